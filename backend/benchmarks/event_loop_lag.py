@@ -0,0 +1,104 @@
+"""
+Event-loop lag benchmark for the data-access layer.
+
+Fires a burst of /api/analytics requests at the app while a probe task
+measures how late the event loop wakes up from a 10ms sleep - the same delay
+a live /ws/audio call would see forwarding audio to Deepgram.
+
+The database is a local stub that answers every PostgREST request after
+DB_LATENCY seconds. The "blocking" run repeats the burst with the old pattern
+(sync Supabase client called from an async handler) for comparison.
+
+Usage (from backend/):
+    python -m benchmarks.event_loop_lag
+"""
+import asyncio
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DB_LATENCY = 0.05
+REQUESTS = 50
+PROBE_INTERVAL = 0.01
+
+
+class _StubPostgrest(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(DB_LATENCY)
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_stub() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubPostgrest)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+async def _probe(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def _measure(burst) -> list[float]:
+    stop = asyncio.Event()
+    lags: list[float] = []
+    probe = asyncio.create_task(_probe(stop, lags))
+    await burst()
+    stop.set()
+    await probe
+    return lags
+
+
+def _report(name: str, lags: list[float]) -> None:
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    p99 = lags_ms[int(len(lags_ms) * 0.99) - 1] if len(lags_ms) > 1 else lags_ms[0]
+    print(f"{name:>10}: samples={len(lags_ms):4d}  median={statistics.median(lags_ms):7.2f}ms  "
+          f"p99={p99:7.2f}ms  max={lags_ms[-1]:7.2f}ms")
+
+
+async def main() -> None:
+    url = _start_stub()
+    os.environ["SUPABASE_URL"] = url
+    os.environ["SUPABASE_SERVICE_KEY"] = "eyJhbGciOiJIUzI1NiJ9.e30.benchmark"
+
+    import httpx
+    from supabase import create_client
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://kova") as client:
+
+        async def async_burst():
+            await asyncio.gather(*(
+                client.get("/api/analytics", params={"user_id": f"user-{i}"}) for i in range(REQUESTS)
+            ))
+
+        sync_client = create_client(url, os.environ["SUPABASE_SERVICE_KEY"])
+
+        async def blocking_handler(user_id: str):
+            sync_client.table("user_analytics").select("*").eq("id", user_id).execute()
+
+        async def blocking_burst():
+            await asyncio.gather(*(blocking_handler(f"user-{i}") for i in range(REQUESTS)))
+
+        # Warm up the pooled client so connection setup isn't measured
+        await client.get("/api/analytics", params={"user_id": "warmup"})
+
+        _report("async", await _measure(async_burst))
+        _report("blocking", await _measure(blocking_burst))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
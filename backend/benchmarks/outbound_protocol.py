@@ -0,0 +1,78 @@
+"""
+Bytes and encode time per call for the /ws/audio outbound protocols.
+
+Replays a synthetic call (a transcript message per analysis, a fact-check
+score update now and then) through OutboundEncoder in JSON and MessagePack
+mode, and reports the bytes on the wire with and without permessage-deflate
+(a raw deflate stream with context takeover, as browsers negotiate it).
+
+Usage (from backend/):
+    python -m benchmarks.outbound_protocol [--messages 200]
+"""
+import argparse
+import random
+import time
+import zlib
+
+from services.outbound_protocol import JSON, MSGPACK, OutboundEncoder
+
+REASONS = [
+    "The caller claims to be a grandson in trouble and asks for secrecy, a common grandparent scam pattern.",
+    "The caller is pressing for gift cards and discouraging the user from hanging up.",
+    "Nothing suspicious so far; the caller is asking general questions.",
+]
+
+
+def call_messages(count: int, rng: random.Random) -> list[dict]:
+    risk, messages = 0, []
+    reasoning = REASONS[2]
+    for i in range(count):
+        if rng.random() < 0.2:
+            risk = min(risk + rng.randint(0, 15), 100)
+            reasoning = rng.choice(REASONS)
+        segments = [] if i % 5 == 4 else [
+            {"speaker": rng.choice(("user", "caller")), "text": f"Sentence {i} of the call, about {rng.randint(8, 20)} words long."}
+        ]
+        messages.append({
+            "type": "transcript",
+            "segments": segments,
+            "risk_score": risk,
+            "confidence_score": min(i, 90),
+            "reasoning": reasoning,
+            "suggested_question": "What did we eat last Thanksgiving?" if i % 25 == 0 else None,
+            "alert_sent": False,
+        })
+    return messages
+
+
+def measure(protocol: str, messages: list[dict]) -> tuple[int, int, float]:
+    """(raw bytes, deflated bytes, microseconds per message)"""
+    encoder = OutboundEncoder(protocol)
+    deflate = zlib.compressobj(wbits=-15)
+    raw = deflated = 0
+    started = time.perf_counter()
+    frames = [encoder.encode(message) for message in messages]
+    elapsed = time.perf_counter() - started
+    for frame in frames:
+        if frame is None:
+            continue
+        data = frame.encode() if isinstance(frame, str) else frame
+        raw += len(data)
+        deflated += len(deflate.compress(data) + deflate.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return raw, deflated, elapsed / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=200, help="Messages in the simulated call")
+    args = parser.parse_args()
+
+    messages = call_messages(args.messages, random.Random(0))
+    print(f"{'protocol':>10}  {'bytes':>8}  {'deflated':>8}  {'us/msg':>7}")
+    for protocol in (JSON, MSGPACK):
+        raw, deflated, micros = measure(protocol, messages)
+        print(f"{protocol:>10}  {raw:>8}  {deflated:>8}  {micros:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
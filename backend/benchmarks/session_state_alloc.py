@@ -0,0 +1,66 @@
+"""
+Per-chunk allocation micro-benchmark for the scam detection workflow.
+
+Runs process_chunk() with the LLM calls stubbed out and reports the peak
+memory allocated while handling one chunk, at several transcript lengths.
+With the session mutated in place it should stay flat as history grows.
+
+Usage (from backend/):
+    python -m benchmarks.session_state_alloc [--chunks 200]
+"""
+import argparse
+import tracemalloc
+from unittest import mock
+
+from services.session_state import SessionState, MAX_TRANSCRIPT_TURNS
+from services import workflow
+
+HISTORY_LENGTHS = (0, 10, 50, MAX_TRANSCRIPT_TURNS)
+
+
+def _fake_analyze(new_chunk, session):
+    """Stands in for scam_detector.analyze_transcript (no network)."""
+    session.recent_turns(20)
+    session.risk_score = min(session.risk_score + 1, 60)
+    session.confidence_score = 60  # Routes straight to END
+    session.add_turn(new_chunk["speaker"], new_chunk["text"])
+
+
+def measure(history_length: int, chunks: int) -> float:
+    """Mean peak bytes allocated per process_chunk() call."""
+    session = SessionState()
+    for i in range(history_length):
+        session.add_turn("caller", f"earlier turn {i}")
+    chunk = {"speaker": "caller", "text": "Please buy gift cards and read me the numbers."}
+
+    # Warm up the compiled graph and any caches before tracing
+    workflow.process_chunk(chunk, session)
+    while len(session.transcript_history) > history_length:
+        session.transcript_history.popleft()
+
+    total = 0
+    tracemalloc.start()
+    for _ in range(chunks):
+        if len(session.transcript_history) > history_length:
+            session.transcript_history.popleft()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        workflow.process_chunk(chunk, session)
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunks", type=int, default=200)
+    args = parser.parse_args()
+
+    with mock.patch.object(workflow, "analyze_transcript", _fake_analyze):
+        print(f"{'history turns':>14}  {'peak bytes/chunk':>16}")
+        for length in HISTORY_LENGTHS:
+            print(f"{length:>14}  {measure(length, args.chunks):>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
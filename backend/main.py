@@ -1,14 +1,61 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routers.websocket import router as websocket_router
 from routers.chat import router as chat_router
 from routers.api import router as api_router
 from routers.wakeword import router as wakeword_router
+from routers.debug import router as debug_router
+from routers.observe import router as observe_router
+from services.report_aggregator import flush_pending_reports
+from services.number_index import get_number_index
+from services.call_rollups import run_compaction_loop
+from services.supabase_client import bind_event_loop
+from services.storage import get_storage
+from services.session_store import get_session_store
+from services.session_manager import run_session_sweeper
+from services.transcription_pool import get_transcription_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Worker threads (LangGraph, report flushes) run their queries on this loop
+    bind_event_loop(asyncio.get_running_loop())
+    
+    # Load the suspicious number replica, then keep it fresh in the background
+    index = get_number_index()
+    try:
+        loaded = await index.sync()
+        print(f"[NumberIndex] Loaded {loaded} suspicious number(s)")
+    except Exception as e:
+        print(f"[NumberIndex] Initial load failed, falling back to live queries: {e}")
+    sync_task = asyncio.create_task(index.run_sync_loop())
+    # Retention/downsampling for the call analytics rollups
+    compaction_task = asyncio.create_task(run_compaction_loop())
+    # Drop sessions whose call went away without a clean disconnect
+    sweeper_task = asyncio.create_task(run_session_sweeper())
+    # Pre-warmed Deepgram connections so calls don't wait for a handshake
+    pool_task = asyncio.create_task(get_transcription_pool().run())
+    
+    yield
+    
+    sync_task.cancel()
+    compaction_task.cancel()
+    sweeper_task.cancel()
+    pool_task.cancel()
+    await get_transcription_pool().close()
+    # Don't drop suspicious-number reports still waiting in the batch window
+    await asyncio.to_thread(flush_pending_reports)
+    await get_storage().close()
+    get_session_store().close()
+
 
 app = FastAPI(
     title="Kova API",
     description="Real-time scam call detection system",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware for frontend
@@ -25,6 +72,8 @@ app.include_router(websocket_router)
 app.include_router(chat_router)
 app.include_router(api_router)
 app.include_router(wakeword_router)
+app.include_router(debug_router)
+app.include_router(observe_router)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,40 @@
 """
 REST API router for phone number operations.
 """
-from fastapi import APIRouter, Query
-from services.supabase_client import check_suspicious_number, get_user_analytics, export_analytics_data
+import csv
+import io
+import json
+from datetime import date, timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Literal
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from services.analytics_cache import AnalyticsReadModel, get_analytics_read_model
+from services.storage.base import CALL_EXPORT_COLUMNS
+from services.supabase_client import check_suspicious_number, check_suspicious_numbers, get_fleet_analytics, iter_call_records, get_risk_timeline_stats
+from services.workflow import ALERT_RISK_THRESHOLD, ALERT_CONFIDENCE_THRESHOLD
 
 router = APIRouter(prefix="/api", tags=["api"])
 
+# Maximum numbers accepted by one /check-numbers request
+MAX_BULK_NUMBERS = 10000
+
+# NDJSON lines per streamed chunk
+NDJSON_CHUNK_LINES = 256
+
+
+# Media types for streamed call exports
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+class CheckNumbersRequest(BaseModel):
+    phone_numbers: list[str] = Field(..., max_length=MAX_BULK_NUMBERS)
+
 
 @router.get("/check-number")
 async def check_number(phone: str = Query(..., description="Phone number to check")):
@@ -14,36 +43,192 @@ async def check_number(phone: str = Query(..., description="Phone number to chec
     
     Returns:
         {"found": true, "report_count": N} if the number is in the database,
-        {"found": false} if not found.
+        {"found": false} if not found. Valid numbers also include the normalized
+        "phone_number", report counts for its exchange block and last-digit
+        "neighborhood", and the "risk_prior" a call from it would start with.
     """
-    result = check_suspicious_number(phone)
-    return result
+    return await check_suspicious_number(phone)
+
+
+@router.post("/check-numbers")
+async def check_numbers(request: CheckNumbersRequest):
+    """
+    Screen many phone numbers at once (e.g. a call log or contact list).
+    
+    Numbers are normalized and deduplicated, resolved in bulk, and streamed
+    back as NDJSON - one line per distinct number, listing the raw inputs that
+    mapped to it, followed by one error line per invalid input.
+    """
+    async def ndjson_chunks():
+        lines = []
+        async for result in check_suspicious_numbers(request.phone_numbers):
+            lines.append(json.dumps(result))
+            if len(lines) >= NDJSON_CHUNK_LINES:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+    
+    return StreamingResponse(ndjson_chunks(), media_type="application/x-ndjson")
+
+
+def _day_start(day: date | None, days_after: int = 0) -> str | None:
+    """UTC midnight starting `day` (+ days_after) as an ISO timestamp."""
+    if day is None:
+        return None
+    return f"{(day + timedelta(days=days_after)).isoformat()}T00:00:00+00:00"
+
+
+def _not_modified(request: Request, etag: str, model: AnalyticsReadModel) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against a read model."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return model.last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _cached_json(request: Request, model: AnalyticsReadModel, body: bytes, etag: str, extra_headers: dict = None) -> Response:
+    """JSON response with validators, or a bodyless 304 when the client copy is current."""
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(model.last_modified, usegmt=True),
+        # Let browsers keep a copy but revalidate it on every load
+        "Cache-Control": "private, no-cache",
+        **(extra_headers or {}),
+    }
+    if _not_modified(request, etag, model):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get("/analytics")
-async def get_analytics(user_id: str = Query(..., description="User UUID")):
+async def get_analytics(request: Request, user_id: str = Query(..., description="User UUID")):
     """
     Get analytics data for a user.
     
+    Served from the per-user read model cache; supports conditional GET
+    (ETag / Last-Modified) so an unchanged dashboard gets a 304.
+    
     Returns:
         Full analytics data or {"error": "Not found"} if user has no analytics.
     """
-    result = get_user_analytics(user_id)
-    if result:
-        return result
-    return {"error": "Not found"}
+    model = await get_analytics_read_model(user_id)
+    if model is None:
+        return {"error": "Not found"}
+    return _cached_json(request, model, model.analytics_body, model.etag())
+
+
+async def _export_chunks(user_id: str, fmt: str, since: str | None, until: str | None):
+    """Serialize call records page by page; one chunk per keyset page."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CALL_EXPORT_COLUMNS)
+        yield buffer.getvalue()
+        async for page in iter_call_records(user_id, since, until):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([row.get(c) for c in CALL_EXPORT_COLUMNS] for row in page)
+            yield buffer.getvalue()
+
+    elif fmt == "ndjson":
+        async for page in iter_call_records(user_id, since, until):
+            yield "\n".join(json.dumps(row, default=str) for row in page) + "\n"
+
+    else:
+        yield '{"calls":['
+        count = 0
+        async for page in iter_call_records(user_id, since, until):
+            yield ("," if count else "") + ",".join(json.dumps(row, default=str) for row in page)
+            count += len(page)
+        yield f'],"count":{count}}}'
 
 
 @router.get("/analytics/export")
-async def export_analytics(user_id: str = Query(..., description="User UUID")):
+async def export_analytics(
+    request: Request,
+    user_id: str = Query(..., description="User UUID"),
+    format: Literal["json", "ndjson", "csv"] | None = Query(None, description="Stream every call record in this format"),
+    since: date | None = Query(None, description="First day to export (UTC, inclusive)"),
+    until: date | None = Query(None, description="Last day to export (UTC, inclusive)"),
+):
     """
-    Export analytics data in a shareable format.
+    Export analytics data.
+    
+    Without format or a date range this is the shareable summary (cached,
+    gzip-compressed when accepted, supports conditional GET). With them, the
+    user's individual calls are streamed oldest first as CSV, NDJSON or a JSON
+    document, paging through the store so memory use stays constant.
     
     Returns:
-        Formatted analytics summary for sharing with loved ones.
+        Formatted analytics summary for sharing with loved ones, or the
+        streamed call records.
+    """
+    if format is not None or since is not None or until is not None:
+        fmt = format or "json"
+        return StreamingResponse(
+            _export_chunks(user_id, fmt, _day_start(since), _day_start(until, days_after=1)),
+            media_type=EXPORT_MEDIA_TYPES[fmt],
+            headers={"Content-Disposition": f'attachment; filename="kova-calls.{fmt}"'},
+        )
+
+    model = await get_analytics_read_model(user_id)
+    if model is None:
+        return {"error": "No analytics data found"}
+
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return _cached_json(request, model, model.export_gzip(), model.etag("export-gzip"), {
+            "Content-Encoding": "gzip",
+            "Vary": "Accept-Encoding",
+        })
+    return _cached_json(request, model, model.export_body, model.etag("export"), {"Vary": "Accept-Encoding"})
+
+
+@router.get("/analytics/fleet")
+async def fleet_analytics():
     """
-    result = export_analytics_data(user_id)
+    Fleet-wide analytics across all users.
+    
+    Returns:
+        Estimated distinct scam numbers seen by any user (HyperLogLog merge).
+    """
+    result = await get_fleet_analytics()
     if result:
         return result
-    return {"error": "No analytics data found"}
+    return {"error": "Fleet analytics unavailable"}
 
+
+@router.get("/analytics/risk-timelines")
+async def risk_timeline_stats(
+    since: date | None = Query(None, description="First day to include (UTC, inclusive)"),
+    until: date | None = Query(None, description="Last day to include (UTC, inclusive)"),
+    risk_threshold: int = Query(ALERT_RISK_THRESHOLD, ge=0, le=100),
+    confidence_threshold: int = Query(ALERT_CONFIDENCE_THRESHOLD, ge=0, le=100),
+    max_calls: int = Query(10000, ge=1, le=1000000),
+):
+    """
+    Fleet-wide statistics over per-call risk timelines, for tuning the
+    alerting thresholds in route_after_analysis.
+    
+    Returns:
+        Time-to-first-alert and risk-at-minute-N percentiles, and how often
+        risk reached risk_threshold before confidence reached confidence_threshold.
+    """
+    result = await get_risk_timeline_stats(
+        risk_threshold,
+        confidence_threshold,
+        since=_day_start(since),
+        until=_day_start(until, days_after=1),
+        max_calls=max_calls,
+    )
+    if result:
+        return result
+    return {"error": "Risk timeline statistics unavailable"}
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from services import session_manager
-from services.chat_bot import chat_with_protector
+from services.chat_bot import chat_with_protector, precomputed_answer
 
 router = APIRouter()
 
@@ -13,7 +13,7 @@ class ChatResponse(BaseModel):
     response: str
 
 @router.post("/chat", response_model=ChatResponse)
-def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks):
+def chat_endpoint(request: ChatRequest):
     """
     Endpoint for the 'Protective Companion' chatbot.
     Retrieves the live session state and generates a contextual answer.
@@ -28,25 +28,23 @@ def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks):
         # For now, let's return a specific message.
         raise HTTPException(status_code=404, detail="Active call session not found.")
         
-    # 2. Call the service logic
-    answer = chat_with_protector(request.query, session)
+    # 2. Answer from the precomputed canned answers if the question matches
+    #    one, otherwise call the model (on our copy of the session)
+    chat_length = len(session.chatbot_history)
+    answer = precomputed_answer(request.query, session)
+    if answer is None:
+        answer = chat_with_protector(request.query, session)
     
-    # 3. Inject User Input into the Brain (Scam Detector)
-    # We treat this as a "USER_INPUT" chunk which the prompt now prioritizes.
-    from services.workflow import process_chunk
+    # Append this exchange to the stored session without clobbering
+    # concurrent transcript updates, and queue the question for a fact check.
+    # We treat it as a "USER_INPUT" chunk which the prompt prioritizes; the
+    # call's SessionActor picks it up from the store and applies the result.
+    new_messages = session.chatbot_history[chat_length:]
     
-    # Run in background to not block the response
-    background_tasks.add_task(
-        process_chunk,
-        new_chunk={"speaker": "USER_INPUT", "text": request.query},
-        transcript_history=session.transcript_history,
-        risk_score=session.risk_score,
-        confidence_score=session.confidence_score,
-        emergency_contacts=session.emergency_contacts,
-        last_alert_time=session.last_alert_time,
-        last_question_time=session.last_question_time,
-        caller_phone_number=session.caller_phone_number,
-        suspicious_number_reported=session.suspicious_number_reported
-    )
+    def record_exchange(live_session):
+        live_session.add_chat_messages(new_messages)
+        live_session.queue_user_input(request.query)
+    
+    session_manager.update_session(request.session_id, record_exchange)
     
     return ChatResponse(response=answer)
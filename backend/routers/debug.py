@@ -0,0 +1,73 @@
+"""
+Debug endpoints for operators.
+"""
+from fastapi import APIRouter
+
+from services.chat_bot import get_chat_answer_stats
+from services.live_transcription import get_transcription_metrics
+from services.observer_hub import get_observer_stats
+from services.session_store import get_session_store
+from services.transcription_pool import get_transcription_pool
+from services.voice_commands import get_command_engine
+from services.wake_spotter import get_wake_word_metrics
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@router.get("/sessions")
+async def session_stats():
+    """
+    Memory accounting for live sessions (sizes and idle times only, no content).
+    """
+    store = get_session_store()
+    sessions = store.stats()
+    return {
+        "backend": store.name,
+        "count": len(sessions),
+        "total_bytes": sum(s["total_bytes"] for s in sessions),
+        "evictions": store.evictions,
+        "idle_ttl_seconds": store.idle_ttl,
+        "max_sessions": store.max_sessions,
+        "sessions": sessions,
+    }
+
+
+@router.get("/transcription")
+async def transcription_metrics():
+    """
+    Upstream transcription health: reconnects, gap durations, replayed audio,
+    connection pool / wakeword handoff counters, and how much wake word
+    audio was spotted locally instead of streamed.
+    """
+    metrics = get_transcription_metrics().to_dict()
+    metrics["pool"] = get_transcription_pool().stats()
+    metrics["wakeword"] = get_wake_word_metrics().to_dict()
+    return metrics
+
+
+@router.get("/voice-commands")
+async def voice_command_stats():
+    """
+    Per-command trigger counts; "retracted" triggers fired on an interim
+    result that the final transcript didn't contain.
+    """
+    return get_command_engine().stats()
+
+
+@router.get("/chat-answers")
+async def chat_answer_stats():
+    """
+    How /chat questions were answered: from precomputed canned answers,
+    live because the matching answer was stale or missing, or live because
+    no canned intent matched.
+    """
+    return get_chat_answer_stats()
+
+
+@router.get("/observers")
+async def observer_stats():
+    """
+    Live call fan-out to /ws/observe: observers per call, queue depths, and
+    how many were dropped for falling behind.
+    """
+    return get_observer_stats()
@@ -0,0 +1,73 @@
+"""
+WebSocket router for emergency contacts watching a live call.
+"""
+import asyncio
+from fastapi import APIRouter, WebSocket, Query
+
+from services.observer_hub import get_observer_hub, verify_observer_token
+
+router = APIRouter()
+
+# Close codes (4000-4999 are free for applications)
+CLOSE_UNAUTHORIZED = 4401  # Bad or expired watch link
+CLOSE_NOT_LIVE = 4404  # No live call with this session here (ended, or not started)
+CLOSE_TRY_AGAIN = 1013  # Too many observers, or dropped for falling behind
+
+
+@router.websocket("/ws/observe/{session_id}")
+async def observe_websocket(
+    websocket: WebSocket,
+    session_id: str,
+    token: str = Query(default=None),  # From the watch link in the alert
+):
+    """
+    Live risk, captions and alerts for a protected call (see services.observer_hub).
+    Read-only: anything the observer sends is ignored.
+    """
+    await websocket.accept()
+    contact = verify_observer_token(session_id, token)
+    if contact is None:
+        await websocket.close(code=CLOSE_UNAUTHORIZED, reason="Invalid or expired link")
+        return
+
+    hub = get_observer_hub(session_id)
+    if hub is None:
+        await websocket.close(code=CLOSE_NOT_LIVE, reason="Call is not live")
+        return
+    subscription = hub.subscribe(contact)
+    if subscription is None:
+        await websocket.close(code=CLOSE_TRY_AGAIN, reason="Too many observers")
+        return
+    print(f"[Observe] {contact} watching {session_id} ({hub.subscribers} observer(s))")
+
+    async def forward():
+        """Send queued frames until the hub ends the call or drops us."""
+        while True:
+            frame = await subscription.queue.get()
+            if frame is None:
+                return
+            await websocket.send_text(frame)
+
+    async def watch_disconnect():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(forward()), asyncio.create_task(watch_disconnect())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except Exception as e:
+        print(f"[Observe] Error: {e}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        hub.unsubscribe(subscription)
+        try:
+            if subscription.dropped:
+                await websocket.close(code=CLOSE_TRY_AGAIN, reason="Too slow, reconnect")
+            else:
+                await websocket.close()
+        except Exception:
+            pass  # Already closed
+        print(f"[Observe] {contact} stopped watching {session_id}")
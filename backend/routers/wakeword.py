@@ -1,117 +1,231 @@
 """
-WebSocket router for wake word detection using Deepgram.
+WebSocket router for wake word detection.
+
+Audio is spotted on the server first (services/wake_spotter.py). Deepgram
+only hears the few seconds around something the spotter flags, and has the
+final say on whether it was the wake phrase.
+
+Clients may send Opus (?encoding=opus) if the server can decode it; the
+spotter needs PCM, so Deepgram gets the decoded linear16 here.
 """
 import asyncio
-from fastapi import APIRouter, WebSocket, Query
+from contextlib import aclosing
+from fastapi import APIRouter, WebSocket, Query, Request, HTTPException
 from starlette.websockets import WebSocketDisconnect
 
-from services.deepgram_client import create_live_connection
+from services.audio_encoding import LINEAR16, OPUS, OPUS_SAMPLE_RATE, OpusDecoder, negotiate_encoding
+from services.live_transcription import AudioRingBuffer, SupervisedTranscription, BYTES_PER_SAMPLE
+from services.supabase_client import get_wake_word_model, save_wake_word_model
+from services.transcription_pool import get_transcription_pool
+from services.voice_commands import CommandEngine, get_command_engine
+from services.wake_spotter import MIN_ENROLLED_SAMPLES, WakeWordSpotter, enroll, get_wake_word_metrics
 
 router = APIRouter()
 
+# Audio from before a trigger that Deepgram also gets (the phrase itself)
+PREROLL_SECONDS = 2.5
+
+# How long Deepgram has to confirm a trigger before the stream goes local again
+CONFIRM_SECONDS = 4.0
+
 
 @router.websocket("/ws/wakeword")
 async def wakeword_websocket(
     websocket: WebSocket,
     sample_rate: int = Query(default=48000),
     wake_word: str = Query(default="hello"),
+    user_id: str = Query(default=None),  # Selects the enrolled wake word templates
+    encoding: str = Query(default=LINEAR16),  # "opus" for Opus in WebM/Ogg (MediaRecorder)
 ):
     """
     WebSocket endpoint for wake word detection.
-    Streams audio to Deepgram and watches for the wake word.
-    Sends {"detected": true} when wake word is found, then closes.
+    Spots the wake word locally and confirms it with Deepgram.
+    Sends {"type": "audio_format", "encoding": ...} first, then
+    {"detected": true, "handoff": <token>} when wake word is found, and
+    closes. For linear16 clients the Deepgram connection stays open under the
+    token so /ws/audio can adopt it instead of dialing a new one.
     """
     await websocket.accept()
-    print(f"[WakeWord] Client connected (sample_rate={sample_rate}, wake_word='{wake_word}')")
-    
-    wake_word_lower = wake_word.lower()
-    detected = False
-    
+    encoding = negotiate_encoding(encoding, needs_pcm=True)
+    await websocket.send_json({"type": "audio_format", "encoding": encoding})
+    decoder = None
+    if encoding == OPUS:
+        decoder = OpusDecoder()
+        sample_rate = OPUS_SAMPLE_RATE
+    print(f"[WakeWord] Client connected (sample_rate={sample_rate}, encoding={encoding}, wake_word='{wake_word}', user={user_id})")
+
+    # "kova activate" is a built-in command; any other wake word gets its own engine
+    engine = get_command_engine()
+    wake_command = engine.lookup(wake_word)
+    if wake_command is None:
+        engine, wake_command = CommandEngine(), "wake"
+        engine.register(wake_command, wake_word)
+
+    # Without enrolled templates the spotter only filters out silence
+    spotter = WakeWordSpotter(sample_rate, await get_wake_word_model(user_id))
+    print(f"[WakeWord] Local spotting: {'templates' if spotter.model else 'speech only'}")
+
+    metrics = get_wake_word_metrics()
+    metrics.streams += 1
+    bytes_per_second = sample_rate * BYTES_PER_SAMPLE
+    preroll = AudioRingBuffer(int(PREROLL_SECONDS * sample_rate) * BYTES_PER_SAMPLE)
+    pool = get_transcription_pool()
+    loop = asyncio.get_running_loop()
+
+    detected = asyncio.Event()
+    detected_transcript = ""
+    dg_connection = None
+    confirm_task = None
+    handed_off = False
+
+    async def confirm(connection: SupervisedTranscription):
+        """Receive transcripts from Deepgram and check for wake word."""
+        nonlocal detected_transcript
+        commands = engine.matcher()
+        try:
+            # Closed on return, so nothing is left reading from a handed-off connection
+            async with aclosing(aiter(connection)) as messages:
+                async for message in messages:
+                    if not (hasattr(message, "channel") and message.channel):
+                        continue
+
+                    transcript = message.channel.alternatives[0].transcript
+                    if not transcript:
+                        continue
+
+                    print(f"[WakeWord] Heard: {transcript}")
+                    if wake_command in commands.feed(transcript, getattr(message, "is_final", True)):
+                        print(f"[WakeWord] Wake word '{wake_word}' detected!")
+                        detected_transcript = transcript
+                        detected.set()
+                        return
+        except Exception as e:
+            print(f"[WakeWord] Receiver error: {e}")
+
+    async def close_confirmation():
+        """Back to listening locally."""
+        nonlocal dg_connection, confirm_task
+        connection, task = dg_connection, confirm_task
+        dg_connection = confirm_task = None
+        await connection.close()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def send_audio():
+        """Spot locally; stream to Deepgram only while confirming a trigger."""
+        nonlocal dg_connection, confirm_task
+        deadline = 0.0
+        try:
+            while not detected.is_set():
+                data = await websocket.receive_bytes()
+                if decoder is not None:
+                    data = decoder.decode(data)
+                    if not data:
+                        continue
+                metrics.audio_seconds += len(data) / bytes_per_second
+                preroll.write(data)
+                triggered = spotter.push(data)
+
+                if dg_connection is None:
+                    if not triggered:
+                        continue
+                    metrics.triggers += 1
+                    if spotter.model:
+                        print(f"[WakeWord] Local match (distance {spotter.last_distance:.2f}), confirming")
+                    connection = SupervisedTranscription(sample_rate, connect=pool.connect)
+                    try:
+                        await connection.open()
+                    except Exception as e:
+                        print(f"[WakeWord] Deepgram unavailable, still listening locally: {e}")
+                        continue
+                    dg_connection = connection
+                    confirm_task = asyncio.create_task(confirm(connection))
+                    data = preroll.read(preroll.start)
+                    deadline = loop.time() + CONFIRM_SECONDS
+                elif triggered or (spotter.model is None and spotter.speaking):
+                    deadline = loop.time() + CONFIRM_SECONDS
+
+                await dg_connection.send_media(data)
+                metrics.streamed_seconds += len(data) / bytes_per_second
+
+                if loop.time() > deadline and not detected.is_set():
+                    if spotter.model:
+                        metrics.false_alarms += 1
+                    await close_confirmation()
+        except WebSocketDisconnect:
+            print("[WakeWord] Client disconnected")
+        except ValueError as e:
+            print(f"[WakeWord] Undecodable audio: {e}")
+
     try:
-        async with create_live_connection(sample_rate) as dg_connection:
-            
-            async def receive_transcripts():
-                """Receive transcripts from Deepgram and check for wake word."""
-                nonlocal detected
-                try:
-                    async for message in dg_connection:
-                        if detected:
-                            return
-                            
-                        if not (hasattr(message, "channel") and message.channel):
-                            continue
-                            
-                        transcript = message.channel.alternatives[0].transcript
-                        if not transcript:
-                            continue
-                        
-                        transcript_lower = transcript.lower()
-                        print(f"[WakeWord] Heard: {transcript}")
-                        
-                        is_match = False
-                        
-                        if "kova" in wake_word_lower:
-                            # Syllable matching for "kova" (not a real word)
-                            # First syllable: "ko" or "co" 
-                            # Second syllable: "va" or "vah"
-                            first_syllables = ["ko", "co"]
-                            second_syllables = ["va", "vah", "ver"]
-                            
-                            has_first = any(s in transcript_lower for s in first_syllables)
-                            has_second = any(s in transcript_lower for s in second_syllables)
-                            has_activate = "activate" in transcript_lower
-                            
-                            # Match if we have both syllables of "kova" + "activate"
-                            if has_first and has_second and has_activate:
-                                is_match = True
-                                print(f"[WakeWord] Syllable match: first={has_first}, second={has_second}, activate={has_activate}")
-                        else:
-                            # Exact match for other wake words
-                            is_match = wake_word_lower in transcript_lower
-                        
-                        if is_match:
-                            print(f"[WakeWord] Wake word '{wake_word}' detected!")
-                            detected = True
-                            await websocket.send_json({"detected": True, "transcript": transcript})
-                            return
-                except Exception as e:
-                    print(f"[WakeWord] Receiver error: {e}")
-
-            async def send_audio():
-                """Receive audio from browser and send to Deepgram."""
-                nonlocal detected
-                try:
-                    while not detected:
-                        data = await websocket.receive_bytes()
-                        if not detected:
-                            await dg_connection.send_media(data)
-                except WebSocketDisconnect:
-                    print("[WakeWord] Client disconnected")
-
-            # Run both tasks, but cancel when wake word detected
-            receive_task = asyncio.create_task(receive_transcripts())
-            send_task = asyncio.create_task(send_audio())
-            
-            # Wait for either task to complete (wake word found or disconnect)
-            done, pending = await asyncio.wait(
-                [receive_task, send_task],
-                return_when=asyncio.FIRST_COMPLETED
-            )
-            
-            # Cancel remaining tasks
-            for task in pending:
-                task.cancel()
-                try:
-                    await task
-                except asyncio.CancelledError:
-                    pass
+        # Run until the wake word is confirmed or the client goes away
+        send_task = asyncio.create_task(send_audio())
+        detected_task = asyncio.create_task(detected.wait())
+
+        done, pending = await asyncio.wait(
+            [send_task, detected_task],
+            return_when=asyncio.FIRST_COMPLETED
+        )
+
+        # Cancel remaining tasks
+        for task in pending:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        if detected.is_set() and dg_connection is not None:
+            # Nothing reads from or writes to the connection any more: park it for the call
+            await confirm_task
+            metrics.confirmed += 1
+            token = None
+            # An Opus call streams a new container the decoded PCM connection can't take
+            if encoding == LINEAR16:
+                token = pool.park(dg_connection, sample_rate)
+                handed_off = True
+            await websocket.send_json({"detected": True, "transcript": detected_transcript, "handoff": token})
 
     except Exception as e:
         print(f"[WakeWord] Error: {e}")
 
     finally:
+        if dg_connection is not None and not handed_off:
+            await close_confirmation()
         try:
             await websocket.close()
         except Exception:
             pass  # Already closed
         print("[WakeWord] Connection closed")
+
+
+@router.post("/wakeword/enroll")
+async def enroll_wake_word(
+    request: Request,
+    user_id: str = Query(...),
+    sample_rate: int = Query(default=48000),
+):
+    """
+    Add one recording of the wake phrase to a user's templates.
+
+    The request body is the raw linear16 mono recording. Local spotting
+    switches on once the user has MIN_ENROLLED_SAMPLES recordings.
+    """
+    pcm = await request.body()
+    try:
+        model = await asyncio.to_thread(enroll, await get_wake_word_model(user_id), pcm, sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await save_wake_word_model(user_id, model)
+    return {
+        "samples": len(model.templates),
+        "samples_needed": max(MIN_ENROLLED_SAMPLES - len(model.templates), 0),
+        "ready": model.ready,
+    }
+
+
+@router.delete("/wakeword/enroll")
+async def reset_wake_word(user_id: str = Query(...)):
+    """Forget a user's recordings (back to speech-only gating)."""
+    await save_wake_word_model(user_id, None)
+    return {"samples": 0, "samples_needed": MIN_ENROLLED_SAMPLES, "ready": False}
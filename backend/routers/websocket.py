@@ -7,39 +7,21 @@ import time
 from fastapi import APIRouter, WebSocket, Query
 from starlette.websockets import WebSocketDisconnect
 
-from services.deepgram_client import create_live_connection
+from services.audio_encoding import LINEAR16, negotiate_encoding
+from services.live_transcription import create_supervised_connection
+from services.observer_hub import open_observer_hub, release_observer_hub
+from services.outbound_protocol import JSON, OutboundEncoder, negotiate_protocol
 from services.transcript_processor import TranscriptProcessor
-from services.workflow import process_chunk
-from services import session_manager
+from services.session_actor import SessionActor
 from services.session_state import SessionState
-from services.supabase_client import update_call_analytics
+from services.supabase_client import update_call_analytics, check_suspicious_number
+from services.phone_numbers import normalize_phone_number
+from services.risk_timeline import RiskTimeline
+from services.voice_commands import STOP_COMMAND, get_command_engine
 
 router = APIRouter()
 
 
-def detect_kova_stop(transcript: str) -> bool:
-    """
-    Detect "kova stop" command using syllable matching.
-    "kova" isn't a real word, so we match syllables:
-    - First syllable: "ko" or "co"
-    - Second syllable: "va", "vah", or "ver"
-    Plus the word "stop"
-    """
-    transcript_lower = transcript.lower()
-    
-    first_syllables = ["ko", "co"]
-    second_syllables = ["va", "vah", "ver", "vid", "bra"]
-    
-    has_first = any(s in transcript_lower for s in first_syllables)
-    has_second = any(s in transcript_lower for s in second_syllables)
-    has_stop = "stop" in transcript_lower
-    
-    if has_first and has_second and has_stop:
-        print(f"[WS] 'kova stop' detected! (first={has_first}, second={has_second}, stop={has_stop})")
-        return True
-    return False
-
-
 @router.websocket("/ws/audio")
 async def audio_websocket(
     websocket: WebSocket,
@@ -47,49 +29,97 @@ async def audio_websocket(
     caller_phone_number: str = Query(default=None),
     session_id: str = Query(default=None),
     user_id: str = Query(default=None),  # For analytics tracking
+    handoff: str = Query(default=None),  # Token from /ws/wakeword to adopt its Deepgram connection
+    encoding: str = Query(default=LINEAR16),  # "opus" for Opus in WebM/Ogg (MediaRecorder)
+    protocol: str = Query(default=JSON),  # "msgpack" for compact delta messages
 ):
     """
     WebSocket endpoint for real-time audio transcription and scam detection.
+    The first message (always JSON) tells the client which audio encoding to
+    send and which protocol the rest of the messages use.
     """
     await websocket.accept()
-    print(f"[WS] Client connected (sample_rate={sample_rate}, caller={caller_phone_number}, user={user_id})")
+    # Containerized audio goes to Deepgram as-is, nothing here needs PCM
+    encoding = negotiate_encoding(encoding)
+    outbound = OutboundEncoder(negotiate_protocol(protocol))
+    await websocket.send_text(json.dumps({"type": "audio_format", "encoding": encoding, "protocol": outbound.protocol}))
+    caller_phone_number = normalize_phone_number(caller_phone_number)
+    print(f"[WS] Client connected (sample_rate={sample_rate}, encoding={encoding}, caller={caller_phone_number}, user={user_id})")
     
     # Track call start time for analytics
     call_start_time = time.time()
-    questions_generated_count = 0
-    alerts_sent_count = 0
     
     processor = TranscriptProcessor()
     
-    # Session state for scam detection
-    session = {
-        "transcript_history": [],
-        "risk_score": 0,
-        "confidence_score": 0,
-        "last_alert_time": 0,
-        "last_question_time": 0,
-        "emergency_contacts": ["+16692940189"],  # Replace with real number
-        "caller_phone_number": caller_phone_number,
-        "suspicious_number_reported": False,
-    }
+    # "kova stop" and any other registered voice commands
+    commands = get_command_engine().matcher()
+    
+    # Risk/confidence after every analysis, persisted with the call record
+    timeline = RiskTimeline(start_time=call_start_time)
+    
+    # Known or neighbor-spoofed numbers start with a reputation-based risk prior
+    risk_prior = 0
+    if caller_phone_number:
+        caller_check = await check_suspicious_number(caller_phone_number)
+        risk_prior = caller_check.get("risk_prior", 0)
+    
+    # Session state for scam detection (the workflow updates it in place)
+    session = SessionState()
+    session.risk_score = risk_prior
+    session.emergency_contacts = ["+16692940189"]  # Replace with real number
+    session.caller_phone_number = caller_phone_number
+    session.call_started_at = call_start_time
 
-    # Register session for Chatbot access
+    def score_update(result: dict = None) -> dict:
+        """A transcript message with no new segments, carrying the current scores."""
+        return {
+            "type": "transcript",
+            "segments": [],
+            "risk_score": session.risk_score,
+            "confidence_score": session.confidence_score,
+            "reasoning": session.latest_reasoning,
+            "suggested_question": result.get("suggested_question") if result else None,
+            "alert_sent": result.get("alert_sent", False) if result else False,
+        }
+
+    # Emergency contacts following the call live (/ws/observe), set once the actor starts
+    observers = None
+
+    async def send(message: dict):
+        """Send a transcript message to the client and fan it out to observers."""
+        if observers is not None:
+            observers.update(message)  # Never waits on the observers
+        await outbound.send(websocket, message)
+
+    async def send_fact_check(result: dict):
+        """Push risk changes from /chat fact checks to the client."""
+        await send(score_update(result))
+
+    # The actor owns the session from here on: segments and /chat fact checks
+    # are applied one at a time and published to the session store. A
+    # reconnect within the grace period picks up the dropped call's snapshot.
+    actor = SessionActor(session_id, session, timeline=timeline, processor=processor, on_update=send_fact_check)
+    await actor.start()
+    session, timeline = actor.state, actor.timeline
     if session_id:
-        print(f"[WS] Registering session: {session_id}")
-        live_session = SessionState()
-        # Initialize workflow state for chat endpoint
-        live_session.emergency_contacts = session["emergency_contacts"]
-        live_session.caller_phone_number = session["caller_phone_number"]
-        session_manager.save_session(session_id, live_session)
+        observers = open_observer_hub(session_id)
+    if actor.resumed:
+        print(f"[WS] Resumed session: {session_id}")
+        await send(score_update())
     else:
-        live_session = None
+        if session_id:
+            print(f"[WS] Registering session: {session_id}")
+        timeline.record(risk_prior, 0, at=call_start_time)
+        if observers is not None:
+            observers.update(score_update())  # Reputation prior for the first snapshot
 
     try:
-        async with create_live_connection(sample_rate) as dg_connection:
+        # Survives Deepgram failures: reconnects and replays recent audio.
+        # Starts on the wakeword's open connection or a pre-warmed one.
+        async with create_supervised_connection(sample_rate, handoff=handoff, encoding=encoding) as dg_connection:
 
             async def receive_transcripts():
                 """Receive transcripts from Deepgram, identify speakers, run scam detection."""
-                nonlocal questions_generated_count, alerts_sent_count
                 try:
                     async for message in dg_connection:
                         if not (hasattr(message, "channel") and message.channel):
@@ -103,13 +133,20 @@ async def audio_websocket(
                             
                         print(f"[DG] {'Final' if is_final else 'Interim'}: {transcript}")
                         
-                        # Check for "kova stop" voice command
-                        if detect_kova_stop(transcript):
-                            await websocket.send_text(json.dumps({
-                                "type": "stop_call",
-                                "transcript": transcript
-                            }))
-                            return  # Exit the transcript loop
+                        # Check for "kova stop" (and other voice commands)
+                        for command in commands.feed(transcript, is_final):
+                            print(f"[WS] Voice command '{command}': {transcript}")
+                            if command == STOP_COMMAND:
+                                await outbound.send(websocket, {
+                                    "type": "stop_call",
+                                    "transcript": transcript
+                                })
+                                return  # Exit the transcript loop
+                            await outbound.send(websocket, {
+                                "type": "voice_command",
+                                "command": command,
+                                "transcript": transcript,
+                            })
                         
                         if is_final:
                             processor.add_transcript(transcript)
@@ -120,56 +157,25 @@ async def audio_websocket(
                                 # Run scam detection on combined segments
                                 result = None
                                 for seg in segments:
-                                    # Add segment to history, then run detection on latest
-                                    # Run scam detection in a separate thread to avoid blocking the WebSocket event loop
-                                    result = await asyncio.to_thread(
-                                        process_chunk,
-                                        new_chunk=seg,
-                                        transcript_history=session["transcript_history"],
-                                        risk_score=session["risk_score"],
-                                        confidence_score=session["confidence_score"],
-                                        emergency_contacts=session["emergency_contacts"],
-                                        last_alert_time=session["last_alert_time"],
-                                        last_question_time=session.get("last_question_time", 0),
-                                        caller_phone_number=session.get("caller_phone_number"),
-                                        suspicious_number_reported=session.get("suspicious_number_reported", False),
-                                    )
-                                    # Update history from result (process_chunk appends chunk internally)
-                                    session["transcript_history"] = result["transcript_history"]
-                                    session["risk_score"] = result["risk_score"]
-                                    session["confidence_score"] = result["confidence_score"]
-                                    session["last_alert_time"] = result["last_alert_time"]
-                                    session["last_question_time"] = result.get("last_question_time", 0)
-                                    session["suspicious_number_reported"] = result.get("suspicious_number_reported", False)
-                                    
-                                    # Sync with shared session state for Chatbot
-                                    if live_session:
-                                        live_session.transcript_history = session["transcript_history"]
-                                        live_session.risk_score = session["risk_score"]
-                                        live_session.confidence_score = session["confidence_score"]
-                                        live_session.latest_reasoning = result.get("latest_reasoning", "")
-                                        live_session.last_alert_time = session["last_alert_time"]
-                                        live_session.last_question_time = session["last_question_time"]
-                                        live_session.suspicious_number_reported = session["suspicious_number_reported"]
+                                    # The actor queues the segment behind any in-flight analysis
+                                    # and runs detection off the event loop
+                                    result = await actor.analyze(seg)
                                 
-                                print(f"[SCAM] Risk: {session['risk_score']} | Conf: {session['confidence_score']}")
+                                print(f"[SCAM] Risk: {session.risk_score} | Conf: {session.confidence_score}")
                                 if result and result.get("suggested_question"):
                                     print(f"[SCAM] Suggested Question: {result['suggested_question']}")
-                                    questions_generated_count += 1
                                 
                                 response = {
                                     "type": "transcript",
                                     "segments": segments,
-                                    "risk_score": session["risk_score"],
-                                    "confidence_score": session["confidence_score"],
-                                    "reasoning": result["latest_reasoning"] if result else "",
+                                    "risk_score": session.risk_score,
+                                    "confidence_score": session.confidence_score,
+                                    "reasoning": session.latest_reasoning if result else "",
                                     "suggested_question": result.get("suggested_question") if result else None,
                                     "alert_sent": result.get("alert_sent", False) if result else False,
                                 }
-                                if result and result.get("alert_sent"):
-                                    alerts_sent_count += 1
                                 print(f"[WS] Sending {len(segments)} segment(s) to client")
-                                await websocket.send_text(json.dumps(response))
+                                await send(response)
                                 
                 except Exception as e:
                     print(f"[DG] Receiver error: {e}")
@@ -189,29 +195,37 @@ async def audio_websocket(
         print(f"[WS] Error: {e}")
 
     finally:
-        # Update analytics on call end (wrapped in try/except to never break core functionality)
-        try:
-            if user_id:
-                call_duration = int(time.time() - call_start_time)
-                final_risk = session.get("risk_score", 0)
-                was_scam = final_risk >= 80
-                await asyncio.to_thread(
-                    update_call_analytics,
-                    user_id=user_id,
-                    call_duration_seconds=call_duration,
-                    final_risk_score=final_risk,
-                    caller_phone_number=caller_phone_number,
-                    was_scam=was_scam,
-                    questions_generated=questions_generated_count,
-                    alerts_sent=alerts_sent_count,
-                )
-        except Exception as analytics_error:
-            print(f"[WS] Analytics update failed (non-blocking): {analytics_error}")
-        
-        if session_id:
-            session_manager.delete_session(session_id)
+        await actor.stop()
         try:
             await websocket.close()
         except Exception:
             pass  # Already closed
-        print("[WS] Connection closed")
\ No newline at end of file
+        
+        # Record the call once: not if a reconnect resumed it during the grace period
+        if await actor.release():
+            # Update analytics on call end (wrapped in try/except to never break core functionality)
+            try:
+                if user_id:
+                    call_duration = int(session.detached_at - session.call_started_at)
+                    final_risk = session.risk_score
+                    was_scam = final_risk >= 80
+                    await update_call_analytics(
+                        user_id=user_id,
+                        call_duration_seconds=call_duration,
+                        final_risk_score=final_risk,
+                        caller_phone_number=session.caller_phone_number,
+                        was_scam=was_scam,
+                        questions_generated=session.questions_generated,
+                        alerts_sent=session.alerts_sent,
+                        session_id=session_id,
+                        risk_timeline=timeline.to_bytes(),
+                        ended_at=session.detached_at,
+                    )
+            except Exception as analytics_error:
+                print(f"[WS] Analytics update failed (non-blocking): {analytics_error}")
+        else:
+            print(f"[WS] Session {session_id} resumed by another connection")
+        # Held through the grace period so observers stay on across a reconnect
+        if observers is not None:
+            release_observer_hub(observers)
+        print(f"[WS] Connection closed ({outbound.messages} {outbound.protocol} messages, {outbound.bytes_sent} bytes)")
\ No newline at end of file
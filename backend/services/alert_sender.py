@@ -2,14 +2,15 @@ import os
 import subprocess
 import platform
 
-from services.supabase_client import report_suspicious_number
+from services.report_aggregator import queue_suspicious_report
 
 def send_scam_alert(
     risk_score: int,
     confidence_score: int,
     reasoning: str,
     contact_numbers: list[str],
-    caller_phone_number: str = None  # The scammer's phone number to report
+    caller_phone_number: str = None,  # The scammer's phone number to report
+    watch_links: dict[str, str] = None  # Per-contact link to follow the call live
 ) -> bool:
     """
     Sends iMessage alerts using MacOS native Messages app.
@@ -21,14 +22,15 @@ def send_scam_alert(
         reasoning: The AI's reasoning for the alert
         contact_numbers: List of phone numbers to alert (E.164 or local format)
         caller_phone_number: The suspicious caller's phone number to report
+        watch_links: Contact number -> signed /observe link for that contact
         
     Returns:
         True if commands executed, False otherwise.
     """
     
-    # Report the suspicious number to the database
+    # Report the suspicious number to the database (batched, flushed atomically)
     if caller_phone_number:
-        report_suspicious_number(caller_phone_number)
+        queue_suspicious_report(caller_phone_number)
     else:
         print("WARNING: No caller phone number provided to report as suspicious")
     
@@ -46,12 +48,15 @@ def send_scam_alert(
         f"Please check on them immediately."
     )
     
-    # Escape double quotes for AppleScript
-    safe_message = message_body.replace('"', '\\"')
-    
     success = True
     for number in contact_numbers:
         try:
+            body = message_body
+            if watch_links and number in watch_links:
+                body += f"\\n\\nFollow the call live: {watch_links[number]}"
+            # Escape double quotes for AppleScript
+            safe_message = body.replace('"', '\\"')
+            
             # AppleScript to send iMessage
             # We use 'participant' (modern macOS) or fallback logic could be added
             script = f'''
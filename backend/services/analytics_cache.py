@@ -0,0 +1,151 @@
+"""
+Per-user analytics read model cache.
+
+The dashboard reloads /api/analytics and /api/analytics/export repeatedly
+while nothing has changed. The first request for a user loads the analytics
+row once, derives the export from it and keeps both serialized bodies (plus
+an ETag and Last-Modified) in memory; later requests are served from the
+cache, and a matching If-None-Match / If-Modified-Since gets a 304 without
+touching the database.
+
+update_call_analytics() invalidates the user's entry on write. Other workers
+only see that write once their own entry expires, so entries also carry a
+short TTL (ANALYTICS_CACHE_TTL_SECONDS).
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from services.reputation import parse_timestamp
+
+# Maximum age of a cached read model (seconds)
+CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "60"))
+
+# Maximum number of users kept in the cache (least recently used evicted first)
+CACHE_MAX_USERS = int(os.getenv("ANALYTICS_CACHE_MAX_USERS", "1024"))
+
+
+class AnalyticsReadModel:
+    """Serialized analytics + export bodies for one user, with validators."""
+
+    __slots__ = ("analytics_body", "export_body", "digest", "last_modified", "loaded_at", "_export_gzip")
+
+    def __init__(self, analytics: dict, export: dict):
+        """
+        Args:
+            analytics: Row as returned by get_user_analytics()
+            export: Derived export from build_analytics_export()
+        """
+        self.analytics_body = json.dumps(analytics, default=str, separators=(",", ":")).encode()
+        self.export_body = json.dumps(export, default=str, separators=(",", ":")).encode()
+        self.digest = hashlib.blake2b(self.analytics_body, digest_size=12).hexdigest()
+
+        # HTTP dates have one-second resolution
+        last_call = parse_timestamp(analytics.get("last_call_at")) or time.time()
+        self.last_modified = datetime.fromtimestamp(int(last_call), timezone.utc)
+        self.loaded_at = time.monotonic()
+        self._export_gzip: bytes | None = None
+
+    def etag(self, representation: str = "analytics") -> str:
+        """Strong ETag; each representation (and encoding) gets its own."""
+        if representation == "analytics":
+            return f'"{self.digest}"'
+        return f'"{self.digest}-{representation}"'
+
+    def export_gzip(self) -> bytes:
+        """Gzip-compressed export body, compressed once on first use."""
+        if self._export_gzip is None:
+            self._export_gzip = gzip.compress(self.export_body, compresslevel=6)
+        return self._export_gzip
+
+
+class AnalyticsCache:
+    """LRU + TTL cache of AnalyticsReadModel per user, with write invalidation."""
+
+    def __init__(self, ttl: float = CACHE_TTL, max_users: int = CACHE_MAX_USERS):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._entries: OrderedDict[str, AnalyticsReadModel] = OrderedDict()
+        # Bumped on every invalidation so a load that raced a write is discarded
+        self._generations: dict[str, int] = {}
+        self._loading: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a user's read model (call after writing their analytics)."""
+        self._entries.pop(user_id, None)
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    async def get(self, user_id: str, load) -> AnalyticsReadModel | None:
+        """
+        Get a user's read model, loading it at most once for concurrent callers.
+
+        Args:
+            user_id: The user's UUID
+            load: async fn(user_id) -> AnalyticsReadModel or None if not found
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None and time.monotonic() - entry.loaded_at < self.ttl:
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        task = self._loading.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load(user_id, load))
+            self._loading[user_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, user_id: str, load) -> AnalyticsReadModel | None:
+        generation = self._generations.get(user_id, 0)
+        entry = await load(user_id)
+        if entry is not None and self._generations.get(user_id, 0) == generation:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return entry
+
+
+async def load_analytics_read_model(user_id: str) -> AnalyticsReadModel | None:
+    """Build a user's read model from storage (None if they have no analytics)."""
+    from services.supabase_client import get_user_analytics, build_analytics_export
+
+    analytics = await get_user_analytics(user_id)
+    if not analytics:
+        return None
+    return AnalyticsReadModel(analytics, build_analytics_export(analytics))
+
+
+# Singleton cache shared by all requests in this worker
+_cache: AnalyticsCache | None = None
+
+
+def get_analytics_cache() -> AnalyticsCache:
+    """Get or create the process-wide analytics cache."""
+    global _cache
+    if _cache is None:
+        _cache = AnalyticsCache()
+    return _cache
+
+
+async def get_analytics_read_model(user_id: str) -> AnalyticsReadModel | None:
+    """Cached read model for a user."""
+    return await get_analytics_cache().get(user_id, load_analytics_read_model)
+
+
+def invalidate_user_analytics(user_id: str) -> None:
+    """Invalidate a user's cached analytics after a write."""
+    if _cache is not None:
+        _cache.invalidate(user_id)
@@ -0,0 +1,411 @@
+"""
+Audio encodings accepted on the audio WebSockets.
+
+Clients send either raw linear16 PCM or Opus in a WebM or Ogg container
+(what MediaRecorder produces; ~32 kbps instead of 768 kbps for 48 kHz PCM).
+The client asks with ?encoding=, and the server answers with an
+{"type": "audio_format", "encoding": ...} message before any audio is read.
+
+Containerized audio is passed through to Deepgram unchanged; Deepgram reads
+the codec and rate from the container. The server only parses it:
+OpusStream finds the container header and the points a new Deepgram
+connection can start from (every WebM block, every Ogg page), so a
+reconnect can replay recent audio (see live_transcription). Decoding to PCM
+happens only where a server-side stage needs samples (the wakeword
+spotter), and needs PyAV (`pip install av`); without it, such endpoints
+negotiate linear16 instead.
+"""
+import importlib.util
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+LINEAR16 = "linear16"
+OPUS = "opus"  # In a WebM or Ogg container (sniffed from the first bytes)
+
+# Opus always decodes to 48 kHz
+OPUS_SAMPLE_RATE = 48000
+
+# Upper bound on container bytes per second of audio (128 kbps, the
+# MediaRecorder default when no bitrate is set), for sizing replay buffers
+OPUS_MAX_BYTES_PER_SECOND = 16000
+
+# Bytes accepted before the container header is complete
+MAX_HEADER_BYTES = 64 * 1024
+
+# Largest single element/page read into memory
+MAX_ELEMENT_BYTES = 1024 * 1024
+
+_WEBM_MAGIC = b"\x1a\x45\xdf\xa3"
+_OGG_MAGIC = b"OggS"
+
+# Matroska element IDs (marker bits included)
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TIMECODE_SCALE = 0x2AD7B1
+_TRACKS = 0x1654AE6B
+_TRACK_ENTRY = 0xAE
+_CODEC_PRIVATE = 0x63A2
+_CLUSTER = 0x1F43B675
+_TIMECODE = 0xE7
+_BLOCK_GROUP = 0xA0
+_BLOCK = 0xA1
+_SIMPLE_BLOCK = 0xA3
+
+# Master elements whose children we need; everything else is skipped by size
+_WEBM_DESCEND = frozenset({_SEGMENT, _INFO, _TRACKS, _TRACK_ENTRY, _CLUSTER, _BLOCK_GROUP})
+_WEBM_READ = frozenset({_TIMECODE_SCALE, _CODEC_PRIVATE, _TIMECODE, _BLOCK, _SIMPLE_BLOCK})
+
+# Opus frame sizes by TOC config (RFC 6716 section 3.1), in 48 kHz samples
+_OPUS_FRAME_SAMPLES = (
+    [480, 960, 1920, 2880] * 3  # SILK
+    + [480, 960] * 2  # Hybrid
+    + [120, 240, 480, 960] * 4  # CELT
+)
+
+
+def decoder_available() -> bool:
+    """Whether Opus can be decoded to PCM on this server (PyAV installed)."""
+    return importlib.util.find_spec("av") is not None
+
+
+def negotiate_encoding(requested: Optional[str], needs_pcm: bool = False) -> str:
+    """
+    The encoding a client should send.
+
+    Args:
+        requested: What the client asked for (?encoding=)
+        needs_pcm: Whether the endpoint has to decode the audio itself
+
+    Returns:
+        OPUS if asked for and usable here, otherwise LINEAR16
+    """
+    if requested == OPUS and (not needs_pcm or decoder_available()):
+        return OPUS
+    return LINEAR16
+
+
+def opus_packet_seconds(packet: bytes) -> float:
+    """Duration of one Opus packet, from its TOC byte."""
+    if not packet:
+        return 0.0
+    toc = packet[0]
+    code = toc & 0x03
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+    return frames * _OPUS_FRAME_SAMPLES[toc >> 3] / OPUS_SAMPLE_RATE
+
+
+def _vint(buf, i: int, keep_marker: bool):
+    """EBML variable-length integer at buf[i]: (value, length, all_ones), or None if incomplete."""
+    if i >= len(buf):
+        return None
+    first = buf[i]
+    if first == 0:
+        raise ValueError("Invalid EBML variable-length integer")
+    length = 9 - first.bit_length()
+    if i + length > len(buf):
+        return None
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in buf[i + 1:i + length]:
+        value = value << 8 | byte
+    return value, length, value == (1 << (7 * length)) - 1
+
+
+def _cluster_prefix(timecode: int) -> bytes:
+    """An open (unknown-size) Cluster with its Timecode, to resume mid-cluster."""
+    raw = timecode.to_bytes(max((timecode.bit_length() + 7) // 8, 1), "big")
+    return b"\x1f\x43\xb6\x75\x01\xff\xff\xff\xff\xff\xff\xff" + bytes([_TIMECODE, 0x80 | len(raw)]) + raw
+
+
+class SyncPoint:
+    """A stream position a new connection can start from (after the header)."""
+
+    __slots__ = ("position", "time", "prefix")
+
+    def __init__(self, position: int, time: float, prefix: bytes = b""):
+        self.position = position  # Byte position in the stream
+        self.time = time  # Stream time (seconds) of the audio starting there
+        self.prefix = prefix  # Bytes to send between the header and position
+
+
+class OpusStream:
+    """
+    Incremental parser for Opus in WebM or Ogg.
+
+    feed() takes the stream in arbitrary chunks and returns the Opus packets
+    completed by each one. Along the way it records the container header,
+    the decoder config (OpusHead), how much audio has been seen, and recent
+    sync points.
+    """
+
+    def __init__(self, window: Optional[int] = None):
+        """
+        Args:
+            window: Only keep sync points within this many bytes of the end
+                (None keeps all)
+        """
+        self.window = window
+        self.container: Optional[str] = None  # "webm" or "ogg"
+        self.header: Optional[bytes] = None  # Everything before the first audio, once known
+        self.opus_head: Optional[bytes] = None
+        self.total = 0  # Bytes fed
+        self.duration = 0.0  # Stream time at the end of the last complete packet
+
+        self._buffer = bytearray()  # Unparsed bytes, starting at stream position _buffer_start
+        self._buffer_start = 0
+        self._head = bytearray()  # Bytes fed before the header was complete
+        self._sync: deque[SyncPoint] = deque()
+
+        # WebM
+        self._skip = 0
+        self._timecode_scale = 1_000_000  # ns per timecode tick
+        self._cluster_position = 0
+        self._cluster_timecode = 0
+        self._group_position = 0
+
+        # Ogg
+        self._packet = bytearray()
+        self._packets_seen = 0
+        self._pre_skip = 0
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """
+        Parse the next chunk of the stream.
+
+        Returns:
+            Opus packets completed by this chunk
+
+        Raises:
+            ValueError: The data is not Opus in WebM or Ogg, or is corrupt
+        """
+        self.total += len(data)
+        if self.header is None:
+            self._head += data
+            if len(self._head) > MAX_HEADER_BYTES:
+                raise ValueError("No audio after the container header")
+        self._buffer += data
+
+        if self.container is None:
+            if len(self._buffer) < 4:
+                return []
+            magic = bytes(self._buffer[:4])
+            if magic == _WEBM_MAGIC:
+                self.container = "webm"
+            elif magic == _OGG_MAGIC:
+                self.container = "ogg"
+            else:
+                raise ValueError("Expected Opus in a WebM or Ogg container")
+
+        packets = self._feed_webm() if self.container == "webm" else self._feed_ogg()
+        if self.window is not None:
+            while self._sync and self._sync[0].position < self.total - self.window:
+                self._sync.popleft()
+        return packets
+
+    def sync_point(self, time: float, not_before: int = 0) -> Optional[SyncPoint]:
+        """
+        Where to start a new connection to cover audio from `time` onwards.
+
+        Args:
+            time: Stream time (seconds) that should be included
+            not_before: Earliest usable byte position (e.g. the oldest byte
+                still buffered)
+
+        Returns:
+            The latest sync point at or before `time`, else the earliest one
+            after it; None if there is none at or after not_before
+        """
+        best = None
+        for point in self._sync:
+            if point.position < not_before:
+                continue
+            if best is None or point.time <= time:
+                best = point
+            if point.time > time:
+                break
+        return best
+
+    # ---------- internals ----------
+
+    def _consume(self, n: int) -> None:
+        del self._buffer[:n]
+        self._buffer_start += n
+
+    def _add_sync(self, point: SyncPoint) -> None:
+        if self._sync and self._sync[-1].position >= point.position:
+            return
+        self._sync.append(point)
+
+    def _header_ends(self, position: int) -> None:
+        self.header = bytes(self._head[:position])
+        self._head = bytearray()
+
+    def _feed_webm(self) -> list[bytes]:
+        packets = []
+        buf = self._buffer
+        while True:
+            if self._skip:
+                n = min(self._skip, len(buf))
+                self._consume(n)
+                self._skip -= n
+                if self._skip:
+                    break
+            element = _vint(buf, 0, keep_marker=True)
+            if element is None:
+                break
+            element_id, id_length, _ = element
+            size = _vint(buf, id_length, keep_marker=False)
+            if size is None:
+                break
+            length, size_length, unknown = size
+            head = id_length + size_length
+            position = self._buffer_start
+
+            if element_id in _WEBM_DESCEND or unknown:
+                self._consume(head)
+                if element_id == _CLUSTER:
+                    if self.header is None:
+                        self._header_ends(position)
+                    self._cluster_position = position
+                elif element_id == _BLOCK_GROUP:
+                    self._group_position = position
+                continue
+
+            if element_id not in _WEBM_READ:
+                self._consume(head)
+                self._skip = length
+                continue
+
+            if length > MAX_ELEMENT_BYTES:
+                raise ValueError("WebM element too large")
+            if len(buf) < head + length:
+                break
+            payload = bytes(buf[head:head + length])
+            self._consume(head + length)
+
+            if element_id == _TIMECODE_SCALE:
+                self._timecode_scale = int.from_bytes(payload, "big") or self._timecode_scale
+            elif element_id == _CODEC_PRIVATE:
+                if payload.startswith(b"OpusHead"):
+                    self.opus_head = payload
+            elif element_id == _TIMECODE:
+                self._cluster_timecode = int.from_bytes(payload, "big")
+                self._add_sync(SyncPoint(self._cluster_position, self._ticks_to_seconds(self._cluster_timecode)))
+            else:
+                start = position if element_id == _SIMPLE_BLOCK else self._group_position
+                packet = self._read_block(payload, start)
+                if packet is not None:
+                    packets.append(packet)
+        return packets
+
+    def _read_block(self, payload: bytes, position: int) -> Optional[bytes]:
+        """Record a (Simple)Block as a sync point; its frame if unlaced."""
+        track = _vint(payload, 0, keep_marker=False)
+        if track is None or len(payload) < track[1] + 3:
+            raise ValueError("Truncated WebM block")
+        offset = track[1]
+        relative = int.from_bytes(payload[offset:offset + 2], "big", signed=True)
+        flags = payload[offset + 2]
+        time = self._ticks_to_seconds(self._cluster_timecode + relative)
+        self._add_sync(SyncPoint(position, time, _cluster_prefix(self._cluster_timecode)))
+        if flags & 0x06:
+            # Laced blocks (several frames) aren't produced by MediaRecorder
+            return None
+        packet = payload[offset + 3:]
+        self.duration = max(self.duration, time + opus_packet_seconds(packet))
+        return packet
+
+    def _ticks_to_seconds(self, ticks: int) -> float:
+        return ticks * self._timecode_scale / 1e9
+
+    def _feed_ogg(self) -> list[bytes]:
+        packets = []
+        buf = self._buffer
+        while len(buf) >= 27:
+            if buf[:4] != _OGG_MAGIC:
+                raise ValueError("Lost Ogg page sync")
+            segments = buf[26]
+            if len(buf) < 27 + segments:
+                break
+            lacing = bytes(buf[27:27 + segments])
+            size = 27 + segments + sum(lacing)
+            if len(buf) < size:
+                break
+            granule = int.from_bytes(buf[6:14], "little", signed=True)
+            body = bytes(buf[27 + segments:size])
+            position = self._buffer_start
+            page_time = self.duration
+            self._consume(size)
+
+            audio = False
+            offset = 0
+            for value in lacing:
+                self._packet += body[offset:offset + value]
+                offset += value
+                if value == 255:
+                    continue  # Packet continues in the next segment
+                packet, self._packet = bytes(self._packet), bytearray()
+                self._packets_seen += 1
+                if self._packets_seen == 1:
+                    if not packet.startswith(b"OpusHead"):
+                        raise ValueError("Ogg stream is not Opus")
+                    self.opus_head = packet
+                    self._pre_skip = int.from_bytes(packet[10:12], "little")
+                elif self._packets_seen > 2:  # The second packet is OpusTags
+                    packets.append(packet)
+                    audio = True
+
+            if self.header is None and self._packets_seen >= 2 and not self._packet:
+                self._header_ends(position + size)
+            elif audio:
+                self._add_sync(SyncPoint(position, page_time))
+            if audio and granule >= 0:
+                self.duration = max((granule - self._pre_skip) / OPUS_SAMPLE_RATE, 0.0)
+        return packets
+
+
+class OpusDecoder:
+    """Containerized Opus in, 48 kHz linear16 mono out (needs PyAV)."""
+
+    def __init__(self):
+        import av  # Optional dependency, see decoder_available()
+
+        self._av = av
+        self.stream = OpusStream(window=0)
+        self._codec = None
+
+    def decode(self, data: bytes) -> bytes:
+        """
+        Decode the next chunk of the stream.
+
+        Returns:
+            PCM for the packets this chunk completed (may be empty)
+
+        Raises:
+            ValueError: The data is not Opus in WebM or Ogg
+        """
+        packets = self.stream.feed(data)
+        if not packets:
+            return b""
+        if self._codec is None:
+            self._codec = self._av.CodecContext.create("opus", "r")
+            if self.stream.opus_head:
+                self._codec.extradata = self.stream.opus_head
+
+        pcm = []
+        for packet in packets:
+            for frame in self._codec.decode(self._av.Packet(packet)):
+                samples = frame.to_ndarray().astype(np.float32)
+                if not frame.format.is_planar:
+                    samples = samples.reshape(-1, len(frame.layout.channels)).T
+                mono = samples.mean(axis=0)
+                if frame.format.name.startswith("s16"):
+                    mono /= 32768
+                pcm.append((np.clip(mono, -1, 1) * 32767).astype("<i2").tobytes())
+        return b"".join(pcm)
@@ -0,0 +1,104 @@
+"""
+Incremental call analytics rollups.
+
+Each finished call is appended to call_records as one event row. The storage
+backend folds that event into the user's analytics counters and into day and
+week buckets in the same transaction (the apply_call_record trigger in
+Postgres), so ending a call costs the same on day one and year five.
+
+This module turns the buckets back into the daily_stats / weekly_stats shape
+the dashboard reads, and runs the compactor that enforces retention: daily
+buckets older than CALL_ROLLUP_DAILY_RETENTION_DAYS are dropped (the weekly
+buckets already hold their totals) and weekly buckets older than
+CALL_ROLLUP_WEEKLY_RETENTION_DAYS are folded into monthly ones.
+"""
+import asyncio
+import os
+from datetime import date, datetime, timedelta, timezone
+
+# Keep per-day buckets this long
+DAILY_RETENTION_DAYS = int(os.getenv("CALL_ROLLUP_DAILY_RETENTION_DAYS", "90"))
+
+# Keep per-week buckets this long, then downsample to months
+WEEKLY_RETENTION_DAYS = int(os.getenv("CALL_ROLLUP_WEEKLY_RETENTION_DAYS", "730"))
+
+# How often the background compactor runs (seconds)
+COMPACT_INTERVAL = float(os.getenv("CALL_ROLLUP_COMPACT_SECONDS", "21600"))
+
+# Length of the recent_callers list
+RECENT_CALLERS_LIMIT = 10
+
+
+def day_bucket(ended_at: datetime) -> date:
+    """UTC calendar day of a call."""
+    return ended_at.astimezone(timezone.utc).date()
+
+
+def week_bucket(day: date) -> date:
+    """Monday starting the week containing `day`."""
+    return day - timedelta(days=day.weekday())
+
+
+def month_bucket(day: date) -> date:
+    """First day of the month containing `day`."""
+    return day.replace(day=1)
+
+
+def push_recent_caller(recent_callers: list[dict], caller: dict) -> list[dict]:
+    """Move `caller` to the front of the recent callers list, keeping it bounded."""
+    others = [c for c in recent_callers if c.get("phone") != caller["phone"]]
+    return [caller, *others][:RECENT_CALLERS_LIMIT]
+
+
+def rollups_to_stats(rows: list[dict]) -> dict:
+    """
+    Convert call_rollups rows into the legacy analytics dictionaries.
+
+    Args:
+        rows: Rows with period, bucket, calls, scams and duration_seconds
+
+    Returns:
+        Dict with daily_stats ("%Y-%m-%d"), weekly_stats ("%Y-W%W") and
+        monthly_stats ("%Y-%m") keyed buckets
+    """
+    daily, weekly, monthly = {}, {}, {}
+    for row in sorted(rows, key=lambda r: str(r["bucket"])):
+        bucket = date.fromisoformat(str(row["bucket"])[:10])
+        calls, scams = row.get("calls") or 0, row.get("scams") or 0
+        duration = row.get("duration_seconds") or 0
+        if row["period"] == "day":
+            daily[bucket.isoformat()] = {"calls": calls, "scams": scams}
+        elif row["period"] == "week":
+            weekly[bucket.strftime("%Y-W%W")] = {"calls": calls, "scams": scams, "duration": duration}
+        elif row["period"] == "month":
+            monthly[bucket.strftime("%Y-%m")] = {"calls": calls, "scams": scams, "duration": duration}
+    return {"daily_stats": daily, "weekly_stats": weekly, "monthly_stats": monthly}
+
+
+async def compact_call_rollups() -> int:
+    """
+    Apply rollup retention: drop expired day buckets, fold expired weeks into months.
+
+    Returns:
+        Number of buckets dropped or folded
+    """
+    from services.storage import get_storage
+
+    return await get_storage().compact_call_rollups(DAILY_RETENTION_DAYS, WEEKLY_RETENTION_DAYS)
+
+
+async def run_compaction_loop(interval: float = COMPACT_INTERVAL) -> None:
+    """Compact rollups forever (run as a background task). Compaction is idempotent."""
+    while True:
+        try:
+            compacted = await compact_call_rollups()
+            if compacted:
+                print(f"📊 Compacted {compacted} call rollup bucket(s)")
+        except Exception as e:
+            print(f"❌ Error compacting call rollups: {e}")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    compacted = asyncio.run(compact_call_rollups())
+    print(f"📊 Compacted {compacted} call rollup bucket(s)")
@@ -1,8 +1,23 @@
+import asyncio
 import os
+import time
+from collections import Counter
+from typing import Optional
 from openai import OpenAI
-from services.session_state import SessionState
+from services.chat_intents import ChatIntent, get_intent_matcher
+from services.session_state import SessionState, recent
 from prompts.chatbot_prompts import CHATBOT_SYSTEM_PROMPT
 
+# A precomputed answer is used while risk stays within this many points of
+# where it was generated (the call's actor regenerates past that)...
+PRECOMPUTE_RISK_DELTA = int(os.getenv("CHAT_PRECOMPUTE_RISK_DELTA", "10"))
+
+# ...and for at most this long (seconds)
+PRECOMPUTE_MAX_AGE = float(os.getenv("CHAT_PRECOMPUTE_MAX_AGE_SECONDS", "90"))
+
+# How /chat questions were answered: "precomputed", "stale" or "unmatched" (live)
+_answer_stats: Counter = Counter()
+
 # Use the same client setup pattern but looking for Keywords AI base URL
 _client = None
 
@@ -15,13 +30,13 @@ def _get_client():
         )
     return _client
 
-def format_history_for_context(history: list[dict]) -> str:
+def format_history_for_context(history) -> str:
     """Format transcript history for the LLM context."""
     if not history:
         return "(No conversation history yet)"
     
     formatted = []
-    for msg in history[-20:]: # Last 20 turns
+    for msg in recent(history, 20): # Last 20 turns
         speaker = msg.get("speaker", "Unknown").upper()
         text = msg.get("text", "")
         formatted.append(f"{speaker}: {text}")
@@ -42,42 +57,103 @@ def format_chatbot_history(history: list[dict]) -> str:
     
     return "\n".join(formatted)
 
+def _generate_answer(user_query: str, session: SessionState) -> str:
+    """One live model answer for the session's current context (raises on failure)."""
+    history_str = format_history_for_context(session.transcript_history)
+    chat_history_str = format_chatbot_history(session.chatbot_history)
+    risk_info = f"Current Risk Score: {session.risk_score}/100\nConfidence Score: {session.confidence_score}/100"
+
+    response = _get_client().chat.completions.create(
+        model="bedrock/anthropic.claude-3-5-sonnet-20240620-v1:0", 
+        messages=[{"role": "user", "content": "placeholder"}],  # This will be overridden
+        extra_body={
+            "prompt": {
+                "prompt_id": "32526990b48c44daa229d34ccaa1ad25",
+                "variables": {
+                    "risk_info": risk_info,
+                    "history_str": history_str,
+                    "chat_history_str": chat_history_str,
+                    "user_query": user_query
+                },
+                "override": True
+            }
+        }
+    )
+    return response.choices[0].message.content
+
 def chat_with_protector(user_query: str, session: SessionState) -> str:
     """
     Simulates a 'Protective Companion' Chatbot.
     Uses Claude 3.5 Sonnet (via Keywords AI) to answer user questions based on the live call context.
     """
     
-    # 1. Prepare Context
-    history_str = format_history_for_context(session.transcript_history)
-    chat_history_str = format_chatbot_history(session.chatbot_history)
-    risk_info = f"Current Risk Score: {session.risk_score}/100\nConfidence Score: {session.confidence_score}/100"
-
     # Update history immediately (optimistic)
     session.chatbot_history.append({"role": "user", "content": user_query})
 
     try:
-        response = _get_client().chat.completions.create(
-            model="bedrock/anthropic.claude-3-5-sonnet-20240620-v1:0", 
-            messages=[{"role": "user", "content": "placeholder"}],  # This will be overridden
-            extra_body={
-                "prompt": {
-                    "prompt_id": "32526990b48c44daa229d34ccaa1ad25",
-                    "variables": {
-                        "risk_info": risk_info,
-                        "history_str": history_str,
-                        "chat_history_str": chat_history_str,
-                        "user_query": user_query
-                    },
-                    "override": True
-                }
-            }
-        )
-        
-        answer = response.choices[0].message.content
+        answer = _generate_answer(user_query, session)
         session.chatbot_history.append({"role": "assistant", "content": answer})
         return answer
         
     except Exception as e:
         print(f"Error in chat_bot: {e}")
         return "I'm having trouble analyzing the call right now. Please hang up if you feel unsafe."
+
+async def precompute_answers(session: SessionState, intents: Optional[list[ChatIntent]] = None) -> dict:
+    """
+    Generate answers to the canned intents for the session's current state.
+    
+    Runs the model calls concurrently in worker threads; intents whose call
+    fails are left out (/chat answers those live).
+    
+    Args:
+        session: A copy of the call's state (read from other threads)
+        intents: Intents to answer (defaults to the matcher's)
+        
+    Returns:
+        {intent: {"answer": str, "risk_score": int, "computed_at": float}}
+    """
+    intents = intents if intents is not None else get_intent_matcher().intents
+    risk_score, computed_at = session.risk_score, time.time()
+    results = await asyncio.gather(
+        *(asyncio.to_thread(_generate_answer, intent.question, session) for intent in intents),
+        return_exceptions=True,
+    )
+    answers = {}
+    for intent, result in zip(intents, results):
+        if isinstance(result, Exception):
+            print(f"[Chat] Precomputing '{intent.name}' failed: {result}")
+        elif result:
+            answers[intent.name] = {"answer": result, "risk_score": risk_score, "computed_at": computed_at}
+    return answers
+
+def precomputed_answer(user_query: str, session: SessionState) -> Optional[str]:
+    """
+    Answer a question from the session's precomputed answers, if it asks one
+    of the canned intents and that answer is still fresh.
+    
+    Records the exchange in the chat history like chat_with_protector.
+    
+    Returns:
+        The answer, or None to generate one live
+    """
+    intent = get_intent_matcher().match(user_query)
+    if intent is None:
+        _answer_stats["unmatched"] += 1
+        return None
+    entry = session.precomputed_answers.get(intent.name)
+    if (
+        entry is None
+        or abs(session.risk_score - entry["risk_score"]) >= PRECOMPUTE_RISK_DELTA
+        or time.time() - entry["computed_at"] >= PRECOMPUTE_MAX_AGE
+    ):
+        _answer_stats["stale"] += 1
+        return None
+    _answer_stats["precomputed"] += 1
+    session.chatbot_history.append({"role": "user", "content": user_query})
+    session.chatbot_history.append({"role": "assistant", "content": entry["answer"]})
+    return entry["answer"]
+
+def get_chat_answer_stats() -> dict:
+    """How /chat questions were answered in this process."""
+    return {key: _answer_stats[key] for key in ("precomputed", "stale", "unmatched")}
@@ -0,0 +1,180 @@
+"""
+Local matching of chat questions to a few canned intents.
+
+Scared users ask the companion the same handful of things ("Is this a
+scam?", "Should I hang up?"). The call's SessionActor precomputes answers
+to these intents while the call runs (services.chat_bot.precompute_answers)
+and /chat answers a matching question from them without an LLM round-trip.
+
+Matching runs in microseconds and errs towards the live model:
+- the question must be close to one of the intent's example phrasings
+  (cosine similarity of character trigram counts, which shrugs off
+  punctuation, word order and most filler), and
+- every content word in it must appear in the intent's examples, so a more
+  specific question ("should I give them my name?") or a negated one
+  ("should I NOT hang up?") is answered live instead.
+
+Intents come from KOVA_CHAT_INTENTS_PATH (JSON, same shape as
+DEFAULT_INTENTS) or the defaults below.
+"""
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Optional
+
+# Similarity a question needs to an intent's closest example
+MATCH_THRESHOLD = float(os.getenv("CHAT_INTENT_THRESHOLD", "0.6"))
+
+# intent -> the question its answer is generated for, and phrasings it matches
+DEFAULT_INTENTS = {
+    "is_scam": {
+        "question": "Is this a scam?",
+        "examples": [
+            "is this a scam", "is this call a scam", "am i being scammed", "is this real",
+            "is this legit", "is this person lying to me", "is this a real call", "are they scamming me",
+        ],
+    },
+    "hang_up": {
+        "question": "Should I hang up?",
+        "examples": [
+            "should i hang up", "should i hang up now", "do i hang up", "can i hang up",
+            "should i end the call", "should i stay on the line",
+        ],
+    },
+    "share_card": {
+        "question": "Should I give them my card number?",
+        "examples": [
+            "should i give them my card number", "should i give my credit card number",
+            "can i give them my card details", "they want my card number",
+            "should i tell them my bank account number", "should i share my card",
+        ],
+    },
+    "share_code": {
+        "question": "Should I tell them the code I was just texted?",
+        "examples": [
+            "should i tell them the code", "should i give them the verification code",
+            "they want the code from my text", "should i read them the code",
+            "can i share the code they sent me",
+        ],
+    },
+    "send_money": {
+        "question": "Should I send them money or buy gift cards?",
+        "examples": [
+            "should i send them money", "should i buy gift cards", "should i wire the money",
+            "should i pay them", "they want me to buy gift cards", "should i send the money",
+        ],
+    },
+    "verify_identity": {
+        "question": "Is this really who they say they are?",
+        "examples": [
+            "is this really my grandson", "is it really them", "how do i know it is really them",
+            "is this really the bank", "is this really who they say they are",
+        ],
+    },
+}
+
+# Words that don't change what is being asked
+_FILLER = frozenset("""
+    a an the i me my im is are am be it its this that they them their
+    do does should can could would will to of on in for from now just so
+    what how who call person really ok okay um uh please kova
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _words(text: str) -> list[str]:
+    text = text.lower().replace("'", "")
+    return [_stem(word) for word in _WORD.findall(text)]
+
+
+def _stem(word: str) -> str:
+    """Crude plural folding (cards -> card), enough for short questions."""
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "is", "us")) else word
+
+
+def _trigrams(words: list[str]) -> Counter:
+    padded = f" {' '.join(words)} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(a: Counter, b: Counter, b_norm: float) -> float:
+    dot = sum(count * b.get(gram, 0) for gram, count in a.items())
+    a_norm = math.sqrt(sum(count * count for count in a.values()))
+    return dot / (a_norm * b_norm) if a_norm and b_norm else 0.0
+
+
+class ChatIntent:
+    """A canned question, the phrasings that map to it and their vocabulary."""
+
+    __slots__ = ("name", "question", "examples", "vocabulary", "_vectors")
+
+    def __init__(self, name: str, question: str, examples: list[str]):
+        self.name = name
+        self.question = question
+        self.examples = list(examples)
+        phrasings = [_words(text) for text in [question] + self.examples]
+        self.vocabulary = frozenset(word for words in phrasings for word in words)
+        self._vectors = []
+        for words in phrasings:
+            vector = _trigrams(words)
+            self._vectors.append((vector, math.sqrt(sum(c * c for c in vector.values()))))
+
+    def similarity(self, words: list[str]) -> float:
+        """Cosine similarity of a question's words to the closest phrasing."""
+        vector = _trigrams(words)
+        return max(_cosine(vector, example, norm) for example, norm in self._vectors)
+
+
+class IntentMatcher:
+    """Maps chat questions to canned intents, or to None for the live model."""
+
+    def __init__(self, intents: Optional[dict] = None, threshold: float = MATCH_THRESHOLD):
+        """
+        Args:
+            intents: {name: {"question": str, "examples": [str, ...]}}
+                (defaults to DEFAULT_INTENTS)
+            threshold: Minimum similarity to the closest example
+        """
+        self.intents = [
+            ChatIntent(name, spec["question"], spec.get("examples", []))
+            for name, spec in (intents or DEFAULT_INTENTS).items()
+        ]
+        self.threshold = threshold
+
+    def match(self, query: str) -> Optional[ChatIntent]:
+        """The intent a question asks, if it clearly asks exactly one of them."""
+        words = _words(query)
+        content = {word for word in words if word not in _FILLER}
+        if not content:
+            return None
+        best, best_score = None, self.threshold
+        for intent in self.intents:
+            if not content <= intent.vocabulary:
+                continue
+            score = intent.similarity(words)
+            if score >= best_score:
+                best, best_score = intent, score
+        return best
+
+
+def load_intents() -> dict:
+    """Intents from KOVA_CHAT_INTENTS_PATH, or DEFAULT_INTENTS."""
+    path = os.getenv("KOVA_CHAT_INTENTS_PATH")
+    if not path:
+        return DEFAULT_INTENTS
+    with open(path) as f:
+        return json.load(f)
+
+
+_matcher: Optional[IntentMatcher] = None
+
+
+def get_intent_matcher() -> IntentMatcher:
+    """Get or create the process-wide intent matcher."""
+    global _matcher
+    if _matcher is None:
+        _matcher = IntentMatcher(load_intents())
+    return _matcher
@@ -6,6 +6,8 @@ from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from deepgram import AsyncDeepgramClient
 
+from services.audio_encoding import LINEAR16
+
 load_dotenv()
 
 # Singleton client instance
@@ -24,24 +26,26 @@ def get_client() -> AsyncDeepgramClient:
 
 
 @asynccontextmanager
-async def create_live_connection(sample_rate: int = 48000):
+async def create_live_connection(sample_rate: int = 48000, encoding: str = LINEAR16):
     """
     Create a live transcription connection to Deepgram.
     
     Args:
         sample_rate: Audio sample rate in Hz (default 48000)
+        encoding: LINEAR16, or OPUS for containerized audio (Deepgram reads
+            the codec and sample rate from the container)
         
     Yields:
         AsyncV1SocketClient: The Deepgram WebSocket connection
     """
     client = get_client()
+    audio_options = {"encoding": "linear16", "sample_rate": str(sample_rate)} if encoding == LINEAR16 else {}
     
     async with client.listen.v1.connect(
         model="nova-2",
         language="en-US",
-        encoding="linear16",
-        sample_rate=str(sample_rate),
         punctuate="true",
+        **audio_options,
     ) as connection:
         print("[DG] Connection opened")
         yield connection
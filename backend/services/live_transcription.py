@@ -0,0 +1,383 @@
+"""
+Supervised Deepgram transcription that survives upstream failures.
+
+If the Deepgram socket errors mid-call, SupervisedTranscription reconnects
+with exponential backoff instead of ending the call. The last
+REPLAY_SECONDS of audio sent upstream is kept in a preallocated ring
+buffer, and after reconnecting everything since the end of the last final
+transcript is replayed, so speech that was in flight (or sent while
+reconnecting) still gets transcribed.
+
+Deepgram timestamps restart at 0 on every connection. Each connection
+remembers the stream position its audio started at, so results can be
+placed on one call-wide timeline; anything ending at or before the last
+final transcript already delivered is dropped as a duplicate.
+
+Containerized audio (Opus in WebM/Ogg, see audio_encoding) is passed
+through as-is. A new connection can't start mid-stream, so replay sends the
+container header first and starts at the nearest block or page, and stream
+positions are mapped to time through the parsed container instead of a
+fixed byte rate.
+
+It exposes the same interface as the raw socket (async iteration over
+messages and send_media()), so /ws/audio doesn't care which one it has.
+Connections come from the worker's TranscriptionPool, and a call can adopt
+the one its wakeword session already had open (see transcription_pool).
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from services.audio_encoding import LINEAR16, OPUS_MAX_BYTES_PER_SECOND, OpusStream
+from services.deepgram_client import create_live_connection
+from services.transcription_pool import get_transcription_pool
+
+# Seconds of sent audio kept for replay after a reconnect
+REPLAY_SECONDS = float(os.getenv("DEEPGRAM_REPLAY_SECONDS", "10"))
+
+# Consecutive failed connection attempts before giving up
+MAX_RECONNECT_ATTEMPTS = int(os.getenv("DEEPGRAM_MAX_RECONNECTS", "8"))
+
+# Backoff between attempts: BASE * 2^n seconds, capped at MAX
+RECONNECT_BACKOFF_BASE = 0.25
+RECONNECT_BACKOFF_MAX = 5.0
+
+# Replayed audio is sent upstream in chunks of this many seconds
+REPLAY_CHUNK_SECONDS = 0.25
+
+# Results ending within this much of the last final are treated as duplicates
+DEDUPE_TOLERANCE_SECONDS = 0.05
+
+# linear16 mono
+BYTES_PER_SAMPLE = 2
+
+
+class AudioRingBuffer:
+    """Fixed-size buffer of the most recent audio, addressed by absolute stream position."""
+
+    __slots__ = ("capacity", "total", "_data")
+
+    def __init__(self, capacity: int):
+        """
+        Args:
+            capacity: Bytes of audio to keep
+        """
+        self.capacity = capacity
+        self.total = 0  # Bytes written since the start of the call
+        self._data = bytearray(capacity)
+
+    @property
+    def start(self) -> int:
+        """Stream position of the oldest byte still held."""
+        return max(self.total - self.capacity, 0)
+
+    def write(self, data: bytes) -> None:
+        if len(data) > self.capacity:
+            # Only the tail survives; write it where its stream positions belong
+            self.total += len(data) - self.capacity
+            data = data[-self.capacity:]
+        offset = self.total % self.capacity
+        first = min(len(data), self.capacity - offset)
+        self._data[offset:offset + first] = data[:first]
+        self._data[:len(data) - first] = data[first:]
+        self.total += len(data)
+
+    def read(self, start: int, end: int = None) -> bytes:
+        """Bytes between two stream positions (clamped to what is still held)."""
+        end = self.total if end is None else min(end, self.total)
+        start = max(start, self.start)
+        if start >= end:
+            return b""
+        offset = start % self.capacity
+        length = end - start
+        if offset + length <= self.capacity:
+            return bytes(self._data[offset:offset + length])
+        return bytes(self._data[offset:]) + bytes(self._data[:length - (self.capacity - offset)])
+
+
+class TranscriptionMetrics:
+    """Process-wide counters for upstream transcription health."""
+
+    def __init__(self):
+        self.connections = 0
+        self.reconnects = 0
+        self.failed_attempts = 0
+        self.gave_up = 0
+        self.gap_seconds_total = 0.0
+        self.gap_seconds_max = 0.0
+        self.replayed_seconds_total = 0.0
+        self.lost_audio_seconds_total = 0.0
+        self.duplicates_dropped = 0
+
+    def record_gap(self, seconds: float) -> None:
+        self.reconnects += 1
+        self.gap_seconds_total += seconds
+        self.gap_seconds_max = max(self.gap_seconds_max, seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "connections": self.connections,
+            "reconnects": self.reconnects,
+            "failed_attempts": self.failed_attempts,
+            "gave_up": self.gave_up,
+            "gap_seconds_total": round(self.gap_seconds_total, 3),
+            "gap_seconds_max": round(self.gap_seconds_max, 3),
+            "replayed_seconds_total": round(self.replayed_seconds_total, 3),
+            "lost_audio_seconds_total": round(self.lost_audio_seconds_total, 3),
+            "duplicates_dropped": self.duplicates_dropped,
+        }
+
+
+# Singleton metrics shared by all calls in this worker
+_metrics: TranscriptionMetrics | None = None
+
+
+def get_transcription_metrics() -> TranscriptionMetrics:
+    """Get or create the process-wide transcription metrics."""
+    global _metrics
+    if _metrics is None:
+        _metrics = TranscriptionMetrics()
+    return _metrics
+
+
+class SupervisedTranscription:
+    """A Deepgram live connection that reconnects and replays audio on failure."""
+
+    def __init__(
+        self,
+        sample_rate: int = 48000,
+        connect=create_live_connection,
+        replay_seconds: float = REPLAY_SECONDS,
+        max_attempts: int = MAX_RECONNECT_ATTEMPTS,
+        encoding: str = LINEAR16,
+    ):
+        """
+        Args:
+            sample_rate: Audio sample rate in Hz
+            connect: Async context manager factory connect(sample_rate, encoding) -> socket
+            replay_seconds: Seconds of sent audio kept for replay
+            max_attempts: Consecutive failed connects before giving up
+            encoding: LINEAR16, or OPUS for containerized audio
+        """
+        self.sample_rate = sample_rate
+        self.encoding = encoding
+        # Containers have no fixed byte rate; size the buffer for the highest
+        self.bytes_per_second = sample_rate * BYTES_PER_SAMPLE if encoding == LINEAR16 else OPUS_MAX_BYTES_PER_SECOND
+        self.max_attempts = max_attempts
+        self.reconnects = 0
+        self._connect = connect
+        self._ring = AudioRingBuffer(int(replay_seconds * self.bytes_per_second))
+        # Header and resume points of containerized audio
+        self._container = None if encoding == LINEAR16 else OpusStream(window=self._ring.capacity)
+        self._container_failed = False
+        self._connection = None
+        self._context = None
+        self._offset = 0.0  # Stream time (seconds) the current connection's audio starts at
+        self._final_until = 0.0  # Stream time the last delivered final result ends at
+        self._closed = False
+
+    async def __aenter__(self) -> "SupervisedTranscription":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        await self._open(0, 0.0)
+
+    async def close(self) -> None:
+        self._closed = True
+        await self._close_connection()
+
+    async def keep_alive(self) -> None:
+        """Stop Deepgram timing out while no audio is flowing (e.g. during a handoff)."""
+        connection = self._connection
+        if connection is None:
+            return
+        try:
+            await connection.send_keep_alive()
+        except Exception as e:
+            print(f"[DG] KeepAlive failed, will reconnect: {e}")
+            self._connection = None
+            await self._close_connection()
+
+    def mark_delivered(self) -> None:
+        """Drop results for all audio sent so far (a new consumer doesn't want them)."""
+        self._final_until = max(self._final_until, self._stream_time())
+
+    async def send_media(self, data: bytes) -> None:
+        """Send audio upstream; while reconnecting it is only buffered for replay."""
+        self._ring.write(data)
+        if self._container is not None and not self._container_failed:
+            try:
+                self._container.feed(data)
+            except ValueError as e:
+                # Deepgram still gets the audio; only replay after a reconnect suffers
+                print(f"[DG] Can't parse the audio container, replay disabled: {e}")
+                self._container_failed = True
+        connection = self._connection
+        if connection is None:
+            return
+        try:
+            await connection.send_media(data)
+        except Exception as e:
+            print(f"[DG] Send failed, reconnecting: {e}")
+            # Closing ends the receive loop, which owns reconnecting
+            self._connection = None
+            await self._close_connection()
+
+    async def __aiter__(self):
+        while not self._closed:
+            connection = self._connection
+            error = "connection closed"
+            if connection is not None:
+                try:
+                    async for message in connection:
+                        if not self._is_duplicate(message):
+                            yield message
+                except Exception as e:
+                    error = e
+            if self._closed:
+                return
+            await self._reconnect(error)
+
+    # ---------- internals ----------
+
+    def _is_duplicate(self, message) -> bool:
+        """Place a result on the call timeline; True if it was already delivered."""
+        start = getattr(message, "start", None)
+        if start is None or not hasattr(message, "channel"):
+            return False
+        end = self._offset + start + (getattr(message, "duration", 0) or 0)
+        if end <= self._final_until + DEDUPE_TOLERANCE_SECONDS:
+            get_transcription_metrics().duplicates_dropped += 1
+            return True
+        if getattr(message, "is_final", False):
+            self._final_until = end
+        return False
+
+    def _stream_time(self) -> float:
+        """Seconds of audio sent so far."""
+        if self._container is None:
+            return self._ring.total / self.bytes_per_second
+        return self._container.duration
+
+    def _resume_point(self, time: float) -> tuple[int, float, bytes]:
+        """
+        Where a new connection should start to cover audio from `time` on.
+
+        Returns:
+            (stream byte position, its stream time, bytes to send before it)
+        """
+        if self._container is None:
+            # Aligned to a sample, within what is still buffered
+            position = int(time * self.bytes_per_second) // BYTES_PER_SAMPLE * BYTES_PER_SAMPLE
+            position = min(max(position, self._ring.start), self._ring.total)
+            return position, position / self.bytes_per_second, b""
+
+        point = self._container.sync_point(time, not_before=self._ring.start)
+        if point is not None:
+            return point.position, point.time, self._container.header + point.prefix
+        if self._ring.start == 0:
+            return 0, 0.0, b""
+        # Nowhere to resume from: start with the audio that arrives next
+        return self._ring.total, self._container.duration, self._container.header or b""
+
+    async def _open(self, position: int, offset: float, prefix: bytes = b"") -> None:
+        """
+        Connect, then replay buffered audio from stream byte `position` onwards.
+
+        Args:
+            position: Stream byte position to replay from
+            offset: Stream time (seconds) of the audio at `position`
+            prefix: Sent first (the container header when resuming mid-stream)
+        """
+        context = self._connect(self.sample_rate, self.encoding)
+        connection = await context.__aenter__()
+        self._context = context
+        self._offset = offset
+        get_transcription_metrics().connections += 1
+        if prefix:
+            await connection.send_media(prefix)
+
+        # Audio that arrives while replaying is buffered too, so keep going
+        # until caught up; no await between the last check and going live
+        chunk = max(int(REPLAY_CHUNK_SECONDS * self.bytes_per_second) // BYTES_PER_SAMPLE * BYTES_PER_SAMPLE, BYTES_PER_SAMPLE)
+        while position < self._ring.total:
+            data = self._ring.read(position, position + chunk)
+            await connection.send_media(data)
+            position += len(data)
+        self._connection = connection
+
+    async def _close_connection(self) -> None:
+        context, self._context = self._context, None
+        self._connection = None
+        if context is not None:
+            try:
+                await context.__aexit__(None, None, None)
+            except Exception as e:
+                print(f"[DG] Error closing connection: {e}")
+
+    async def _reconnect(self, error) -> None:
+        """Reconnect with backoff and replay; raises once max_attempts have failed."""
+        metrics = get_transcription_metrics()
+        loop = asyncio.get_running_loop()
+        failed_at = loop.time()
+        print(f"[DG] Upstream lost ({error}), reconnecting")
+        await self._close_connection()
+
+        for attempt in range(self.max_attempts):
+            await asyncio.sleep(min(RECONNECT_BACKOFF_BASE * 2 ** attempt, RECONNECT_BACKOFF_MAX))
+            if self._closed:
+                return
+            # Replay from the end of the last final transcript
+            position, offset, prefix = self._resume_point(self._final_until)
+            try:
+                await self._open(position, offset, prefix)
+            except Exception as e:
+                metrics.failed_attempts += 1
+                await self._close_connection()
+                print(f"[DG] Reconnect attempt {attempt + 1} failed: {e}")
+                continue
+
+            gap = loop.time() - failed_at
+            self.reconnects += 1
+            metrics.record_gap(gap)
+            replayed = self._stream_time() - offset
+            metrics.replayed_seconds_total += replayed
+            metrics.lost_audio_seconds_total += max(offset - self._final_until, 0)
+            print(f"[DG] Reconnected after {gap:.2f}s, replayed {replayed:.2f}s of audio")
+            return
+
+        metrics.gave_up += 1
+        raise ConnectionError(f"Deepgram unavailable after {self.max_attempts} attempts: {error}")
+
+
+@asynccontextmanager
+async def create_supervised_connection(sample_rate: int = 48000, handoff: str = None, encoding: str = LINEAR16):
+    """
+    Like create_live_connection(), but reconnects and replays audio on failure.
+
+    Args:
+        sample_rate: Audio sample rate in Hz
+        handoff: Token from /ws/wakeword; adopts its still-open connection
+            instead of taking one from the pool, if it is parked on this worker
+        encoding: LINEAR16, or OPUS for containerized audio
+
+    Yields:
+        SupervisedTranscription
+    """
+    pool = get_transcription_pool()
+    connection = pool.claim(handoff, sample_rate, encoding)
+    if connection is not None:
+        print("[DG] Adopted the wakeword connection")
+        # Whatever is still in flight for the wake phrase isn't part of the call
+        connection.mark_delivered()
+    else:
+        connection = SupervisedTranscription(sample_rate, connect=pool.connect, encoding=encoding)
+        await connection.open()
+    try:
+        yield connection
+    finally:
+        await connection.close()
@@ -0,0 +1,320 @@
+"""
+In-process replica of the suspicious_numbers table.
+
+Every number lookup used to be a live Supabase query. Instead, the whole table
+is loaded into a hash map at startup (fronted by a Bloom filter so the common
+"never reported" case never touches the map) and kept fresh with periodic
+delta syncs on a last_reported_at watermark. Lookups are served locally as long
+as the replica is within the configured staleness bound.
+
+A digit trie over the same numbers answers neighbor-spoofing queries ("how
+many reported numbers share this exchange block?") in O(prefix length).
+Report counts are paired with time-decayed reputation scores (see
+services.reputation) so old reports fade out of both lookups.
+"""
+import asyncio
+import hashlib
+import math
+import os
+import threading
+import time
+
+from services.phone_numbers import normalize_phone_number, exchange_block_prefix, neighborhood_prefix
+from services.reputation import to_anchored, from_anchored, row_anchored_score
+
+# How often to pull changed rows from the database (seconds)
+SYNC_INTERVAL = float(os.getenv("NUMBER_INDEX_SYNC_SECONDS", "30"))
+
+# Maximum age of the replica before lookups fall back to a live query (seconds)
+MAX_STALENESS = float(os.getenv("NUMBER_INDEX_MAX_STALENESS_SECONDS", "300"))
+
+# Rows fetched per delta-sync page
+SYNC_PAGE_SIZE = 1000
+
+# Numbers differing only in this many trailing digits count as neighbors
+NEIGHBOR_DIGITS = int(os.getenv("NUMBER_INDEX_NEIGHBOR_DIGITS", "2"))
+
+
+class BloomFilter:
+    """
+    Compact Bloom filter over strings.
+
+    Uses double hashing over one blake2b digest, so each add/check is a single
+    hash call regardless of the number of probes.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Args:
+            capacity: Expected number of items
+            error_rate: Target false-positive rate at capacity
+        """
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._bits)
+
+
+class PrefixTrie:
+    """
+    Digit trie where every node aggregates the numbers below it.
+
+    Each node is a [children, number_count, report_count, anchored_score]
+    list, so a prefix query is one dict lookup per digit with no subtree walk.
+    """
+
+    def __init__(self):
+        self._root = [{}, 0, 0, 0.0]
+
+    def add(self, number: str, numbers_delta: int, reports_delta: int, score_delta: float = 0.0) -> None:
+        """Adjust the aggregates along the path of a number."""
+        node = self._root
+        node[1] += numbers_delta
+        node[2] += reports_delta
+        node[3] += score_delta
+        for digit in number.lstrip("+"):
+            child = node[0].get(digit)
+            if child is None:
+                child = node[0][digit] = [{}, 0, 0, 0.0]
+            node = child
+            node[1] += numbers_delta
+            node[2] += reports_delta
+            node[3] += score_delta
+
+    def count(self, prefix: str) -> tuple[int, int, float]:
+        """
+        Returns:
+            (reported numbers, total reports, anchored score sum) under the prefix
+        """
+        node = self._root
+        for digit in prefix.lstrip("+"):
+            node = node[0].get(digit)
+            if node is None:
+                return 0, 0, 0.0
+        return node[1], node[2], node[3]
+
+
+class SuspiciousNumberIndex:
+    """
+    Local hash-map replica of suspicious_numbers with a Bloom filter for
+    negative lookups. Thread-safe: reports are written through from the
+    LangGraph worker threads while the event loop serves lookups.
+    """
+
+    def __init__(self, fetch_fn=None, max_staleness: float = MAX_STALENESS):
+        """
+        Args:
+            fetch_fn: Async callable(watermark, after_number, limit) -> list of rows
+                ordered by (last_reported_at, phone_number); defaults to Supabase
+            max_staleness: Seconds since the last successful sync before the
+                replica is considered stale
+        """
+        if fetch_fn is None:
+            from services.supabase_client import fetch_suspicious_numbers_since
+            fetch_fn = fetch_suspicious_numbers_since
+        self._fetch_fn = fetch_fn
+        self.max_staleness = max_staleness
+
+        self._entries: dict[str, dict] = {}
+        self._bloom = BloomFilter(1024)
+        self._trie = PrefixTrie()
+        self._lock = threading.Lock()
+
+        # Keyset watermark: (last_reported_at, phone_number) of the newest row seen
+        self.watermark: tuple[str, str] | None = None
+        self.last_synced_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_fresh(self) -> bool:
+        """Whether the replica was synced within the staleness bound."""
+        return self.last_synced_at is not None and \
+            (time.monotonic() - self.last_synced_at) <= self.max_staleness
+
+    def lookup(self, phone_number: str) -> dict | None:
+        """Return the local row for a number, or None if it was never reported."""
+        if phone_number not in self._bloom:
+            return None
+        return self._entries.get(phone_number)
+
+    def neighborhood(self, phone_number: str, neighbor_digits: int = NEIGHBOR_DIGITS) -> dict:
+        """
+        Count reports near a number, excluding the number itself.
+
+        Args:
+            phone_number: E.164 number
+            neighbor_digits: Size of the last-N-digit neighborhood
+
+        Returns:
+            {"block": {...}, "neighbors": {...}} with prefix, numbers, reports
+            and decayed reputation score
+        """
+        entry = self._entries.get(phone_number)
+        own_reports = entry["report_count"] if entry else 0
+        own_numbers = 1 if entry else 0
+        own_score = entry["score_anchor"] if entry else 0.0
+
+        result = {}
+        for name, prefix in (
+            ("block", exchange_block_prefix(phone_number)),
+            ("neighbors", neighborhood_prefix(phone_number, neighbor_digits)),
+        ):
+            numbers, reports, score = self._trie.count(prefix)
+            result[name] = {
+                "prefix": prefix,
+                "numbers": numbers - own_numbers,
+                "reports": reports - own_reports,
+                "score": round(max(0.0, from_anchored(score - own_score)), 3),
+            }
+        return result
+
+    def reputation_score(self, phone_number: str) -> float:
+        """Current time-decayed reputation score of a number (0 if never reported)."""
+        entry = self.lookup(phone_number)
+        return from_anchored(entry["score_anchor"]) if entry else 0.0
+
+    def apply(self, rows: list[dict]) -> None:
+        """Upsert rows from the database into the replica (absolute counts)."""
+        with self._lock:
+            for row in rows:
+                number = normalize_phone_number(row["phone_number"])
+                if number is None:
+                    continue
+                count = row.get("report_count") or 0
+                score_anchor = row_anchored_score(row)
+                entry = self._entries.get(number)
+                if entry is None:
+                    self._entries[number] = {
+                        "report_count": count,
+                        "score_anchor": score_anchor,
+                        "last_reported_at": row.get("last_reported_at"),
+                    }
+                    self._bloom_add(number)
+                    self._trie.add(number, 1, count, score_anchor)
+                else:
+                    self._trie.add(number, 0, count - entry["report_count"], score_anchor - entry["score_anchor"])
+                    entry["report_count"] = count
+                    entry["score_anchor"] = score_anchor
+                    entry["last_reported_at"] = row.get("last_reported_at")
+
+    def record_reports(self, counts: dict[str, int]) -> None:
+        """Write-through for reports this process just committed."""
+        now = time.time()
+        with self._lock:
+            for number, count in counts.items():
+                # Anchored scores make each report an O(1) addition
+                score_delta = to_anchored(count, now)
+                entry = self._entries.get(number)
+                if entry is None:
+                    self._entries[number] = {"report_count": count, "score_anchor": score_delta, "last_reported_at": None}
+                    self._bloom_add(number)
+                    self._trie.add(number, 1, count, score_delta)
+                else:
+                    entry["report_count"] += count
+                    entry["score_anchor"] += score_delta
+                    self._trie.add(number, 0, count, score_delta)
+
+    def _bloom_add(self, number: str) -> None:
+        # Caller holds the lock. Rebuild at 2x capacity so the error rate stays bounded.
+        if len(self._entries) > self._bloom.capacity:
+            bloom = BloomFilter(self._bloom.capacity * 2)
+            for existing in self._entries:
+                bloom.add(existing)
+            self._bloom = bloom
+        else:
+            self._bloom.add(number)
+
+    async def sync(self) -> int:
+        """
+        Pull every row changed since the watermark.
+
+        Returns:
+            Number of rows applied
+        """
+        applied = 0
+        while True:
+            after_ts, after_number = self.watermark or (None, None)
+            rows = await self._fetch_fn(after_ts, after_number, SYNC_PAGE_SIZE)
+            if rows:
+                self.apply(rows)
+                applied += len(rows)
+                last = rows[-1]
+                self.watermark = (last["last_reported_at"], last["phone_number"])
+            if len(rows) < SYNC_PAGE_SIZE:
+                break
+        self.last_synced_at = time.monotonic()
+        return applied
+
+    async def run_sync_loop(self, interval: float = SYNC_INTERVAL) -> None:
+        """Periodically delta-sync the replica."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                applied = await self.sync()
+                if applied:
+                    print(f"[NumberIndex] Synced {applied} changed number(s), {len(self)} total")
+            except Exception as e:
+                print(f"[NumberIndex] Delta sync failed: {e}")
+
+
+# Singleton replica for this process
+_index: SuspiciousNumberIndex | None = None
+
+
+def get_number_index() -> SuspiciousNumberIndex:
+    """Get or create the process-wide suspicious number index."""
+    global _index
+    if _index is None:
+        _index = SuspiciousNumberIndex()
+    return _index
+
+
+def caller_risk_prior(phone_number: str) -> int:
+    """
+    Starting risk score for a call, based on the caller's number.
+
+    Uses time-decayed reputation, so recent reports weigh far more than old
+    ones. A number with its own recent reports starts high; numbers next to
+    reported ones (neighbor spoofing within an exchange block) start with a
+    smaller bump. The prior stays below the alert threshold - the
+    conversation still decides.
+
+    Args:
+        phone_number: E.164 caller number
+
+    Returns:
+        Risk prior 0-70
+    """
+    if not phone_number:
+        return 0
+
+    index = get_number_index()
+    score = index.reputation_score(phone_number)
+    if score >= 1:
+        return min(70, round(40 + 10 * math.log2(score)))
+    exact_prior = round(40 * score)
+
+    nearby = index.neighborhood(phone_number)
+    neighbor_prior = min(35, round(10 * nearby["neighbors"]["score"] + 2 * nearby["block"]["score"]))
+    return max(exact_prior, neighbor_prior)
@@ -0,0 +1,281 @@
+"""
+Live fan-out of a protected call to its emergency contacts (/ws/observe).
+
+Each live session with a session_id gets one ObserverHub. The call's
+/ws/audio connection publishes its risk, captions and alerts to the hub;
+the hub serializes each event once and puts the same frame on every
+subscriber's bounded queue without waiting. A subscriber whose queue is
+full (slow phone, stalled network) is dropped and its socket closed - it
+can reconnect and starts again from a fresh "state" snapshot - so
+observers never hold up the call's own pipeline.
+
+Observers authenticate with a signed token bound to the session and one
+emergency contact (see observer_link); the alert iMessage carries it.
+
+Events (JSON text frames):
+- {"type": "state", ...}: sent first - current scores, recent captions
+- {"type": "update", "segments", "risk_score", "confidence_score",
+  "reasoning", "alert_sent"}: after every analysis / fact check
+- {"type": "ended"}: the call ended (the socket is closed after it)
+
+Hubs live in this process, like the /ws/audio connection that feeds them.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from collections import deque
+from typing import Optional
+from urllib.parse import quote
+
+# Frames buffered per observer before it counts as a slow consumer
+QUEUE_SIZE = int(os.getenv("OBSERVER_QUEUE_SIZE", "32"))
+
+# Observers allowed per call
+MAX_SUBSCRIBERS = int(os.getenv("OBSERVER_MAX_SUBSCRIBERS", "8"))
+
+# Recent captions sent to a new observer in its "state" snapshot
+SNAPSHOT_CAPTIONS = int(os.getenv("OBSERVER_SNAPSHOT_CAPTIONS", "50"))
+
+# How long a watch link from an alert stays valid (seconds)
+TOKEN_TTL = int(os.getenv("OBSERVER_TOKEN_TTL_SECONDS", "7200"))
+
+# Where watch links point (the frontend's /observe page)
+OBSERVE_URL = os.getenv("KOVA_OBSERVE_URL", "http://localhost:5173/observe")
+
+_secret: Optional[bytes] = None
+
+
+def _get_secret() -> bytes:
+    """The token signing key (random per process if KOVA_OBSERVER_SECRET is unset)."""
+    global _secret
+    if _secret is None:
+        configured = os.getenv("KOVA_OBSERVER_SECRET")
+        if configured:
+            _secret = configured.encode()
+        else:
+            print("[Observe] KOVA_OBSERVER_SECRET not set, watch links won't survive a restart")
+            _secret = secrets.token_bytes(32)
+    return _secret
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(session_id: str, payload: str) -> str:
+    digest = hmac.new(_get_secret(), f"{session_id}\n{payload}".encode(), hashlib.sha256).digest()
+    return _b64(digest[:18])
+
+
+def issue_observer_token(session_id: str, contact: str, ttl: int = TOKEN_TTL) -> str:
+    """
+    A token that lets `contact` watch session `session_id` for `ttl` seconds.
+
+    Returns:
+        "<payload>.<signature>", URL safe
+    """
+    payload = _b64(f"{contact}|{int(time.time()) + ttl}".encode())
+    return f"{payload}.{_signature(session_id, payload)}"
+
+
+def verify_observer_token(session_id: str, token: Optional[str]) -> Optional[str]:
+    """
+    Check a token from issue_observer_token.
+
+    Returns:
+        The contact it was issued to, or None if it is forged, expired or
+        for another session
+    """
+    if not token or token.count(".") != 1:
+        return None
+    payload, signature = token.split(".")
+    if not hmac.compare_digest(signature, _signature(session_id, payload)):
+        return None
+    try:
+        contact, expires = _unb64(payload).decode().rsplit("|", 1)
+        if int(expires) < time.time():
+            return None
+    except ValueError:
+        return None
+    return contact
+
+
+def observer_link(session_id: str, contact: str) -> str:
+    """The watch link to send `contact` for session `session_id`."""
+    return f"{OBSERVE_URL}/{quote(session_id)}?token={issue_observer_token(session_id, contact)}"
+
+
+class ObserverSubscription:
+    """One observer's queue of serialized frames (None = disconnect)."""
+
+    __slots__ = ("contact", "queue", "dropped")
+
+    def __init__(self, contact: str, queue_size: int):
+        self.contact = contact
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+
+class ObserverHub:
+    """Fans out one live call's events to its observers."""
+
+    __slots__ = (
+        "session_id", "queue_size", "max_subscribers", "closed", "references",
+        "published", "delivered", "dropped", "_subscribers", "_scores", "_captions",
+    )
+
+    def __init__(
+        self,
+        session_id: str,
+        queue_size: int = QUEUE_SIZE,
+        max_subscribers: int = MAX_SUBSCRIBERS,
+        snapshot_captions: int = SNAPSHOT_CAPTIONS,
+    ):
+        self.session_id = session_id
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.closed = False
+        self.references = 0  # /ws/audio connections feeding the hub (2 during a reconnect)
+        self.published = 0  # Events serialized
+        self.delivered = 0  # Frames queued to observers
+        self.dropped = 0  # Observers disconnected for falling behind
+        self._subscribers: list[ObserverSubscription] = []
+        self._scores = {"risk_score": 0, "confidence_score": 0, "reasoning": ""}
+        self._captions: deque = deque(maxlen=snapshot_captions)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, contact: str) -> Optional[ObserverSubscription]:
+        """
+        Add an observer; its queue starts with a "state" snapshot.
+
+        Returns:
+            The subscription, or None if the call ended or has too many observers
+        """
+        if self.closed or len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscription = ObserverSubscription(contact, self.queue_size)
+        subscription.queue.put_nowait(json.dumps({
+            "type": "state",
+            **self._scores,
+            "segments": list(self._captions),
+        }))
+        self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ObserverSubscription) -> None:
+        if subscription in self._subscribers:
+            self._subscribers.remove(subscription)
+
+    def update(self, message: dict) -> None:
+        """
+        Publish a /ws/audio transcript message (new segments and/or scores).
+
+        Never blocks: observers that can't keep up are dropped.
+        """
+        segments = message.get("segments") or []
+        self._captions.extend(segments)
+        for field in self._scores:
+            if message.get(field) is not None:
+                self._scores[field] = message[field]
+        self._publish({
+            "type": "update",
+            "segments": segments,
+            **self._scores,
+            "alert_sent": bool(message.get("alert_sent")),
+        })
+
+    def close(self) -> None:
+        """Tell every observer the call ended and disconnect them."""
+        if self.closed:
+            return
+        self._publish({"type": "ended"})
+        self.closed = True
+        for subscription in self._subscribers:
+            self._disconnect(subscription)
+        self._subscribers.clear()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "queued": [s.queue.qsize() for s in self._subscribers],
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+    def _publish(self, event: dict) -> None:
+        if self.closed:
+            return
+        frame = json.dumps(event)  # Once, for every observer
+        self.published += 1
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(frame)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                print(f"[Observe] Dropping slow observer {subscription.contact} of {self.session_id}")
+                self.dropped += 1
+                self._subscribers.remove(subscription)
+                subscription.dropped = True
+                self._disconnect(subscription)
+
+    @staticmethod
+    def _disconnect(subscription: ObserverSubscription) -> None:
+        """Queue the disconnect marker, discarding frames a dropped observer won't get to."""
+        if subscription.dropped:
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+        try:
+            subscription.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            subscription.queue.get_nowait()
+            subscription.queue.put_nowait(None)
+
+
+_hubs: dict[str, ObserverHub] = {}
+
+
+def open_observer_hub(session_id: str) -> ObserverHub:
+    """Get or create the live hub for a session (release with release_observer_hub)."""
+    hub = _hubs.get(session_id)
+    if hub is None:
+        hub = _hubs[session_id] = ObserverHub(session_id)
+    hub.references += 1
+    return hub
+
+
+def release_observer_hub(hub: ObserverHub) -> None:
+    """Drop a reference; the last one ends the hub and disconnects its observers."""
+    hub.references -= 1
+    if hub.references <= 0:
+        hub.close()
+        if _hubs.get(hub.session_id) is hub:
+            del _hubs[hub.session_id]
+
+
+def get_observer_hub(session_id: str) -> Optional[ObserverHub]:
+    """The live hub for a session in this process, if its call is connected here."""
+    return _hubs.get(session_id)
+
+
+def get_observer_stats() -> dict:
+    """Subscriber and fan-out counters for every live hub in this process."""
+    hubs = {session_id: hub.stats() for session_id, hub in _hubs.items()}
+    return {
+        "hubs": len(hubs),
+        "subscribers": sum(h["subscribers"] for h in hubs.values()),
+        "dropped": sum(h["dropped"] for h in hubs.values()),
+        "sessions": hubs,
+    }
@@ -0,0 +1,124 @@
+"""
+Outbound message encodings for /ws/audio.
+
+JSON (the default) sends every message as the full dict in a text frame,
+which repeats every key and the current reasoning each time.
+
+MessagePack (?protocol=msgpack) sends binary frames, and is meant for
+mobile links:
+- keys, message types and speakers are small integers (FIELDS, TYPES,
+  SPEAKERS; mirrored in frontend/src/lib/callProtocol.ts);
+- transcript messages are deltas. They carry only the scores that changed
+  since the previous message, the one-off suggested_question / alert_sent
+  when set, and new segments. `seq` numbers the first of those segments
+  (its index among the segments sent on this connection), so the client
+  can drop repeats and notice gaps. A delta with nothing in it isn't sent.
+
+The audio_format handshake stays a JSON text frame either way and tells the
+client which protocol the server picked. Both protocols are compressed
+with permessage-deflate when the client offers it (uvicorn negotiates it
+by default).
+"""
+import json
+from typing import Optional, Union
+
+import ormsgpack
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+# Interned message types and field names (append only: clients depend on the codes)
+TYPES = {"transcript": 0, "stop_call": 1, "voice_command": 2}
+FIELDS = {
+    "type": 0,
+    "seq": 1,
+    "segments": 2,
+    "risk_score": 3,
+    "confidence_score": 4,
+    "reasoning": 5,
+    "suggested_question": 6,
+    "alert_sent": 7,
+    "transcript": 8,
+    "command": 9,
+}
+SPEAKERS = {"user": 0, "caller": 1}
+
+# Transcript fields the client keeps between messages (sent when they change)
+STATE_FIELDS = ("risk_score", "confidence_score", "reasoning")
+
+_UNSET = object()
+
+
+def negotiate_protocol(requested: Optional[str]) -> str:
+    """The outbound protocol for a client that asked for `requested` (?protocol=)."""
+    return MSGPACK if requested == MSGPACK else JSON
+
+
+class OutboundEncoder:
+    """Encodes one connection's outbound messages, remembering what the client already has."""
+
+    __slots__ = ("protocol", "messages", "bytes_sent", "_state", "_next_seq")
+
+    def __init__(self, protocol: str = JSON):
+        self.protocol = protocol
+        self.messages = 0
+        self.bytes_sent = 0
+        self._state: dict = {}  # Last value sent per STATE_FIELDS field
+        self._next_seq = 0  # Segments sent so far
+
+    def encode(self, message: dict) -> Optional[Union[str, bytes]]:
+        """
+        Encode one message for the client.
+
+        Returns:
+            A str (text frame) for JSON, bytes (binary frame) for MessagePack,
+            or None if the client already has everything in it
+        """
+        if self.protocol == JSON:
+            return json.dumps(message)
+
+        if message.get("type") == "transcript":
+            frame = self._transcript_delta(message)
+            if frame is None:
+                return None
+        else:
+            frame = {FIELDS.get(key, key): value for key, value in message.items()}
+            frame[FIELDS["type"]] = TYPES.get(message["type"], message["type"])
+        return ormsgpack.packb(frame, option=ormsgpack.OPT_NON_STR_KEYS)
+
+    async def send(self, websocket, message: dict) -> None:
+        """Encode and send a message (nothing is sent for an empty delta)."""
+        data = self.encode(message)
+        if data is None:
+            return
+        if isinstance(data, str):
+            await websocket.send_text(data)
+            self.bytes_sent += len(data.encode())
+        else:
+            await websocket.send_bytes(data)
+            self.bytes_sent += len(data)
+        self.messages += 1
+
+    def _transcript_delta(self, message: dict) -> Optional[dict]:
+        frame = {}
+        segments = message.get("segments")
+        if segments:
+            frame[FIELDS["seq"]] = self._next_seq
+            frame[FIELDS["segments"]] = [
+                [SPEAKERS.get(segment["speaker"], segment["speaker"]), segment["text"]]
+                for segment in segments
+            ]
+            self._next_seq += len(segments)
+        for field in STATE_FIELDS:
+            value = message.get(field, _UNSET)
+            if value is not _UNSET and value != self._state.get(field, _UNSET):
+                frame[FIELDS[field]] = value
+                self._state[field] = value
+        if message.get("suggested_question"):
+            frame[FIELDS["suggested_question"]] = message["suggested_question"]
+        if message.get("alert_sent"):
+            frame[FIELDS["alert_sent"]] = True
+        if not frame:
+            return None
+        frame[FIELDS["type"]] = TYPES["transcript"]
+        return frame
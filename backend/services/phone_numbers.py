@@ -0,0 +1,66 @@
+"""
+Phone number normalization.
+
+Every entry point (API queries, the caller number on /ws/audio, reports) runs
+numbers through normalize_phone_number() so that "(555) 123-4567",
+"555.123.4567" and "+1 555 123 4567" are stored and matched as one key.
+"""
+import os
+
+# Country calling code assumed for numbers dialed without one
+DEFAULT_COUNTRY_CODE = os.getenv("DEFAULT_COUNTRY_CODE", "1")
+
+# Number of trailing digits that identify a line within an exchange block
+# (NANP: the 4-digit line number after NPA-NXX)
+EXCHANGE_LINE_DIGITS = 4
+
+
+def normalize_phone_number(raw: str, default_country_code: str = DEFAULT_COUNTRY_CODE) -> str | None:
+    """
+    Normalize a phone number to E.164 ("+15551234567").
+
+    Args:
+        raw: Phone number in any common format
+        default_country_code: Calling code for national-format numbers
+
+    Returns:
+        E.164 string, or None if the input can't be a valid number
+    """
+    if not raw:
+        return None
+
+    raw = raw.strip()
+    digits = "".join(ch for ch in raw if ch.isdigit())
+
+    if raw.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        # International dialing prefix
+        digits = digits[2:]
+    elif default_country_code == "1" and len(digits) == 11 and digits.startswith("1"):
+        # NANP with trunk prefix: 1 555 123 4567
+        pass
+    else:
+        # National format; drop a trunk "0" used outside NANP
+        if default_country_code != "1" and digits.startswith("0"):
+            digits = digits[1:]
+        digits = default_country_code + digits
+
+    # E.164 allows at most 15 digits; anything under 8 is a short code
+    if not 8 <= len(digits) <= 15:
+        return None
+    # Country code 1 is NANP: always exactly 10 digits after it
+    if digits.startswith("1") and len(digits) != 11:
+        return None
+
+    return "+" + digits
+
+
+def exchange_block_prefix(e164: str) -> str:
+    """Prefix shared by every number in the same exchange block (NANP: +1 NPA NXX)."""
+    return e164[:-EXCHANGE_LINE_DIGITS]
+
+
+def neighborhood_prefix(e164: str, last_digits: int) -> str:
+    """Prefix shared by every number that differs only in the last N digits."""
+    return e164[:-last_digits] if last_digits > 0 else e164
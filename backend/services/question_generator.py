@@ -41,7 +41,7 @@ def generate_question(session: SessionState) -> Tuple[Optional[str], int]:
     """
     
     # Format History
-    history_str = "\n".join([_format_message(m) for m in session.transcript_history[-20:]])
+    history_str = "\n".join([_format_message(m) for m in session.recent_turns(20)])
     if not history_str:
         history_str = "(No conversation history yet)"
     
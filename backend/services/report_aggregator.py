@@ -0,0 +1,128 @@
+"""
+In-process aggregator for suspicious-number reports.
+
+Alerts fire from the LangGraph worker threads, and a scam campaign produces
+bursts of reports for the same handful of numbers. Instead of one database
+round-trip per report, reports are summed per number for a short window and
+flushed together in a single report_suspicious_numbers() statement from a
+background timer thread.
+"""
+import os
+import threading
+from collections import Counter
+
+from services.supabase_client import report_suspicious_numbers_sync
+
+# How long reports are held before being flushed (seconds)
+DEFAULT_FLUSH_INTERVAL = float(os.getenv("SUSPICIOUS_REPORT_FLUSH_SECONDS", "2.0"))
+
+# Flush early once this many distinct numbers are pending
+DEFAULT_MAX_PENDING = int(os.getenv("SUSPICIOUS_REPORT_MAX_PENDING", "500"))
+
+
+class ReportAggregator:
+    """
+    Batches suspicious-number reports and flushes them in one statement.
+
+    Thread-safe: add() can be called from any thread. Counts are exact - a
+    failed flush puts its reports back so they go out with the next batch.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        flush_fn=report_suspicious_numbers_sync,
+    ):
+        """
+        Args:
+            flush_interval: Seconds to hold reports before flushing
+            max_pending: Flush immediately once this many distinct numbers are pending
+            flush_fn: Callable taking {phone_number: count}, returns True on success
+        """
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._flush_fn = flush_fn
+        self._pending: Counter = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    def add(self, phone_number: str, count: int = 1) -> None:
+        """Queue a report for the next flush."""
+        if not phone_number or count <= 0:
+            return
+
+        with self._lock:
+            self._pending[phone_number] += count
+            flush_now = len(self._pending) >= self.max_pending
+            if not flush_now and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if flush_now:
+            self.flush()
+
+    def pending_count(self) -> int:
+        """Total number of reports waiting to be flushed."""
+        with self._lock:
+            return sum(self._pending.values())
+
+    def flush(self) -> bool:
+        """
+        Write all pending reports in a single statement.
+
+        Returns:
+            True if there was nothing to flush or the flush succeeded
+        """
+        # Serialize flushes so a retry can't race ahead of an in-flight batch
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                batch = self._pending
+                self._pending = Counter()
+
+            if not batch:
+                return True
+
+            if self._flush_fn(dict(batch)):
+                return True
+
+            # Put the batch back so no report is lost; it will retry on the next window
+            with self._lock:
+                self._pending.update(batch)
+                if self._timer is None:
+                    self._timer = threading.Timer(self.flush_interval, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+            return False
+
+
+# Singleton aggregator shared by all sessions in this process
+_aggregator: ReportAggregator | None = None
+_aggregator_lock = threading.Lock()
+
+
+def get_report_aggregator() -> ReportAggregator:
+    """Get or create the process-wide report aggregator."""
+    global _aggregator
+    if _aggregator is None:
+        with _aggregator_lock:
+            if _aggregator is None:
+                _aggregator = ReportAggregator()
+    return _aggregator
+
+
+def queue_suspicious_report(phone_number: str) -> None:
+    """Queue a single suspicious-number report for batched, atomic writing."""
+    get_report_aggregator().add(phone_number)
+
+
+def flush_pending_reports() -> bool:
+    """Flush any queued reports now (e.g. on shutdown)."""
+    if _aggregator is None:
+        return True
+    return _aggregator.flush()
@@ -0,0 +1,95 @@
+"""
+Time-decayed caller reputation.
+
+A number's reputation score is its report count with exponential decay: each
+report adds 1 and the score halves every REPUTATION_HALF_LIFE_DAYS. A number
+reported ten times this week scores ~10, one reported once two years ago
+scores ~0.
+
+Updates are O(1): decay the stored (score, updated_at) pair to now and add
+(done atomically in the report_suspicious_numbers database function).
+For in-memory aggregation (e.g. summing an exchange block in the number
+index trie) scores are kept "anchored" to a fixed epoch, so scores updated at
+different times can be added directly and decayed once on read.
+"""
+import math
+import os
+import time
+from datetime import datetime
+
+# Time for a report's weight to halve
+HALF_LIFE_SECONDS = float(os.getenv("REPUTATION_HALF_LIFE_DAYS", "30")) * 86400
+
+DECAY_RATE = math.log(2) / HALF_LIFE_SECONDS
+
+# Fixed reference time for anchored scores (2026-01-01T00:00:00Z)
+ANCHOR_EPOCH = 1767225600.0
+
+
+def parse_timestamp(value) -> float | None:
+    """Convert a database timestamp (ISO string) to epoch seconds."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def decayed_score(score: float, updated_at: float, now: float = None) -> float:
+    """Decay a score last updated at `updated_at` to `now`."""
+    if not score:
+        return 0.0
+    now = time.time() if now is None else now
+    return score * math.exp(-DECAY_RATE * max(0.0, now - updated_at))
+
+
+def to_anchored(score: float, updated_at: float) -> float:
+    """Rescale a score to ANCHOR_EPOCH so scores from different times can be summed."""
+    return score * math.exp(DECAY_RATE * (updated_at - ANCHOR_EPOCH))
+
+
+def from_anchored(anchored: float, now: float = None) -> float:
+    """Decay an anchored score (or a sum of them) to `now`."""
+    now = time.time() if now is None else now
+    return anchored * math.exp(-DECAY_RATE * (now - ANCHOR_EPOCH))
+
+
+def row_anchored_score(row: dict) -> float:
+    """
+    Anchored score for a suspicious_numbers row.
+
+    Rows without a reputation score yet (not backfilled) are treated as if all
+    their reports arrived at last_reported_at, matching the database fallback.
+    """
+    score = row.get("reputation_score")
+    updated_at = parse_timestamp(row.get("reputation_updated_at"))
+    if score is None or updated_at is None:
+        score = row.get("report_count") or 0
+        updated_at = parse_timestamp(row.get("last_reported_at")) or time.time()
+    return to_anchored(score, updated_at)
+
+
+async def recompute_reputation_scores(only_missing: bool = True) -> int:
+    """
+    Batch backfill job: recompute reputation scores in the database.
+
+    Args:
+        only_missing: Only fill rows that have never had a score
+
+    Returns:
+        Number of rows updated
+    """
+    from services.storage import get_storage
+
+    return await get_storage().recompute_reputation_scores(HALF_LIFE_SECONDS, only_missing)
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+
+    updated = asyncio.run(recompute_reputation_scores(only_missing="--all" not in sys.argv))
+    print(f"📊 Recomputed reputation for {updated} number(s)")
@@ -0,0 +1,165 @@
+"""
+Per-call risk timeline.
+
+Every process_chunk() result during a call is recorded as one fixed-width
+7-byte sample - (t_offset_ms: uint32, risk: uint8, confidence: uint8,
+flags: uint8), little-endian - appended to a bytearray. An hour-long call is a
+few KB. The packed bytes are stored with the call record at call end and load
+straight into a numpy structured array for fleet-wide statistics, which we
+use to tune the thresholds in route_after_analysis.
+"""
+import struct
+import time
+
+import numpy as np
+
+# (t_offset_ms, risk, confidence, flags)
+SAMPLE_FORMAT = struct.Struct("<IBBB")
+SAMPLE_DTYPE = np.dtype([("t_ms", "<u4"), ("risk", "u1"), ("confidence", "u1"), ("flags", "u1")])
+
+# Event flags
+FLAG_ALERT = 0x01  # Alert sent to emergency contacts
+FLAG_QUESTION = 0x02  # Verification question suggested
+FLAG_REPORTED = 0x04  # Caller number reported as suspicious
+
+# Samples kept per call (~140 KB); later samples are dropped
+MAX_SAMPLES = 20000
+
+
+def _as_bytes(data) -> bytes:
+    """Accept raw bytes or a PostgREST bytea string ("\\x0a1b...")."""
+    if isinstance(data, str):
+        return bytes.fromhex(data[2:] if data.startswith("\\x") else data)
+    return bytes(data)
+
+
+class RiskTimeline:
+    """Append-only packed timeline of one call's risk trajectory."""
+
+    __slots__ = ("start_time", "_buffer")
+
+    def __init__(self, start_time: float = None, data: bytes = b""):
+        """
+        Args:
+            start_time: Epoch seconds the call started (defaults to now)
+            data: Existing packed samples, e.g. from to_bytes()
+        """
+        if len(data) % SAMPLE_FORMAT.size:
+            raise ValueError("timeline data is not a whole number of samples")
+        self.start_time = time.time() if start_time is None else start_time
+        self._buffer = bytearray(data)
+
+    @classmethod
+    def from_bytes(cls, data) -> "RiskTimeline":
+        return cls(start_time=0.0, data=_as_bytes(data))
+
+    def __len__(self) -> int:
+        return len(self._buffer) // SAMPLE_FORMAT.size
+
+    def record(self, risk: int, confidence: int, flags: int = 0, at: float = None) -> None:
+        """Append a sample taken at `at` (epoch seconds, defaults to now)."""
+        if len(self) >= MAX_SAMPLES:
+            return
+        at = time.time() if at is None else at
+        offset_ms = min(max(int((at - self.start_time) * 1000), 0), 0xFFFFFFFF)
+        self._buffer += SAMPLE_FORMAT.pack(
+            offset_ms,
+            min(max(int(risk), 0), 255),
+            min(max(int(confidence), 0), 255),
+            flags & 0xFF,
+        )
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._buffer)
+
+    def to_array(self) -> np.ndarray:
+        """Samples as a structured array (fields t_ms, risk, confidence, flags)."""
+        return np.frombuffer(bytes(self._buffer), dtype=SAMPLE_DTYPE)
+
+
+def _percentiles(values: list[float], percentiles: tuple[int, ...]) -> dict | None:
+    if not values:
+        return None
+    return {f"p{p}": round(float(v), 2) for p, v in zip(percentiles, np.percentile(values, percentiles))}
+
+
+class TimelineStats:
+    """
+    Accumulates fleet-wide statistics one call timeline at a time.
+
+    Only a few numbers per call are kept, so calls can be streamed in pages.
+    """
+
+    def __init__(
+        self,
+        risk_threshold: int,
+        confidence_threshold: int,
+        minutes: tuple[int, ...] = (1, 2, 5, 10),
+        percentiles: tuple[int, ...] = (50, 75, 90, 99),
+    ):
+        """
+        Args:
+            risk_threshold: Risk that counts as high (route_after_analysis alert risk)
+            confidence_threshold: Confidence that counts as confident
+            minutes: Call minutes N at which to report risk percentiles
+            percentiles: Percentiles to report
+        """
+        self.risk_threshold = risk_threshold
+        self.confidence_threshold = confidence_threshold
+        self.percentiles = percentiles
+        self.calls = 0
+        self._first_alert_seconds: list[float] = []
+        self._risk_at_minute: dict[int, list[int]] = {n: [] for n in minutes}
+        self._early_high_risk = 0
+        self._early_lead_seconds: list[float] = []
+
+    def add(self, data) -> None:
+        """Fold in one packed timeline (bytes or bytea string)."""
+        samples = RiskTimeline.from_bytes(data).to_array()
+        if not len(samples):
+            return
+        self.calls += 1
+        t_ms = samples["t_ms"]
+
+        alerts = np.flatnonzero(samples["flags"] & FLAG_ALERT)
+        if len(alerts):
+            self._first_alert_seconds.append(t_ms[alerts[0]] / 1000)
+
+        # Risk at minute N is the latest sample at or before N; calls that
+        # ended before minute N don't count towards it
+        for n, values in self._risk_at_minute.items():
+            index = np.searchsorted(t_ms, n * 60000, side="right") - 1
+            if index >= 0 and t_ms[-1] >= n * 60000:
+                values.append(int(samples["risk"][index]))
+
+        confident = np.flatnonzero(samples["confidence"] >= self.confidence_threshold)
+        high_risk = np.flatnonzero(samples["risk"] >= self.risk_threshold)
+        if len(high_risk) and (not len(confident) or high_risk[0] < confident[0]):
+            self._early_high_risk += 1
+            if len(confident):
+                self._early_lead_seconds.append((t_ms[confident[0]] - t_ms[high_risk[0]]) / 1000)
+
+    def result(self) -> dict:
+        """
+        Returns:
+            Dict with calls, time_to_first_alert_seconds, risk_at_minute and
+            high_risk_before_confident (how often risk reached the threshold
+            while confidence was still below its threshold)
+        """
+        return {
+            "calls": self.calls,
+            "thresholds": {"risk": self.risk_threshold, "confidence": self.confidence_threshold},
+            "time_to_first_alert_seconds": {
+                "alerted_calls": len(self._first_alert_seconds),
+                "percentiles": _percentiles(self._first_alert_seconds, self.percentiles),
+            },
+            "risk_at_minute": {
+                str(n): {"calls": len(values), "percentiles": _percentiles(values, self.percentiles)}
+                for n, values in self._risk_at_minute.items()
+            },
+            "high_risk_before_confident": {
+                "calls": self._early_high_risk,
+                "rate": round(self._early_high_risk / self.calls, 4) if self.calls else 0.0,
+                "lead_seconds_percentiles": _percentiles(self._early_lead_seconds, self.percentiles),
+            },
+        }
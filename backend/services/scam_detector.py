@@ -40,7 +40,7 @@ def analyze_transcript(new_chunk: Dict[str, str], session: SessionState) -> None
     # being the *previous* turns. 
     
     # Format History (Exclude the very newest chunk since we pass it separately)
-    history_str = "\n".join([_format_message(m) for m in session.transcript_history[-20:]]) # last 20 turns
+    history_str = "\n".join([_format_message(m) for m in session.recent_turns(20)]) # last 20 turns
     if not history_str:
         history_str = "(No previous history)"
         
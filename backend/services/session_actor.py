@@ -0,0 +1,376 @@
+"""
+Per-session actor that owns a live call's SessionState.
+
+Everything that changes a call's detection state goes through one asyncio
+task and its mailbox, in order:
+- transcript segments from /ws/audio (analyze())
+- USER_INPUT fact checks queued by /chat on the stored session (any worker;
+  the actor hears about them through the session store's change feed)
+- a snapshot timer
+- answers to canned chat intents, precomputed in the background whenever
+  risk moves materially (see services.chat_bot.precompute_answers)
+
+Only the actor mutates the state, so no locks are needed and no update is
+lost. After every change it publishes the new turn and scores to the session
+store, which gives /chat a versioned snapshot. Fact checks that pile up while
+an analysis is running are coalesced into a single USER_INPUT chunk.
+
+Resuming: every SNAPSHOT_INTERVAL seconds, and when the connection drops, the
+actor also snapshots the risk timeline and the TranscriptProcessor buffer.
+A dropped call is kept for RESUME_GRACE_SECONDS; a reconnect with the same
+session_id claims it (compare-and-set on the owner token) and carries on
+from the snapshot. Only the connection that still owns the call when the
+grace period ends records it in analytics, so a resumed call counts once.
+"""
+import asyncio
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from services import session_manager
+from services.chat_bot import PRECOMPUTE_MAX_AGE, PRECOMPUTE_RISK_DELTA, precompute_answers
+from services.risk_timeline import RiskTimeline, FLAG_ALERT, FLAG_QUESTION, FLAG_REPORTED
+from services.session_state import SessionState
+from services.session_store import SessionConflict
+from services.transcript_processor import TranscriptProcessor
+from services.workflow import process_chunk
+
+# Speaker label for chat questions fed to the scam detector
+USER_INPUT_SPEAKER = "USER_INPUT"
+
+# How long a dropped call waits for a reconnect before it is finalized (seconds)
+RESUME_GRACE_SECONDS = float(os.getenv("SESSION_RESUME_GRACE_SECONDS", "30"))
+
+# How often the full call snapshot (timeline, processor buffer) is written (seconds)
+SNAPSHOT_INTERVAL = float(os.getenv("SESSION_SNAPSHOT_SECONDS", "5"))
+
+# Set to 0 to always answer /chat live
+PRECOMPUTE_CHAT_ANSWERS = os.getenv("CHAT_PRECOMPUTE_ANSWERS", "1") != "0"
+
+# Mailbox message kinds
+_SEGMENT = "segment"
+_POLL = "poll"
+_SNAPSHOT = "snapshot"
+_ANSWERS = "answers"
+_STOP = "stop"
+
+
+class SessionActor:
+    """Serializes all state changes for one live call."""
+
+    def __init__(
+        self,
+        session_id: Optional[str],
+        state: SessionState,
+        timeline: Optional[RiskTimeline] = None,
+        processor: Optional[TranscriptProcessor] = None,
+        on_update: Optional[Callable[[dict], Awaitable[None]]] = None,
+    ):
+        """
+        Args:
+            session_id: Session store key (None = not shared with /chat)
+            state: The call's state; owned by the actor from now on
+            timeline: Records risk/confidence after every analysis
+            processor: The connection's transcript buffer (snapshotted for resume)
+            on_update: async fn(result) for changes the caller didn't
+                request itself (fact checks from /chat)
+        """
+        self.session_id = session_id
+        self.state = state
+        self.timeline = timeline
+        self.processor = processor
+        self.on_update = on_update
+        self.owner = uuid.uuid4().hex
+        self.resumed = False
+        self.version = 0
+        self._mailbox: asyncio.Queue = asyncio.Queue()
+        self._poll_queued = False
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._unsubscribe: Optional[Callable[[], None]] = None
+        self._snapshot_timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._answers_task: Optional[asyncio.Task] = None
+        self._answers_risk: Optional[int] = None  # Risk the latest precompute started at
+        self._answers_at = 0.0
+
+    async def start(self) -> None:
+        """
+        Register the session in the store (resuming a dropped call with the
+        same session_id if there is one) and start processing the mailbox.
+        """
+        self._loop = asyncio.get_running_loop()
+        if self.session_id:
+            self.resumed = await asyncio.to_thread(self._claim)
+            if not self.resumed:
+                self.state.owner = self.owner
+                self.version = await asyncio.to_thread(session_manager.save_session, self.session_id, self.state)
+            self._unsubscribe = session_manager.subscribe(self._on_store_change)
+            self._schedule_snapshot()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Finish queued work and write a final snapshot marking the call as dropped."""
+        if self._stopping:
+            return
+        self._stopping = True
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+        if self._snapshot_timer is not None:
+            self._snapshot_timer.cancel()
+        if self._answers_task is not None:
+            self._answers_task.cancel()
+        if self._task is not None:
+            self._mailbox.put_nowait((_STOP, None, None))
+            await self._task
+            self._task = None
+        self.state.detached_at = time.time()
+        if self.session_id:
+            await self._write_snapshot()
+
+    async def release(self, grace: float = RESUME_GRACE_SECONDS) -> bool:
+        """
+        After stop(): wait up to `grace` seconds for a reconnect to resume the call.
+
+        Returns:
+            True if nobody resumed it - the caller should record the call in
+            analytics (the stored session has been deleted); False if another
+            connection now owns it
+        """
+        if not self.session_id:
+            return True
+        await asyncio.sleep(grace)
+        return await asyncio.to_thread(self._finalize)
+
+    async def analyze(self, segment: dict) -> dict:
+        """Queue a transcript segment and wait for its workflow result."""
+        future = self._loop.create_future()
+        self._mailbox.put_nowait((_SEGMENT, segment, future))
+        return await future
+
+    def snapshot(self) -> SessionState:
+        """A copy of the current state, tagged with the last published version."""
+        state = self.state.copy()
+        state.version = self.version
+        return state
+
+    # ---------- ownership ----------
+
+    def _claim(self) -> bool:
+        """Take over a dropped (or still attached) call with this session_id, if any."""
+        stored = session_manager.get_session(self.session_id)
+        if stored is None or not stored.owner:
+            return False
+        if stored.detached_at and time.time() - stored.detached_at > RESUME_GRACE_SECONDS:
+            return False
+        stored.owner = self.owner
+        stored.detached_at = 0
+        try:
+            self.version = session_manager.save_session(self.session_id, stored, stored.version)
+        except SessionConflict:
+            return False
+
+        self.state = stored
+        if self.timeline is not None:
+            self.timeline = RiskTimeline(start_time=stored.call_started_at, data=stored.risk_timeline)
+        if self.processor is not None:
+            self.processor.buffer = stored.processor_buffer
+            self.processor.conversation_history = list(stored.processor_history)
+        print(f"[SessionActor] Resumed {self.session_id} (risk {stored.risk_score}, {len(stored.transcript_history)} turns)")
+        return True
+
+    def _finalize(self) -> bool:
+        """Give up the call for good if this connection still owns it."""
+        stored = session_manager.get_session(self.session_id)
+        if stored is not None:
+            if stored.owner != self.owner:
+                return False
+            # Clearing the owner makes the call unclaimable before it is deleted
+            stored.owner = ""
+            try:
+                session_manager.save_session(self.session_id, stored, stored.version)
+            except SessionConflict:
+                return False
+        session_manager.delete_session(self.session_id)
+        return True
+
+    # ---------- mailbox ----------
+
+    def _on_store_change(self, session_id: str, version: int) -> None:
+        # Runs on whichever thread wrote the change (or the store watcher)
+        if session_id != self.session_id or version <= self.version:
+            return
+        self._loop.call_soon_threadsafe(self._queue_poll)
+
+    def _queue_poll(self) -> None:
+        if not self._poll_queued:
+            self._poll_queued = True
+            self._mailbox.put_nowait((_POLL, None, None))
+
+    def _schedule_snapshot(self) -> None:
+        if self._stopping:
+            return
+        # The snapshot also keeps a quiet call from being evicted as idle
+        interval = min(SNAPSHOT_INTERVAL, session_manager.get_session_store().idle_ttl / 3)
+        self._snapshot_timer = self._loop.call_later(
+            interval, self._mailbox.put_nowait, (_SNAPSHOT, None, None)
+        )
+
+    async def _run(self) -> None:
+        while True:
+            kind, payload, future = await self._mailbox.get()
+            if kind == _STOP:
+                return
+            await self._handle(kind, payload, future)
+
+    async def _handle(self, kind: str, payload, future: Optional[asyncio.Future]) -> None:
+        # Errors are caught here rather than in _run so their tracebacks never
+        # reference the long-lived _run frame (clearing it would end the actor)
+        try:
+            if kind == _SEGMENT:
+                result = await self._apply(payload)
+                if not future.done():
+                    future.set_result(result)
+            elif kind == _POLL:
+                self._poll_queued = False
+                await self._run_fact_checks()
+            elif kind == _SNAPSHOT:
+                self._schedule_snapshot()
+                await self._write_snapshot()
+            elif kind == _ANSWERS:
+                await self._publish_answers(payload)
+        except Exception as e:
+            if future is not None and not future.done():
+                future.set_exception(e)
+            else:
+                print(f"[SessionActor] {kind} failed for {self.session_id}: {e}")
+
+    async def _run_fact_checks(self) -> None:
+        """Claim USER_INPUT questions queued by /chat and analyze them as one chunk."""
+        stored = await asyncio.to_thread(session_manager.get_session, self.session_id)
+        if stored is None or not stored.pending_user_inputs or stored.owner != self.owner:
+            return
+
+        claimed: list[str] = []
+
+        def claim(live_session: SessionState):
+            claimed[:] = live_session.pending_user_inputs
+            live_session.pending_user_inputs = []
+
+        version = await asyncio.to_thread(session_manager.update_session, self.session_id, claim)
+        self.version = max(self.version, version or 0)
+        if not claimed:
+            return
+        result = await self._apply({"speaker": USER_INPUT_SPEAKER, "text": "\n".join(claimed)})
+        if self.on_update is not None:
+            await self.on_update(result)
+
+    async def _apply(self, chunk: dict) -> dict:
+        """Run the workflow on the owned state, record it and publish the change."""
+        state = self.state
+        was_reported = state.suspicious_number_reported
+        result = await asyncio.to_thread(process_chunk, chunk, state, self.session_id)
+
+        if result.get("suggested_question"):
+            state.questions_generated += 1
+        if result.get("alert_sent"):
+            state.alerts_sent += 1
+        if self.timeline is not None:
+            self.timeline.record(
+                state.risk_score,
+                state.confidence_score,
+                (FLAG_ALERT if result.get("alert_sent") else 0)
+                | (FLAG_QUESTION if result.get("suggested_question") else 0)
+                | (FLAG_REPORTED if state.suspicious_number_reported and not was_reported else 0),
+            )
+        if self.session_id:
+            await self._publish()
+            self._maybe_precompute_answers()
+        return result
+
+    def _maybe_precompute_answers(self) -> None:
+        """Regenerate the canned chat answers off the mailbox if risk moved materially."""
+        state = self.state
+        if not PRECOMPUTE_CHAT_ANSWERS or self._answers_task is not None or not state.transcript_history:
+            return
+        if (
+            self._answers_risk is not None
+            and abs(state.risk_score - self._answers_risk) < PRECOMPUTE_RISK_DELTA
+            and time.time() - self._answers_at < PRECOMPUTE_MAX_AGE / 2
+        ):
+            return
+        self._answers_risk, self._answers_at = state.risk_score, time.time()
+        self._answers_task = asyncio.create_task(self._precompute_answers(state.copy()))
+
+    async def _precompute_answers(self, snapshot: SessionState) -> None:
+        try:
+            answers = await precompute_answers(snapshot)
+        except Exception as e:
+            print(f"[SessionActor] Precomputing chat answers failed for {self.session_id}: {e}")
+            answers = None
+        finally:
+            self._answers_task = None
+        if answers and not self._stopping:
+            self._mailbox.put_nowait((_ANSWERS, answers, None))
+
+    async def _publish_answers(self, answers: dict) -> None:
+        """Store freshly precomputed chat answers for /chat (on any worker)."""
+        self.state.precomputed_answers = answers
+
+        def sync(live_session: SessionState):
+            if live_session.owner == self.owner:
+                live_session.precomputed_answers = answers
+
+        await self._write(sync)
+
+    async def _publish(self) -> None:
+        """Write the newest turn and scores to the store (chat fields are left alone)."""
+        state = self.state
+        turn = state.transcript_history[-1] if state.transcript_history else None
+
+        def sync(live_session: SessionState):
+            if live_session.owner != self.owner:
+                return  # Another connection resumed the call
+            if turn is not None:
+                live_session.add_turn(turn["speaker"], turn["text"])
+            live_session.risk_score = state.risk_score
+            live_session.confidence_score = state.confidence_score
+            live_session.latest_reasoning = state.latest_reasoning
+            live_session.last_alert_time = state.last_alert_time
+            live_session.last_question_time = state.last_question_time
+            live_session.suspicious_number_reported = state.suspicious_number_reported
+            live_session.questions_generated = state.questions_generated
+            live_session.alerts_sent = state.alerts_sent
+
+        await self._write(sync)
+
+    async def _write_snapshot(self) -> None:
+        """Write what a reconnect needs beyond the per-change fields."""
+        state = self.state
+        if self.timeline is not None:
+            state.risk_timeline = self.timeline.to_bytes()
+        if self.processor is not None:
+            state.processor_buffer = self.processor.buffer
+            state.processor_history = list(self.processor.conversation_history)
+        risk_timeline, buffer, history = state.risk_timeline, state.processor_buffer, state.processor_history
+        detached_at = state.detached_at
+
+        def snapshot(live_session: SessionState):
+            if live_session.owner != self.owner:
+                return
+            live_session.risk_timeline = risk_timeline
+            live_session.processor_buffer = buffer
+            live_session.processor_history = list(history)
+            live_session.detached_at = detached_at
+
+        await self._write(snapshot)
+
+    async def _write(self, fn: Callable[[SessionState], None]) -> None:
+        version = await asyncio.to_thread(session_manager.update_session, self.session_id, fn)
+        if version is None:
+            # Evicted (idle TTL or session cap) - register it again
+            version = await asyncio.to_thread(session_manager.save_session, self.session_id, self.state)
+        self.version = version
+
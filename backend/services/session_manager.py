@@ -1,19 +1,58 @@
-from typing import Dict, Optional
+"""
+Active call sessions, shared between /ws/audio and /chat.
+
+Sessions live in the configured session store (see services.session_store):
+in this process by default, or in a shared SQLite file so that any uvicorn
+worker can serve any session.
+"""
+import asyncio
+import os
+from typing import Callable, Optional
 from services.session_state import SessionState
+from services.session_store import get_session_store
 
-# Singleton storage for active sessions
-# Key: session_id (str), Value: SessionState
-_active_sessions: Dict[str, SessionState] = {}
+# How often idle sessions are swept out of the store (seconds)
+SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_SECONDS", "60"))
 
 def get_session(session_id: str) -> Optional[SessionState]:
-    """Retrieve an active session by ID."""
-    return _active_sessions.get(session_id)
+    """Retrieve a copy of an active session by ID."""
+    return get_session_store().get(session_id)
+
+def save_session(session_id: str, session: SessionState, expected_version: Optional[int] = None) -> int:
+    """
+    Save or replace a session. Returns its new version.
+    
+    With expected_version, raises SessionConflict unless the stored version
+    is still that (0 = must not exist).
+    """
+    return get_session_store().save(session_id, session, expected_version)
 
-def save_session(session_id: str, session: SessionState):
-    """Save or update a session."""
-    _active_sessions[session_id] = session
+def update_session(session_id: str, fn: Callable[[SessionState], None]) -> Optional[int]:
+    """
+    Apply fn to the stored session and save it without losing concurrent
+    updates from other requests or workers (fn may run more than once).
+    
+    Returns:
+        The new version, or None if the session doesn't exist
+    """
+    return get_session_store().update(session_id, fn)
 
 def delete_session(session_id: str):
     """Remove a session (e.g. on disconnect)."""
-    if session_id in _active_sessions:
-        del _active_sessions[session_id]
+    get_session_store().delete(session_id)
+
+def subscribe(callback: Callable[[str, int], None]) -> Callable[[], None]:
+    """Call callback(session_id, version) whenever any session changes (version 0 = deleted)."""
+    return get_session_store().subscribe(callback)
+
+
+async def run_session_sweeper(interval: float = SWEEP_INTERVAL):
+    """Evict sessions idle longer than SESSION_IDLE_TTL_SECONDS, forever."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            evicted = await asyncio.to_thread(get_session_store().evict_expired)
+            if evicted:
+                print(f"[SessionStore] Evicted {evicted} idle session(s)")
+        except Exception as e:
+            print(f"[SessionStore] Sweep failed: {e}")
@@ -1,13 +1,66 @@
-from typing import List, Dict
+import base64
+import json
+import sys
+import zlib
+from collections import deque
+from itertools import islice
+from typing import Deque, List, Dict
+
+# Leading byte of SessionState.to_bytes() payloads
+SERIAL_FORMAT_VERSION = 1
+
+# Fields persisted by to_bytes()
+_SERIALIZED_FIELDS = (
+    "transcript_history",
+    "risk_score",
+    "confidence_score",
+    "chatbot_history",
+    "latest_reasoning",
+    "emergency_contacts",
+    "last_alert_time",
+    "last_question_time",
+    "caller_phone_number",
+    "suspicious_number_reported",
+    "pending_user_inputs",
+    # Call continuation, so a reconnect can resume the call
+    "call_started_at",
+    "questions_generated",
+    "alerts_sent",
+    "risk_timeline",
+    "processor_buffer",
+    "processor_history",
+    "owner",
+    "detached_at",
+    # Answers to canned chat intents, precomputed by the call's actor
+    "precomputed_answers",
+)
+
+# Fields holding raw bytes (base64 in the serialized form)
+_BYTES_FIELDS = frozenset({"risk_timeline"})
+
+# Chatbot messages kept per session (the prompt only uses the last few)
+MAX_CHAT_MESSAGES = 50
+
+# Transcript turns kept per session (prompts use the last 20)
+MAX_TRANSCRIPT_TURNS = 100
+
+# Chat questions waiting for the call's SessionActor to fact-check
+MAX_PENDING_USER_INPUTS = 10
 
 class SessionState:
     """
     Holds the state for a SINGLE user connection.
     This is preferred over a global variable so we don't mix up different users.
+
+    The LangGraph workflow mutates one SessionState in place, so adding a turn
+    allocates one small dict no matter how long the call has been going.
     """
+    __slots__ = _SERIALIZED_FIELDS + ("version",)
+
     def __init__(self):
-        # The shared history that all AI models (Detector, Question Generator) will read
-        self.transcript_history: List[Dict[str, str]] = []
+        # The shared history that all AI models (Detector, Question Generator) will read.
+        # A bounded deque: the oldest turn drops off in O(1) once it is full
+        self.transcript_history: Deque[Dict[str, str]] = deque(maxlen=MAX_TRANSCRIPT_TURNS)
         
         # Scam Detection State
         self.risk_score: int = 0
@@ -26,14 +79,66 @@ class SessionState:
         self.last_question_time: float = 0
         self.caller_phone_number: str = None
         self.suspicious_number_reported: bool = False
+        
+        # Chat questions queued for a USER_INPUT fact check by the call's actor
+        self.pending_user_inputs: List[str] = []
+        
+        # Call continuation (see SessionActor): everything a reconnect needs
+        # to pick the call up where it left off
+        self.call_started_at: float = 0
+        self.questions_generated: int = 0
+        self.alerts_sent: int = 0
+        self.risk_timeline: bytes = b""  # Packed RiskTimeline samples
+        self.processor_buffer: str = ""  # TranscriptProcessor words not yet analyzed
+        self.processor_history: List[Dict[str, str]] = []  # Speaker identification context
+        self.owner: str = ""  # Token of the connection currently driving the call
+        self.detached_at: float = 0  # When that connection dropped (0 = connected)
+        
+        # Canned chat intent -> {"answer", "risk_score", "computed_at"} (see chat_bot.precompute_answers)
+        self.precomputed_answers: Dict[str, Dict] = {}
+        
+        # Store version this copy was read at (0 = never saved)
+        self.version: int = 0
     
     def add_turn(self, speaker: str, text: str):
-        """Adds a turn to the history efficiently."""
-        self.transcript_history.append({"speaker": speaker, "text": text})
-        
-        # Optional: Limit history size if it gets too huge (e.g. > 100 turns)
-        if len(self.transcript_history) > 100:
-             self.transcript_history = self.transcript_history[-100:]
+        """Adds a turn to the history efficiently (speaker labels are interned)."""
+        self.transcript_history.append({"speaker": sys.intern(speaker), "text": text})
+
+    def recent_turns(self, count: int) -> List[Dict[str, str]]:
+        """The last `count` turns, oldest first, without copying the whole history."""
+        return recent(self.transcript_history, count)
+
+    def add_chat_messages(self, messages: List[Dict[str, str]]):
+        """Appends chatbot messages, keeping only the most recent MAX_CHAT_MESSAGES."""
+        self.chatbot_history.extend(messages)
+        if len(self.chatbot_history) > MAX_CHAT_MESSAGES:
+            del self.chatbot_history[:-MAX_CHAT_MESSAGES]
+
+    def queue_user_input(self, text: str):
+        """Queues a chat question for the scam detector, dropping the oldest beyond MAX_PENDING_USER_INPUTS."""
+        self.pending_user_inputs.append(text)
+        if len(self.pending_user_inputs) > MAX_PENDING_USER_INPUTS:
+            del self.pending_user_inputs[:-MAX_PENDING_USER_INPUTS]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """UTF-8 bytes held in the transcript, chat history and precomputed answers, latest reasoning and resume snapshot."""
+        transcript = sum(
+            len(turn.get("speaker", "").encode()) + len(turn.get("text", "").encode())
+            for turn in self.transcript_history
+        )
+        chat = sum(len(message.get("content", "").encode()) for message in self.chatbot_history)
+        chat += sum(len(entry.get("answer", "").encode()) for entry in self.precomputed_answers.values())
+        summary = len((self.latest_reasoning or "").encode())
+        resume = len(self.risk_timeline) + len(self.processor_buffer.encode()) + sum(
+            len(segment.get("text", "").encode()) for segment in self.processor_history
+        )
+        return {
+            "transcript_bytes": transcript,
+            "chat_bytes": chat,
+            "summary_bytes": summary,
+            "resume_bytes": resume,
+            "total_bytes": transcript + chat + summary + resume,
+        }
 
     def to_dict(self):
         """Helper to send state to frontend"""
@@ -44,3 +149,51 @@ class SessionState:
             "history_length": len(self.transcript_history),
             "chat_length": len(self.chatbot_history)
         }
+
+    def copy(self) -> "SessionState":
+        """Independent copy (history containers are copied, their entries shared)."""
+        state = SessionState()
+        for field in _SERIALIZED_FIELDS:
+            value = getattr(self, field)
+            if isinstance(value, deque):
+                value = deque(value, maxlen=value.maxlen)
+            elif isinstance(value, list):
+                value = list(value)
+            elif isinstance(value, dict):
+                value = dict(value)
+            setattr(state, field, value)
+        state.version = self.version
+        return state
+
+    def to_bytes(self) -> bytes:
+        """Compact serialized form for cross-process session stores."""
+        payload = json.dumps(
+            [
+                base64.b64encode(getattr(self, field)).decode() if field in _BYTES_FIELDS else getattr(self, field)
+                for field in _SERIALIZED_FIELDS
+            ],
+            separators=(",", ":"),
+            default=list,
+        ).encode()
+        return bytes([SERIAL_FORMAT_VERSION]) + zlib.compress(payload, 1)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, version: int = 0) -> "SessionState":
+        """Rebuild a SessionState from to_bytes() output."""
+        if not data or data[0] != SERIAL_FORMAT_VERSION:
+            raise ValueError(f"Unsupported session format: {data[:1]!r}")
+        state = cls()
+        values = dict(zip(_SERIALIZED_FIELDS, json.loads(zlib.decompress(data[1:]))))
+        for turn in values.pop("transcript_history"):
+            state.add_turn(turn["speaker"], turn["text"])
+        for field, value in values.items():
+            setattr(state, field, base64.b64decode(value) if field in _BYTES_FIELDS else value)
+        state.version = version
+        return state
+
+
+def recent(history, count: int) -> list:
+    """Last `count` items of a list or deque, oldest first (no full copy)."""
+    items = list(islice(reversed(history), count))
+    items.reverse()
+    return items
@@ -0,0 +1,43 @@
+"""
+Pluggable storage for live call sessions.
+
+The backend is chosen with KOVA_SESSION_STORE:
+- "memory" (default): sessions live in this process (single worker)
+- "sqlite": a SQLite file at KOVA_SESSION_DB shared by every worker on the
+  host, so /chat can be served by any worker
+"""
+import os
+
+from services.session_store.base import SessionStore, SessionConflict
+
+SESSION_STORE_BACKEND = os.getenv("KOVA_SESSION_STORE") or "memory"
+
+_store: SessionStore | None = None
+
+
+def create_session_store(backend: str = SESSION_STORE_BACKEND, **kwargs) -> SessionStore:
+    """Instantiate a session store backend by name."""
+    if backend == "memory":
+        from services.session_store.memory_store import MemorySessionStore
+        return MemorySessionStore(**kwargs)
+    if backend == "sqlite":
+        from services.session_store.sqlite_store import SQLiteSessionStore
+        return SQLiteSessionStore(**kwargs)
+    raise ValueError(f"Unknown KOVA_SESSION_STORE: {backend!r} (expected 'memory' or 'sqlite')")
+
+
+def get_session_store() -> SessionStore:
+    """Get or create the configured session store singleton."""
+    global _store
+    if _store is None:
+        _store = create_session_store()
+    return _store
+
+
+def set_session_store(store: SessionStore | None) -> None:
+    """Replace the session store singleton (tests, embedding)."""
+    global _store
+    _store = store
+
+
+__all__ = ["SessionStore", "SessionConflict", "create_session_store", "get_session_store", "set_session_store"]
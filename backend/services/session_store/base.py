@@ -0,0 +1,135 @@
+"""
+Session store interface shared by every backend.
+"""
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from services.session_state import SessionState
+
+# Maximum compare-and-set attempts in update()
+MAX_UPDATE_ATTEMPTS = 10
+
+# Sessions not written for this long are evicted (seconds)
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL_SECONDS", "900"))
+
+# Maximum stored sessions; the least recently written are evicted beyond it
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "1000"))
+
+
+class SessionConflict(Exception):
+    """A save() expected a version that is no longer current."""
+
+
+class SessionStore(ABC):
+    """
+    Versioned key-value store of live SessionStates.
+
+    Sessions are bounded: one that hasn't been written for idle_ttl seconds
+    is treated as gone (a crashed handler or half-open socket never deletes
+    its session), and beyond max_sessions the least recently written are
+    evicted.
+
+    Every save bumps the session's version. get() returns a private copy, so
+    changes must be written back with save() or, preferably, update(), which
+    re-applies the change on conflict instead of overwriting a concurrent
+    writer. Subscribers are told about every change with (session_id,
+    version); version 0 means the session was deleted.
+    """
+
+    name: str = "base"
+
+    def __init__(self, idle_ttl: float = SESSION_IDLE_TTL, max_sessions: int = SESSION_MAX_COUNT):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.evictions = 0
+        self._subscribers: list[Callable[[str, int], None]] = []
+        self._subscribers_lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, session_id: str) -> SessionState | None:
+        """A copy of the session at its current version, or None."""
+
+    @abstractmethod
+    def save(self, session_id: str, state: SessionState, expected_version: int | None = None) -> int:
+        """
+        Store a session.
+
+        Args:
+            session_id: The session's id
+            state: State to store; its version is set to the new version
+            expected_version: Fail with SessionConflict unless the stored
+                version is this (0 = must not exist); None saves unconditionally
+
+        Returns:
+            The new version
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Remove a session (no-op if it doesn't exist)."""
+
+    @abstractmethod
+    def session_ids(self) -> list[str]:
+        """Ids of all stored sessions."""
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        """Remove sessions idle for longer than idle_ttl. Returns how many were removed."""
+
+    @abstractmethod
+    def stats(self) -> list[dict]:
+        """
+        Per-session introspection: session_id, version, idle_seconds and the
+        SessionState.memory_usage() byte counts.
+        """
+
+    def update(self, session_id: str, fn: Callable[[SessionState], None]) -> int | None:
+        """
+        Apply fn to the current state and save it, retrying on conflict.
+
+        fn may run more than once and must only mutate the state it is given.
+
+        Returns:
+            The new version, or None if the session doesn't exist
+        """
+        for _ in range(MAX_UPDATE_ATTEMPTS):
+            state = self.get(session_id)
+            if state is None:
+                return None
+            fn(state)
+            try:
+                return self.save(session_id, state, expected_version=state.version)
+            except SessionConflict:
+                continue
+        raise SessionConflict(f"Session {session_id} kept changing; gave up after {MAX_UPDATE_ATTEMPTS} attempts")
+
+    def subscribe(self, callback: Callable[[str, int], None]) -> Callable[[], None]:
+        """
+        Call callback(session_id, version) on every change.
+
+        Returns:
+            A function that removes the subscription
+        """
+        with self._subscribers_lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._subscribers_lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def _notify(self, session_id: str, version: int) -> None:
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(session_id, version)
+            except Exception as e:
+                print(f"[SessionStore] Subscriber error: {e}")
+
+    def close(self) -> None:
+        """Release resources (optional)."""
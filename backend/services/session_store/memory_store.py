@@ -0,0 +1,116 @@
+"""
+In-process session store (the default).
+
+Only this worker can see its sessions, so it is right for a single uvicorn
+worker. update() mutates the stored object in place under a lock - no copies
+and no conflicts. Sessions are kept in write order, so the idle and LRU
+candidates are always at the front.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from services.session_state import SessionState
+from services.session_store.base import SessionStore, SessionConflict
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in a dict owned by this process."""
+
+    name = "memory"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions: OrderedDict[str, SessionState] = OrderedDict()
+        self._written_at: dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def _touch(self, session_id: str) -> list[str]:
+        """Mark a session as just written; returns ids evicted to respect max_sessions."""
+        self._written_at[session_id] = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        evicted = []
+        while len(self._sessions) > self.max_sessions:
+            oldest, _ = self._sessions.popitem(last=False)
+            del self._written_at[oldest]
+            evicted.append(oldest)
+        self.evictions += len(evicted)
+        return evicted
+
+    def _is_expired(self, session_id: str) -> bool:
+        return time.monotonic() - self._written_at[session_id] > self.idle_ttl
+
+    def get(self, session_id):
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None or self._is_expired(session_id):
+                return None
+            return state.copy()
+
+    def save(self, session_id, state, expected_version=None):
+        with self._lock:
+            current = self._sessions.get(session_id)
+            if current is not None and self._is_expired(session_id):
+                current = None
+            current_version = current.version if current is not None else 0
+            if expected_version is not None and expected_version != current_version:
+                raise SessionConflict(f"{session_id}: expected v{expected_version}, found v{current_version}")
+            stored = state.copy()
+            stored.version = state.version = current_version + 1
+            self._sessions[session_id] = stored
+            evicted = self._touch(session_id)
+        for evicted_id in evicted:
+            self._notify(evicted_id, 0)
+        self._notify(session_id, stored.version)
+        return stored.version
+
+    def update(self, session_id, fn):
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None or self._is_expired(session_id):
+                return None
+            fn(state)
+            state.version += 1
+            version = state.version
+            self._touch(session_id)
+        self._notify(session_id, version)
+        return version
+
+    def delete(self, session_id):
+        with self._lock:
+            removed = self._sessions.pop(session_id, None)
+            self._written_at.pop(session_id, None)
+        if removed is not None:
+            self._notify(session_id, 0)
+
+    def session_ids(self):
+        with self._lock:
+            return [session_id for session_id in self._sessions if not self._is_expired(session_id)]
+
+    def evict_expired(self):
+        expired = []
+        with self._lock:
+            while self._sessions:
+                oldest = next(iter(self._sessions))
+                if not self._is_expired(oldest):
+                    break
+                del self._sessions[oldest]
+                del self._written_at[oldest]
+                expired.append(oldest)
+            self.evictions += len(expired)
+        for session_id in expired:
+            self._notify(session_id, 0)
+        return len(expired)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "session_id": session_id,
+                    "version": state.version,
+                    "idle_seconds": round(now - self._written_at[session_id], 1),
+                    **state.memory_usage(),
+                }
+                for session_id, state in self._sessions.items()
+            ]
@@ -0,0 +1,222 @@
+"""
+Cross-process session store in a shared SQLite file.
+
+Every uvicorn worker on the host opens the same database (WAL mode, so
+readers never block the writer), which lets a /chat request on one worker
+see the session a /ws/audio connection created on another. Sessions are
+stored as compact SessionState.to_bytes() blobs with a version number;
+saves are compare-and-set inside a `begin immediate` transaction.
+
+Each write also appends to a small change log. A watcher thread (started on
+the first subscribe()) polls it and notifies subscribers in this process of
+changes made by any worker.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from services.session_state import SessionState
+from services.session_store.base import SessionStore, SessionConflict
+
+# Shared database file (must be on a local filesystem for WAL)
+SESSION_DB_PATH = os.getenv("KOVA_SESSION_DB") or "kova_sessions.db"
+
+# How often the watcher polls the change log (seconds)
+POLL_INTERVAL = float(os.getenv("SESSION_STORE_POLL_SECONDS", "0.05"))
+
+# Change log entries kept for slow watchers
+CHANGE_LOG_RETENTION = 10000
+
+_SCHEMA = """
+create table if not exists sessions (
+    id text primary key,
+    version integer not null,
+    data blob not null,
+    written_at real not null default 0
+);
+create index if not exists sessions_written_at_idx on sessions (written_at);
+
+create table if not exists session_changes (
+    seq integer primary key autoincrement,
+    session_id text not null,
+    version integer not null
+);
+"""
+
+# Columns added after a table was first created: (table, column, definition)
+_ADDED_COLUMNS = (
+    ("sessions", "written_at", "real not null default 0"),
+)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions shared by all processes that open KOVA_SESSION_DB."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = SESSION_DB_PATH, poll_interval: float = POLL_INTERVAL, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.poll_interval = poll_interval
+        # One connection per thread (sqlite3 connections are not thread-safe)
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._watcher: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")
+            conn.execute("pragma busy_timeout=5000")
+            for table, column, definition in _ADDED_COLUMNS:
+                existing = {r[1] for r in conn.execute(f"pragma table_info({table})")}
+                if existing and column not in existing:
+                    conn.execute(f"alter table {table} add column {column} {definition}")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _write(self, session_id: str, apply) -> int:
+        """
+        Run apply(conn, current_version) -> new_version in a write transaction,
+        evict sessions beyond max_sessions, and log every change.
+        """
+        conn = self._conn()
+        conn.execute("begin immediate")
+        try:
+            row = conn.execute(
+                "select version from sessions where id = ? and written_at >= ?",
+                (session_id, time.time() - self.idle_ttl),
+            ).fetchone()
+            version = apply(conn, row[0] if row else 0)
+            changes = [(session_id, version)]
+            evicted = [r[0] for r in conn.execute(
+                "select id from sessions order by written_at desc limit -1 offset ?", (self.max_sessions,)
+            )]
+            if evicted:
+                conn.executemany("delete from sessions where id = ?", [(e,) for e in evicted])
+                changes += [(e, 0) for e in evicted]
+                self.evictions += len(evicted)
+            self._log_changes(conn, changes)
+            conn.execute("commit")
+        except BaseException:
+            conn.execute("rollback")
+            raise
+        return version
+
+    @staticmethod
+    def _log_changes(conn: sqlite3.Connection, changes: list[tuple[str, int]]) -> None:
+        conn.executemany("insert into session_changes (session_id, version) values (?, ?)", changes)
+        seq = conn.execute("select max(seq) from session_changes").fetchone()[0]
+        conn.execute("delete from session_changes where seq <= ?", (seq - CHANGE_LOG_RETENTION,))
+
+    def get(self, session_id):
+        row = self._conn().execute(
+            "select version, data from sessions where id = ? and written_at >= ?",
+            (session_id, time.time() - self.idle_ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        return SessionState.from_bytes(row[1], version=row[0])
+
+    def save(self, session_id, state, expected_version=None):
+        data = state.to_bytes()
+
+        def apply(conn, current_version):
+            if expected_version is not None and expected_version != current_version:
+                raise SessionConflict(f"{session_id}: expected v{expected_version}, found v{current_version}")
+            conn.execute(
+                "insert into sessions (id, version, data, written_at) values (?, ?, ?, ?) "
+                "on conflict (id) do update set version = excluded.version, data = excluded.data, "
+                "written_at = excluded.written_at",
+                (session_id, current_version + 1, data, time.time()),
+            )
+            return current_version + 1
+
+        state.version = self._write(session_id, apply)
+        return state.version
+
+    def delete(self, session_id):
+        def apply(conn, current_version):
+            conn.execute("delete from sessions where id = ?", (session_id,))
+            return 0
+
+        self._write(session_id, apply)
+
+    def session_ids(self):
+        return [row[0] for row in self._conn().execute(
+            "select id from sessions where written_at >= ?", (time.time() - self.idle_ttl,)
+        )]
+
+    def evict_expired(self):
+        conn = self._conn()
+        conn.execute("begin immediate")
+        try:
+            expired = [r[0] for r in conn.execute(
+                "select id from sessions where written_at < ?", (time.time() - self.idle_ttl,)
+            )]
+            if expired:
+                conn.executemany("delete from sessions where id = ?", [(e,) for e in expired])
+                self._log_changes(conn, [(e, 0) for e in expired])
+            conn.execute("commit")
+        except BaseException:
+            conn.execute("rollback")
+            raise
+        self.evictions += len(expired)
+        return len(expired)
+
+    def stats(self):
+        now = time.time()
+        return [
+            {
+                "session_id": session_id,
+                "version": version,
+                "idle_seconds": round(now - written_at, 1),
+                "serialized_bytes": len(data),
+                **SessionState.from_bytes(data).memory_usage(),
+            }
+            for session_id, version, data, written_at in self._conn().execute(
+                "select id, version, data, written_at from sessions order by written_at"
+            )
+        ]
+
+    def subscribe(self, callback):
+        unsubscribe = super().subscribe(callback)
+        if self._watcher is None:
+            start_seq = self._conn().execute("select coalesce(max(seq), 0) from session_changes").fetchone()[0]
+            self._watcher = threading.Thread(
+                target=self._watch, args=(start_seq,), name="kova-session-watcher", daemon=True
+            )
+            self._watcher.start()
+        return unsubscribe
+
+    def _watch(self, last_seq: int) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                changes = self._conn().execute(
+                    "select seq, session_id, version from session_changes where seq > ? order by seq", (last_seq,)
+                ).fetchall()
+            except sqlite3.Error as e:
+                print(f"[SessionStore] Watcher error: {e}")
+                continue
+            for seq, session_id, version in changes:
+                last_seq = seq
+                self._notify(session_id, version)
+
+    def close(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=1)
+            self._watcher = None
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
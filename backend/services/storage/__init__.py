@@ -0,0 +1,43 @@
+"""
+Pluggable persistence for suspicious numbers, user analytics and call records.
+
+The backend is chosen with KOVA_STORAGE_BACKEND:
+- "supabase" (default): the hosted Supabase project
+- "sqlite": an embedded SQLite file at KOVA_SQLITE_PATH (offline tests, local
+  load tests, edge deployments)
+"""
+import os
+
+from services.storage.base import Storage
+
+STORAGE_BACKEND = os.getenv("KOVA_STORAGE_BACKEND") or "supabase"
+
+_storage: Storage | None = None
+
+
+def create_storage(backend: str = STORAGE_BACKEND, **kwargs) -> Storage:
+    """Instantiate a storage backend by name."""
+    if backend == "supabase":
+        from services.storage.supabase_store import SupabaseStorage
+        return SupabaseStorage(**kwargs)
+    if backend == "sqlite":
+        from services.storage.sqlite_store import SQLiteStorage
+        return SQLiteStorage(**kwargs)
+    raise ValueError(f"Unknown KOVA_STORAGE_BACKEND: {backend!r} (expected 'supabase' or 'sqlite')")
+
+
+def get_storage() -> Storage:
+    """Get or create the configured storage backend singleton."""
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+def set_storage(storage: Storage | None) -> None:
+    """Replace the storage singleton (tests, embedding)."""
+    global _storage
+    _storage = storage
+
+
+__all__ = ["Storage", "create_storage", "get_storage", "set_storage"]
@@ -0,0 +1,137 @@
+"""
+Storage interface shared by every persistence backend.
+"""
+from abc import ABC, abstractmethod
+
+# Columns returned for suspicious_numbers rows by every backend
+SUSPICIOUS_NUMBER_COLUMNS = (
+    "phone_number",
+    "report_count",
+    "last_reported_at",
+    "reputation_score",
+    "reputation_updated_at",
+)
+
+# Columns of call_records included in exports
+CALL_EXPORT_COLUMNS = (
+    "id",
+    "session_id",
+    "started_at",
+    "ended_at",
+    "duration_seconds",
+    "final_risk_score",
+    "caller_phone_number",
+    "was_scam",
+    "questions_generated",
+    "alerts_sent",
+)
+
+# HyperLogLog sketch columns on the user_analytics row (never returned to clients)
+ANALYTICS_SKETCH_COLUMNS = ("callers_hll", "scam_callers_hll")
+
+
+class Storage(ABC):
+    """
+    Async persistence API for suspicious numbers, user analytics and call records.
+
+    Implementations must make report_suspicious_numbers() atomic per number:
+    concurrent reports for the same number may never lose an increment.
+    """
+
+    name: str = "base"
+
+    # ---------- suspicious numbers ----------
+
+    @abstractmethod
+    async def report_suspicious_numbers(self, counts: dict[str, int], half_life_seconds: float) -> None:
+        """Upsert-increment report_count and decayed reputation_score for each number."""
+
+    @abstractmethod
+    async def get_suspicious_numbers(self, phone_numbers: list[str]) -> list[dict]:
+        """Fetch the rows for the given (normalized) numbers; missing numbers are omitted."""
+
+    @abstractmethod
+    async def fetch_suspicious_numbers_since(
+        self,
+        last_reported_at: str | None,
+        after_phone_number: str | None,
+        limit: int,
+    ) -> list[dict]:
+        """One keyset page of rows ordered by (last_reported_at, phone_number)."""
+
+    @abstractmethod
+    async def recompute_reputation_scores(self, half_life_seconds: float, only_missing: bool) -> int:
+        """Backfill reputation scores from report_count/last_reported_at. Returns rows updated."""
+
+    # ---------- user analytics ----------
+
+    @abstractmethod
+    async def get_user_analytics(self, user_id: str) -> dict | None:
+        """Fetch a user's analytics row, without the sketch columns."""
+
+    @abstractmethod
+    async def merge_scam_caller_sketches(self) -> bytes | None:
+        """Register-wise merge of every user's scam-caller HyperLogLog sketch."""
+
+    # ---------- call records ----------
+
+    @abstractmethod
+    async def record_call(self, record: dict) -> None:
+        """
+        Append one finished call to call_records and fold it into the user's
+        analytics counters, recent callers, caller sketches and day/week
+        rollups, atomically.
+        """
+
+    @abstractmethod
+    async def get_call_rollups(self, user_id: str) -> list[dict]:
+        """A user's rollup buckets (period, bucket, calls, scams, duration_seconds)."""
+
+    @abstractmethod
+    async def compact_call_rollups(self, daily_retention_days: int, weekly_retention_days: int) -> int:
+        """Drop expired day buckets and fold expired week buckets into months. Returns buckets changed."""
+
+    @abstractmethod
+    async def get_call_records(self, user_id: str, limit: int = 100) -> list[dict]:
+        """A user's most recent call records, newest first."""
+
+    @abstractmethod
+    async def fetch_call_records_page(
+        self,
+        user_id: str,
+        since: str | None,
+        until: str | None,
+        after: tuple[str, int] | None,
+        limit: int,
+    ) -> list[dict]:
+        """
+        One keyset page of a user's call records (CALL_EXPORT_COLUMNS), ordered
+        by (ended_at, id), with since <= ended_at < until. `after` is the
+        (ended_at, id) of the last row of the previous page.
+        """
+
+    @abstractmethod
+    async def fetch_risk_timelines(
+        self,
+        since: str | None,
+        until: str | None,
+        after_id: int | None,
+        limit: int,
+    ) -> list[dict]:
+        """
+        One keyset page (by id) of {id, risk_timeline} for calls across all
+        users that have a timeline, with since <= ended_at < until.
+        """
+
+    # ---------- wake word ----------
+
+    @abstractmethod
+    async def get_wake_word_model(self, user_id: str) -> bytes | None:
+        """A user's enrolled wake word templates (WakeWordModel.to_bytes()), if any."""
+
+    @abstractmethod
+    async def save_wake_word_model(self, user_id: str, model: bytes | None) -> None:
+        """Store a user's wake word templates; None deletes them."""
+
+    async def close(self) -> None:
+        """Release connections (optional)."""
@@ -0,0 +1,472 @@
+"""
+Embedded SQLite storage backend.
+
+Lets the backend run (and be load-tested) without a network database, and
+supports edge deployments where reputation lookups live on local disk. The
+database runs in WAL mode so readers in other processes never block the
+writer. All statements run on one dedicated thread that owns the connection,
+which also serializes writes - each multi-statement update is a single
+transaction, so report increments are atomic like the Postgres upsert.
+"""
+import asyncio
+import json
+import math
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from services.storage.base import Storage, SUSPICIOUS_NUMBER_COLUMNS, CALL_EXPORT_COLUMNS
+from services.call_rollups import day_bucket, week_bucket, push_recent_caller
+from services.hyperloglog import HyperLogLog
+from services.reputation import parse_timestamp
+
+# Database file (":memory:" for throwaway test databases)
+SQLITE_PATH = os.getenv("KOVA_SQLITE_PATH") or "kova.db"
+
+_SCHEMA = """
+create table if not exists suspicious_numbers (
+    phone_number text primary key,
+    report_count integer not null default 1,
+    last_reported_at text,
+    created_at text,
+    reputation_score real,
+    reputation_updated_at text
+);
+create index if not exists suspicious_numbers_last_reported_at_idx
+    on suspicious_numbers (last_reported_at, phone_number);
+
+create table if not exists user_analytics (
+    id text primary key,
+    data text not null
+);
+
+create table if not exists call_records (
+    id integer primary key autoincrement,
+    user_id text not null,
+    session_id text,
+    started_at text,
+    ended_at text not null,
+    duration_seconds integer not null default 0,
+    final_risk_score integer not null default 0,
+    caller_phone_number text,
+    was_scam integer not null default 0,
+    questions_generated integer not null default 0,
+    alerts_sent integer not null default 0,
+    risk_timeline blob
+);
+create index if not exists call_records_user_idx on call_records (user_id, ended_at);
+
+create table if not exists call_rollups (
+    user_id text not null,
+    period text not null,
+    bucket text not null,
+    calls integer not null default 0,
+    scams integer not null default 0,
+    duration_seconds integer not null default 0,
+    primary key (user_id, period, bucket)
+);
+
+create table if not exists analytics_sketches (
+    user_id text not null,
+    name text not null,
+    sketch blob not null,
+    primary key (user_id, name)
+);
+
+create table if not exists wake_word_models (
+    user_id text primary key,
+    model blob not null,
+    updated_at text
+);
+"""
+
+_CALL_RECORD_COLUMNS = (
+    "user_id", "session_id", "started_at", "ended_at", "duration_seconds", "final_risk_score",
+    "caller_phone_number", "was_scam", "questions_generated", "alerts_sent", "risk_timeline",
+)
+
+# Columns added after a table was first created: (table, column, type)
+_ADDED_COLUMNS = (
+    ("call_records", "risk_timeline", "blob"),
+)
+
+
+def _now_iso() -> str:
+    """UTC timestamp in a fixed-width format, so text ordering is time ordering."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+def _decay(age_seconds: float, half_life_seconds: float) -> float:
+    return math.exp(max(-700.0, -math.log(2) * max(age_seconds, 0.0) / half_life_seconds))
+
+
+def _apply_call(data: dict, record: dict) -> dict:
+    """Fold one call record into a user's analytics counters (same rules as apply_call_record)."""
+    risk = record.get("final_risk_score") or 0
+    ended_at = record["ended_at"]
+    medium = 1 if 50 <= risk < 80 else 0
+    low = 1 if risk < 50 else 0
+    increments = {
+        "total_calls": 1,
+        "total_call_duration_seconds": record.get("duration_seconds") or 0,
+        "total_scam_calls": 1 if record.get("was_scam") else 0,
+        "total_suspicious_calls": medium,
+        "total_safe_calls": low,
+        "total_alerts_sent": record.get("alerts_sent") or 0,
+        "total_questions_generated": record.get("questions_generated") or 0,
+        "high_risk_calls": 1 if risk >= 80 else 0,
+        "medium_risk_calls": medium,
+        "low_risk_calls": low,
+    }
+    for field, amount in increments.items():
+        data[field] = (data.get(field) or 0) + amount
+
+    recent_callers = data.get("recent_callers") or []
+    if record.get("caller_phone_number"):
+        recent_callers = push_recent_caller(
+            recent_callers, {"phone": record["caller_phone_number"], "last_call": ended_at, "risk": risk}
+        )
+    data["recent_callers"] = recent_callers
+    data.setdefault("unique_callers_count", 0)
+
+    data["first_call_at"] = min(filter(None, (data.get("first_call_at"), ended_at)))
+    data["last_call_at"] = max(filter(None, (data.get("last_call_at"), ended_at)))
+    if record.get("was_scam"):
+        data["last_scam_detected_at"] = max(filter(None, (data.get("last_scam_detected_at"), ended_at)))
+    else:
+        data.setdefault("last_scam_detected_at", None)
+    return data
+
+
+class SQLiteStorage(Storage):
+    """Storage in a local SQLite file (KOVA_SQLITE_PATH)."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kova-sqlite")
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Runs on the storage thread; the connection never leaves it
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")
+            conn.execute("pragma busy_timeout=5000")
+            conn.executescript(_SCHEMA)
+            for table, column, column_type in _ADDED_COLUMNS:
+                existing = {r["name"] for r in conn.execute(f"pragma table_info({table})")}
+                if column not in existing:
+                    conn.execute(f"alter table {table} add column {column} {column_type}")
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        """Run fn(conn, *args) on the storage thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._connect(), *args))
+
+    # ---------- suspicious numbers ----------
+
+    async def report_suspicious_numbers(self, counts, half_life_seconds):
+        def report(conn: sqlite3.Connection):
+            now = _now_iso()
+            now_ts = parse_timestamp(now)
+            conn.execute("begin immediate")
+            try:
+                for number, count in counts.items():
+                    row = conn.execute(
+                        "select report_count, reputation_score, reputation_updated_at, last_reported_at "
+                        "from suspicious_numbers where phone_number = ?", (number,)
+                    ).fetchone()
+                    if row is None:
+                        conn.execute(
+                            "insert into suspicious_numbers (phone_number, report_count, last_reported_at, created_at, "
+                            "reputation_score, reputation_updated_at) values (?, ?, ?, ?, ?, ?)",
+                            (number, count, now, now, float(count), now),
+                        )
+                        continue
+                    # Same fallback as the Postgres function for rows without a score yet
+                    score = row["reputation_score"]
+                    if score is None:
+                        score = row["report_count"]
+                    updated_at = parse_timestamp(row["reputation_updated_at"] or row["last_reported_at"]) or now_ts
+                    score = score * _decay(now_ts - updated_at, half_life_seconds) + count
+                    conn.execute(
+                        "update suspicious_numbers set report_count = report_count + ?, last_reported_at = ?, "
+                        "reputation_score = ?, reputation_updated_at = ? where phone_number = ?",
+                        (count, now, score, now, number),
+                    )
+                conn.execute("commit")
+            except Exception:
+                conn.execute("rollback")
+                raise
+
+        await self._run(report)
+
+    async def get_suspicious_numbers(self, phone_numbers):
+        def query(conn: sqlite3.Connection):
+            rows = []
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(phone_numbers), 500):
+                chunk = phone_numbers[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                rows.extend(dict(r) for r in conn.execute(
+                    f"select {', '.join(SUSPICIOUS_NUMBER_COLUMNS)} from suspicious_numbers "
+                    f"where phone_number in ({placeholders})", chunk
+                ))
+            return rows
+
+        return await self._run(query)
+
+    async def fetch_suspicious_numbers_since(self, last_reported_at, after_phone_number, limit):
+        def query(conn: sqlite3.Connection):
+            columns = ", ".join(SUSPICIOUS_NUMBER_COLUMNS)
+            if last_reported_at:
+                cursor = conn.execute(
+                    f"select {columns} from suspicious_numbers "
+                    "where (last_reported_at, phone_number) > (?, ?) "
+                    "order by last_reported_at, phone_number limit ?",
+                    (last_reported_at, after_phone_number or "", limit),
+                )
+            else:
+                cursor = conn.execute(
+                    f"select {columns} from suspicious_numbers order by last_reported_at, phone_number limit ?",
+                    (limit,),
+                )
+            return [dict(r) for r in cursor]
+
+        return await self._run(query)
+
+    async def recompute_reputation_scores(self, half_life_seconds, only_missing):
+        def recompute(conn: sqlite3.Connection):
+            now = _now_iso()
+            now_ts = parse_timestamp(now)
+            where = "where reputation_score is null" if only_missing else ""
+            conn.execute("begin immediate")
+            try:
+                rows = conn.execute(
+                    f"select phone_number, report_count, last_reported_at from suspicious_numbers {where}"
+                ).fetchall()
+                conn.executemany(
+                    "update suspicious_numbers set reputation_score = ?, reputation_updated_at = ? where phone_number = ?",
+                    [
+                        (
+                            r["report_count"] * _decay(now_ts - (parse_timestamp(r["last_reported_at"]) or now_ts), half_life_seconds),
+                            now,
+                            r["phone_number"],
+                        )
+                        for r in rows
+                    ],
+                )
+                conn.execute("commit")
+            except Exception:
+                conn.execute("rollback")
+                raise
+            return len(rows)
+
+        return await self._run(recompute)
+
+    # ---------- user analytics ----------
+
+    async def get_user_analytics(self, user_id):
+        def query(conn: sqlite3.Connection):
+            row = conn.execute("select data from user_analytics where id = ?", (user_id,)).fetchone()
+            return json.loads(row["data"]) if row else None
+
+        return await self._run(query)
+
+    async def merge_scam_caller_sketches(self):
+        def query(conn: sqlite3.Connection):
+            merged = None
+            for row in conn.execute("select sketch from analytics_sketches where name = 'scam_callers_hll'"):
+                sketch = HyperLogLog.from_bytes(row["sketch"])
+                merged = sketch if merged is None else merged.merge(sketch)
+            return merged.to_bytes() if merged else None
+
+        return await self._run(query)
+
+    # ---------- call records ----------
+
+    async def record_call(self, record):
+        def insert(conn: sqlite3.Connection):
+            day = day_bucket(datetime.fromisoformat(record["ended_at"]))
+            duration = record.get("duration_seconds") or 0
+            scams = 1 if record.get("was_scam") else 0
+            conn.execute("begin immediate")
+            try:
+                conn.execute(
+                    f"insert into call_records ({', '.join(_CALL_RECORD_COLUMNS)}) "
+                    f"values ({', '.join('?' * len(_CALL_RECORD_COLUMNS))})",
+                    [record.get(c) for c in _CALL_RECORD_COLUMNS],
+                )
+                existing = conn.execute(
+                    "select data from user_analytics where id = ?", (record["user_id"],)
+                ).fetchone()
+                data = json.loads(existing["data"]) if existing else {"id": record["user_id"]}
+                caller = record.get("caller_phone_number")
+                if caller:
+                    callers = self._add_to_sketch(conn, record["user_id"], "callers_hll", caller)
+                    data["unique_callers_count"] = callers.count()
+                    if record.get("was_scam"):
+                        self._add_to_sketch(conn, record["user_id"], "scam_callers_hll", caller)
+                conn.execute(
+                    "insert into user_analytics (id, data) values (?, ?) "
+                    "on conflict (id) do update set data = excluded.data",
+                    (record["user_id"], json.dumps(_apply_call(data, record))),
+                )
+                conn.executemany(
+                    "insert into call_rollups (user_id, period, bucket, calls, scams, duration_seconds) "
+                    "values (?, ?, ?, 1, ?, ?) on conflict (user_id, period, bucket) do update set "
+                    "calls = calls + 1, scams = scams + excluded.scams, "
+                    "duration_seconds = duration_seconds + excluded.duration_seconds",
+                    [
+                        (record["user_id"], "day", day.isoformat(), scams, duration),
+                        (record["user_id"], "week", week_bucket(day).isoformat(), scams, duration),
+                    ],
+                )
+                conn.execute("commit")
+            except Exception:
+                conn.execute("rollback")
+                raise
+
+        await self._run(insert)
+
+    @staticmethod
+    def _add_to_sketch(conn: sqlite3.Connection, user_id: str, name: str, value: str) -> HyperLogLog:
+        row = conn.execute(
+            "select sketch from analytics_sketches where user_id = ? and name = ?", (user_id, name)
+        ).fetchone()
+        sketch = HyperLogLog.from_bytes(row["sketch"]) if row else HyperLogLog()
+        if sketch.add(value) or row is None:
+            conn.execute(
+                "insert into analytics_sketches (user_id, name, sketch) values (?, ?, ?) "
+                "on conflict (user_id, name) do update set sketch = excluded.sketch",
+                (user_id, name, sketch.to_bytes()),
+            )
+        return sketch
+
+    async def get_call_rollups(self, user_id):
+        def query(conn: sqlite3.Connection):
+            cursor = conn.execute(
+                "select period, bucket, calls, scams, duration_seconds from call_rollups where user_id = ?",
+                (user_id,),
+            )
+            return [dict(r) for r in cursor]
+
+        return await self._run(query)
+
+    async def compact_call_rollups(self, daily_retention_days, weekly_retention_days):
+        def compact(conn: sqlite3.Connection):
+            today = datetime.now(timezone.utc).date()
+            day_cutoff = (today - timedelta(days=daily_retention_days)).isoformat()
+            week_cutoff = (today - timedelta(days=weekly_retention_days)).isoformat()
+            conn.execute("begin immediate")
+            try:
+                dropped = conn.execute(
+                    "delete from call_rollups where period = 'day' and bucket < ?", (day_cutoff,)
+                ).rowcount
+                conn.execute(
+                    "insert into call_rollups (user_id, period, bucket, calls, scams, duration_seconds) "
+                    "select user_id, 'month', substr(bucket, 1, 8) || '01', sum(calls), sum(scams), sum(duration_seconds) "
+                    "from call_rollups where period = 'week' and bucket < ? group by user_id, substr(bucket, 1, 8) "
+                    "on conflict (user_id, period, bucket) do update set calls = calls + excluded.calls, "
+                    "scams = scams + excluded.scams, duration_seconds = duration_seconds + excluded.duration_seconds",
+                    (week_cutoff,),
+                )
+                folded = conn.execute(
+                    "delete from call_rollups where period = 'week' and bucket < ?", (week_cutoff,)
+                ).rowcount
+                conn.execute("commit")
+            except Exception:
+                conn.execute("rollback")
+                raise
+            return dropped + folded
+
+        return await self._run(compact)
+
+    async def get_call_records(self, user_id, limit=100):
+        def query(conn: sqlite3.Connection):
+            cursor = conn.execute(
+                "select * from call_records where user_id = ? order by ended_at desc, id desc limit ?",
+                (user_id, limit),
+            )
+            return [{**dict(r), "was_scam": bool(r["was_scam"])} for r in cursor]
+
+        return await self._run(query)
+
+    async def fetch_call_records_page(self, user_id, since, until, after, limit):
+        def query(conn: sqlite3.Connection):
+            clauses, params = ["user_id = ?"], [user_id]
+            if since:
+                clauses.append("ended_at >= ?")
+                params.append(since)
+            if until:
+                clauses.append("ended_at < ?")
+                params.append(until)
+            if after:
+                clauses.append("(ended_at, id) > (?, ?)")
+                params.extend(after)
+            cursor = conn.execute(
+                f"select {', '.join(CALL_EXPORT_COLUMNS)} from call_records where {' and '.join(clauses)} "
+                "order by ended_at, id limit ?",
+                (*params, limit),
+            )
+            return [{**dict(r), "was_scam": bool(r["was_scam"])} for r in cursor]
+
+        return await self._run(query)
+
+    async def fetch_risk_timelines(self, since, until, after_id, limit):
+        def query(conn: sqlite3.Connection):
+            clauses, params = ["risk_timeline is not null"], []
+            if since:
+                clauses.append("ended_at >= ?")
+                params.append(since)
+            if until:
+                clauses.append("ended_at < ?")
+                params.append(until)
+            if after_id is not None:
+                clauses.append("id > ?")
+                params.append(after_id)
+            cursor = conn.execute(
+                f"select id, risk_timeline from call_records where {' and '.join(clauses)} order by id limit ?",
+                (*params, limit),
+            )
+            return [dict(r) for r in cursor]
+
+        return await self._run(query)
+
+    # ---------- wake word ----------
+
+    async def get_wake_word_model(self, user_id):
+        def query(conn: sqlite3.Connection):
+            row = conn.execute("select model from wake_word_models where user_id = ?", (user_id,)).fetchone()
+            return row["model"] if row else None
+
+        return await self._run(query)
+
+    async def save_wake_word_model(self, user_id, model):
+        def save(conn: sqlite3.Connection):
+            if model is None:
+                conn.execute("delete from wake_word_models where user_id = ?", (user_id,))
+            else:
+                conn.execute(
+                    "insert into wake_word_models (user_id, model, updated_at) values (?, ?, ?) "
+                    "on conflict (user_id) do update set model = excluded.model, updated_at = excluded.updated_at",
+                    (user_id, model, _now_iso()),
+                )
+
+        await self._run(save)
+
+    async def close(self):
+        def close(conn: sqlite3.Connection):
+            conn.close()
+
+        if self._conn is not None:
+            await self._run(close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
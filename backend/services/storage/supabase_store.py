@@ -0,0 +1,240 @@
+"""
+Supabase (hosted PostgreSQL) storage backend.
+
+All queries share one pooled AsyncClient per event loop and go through
+_execute(), which bounds in-flight requests with a semaphore and applies a
+timeout.
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+import httpx
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+from dotenv import load_dotenv
+
+from services.storage.base import Storage, SUSPICIOUS_NUMBER_COLUMNS, ANALYTICS_SKETCH_COLUMNS, CALL_EXPORT_COLUMNS
+
+load_dotenv()
+
+# Per-request timeout for database calls (seconds)
+QUERY_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+
+# Maximum concurrent database requests per worker (also the HTTP pool size)
+MAX_CONCURRENCY = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "20"))
+
+# Rows per `in` query, to keep request URLs short
+IN_QUERY_CHUNK = 200
+
+_NUMBER_COLUMNS = ", ".join(SUSPICIOUS_NUMBER_COLUMNS)
+_EXPORT_COLUMNS = ", ".join(CALL_EXPORT_COLUMNS)
+
+
+class SupabaseStorage(Storage):
+    """Storage backed by the hosted Supabase project (SUPABASE_URL / SUPABASE_SERVICE_KEY)."""
+
+    name = "supabase"
+
+    def __init__(self):
+        # Async client, bound to the event loop that created it
+        self._client: AsyncClient | None = None
+        self._client_loop: asyncio.AbstractEventLoop | None = None
+        self._client_lock: asyncio.Lock | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    async def get_client(self) -> AsyncClient:
+        """Get or create the async Supabase client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._client_loop is not loop:
+            # First use, or a different loop (e.g. a CLI job): start a fresh pool
+            self._client = None
+            self._client_loop = loop
+            self._client_lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    url = os.getenv("SUPABASE_URL")
+                    key = os.getenv("SUPABASE_SERVICE_KEY")  # Use service key for backend
+
+                    if not url or not key:
+                        raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set")
+
+                    http_client = httpx.AsyncClient(
+                        timeout=QUERY_TIMEOUT,
+                        limits=httpx.Limits(max_connections=MAX_CONCURRENCY, max_keepalive_connections=MAX_CONCURRENCY),
+                    )
+                    self._client = await acreate_client(url, key, options=AsyncClientOptions(
+                        postgrest_client_timeout=QUERY_TIMEOUT,
+                        httpx_client=http_client,
+                    ))
+
+        return self._client
+
+    async def _execute(self, query):
+        """Run a query builder with the concurrency limit and timeout applied."""
+        async with self._semaphore:
+            return await asyncio.wait_for(query.execute(), QUERY_TIMEOUT)
+
+    # ---------- suspicious numbers ----------
+
+    async def report_suspicious_numbers(self, counts: dict[str, int], half_life_seconds: float) -> None:
+        client = await self.get_client()
+        await self._execute(client.rpc("report_suspicious_numbers", {
+            "numbers": list(counts.keys()),
+            "counts": list(counts.values()),
+            "half_life_seconds": half_life_seconds,
+        }))
+
+    async def get_suspicious_numbers(self, phone_numbers: list[str]) -> list[dict]:
+        client = await self.get_client()
+        if len(phone_numbers) == 1:
+            query = client.table("suspicious_numbers").select(_NUMBER_COLUMNS).eq("phone_number", phone_numbers[0])
+            return (await self._execute(query)).data or []
+
+        results = await asyncio.gather(*(
+            self._execute(client.table("suspicious_numbers")
+                .select(_NUMBER_COLUMNS)
+                .in_("phone_number", phone_numbers[start:start + IN_QUERY_CHUNK]))
+            for start in range(0, len(phone_numbers), IN_QUERY_CHUNK)
+        ))
+        return [row for result in results for row in (result.data or [])]
+
+    async def fetch_suspicious_numbers_since(self, last_reported_at, after_phone_number, limit):
+        client = await self.get_client()
+
+        query = client.table("suspicious_numbers").select(_NUMBER_COLUMNS)
+        if last_reported_at:
+            query = query.or_(
+                f'last_reported_at.gt."{last_reported_at}",'
+                f'and(last_reported_at.eq."{last_reported_at}",phone_number.gt."{after_phone_number}")'
+            )
+
+        result = await self._execute(query
+            .order("last_reported_at")
+            .order("phone_number")
+            .limit(limit))
+        return result.data or []
+
+    async def recompute_reputation_scores(self, half_life_seconds, only_missing):
+        client = await self.get_client()
+        result = await self._execute(client.rpc("recompute_reputation_scores", {
+            "half_life_seconds": half_life_seconds,
+            "only_missing": only_missing,
+        }))
+        return result.data or 0
+
+    # ---------- user analytics ----------
+
+    async def get_user_analytics(self, user_id):
+        client = await self.get_client()
+        result = await self._execute(client.table("user_analytics")
+            .select("*")
+            .eq("id", user_id))
+        if result.data and len(result.data) > 0:
+            row = result.data[0]
+            for column in ANALYTICS_SKETCH_COLUMNS:
+                row.pop(column, None)
+            return row
+        return None
+
+    async def merge_scam_caller_sketches(self):
+        client = await self.get_client()
+        result = await self._execute(client.rpc("merge_scam_caller_sketches", {}))
+        return result.data or None
+
+    # ---------- call records ----------
+
+    async def record_call(self, record):
+        # The apply_call_record and apply_call_sketches triggers update
+        # user_analytics and call_rollups in the same transaction as the insert
+        client = await self.get_client()
+        if isinstance(record.get("risk_timeline"), (bytes, bytearray)):
+            # PostgREST takes bytea as a hex string
+            record = {**record, "risk_timeline": "\\x" + record["risk_timeline"].hex()}
+        await self._execute(client.table("call_records").insert(record))
+
+    async def get_call_rollups(self, user_id):
+        client = await self.get_client()
+        result = await self._execute(client.table("call_rollups")
+            .select("period, bucket, calls, scams, duration_seconds")
+            .eq("user_id", user_id))
+        return result.data or []
+
+    async def compact_call_rollups(self, daily_retention_days, weekly_retention_days):
+        client = await self.get_client()
+        result = await self._execute(client.rpc("compact_call_rollups", {
+            "daily_retention_days": daily_retention_days,
+            "weekly_retention_days": weekly_retention_days,
+        }))
+        return result.data or 0
+
+    async def get_call_records(self, user_id, limit=100):
+        client = await self.get_client()
+        result = await self._execute(client.table("call_records")
+            .select("*")
+            .eq("user_id", user_id)
+            .order("ended_at", desc=True)
+            .limit(limit))
+        return result.data or []
+
+    async def fetch_call_records_page(self, user_id, since, until, after, limit):
+        client = await self.get_client()
+
+        query = client.table("call_records").select(_EXPORT_COLUMNS).eq("user_id", user_id)
+        if since:
+            query = query.gte("ended_at", since)
+        if until:
+            query = query.lt("ended_at", until)
+        if after:
+            ended_at, record_id = after
+            query = query.or_(
+                f'ended_at.gt."{ended_at}",'
+                f'and(ended_at.eq."{ended_at}",id.gt.{int(record_id)})'
+            )
+
+        result = await self._execute(query
+            .order("ended_at")
+            .order("id")
+            .limit(limit))
+        return result.data or []
+
+    async def fetch_risk_timelines(self, since, until, after_id, limit):
+        client = await self.get_client()
+
+        query = client.table("call_records").select("id, risk_timeline").not_.is_("risk_timeline", "null")
+        if since:
+            query = query.gte("ended_at", since)
+        if until:
+            query = query.lt("ended_at", until)
+        if after_id is not None:
+            query = query.gt("id", after_id)
+
+        result = await self._execute(query.order("id").limit(limit))
+        return result.data or []
+
+    # ---------- wake word ----------
+
+    async def get_wake_word_model(self, user_id):
+        client = await self.get_client()
+        result = await self._execute(client.table("wake_word_models")
+            .select("model")
+            .eq("user_id", user_id))
+        # bytea comes back as a hex string; WakeWordModel.from_bytes() takes either
+        return result.data[0]["model"] if result.data else None
+
+    async def save_wake_word_model(self, user_id, model):
+        client = await self.get_client()
+        if model is None:
+            await self._execute(client.table("wake_word_models").delete().eq("user_id", user_id))
+            return
+        await self._execute(client.table("wake_word_models").upsert({
+            "user_id": user_id,
+            "model": "\\x" + model.hex(),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }))
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.postgrest.aclose()
+            self._client = None
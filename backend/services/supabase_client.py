@@ -1,38 +1,106 @@
 """
-Supabase client for database operations.
+Data-access layer for suspicious numbers, user analytics and call records.
+
+Persistence is delegated to the configured storage backend (Supabase by
+default, or embedded SQLite - see services.storage). All operations are async,
+so a database round-trip never blocks the event loop (and with it every live
+/ws/audio call on the worker).
+
+Code running on a LangGraph worker thread can't await; it uses the *_sync
+wrappers, which hand the coroutine to the app's event loop and wait for it.
 """
-import os
-from supabase import create_client, Client
-from dotenv import load_dotenv
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from services.analytics_cache import invalidate_user_analytics
+from services.call_rollups import rollups_to_stats
+from services.hyperloglog import HyperLogLog
+from services.phone_numbers import normalize_phone_number
+from services.reputation import HALF_LIFE_SECONDS
+from services.risk_timeline import TimelineStats
+from services.storage import get_storage
+from services.wake_spotter import WakeWordModel
+
+# Call records fetched per keyset page when exporting
+EXPORT_PAGE_SIZE = 500
+
+# Calls fetched per page when computing risk timeline statistics
+TIMELINE_PAGE_SIZE = 1000
 
-load_dotenv()
+# How long a sync wrapper waits for its coroutine (seconds)
+SYNC_WRAPPER_TIMEOUT = 30.0
 
-# Initialize Supabase client
-_supabase_client: Client = None
+# The app's event loop, used by the sync wrappers
+_app_loop: asyncio.AbstractEventLoop = None
 
 
-def get_supabase_client() -> Client:
-    """Get or create the Supabase client singleton."""
-    global _supabase_client
+def bind_event_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """Register the app's event loop for the sync wrappers (called at startup)."""
+    global _app_loop
+    _app_loop = loop
+
+
+def _run_sync(coro):
+    """Run a coroutine from a worker thread and wait for its result."""
+    if _app_loop is not None and _app_loop.is_running():
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is _app_loop:
+            coro.close()
+            raise RuntimeError("Sync database wrapper called from the event loop; await the async function instead")
+        return asyncio.run_coroutine_threadsafe(coro, _app_loop).result(SYNC_WRAPPER_TIMEOUT)
     
-    if _supabase_client is None:
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_SERVICE_KEY")  # Use service key for backend
-        
-        if not url or not key:
-            raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set")
+    # No app loop (scripts, CLI jobs): run on a private loop
+    return asyncio.run(coro)
+
+
+async def report_suspicious_numbers(counts: dict[str, int]) -> bool:
+    """
+    Atomically add report counts for one or more phone numbers.
+    
+    The storage backend upserts every number atomically (on Supabase, the
+    report_suspicious_numbers database function): new numbers are inserted and
+    existing ones have their report_count and decayed reputation_score
+    incremented in place, so concurrent reports never lose an update.
+    
+    Args:
+        counts: Mapping of phone number -> number of reports to add
         
-        _supabase_client = create_client(url, key)
+    Returns:
+        True if operation succeeded, False otherwise
+    """
+    normalized: dict[str, int] = {}
+    for number, n in counts.items():
+        e164 = normalize_phone_number(number)
+        if e164 and n > 0:
+            normalized[e164] = normalized.get(e164, 0) + n
+    counts = normalized
+    if not counts:
+        return True
     
-    return _supabase_client
+    try:
+        await get_storage().report_suspicious_numbers(counts, HALF_LIFE_SECONDS)
+        print(f"📊 Reported {sum(counts.values())} suspicious report(s) across {len(counts)} number(s)")
+        
+        # Write through to the local replica so lookups see the report immediately
+        from services.number_index import get_number_index
+        get_number_index().record_reports(counts)
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error reporting suspicious numbers: {e}")
+        return False
 
 
-def report_suspicious_number(phone_number: str) -> bool:
+async def report_suspicious_number(phone_number: str) -> bool:
     """
     Report a suspicious phone number to the database.
     
     If the number exists, increments report_count and updates last_reported_at.
     If the number doesn't exist, creates a new entry with report_count=1.
+    Both cases are a single atomic upsert (see report_suspicious_numbers).
     
     Args:
         phone_number: The phone number to report (E.164 format preferred)
@@ -44,84 +112,149 @@ def report_suspicious_number(phone_number: str) -> bool:
         print("WARNING: No phone number provided to report")
         return False
     
-    try:
-        client = get_supabase_client()
-        
-        # Check if the number already exists
-        existing = client.table("suspicious_numbers") \
-            .select("phone_number, report_count") \
-            .eq("phone_number", phone_number) \
-            .execute()
-        
-        if existing.data and len(existing.data) > 0:
-            # Number exists - increment report count and update timestamp
-            current_count = existing.data[0]["report_count"]
-            result = client.table("suspicious_numbers") \
-                .update({
-                    "report_count": current_count + 1,
-                    "last_reported_at": "now()"
-                }) \
-                .eq("phone_number", phone_number) \
-                .execute()
-            print(f"📊 Updated suspicious number {phone_number}: report_count = {current_count + 1}")
-        else:
-            # New number - insert with report_count=1
-            result = client.table("suspicious_numbers") \
-                .insert({
-                    "phone_number": phone_number,
-                    "report_count": 1,
-                    "last_reported_at": "now()",
-                    "created_at": "now()"
-                }) \
-                .execute()
-            print(f"📊 Added new suspicious number: {phone_number}")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error reporting suspicious number: {e}")
-        return False
+    return await report_suspicious_numbers({phone_number: 1})
+
 
+def report_suspicious_numbers_sync(counts: dict[str, int]) -> bool:
+    """Sync wrapper of report_suspicious_numbers for worker threads."""
+    return _run_sync(report_suspicious_numbers(counts))
 
-def check_suspicious_number(phone_number: str) -> dict:
+
+async def check_suspicious_number(phone_number: str) -> dict:
     """
     Check if a phone number exists in the suspicious_numbers database.
     
+    Served from the local replica (services.number_index) while it is within
+    its staleness bound; otherwise falls back to a live query. The number is
+    normalized to E.164 first, and reports on neighboring numbers in the same
+    exchange block are included to catch neighbor spoofing.
+    
     Args:
-        phone_number: The phone number to check (E.164 format preferred)
+        phone_number: The phone number to check, in any common format
         
     Returns:
-        {"found": True, "report_count": N} if found, {"found": False} if not
+        {"found": True, "report_count": N, "reputation_score": S, ...} if found,
+        {"found": False, ...} if not. Valid numbers also carry "phone_number"
+        (E.164), "neighborhood" and "risk_prior".
     """
+    phone_number = normalize_phone_number(phone_number)
     if not phone_number:
         return {"found": False}
     
-    try:
-        client = get_supabase_client()
-        
-        result = client.table("suspicious_numbers") \
-            .select("phone_number, report_count") \
-            .eq("phone_number", phone_number) \
-            .execute()
-        
-        if result.data and len(result.data) > 0:
-            return {
-                "found": True,
-                "report_count": result.data[0]["report_count"]
-            }
-        return {"found": False}
+    from services.number_index import get_number_index, caller_risk_prior
+    index = get_number_index()
+    
+    if index.is_fresh():
+        entry = index.lookup(phone_number)
+    else:
+        row = await _query_suspicious_number(phone_number)
+        if row:
+            index.apply([row])
+        entry = index.lookup(phone_number) if row else None
+    
+    result = {"found": False}
+    if entry:
+        result = {
+            "found": True,
+            "report_count": entry["report_count"],
+            "reputation_score": round(index.reputation_score(phone_number), 3),
+        }
+    result["phone_number"] = phone_number
+    result["neighborhood"] = index.neighborhood(phone_number)
+    result["risk_prior"] = caller_risk_prior(phone_number)
+    return result
+
+
+async def _query_suspicious_number(phone_number: str) -> dict | None:
+    """Live lookup of a single suspicious_numbers row."""
+    rows = await _query_suspicious_numbers([phone_number])
+    return rows[0] if rows else None
+
+
+async def check_suspicious_numbers(phone_numbers: list[str]):
+    """
+    Bulk version of check_suspicious_number for screening call logs and contact lists.
+    
+    Inputs are normalized and deduplicated. Lookups are served from the local
+    replica; if it is stale, all numbers are first refreshed with a few
+    chunked `in` queries instead of one query per number.
+    
+    Args:
+        phone_numbers: Phone numbers in any common format
         
+    Yields:
+        One result per distinct valid number - {"phone_number", "inputs", "found",
+        "report_count"?, "reputation_score"?, "risk_prior"} - then one
+        {"input", "error": "invalid_number"} per unparseable input.
+    """
+    from services.number_index import get_number_index, caller_risk_prior
+    index = get_number_index()
+    
+    inputs_by_number: dict[str, list[str]] = {}
+    invalid: list[str] = []
+    for raw in phone_numbers:
+        e164 = normalize_phone_number(raw)
+        if e164:
+            inputs_by_number.setdefault(e164, []).append(raw)
+        else:
+            invalid.append(raw)
+    
+    if not index.is_fresh() and inputs_by_number:
+        index.apply(await _query_suspicious_numbers(list(inputs_by_number)))
+    
+    for phone_number, inputs in inputs_by_number.items():
+        entry = index.lookup(phone_number)
+        result = {"phone_number": phone_number, "inputs": inputs, "found": entry is not None}
+        if entry:
+            result["report_count"] = entry["report_count"]
+            result["reputation_score"] = round(index.reputation_score(phone_number), 3)
+        result["risk_prior"] = caller_risk_prior(phone_number)
+        yield result
+    
+    for raw in invalid:
+        yield {"input": raw, "error": "invalid_number"}
+
+
+async def _query_suspicious_numbers(phone_numbers: list[str]) -> list[dict]:
+    """Live lookup of many suspicious_numbers rows."""
+    try:
+        return await get_storage().get_suspicious_numbers(phone_numbers)
     except Exception as e:
-        print(f"❌ Error checking suspicious number: {e}")
-        return {"found": False}
+        print(f"❌ Error checking suspicious numbers: {e}")
+        return []
+
+
+async def fetch_suspicious_numbers_since(
+    last_reported_at: str = None,
+    after_phone_number: str = None,
+    limit: int = 1000
+) -> list[dict]:
+    """
+    Fetch one page of suspicious_numbers rows changed after a watermark.
+    
+    Rows are ordered by (last_reported_at, phone_number) so the caller can page
+    with a keyset watermark without skipping rows that share a timestamp.
+    
+    Args:
+        last_reported_at: Watermark timestamp (None for a full load)
+        after_phone_number: Tie-breaker for rows at exactly last_reported_at
+        limit: Maximum rows to return
+        
+    Returns:
+        List of suspicious_numbers rows (counts, timestamps and reputation)
+    """
+    return await get_storage().fetch_suspicious_numbers_since(last_reported_at, after_phone_number, limit)
 
 
 # ============== ANALYTICS FUNCTIONS ==============
 
-def get_user_analytics(user_id: str) -> dict:
+async def get_user_analytics(user_id: str) -> dict:
     """
     Get analytics data for a user.
     
+    Counters come from the user_analytics row; daily_stats, weekly_stats and
+    monthly_stats are assembled from the call_rollups buckets.
+    
     Args:
         user_id: The user's UUID
         
@@ -132,32 +265,36 @@ def get_user_analytics(user_id: str) -> dict:
         return None
     
     try:
-        client = get_supabase_client()
-        result = client.table("user_analytics") \
-            .select("*") \
-            .eq("id", user_id) \
-            .execute()
-        
-        if result.data and len(result.data) > 0:
-            return result.data[0]
-        return None
+        storage = get_storage()
+        analytics, rollups = await asyncio.gather(
+            storage.get_user_analytics(user_id),
+            storage.get_call_rollups(user_id),
+        )
+        if not analytics:
+            return None
+        return {**analytics, **rollups_to_stats(rollups)}
         
     except Exception as e:
         print(f"❌ Error getting user analytics: {e}")
         return None
 
 
-def update_call_analytics(
+async def update_call_analytics(
     user_id: str,
     call_duration_seconds: int = 0,
     final_risk_score: int = 0,
     caller_phone_number: str = None,
     was_scam: bool = False,
     questions_generated: int = 0,
-    alerts_sent: int = 0
+    alerts_sent: int = 0,
+    session_id: str = None,
+    risk_timeline: bytes = None,
+    ended_at: float = None
 ) -> bool:
     """
-    Update analytics after a call ends. Purely additive - increments counters.
+    Record a finished call. Appends one event to call_records; the storage
+    backend folds it into the analytics counters and daily/weekly rollups in
+    the same transaction, so this is a single constant-cost write.
     
     Args:
         user_id: The user's UUID
@@ -167,6 +304,9 @@ def update_call_analytics(
         was_scam: Whether this was classified as a scam (risk >= 80)
         questions_generated: Number of verification questions generated during call
         alerts_sent: Number of alerts sent during call
+        session_id: The call's session id, if any
+        risk_timeline: Packed RiskTimeline samples for the call, if recorded
+        ended_at: Epoch seconds the call ended (defaults to now)
         
     Returns:
         True if update succeeded, False otherwise
@@ -175,115 +315,147 @@ def update_call_analytics(
         print("WARNING: No user_id provided for analytics update")
         return False
     
+    caller_phone_number = normalize_phone_number(caller_phone_number)
+    
     try:
-        client = get_supabase_client()
-        
-        # Get current analytics
-        current = get_user_analytics(user_id)
-        
-        if not current:
-            # Create new analytics row if doesn't exist
-            from datetime import datetime
-            now = datetime.utcnow().isoformat()
-            client.table("user_analytics").insert({
-                "id": user_id,
-                "total_calls": 1,
-                "total_call_duration_seconds": call_duration_seconds,
-                "total_scam_calls": 1 if was_scam else 0,
-                "total_suspicious_calls": 1 if 50 <= final_risk_score < 80 else 0,
-                "total_safe_calls": 1 if final_risk_score < 50 else 0,
-                "total_alerts_sent": alerts_sent,
-                "total_questions_generated": questions_generated,
-                "high_risk_calls": 1 if final_risk_score >= 80 else 0,
-                "medium_risk_calls": 1 if 50 <= final_risk_score < 80 else 0,
-                "low_risk_calls": 1 if final_risk_score < 50 else 0,
-                "unique_callers_count": 1 if caller_phone_number else 0,
-                "recent_callers": [{"phone": caller_phone_number, "last_call": now, "risk": final_risk_score}] if caller_phone_number else [],
-                "first_call_at": now,
-                "last_call_at": now,
-                "last_scam_detected_at": now if was_scam else None,
-                "weekly_stats": {},
-                "daily_stats": {},
-            }).execute()
-            print(f"📊 Created analytics for user {user_id}")
-            return True
+        ended_at = datetime.fromtimestamp(ended_at, timezone.utc) if ended_at else datetime.now(timezone.utc)
+        await get_storage().record_call({
+            "user_id": user_id,
+            "session_id": session_id,
+            "started_at": (ended_at - timedelta(seconds=call_duration_seconds)).isoformat(timespec="microseconds"),
+            "ended_at": ended_at.isoformat(timespec="microseconds"),
+            "duration_seconds": call_duration_seconds,
+            "final_risk_score": final_risk_score,
+            "caller_phone_number": caller_phone_number,
+            "was_scam": was_scam,
+            "questions_generated": questions_generated,
+            "alerts_sent": alerts_sent,
+            "risk_timeline": risk_timeline,
+        })
+        invalidate_user_analytics(user_id)
         
-        # Build update data - increment counters
-        from datetime import datetime
-        import json
-        
-        now = datetime.utcnow().isoformat()
-        today = datetime.utcnow().strftime("%Y-%m-%d")
-        week = datetime.utcnow().strftime("%Y-W%W")
-        
-        # Update weekly stats
-        weekly_stats = current.get("weekly_stats") or {}
-        if week not in weekly_stats:
-            weekly_stats[week] = {"calls": 0, "scams": 0, "duration": 0}
-        weekly_stats[week]["calls"] += 1
-        weekly_stats[week]["duration"] += call_duration_seconds
-        if was_scam:
-            weekly_stats[week]["scams"] += 1
+        print(f"📊 Updated analytics for user {user_id}: +1 call, duration={call_duration_seconds}s, risk={final_risk_score}")
+        return True
         
-        # Update daily stats
-        daily_stats = current.get("daily_stats") or {}
-        if today not in daily_stats:
-            daily_stats[today] = {"calls": 0, "scams": 0}
-        daily_stats[today]["calls"] += 1
-        if was_scam:
-            daily_stats[today]["scams"] += 1
+    except Exception as e:
+        print(f"❌ Error updating call analytics: {e}")
+        return False
+
+
+async def iter_call_records(user_id: str, since: str = None, until: str = None, page_size: int = EXPORT_PAGE_SIZE):
+    """
+    Stream a user's call records oldest first, one keyset page at a time.
+    
+    Memory use is bounded by page_size however long the history is.
+    
+    Args:
+        user_id: The user's UUID
+        since: Only calls that ended at or after this ISO timestamp
+        until: Only calls that ended before this ISO timestamp
+        page_size: Rows per database round-trip
         
-        # Update recent callers (keep last 10)
-        recent_callers = current.get("recent_callers") or []
-        if caller_phone_number:
-            # Check if this caller already exists
-            existing_idx = next((i for i, c in enumerate(recent_callers) if c.get("phone") == caller_phone_number), None)
-            if existing_idx is not None:
-                recent_callers.pop(existing_idx)
-            recent_callers.insert(0, {"phone": caller_phone_number, "last_call": now, "risk": final_risk_score})
-            recent_callers = recent_callers[:10]  # Keep only last 10
+    Yields:
+        Lists of call record dicts (one list per page)
+    """
+    storage = get_storage()
+    after = None
+    while True:
+        page = await storage.fetch_call_records_page(user_id, since, until, after, page_size)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        after = (page[-1]["ended_at"], page[-1]["id"])
+
+
+async def get_risk_timeline_stats(
+    risk_threshold: int,
+    confidence_threshold: int,
+    since: str = None,
+    until: str = None,
+    max_calls: int = 10000,
+) -> dict:
+    """
+    Fleet-wide statistics over recorded per-call risk timelines.
+    
+    Args:
+        risk_threshold: Risk that counts as high
+        confidence_threshold: Confidence that counts as confident
+        since: Only calls that ended at or after this ISO timestamp
+        until: Only calls that ended before this ISO timestamp
+        max_calls: Stop after this many calls
         
-        # Count unique callers
-        unique_phones = set()
-        for caller in recent_callers:
-            if caller.get("phone"):
-                unique_phones.add(caller["phone"])
+    Returns:
+        TimelineStats.result() dict, or None on error
+    """
+    stats = TimelineStats(risk_threshold, confidence_threshold)
+    storage = get_storage()
+    after_id = None
+    remaining = max_calls
+    
+    try:
+        while remaining > 0:
+            page = await storage.fetch_risk_timelines(since, until, after_id, min(TIMELINE_PAGE_SIZE, remaining))
+            if not page:
+                break
+            # numpy work for a page runs off the event loop
+            await asyncio.to_thread(lambda: [stats.add(row["risk_timeline"]) for row in page])
+            remaining -= len(page)
+            after_id = page[-1]["id"]
+        return stats.result()
         
-        update_data = {
-            "total_calls": (current.get("total_calls") or 0) + 1,
-            "total_call_duration_seconds": (current.get("total_call_duration_seconds") or 0) + call_duration_seconds,
-            "total_scam_calls": (current.get("total_scam_calls") or 0) + (1 if was_scam else 0),
-            "total_suspicious_calls": (current.get("total_suspicious_calls") or 0) + (1 if 50 <= final_risk_score < 80 else 0),
-            "total_safe_calls": (current.get("total_safe_calls") or 0) + (1 if final_risk_score < 50 else 0),
-            "total_alerts_sent": (current.get("total_alerts_sent") or 0) + alerts_sent,
-            "total_questions_generated": (current.get("total_questions_generated") or 0) + questions_generated,
-            "high_risk_calls": (current.get("high_risk_calls") or 0) + (1 if final_risk_score >= 80 else 0),
-            "medium_risk_calls": (current.get("medium_risk_calls") or 0) + (1 if 50 <= final_risk_score < 80 else 0),
-            "low_risk_calls": (current.get("low_risk_calls") or 0) + (1 if final_risk_score < 50 else 0),
-            "unique_callers_count": len(unique_phones),
-            "recent_callers": recent_callers,
-            "weekly_stats": weekly_stats,
-            "daily_stats": daily_stats,
-            "last_call_at": now,
+    except Exception as e:
+        print(f"❌ Error computing risk timeline stats: {e}")
+        return None
+
+
+async def get_fleet_analytics() -> dict:
+    """
+    Fleet-wide statistics merged from every user's HyperLogLog sketches.
+    
+    Returns:
+        Dict with the estimated number of distinct scam numbers seen across
+        all users and the estimate's relative standard error
+    """
+    try:
+        merged = await get_storage().merge_scam_caller_sketches()
+        sketch = HyperLogLog.from_bytes(merged) if merged else HyperLogLog()
+        return {
+            "unique_scam_numbers": sketch.count(),
+            "relative_error": round(sketch.standard_error, 4),
         }
         
-        if was_scam:
-            update_data["last_scam_detected_at"] = now
-        
-        client.table("user_analytics") \
-            .update(update_data) \
-            .eq("id", user_id) \
-            .execute()
-        
-        print(f"📊 Updated analytics for user {user_id}: +1 call, duration={call_duration_seconds}s, risk={final_risk_score}")
-        return True
+    except Exception as e:
+        print(f"❌ Error getting fleet analytics: {e}")
+        return None
+
+
+async def get_wake_word_model(user_id: str) -> WakeWordModel | None:
+    """
+    Load a user's enrolled wake word templates.
+    
+    Returns:
+        WakeWordModel, or None if the user hasn't enrolled (or the lookup failed)
+    """
+    if not user_id:
+        return None
+    
+    try:
+        data = await get_storage().get_wake_word_model(user_id)
+        return WakeWordModel.from_bytes(data) if data else None
         
     except Exception as e:
-        print(f"❌ Error updating call analytics: {e}")
-        return False
+        print(f"❌ Error loading wake word model: {e}")
+        return None
+
+
+async def save_wake_word_model(user_id: str, model: WakeWordModel | None) -> None:
+    """Store a user's wake word templates (None removes them)."""
+    await get_storage().save_wake_word_model(user_id, model.to_bytes() if model else None)
 
 
-def export_analytics_data(user_id: str) -> dict:
+async def export_analytics_data(user_id: str) -> dict:
     """
     Export all analytics data for a user in a format suitable for sharing.
     
@@ -293,10 +465,18 @@ def export_analytics_data(user_id: str) -> dict:
     Returns:
         Dict with formatted analytics data for export/sharing
     """
-    analytics = get_user_analytics(user_id)
+    analytics = await get_user_analytics(user_id)
     if not analytics:
         return None
     
+    return build_analytics_export(analytics)
+
+
+def build_analytics_export(analytics: dict) -> dict:
+    """
+    Derive the shareable export (summary, risk breakdown, activity) from an
+    analytics row as returned by get_user_analytics().
+    """
     # Calculate some derived metrics
     total_calls = analytics.get("total_calls") or 0
     total_duration = analytics.get("total_call_duration_seconds") or 0
@@ -326,6 +506,6 @@ def export_analytics_data(user_id: str) -> dict:
         },
         "weekly_activity": analytics.get("weekly_stats") or {},
         "recent_callers": analytics.get("recent_callers") or [],
-        "exported_at": __import__("datetime").datetime.utcnow().isoformat(),
+        "exported_at": datetime.utcnow().isoformat(),
     }
 
@@ -0,0 +1,310 @@
+"""
+Pre-warmed Deepgram connections and wakeword-to-call handoff.
+
+Opening a Deepgram socket costs a TLS handshake plus the upgrade, which is
+the first thing a call (or a reconnect) waits for. Each worker keeps up to
+POOL_SIZE idle connections open per audio format (encoding and sample
+rate) it has served, and
+TranscriptionPool.connect() hands one out instead of dialing. Deepgram closes
+a socket that gets no audio for ~10 seconds, so idle connections are sent a
+KeepAlive every KEEPALIVE_SECONDS and recycled after POOL_MAX_IDLE_SECONDS.
+A pooled connection is used for one stream only and closed afterwards
+(Deepgram timestamps and endpointing state are per socket).
+
+Handoff: when /ws/wakeword hears "kova activate" it doesn't close its
+connection. It parks it under a one-time token sent to the client, and
+/ws/audio?handoff=<token> adopts it, so protection starts on a socket that
+is already open. Parked connections are kept alive too and closed if nobody
+claims them within HANDOFF_TTL_SECONDS. Tokens only work on the worker that
+issued them; anywhere else /ws/audio falls back to the pool.
+"""
+import asyncio
+import os
+import secrets
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from services.audio_encoding import LINEAR16, OPUS_SAMPLE_RATE
+from services.deepgram_client import create_live_connection
+
+# Idle connections kept per audio format (0 disables the pool)
+POOL_SIZE = int(os.getenv("DEEPGRAM_POOL_SIZE", "2"))
+
+# Sample rate warmed at startup (the browser default)
+DEFAULT_SAMPLE_RATE = int(os.getenv("DEEPGRAM_POOL_SAMPLE_RATE", "48000"))
+
+# Encodings warmed at startup (calls stream Opus, wakeword confirmation linear16)
+DEFAULT_ENCODINGS = os.getenv("DEEPGRAM_POOL_ENCODINGS", "linear16,opus").split(",")
+
+# KeepAlive interval for idle and parked connections (Deepgram times out at ~10s)
+KEEPALIVE_SECONDS = float(os.getenv("DEEPGRAM_KEEPALIVE_SECONDS", "4"))
+
+# Idle connections older than this are replaced with fresh ones
+POOL_MAX_IDLE_SECONDS = float(os.getenv("DEEPGRAM_POOL_MAX_IDLE_SECONDS", "120"))
+
+# How long a parked wakeword connection waits for /ws/audio
+HANDOFF_TTL_SECONDS = float(os.getenv("DEEPGRAM_HANDOFF_TTL_SECONDS", "15"))
+
+
+class _Warm:
+    """An open, unused connection and the context manager that owns it."""
+
+    __slots__ = ("context", "connection", "opened_at")
+
+    def __init__(self, context, connection, opened_at: float):
+        self.context = context
+        self.connection = connection
+        self.opened_at = opened_at
+
+
+class _Parked:
+    """A wakeword transcription waiting to be adopted by /ws/audio."""
+
+    __slots__ = ("transcription", "audio_format", "expiry")
+
+    def __init__(self, transcription, audio_format: tuple, expiry: asyncio.TimerHandle):
+        self.transcription = transcription
+        self.audio_format = audio_format
+        self.expiry = expiry
+
+
+def _audio_format(sample_rate: int, encoding: str) -> tuple[int, str]:
+    """Pool key: containerized audio carries its own rate, so only linear16 is split by it."""
+    return (sample_rate if encoding == LINEAR16 else OPUS_SAMPLE_RATE), encoding
+
+
+class TranscriptionPool:
+    """Per-worker pool of open Deepgram connections, plus parked handoffs."""
+
+    def __init__(
+        self,
+        size: int = POOL_SIZE,
+        connect=create_live_connection,
+        keepalive_interval: float = KEEPALIVE_SECONDS,
+        max_idle: float = POOL_MAX_IDLE_SECONDS,
+        handoff_ttl: float = HANDOFF_TTL_SECONDS,
+    ):
+        """
+        Args:
+            size: Idle connections kept per audio format
+            connect: Async context manager factory connect(sample_rate, encoding) -> socket
+            keepalive_interval: Seconds between KeepAlives on idle connections
+            max_idle: Seconds before an idle connection is recycled
+            handoff_ttl: Seconds a parked handoff waits to be claimed
+        """
+        self.size = size
+        self.keepalive_interval = keepalive_interval
+        self.max_idle = max_idle
+        self.handoff_ttl = handoff_ttl
+        self._connect = connect
+        self._idle: dict[tuple[int, str], deque[_Warm]] = {}
+        self._opening: dict[tuple[int, str], int] = {}
+        self._parked: dict[str, _Parked] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._closed = False
+
+        self.hits = 0
+        self.misses = 0
+        self.opened = 0
+        self.open_failures = 0
+        self.recycled = 0
+        self.keepalive_failures = 0
+        self.handoffs_parked = 0
+        self.handoffs_claimed = 0
+        self.handoffs_expired = 0
+
+    # ---------- pool ----------
+
+    @asynccontextmanager
+    async def connect(self, sample_rate: int = DEFAULT_SAMPLE_RATE, encoding: str = LINEAR16):
+        """
+        Drop-in for create_live_connection(): yields a warm connection if one
+        is idle, otherwise dials a new one. Either way it is closed on exit and
+        a replacement is opened in the background.
+
+        Yields:
+            AsyncV1SocketClient
+        """
+        warm = self._take(sample_rate, encoding)
+        self._refill(sample_rate, encoding)
+        if warm is None:
+            self.misses += 1
+            async with self._connect(*_audio_format(sample_rate, encoding)) as connection:
+                yield connection
+            return
+
+        self.hits += 1
+        try:
+            yield warm.connection
+        finally:
+            await self._discard(warm)
+
+    async def run(self) -> None:
+        """Warm the default formats, then keep idle connections alive until cancelled."""
+        for encoding in DEFAULT_ENCODINGS:
+            self._refill(DEFAULT_SAMPLE_RATE, encoding.strip())
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            await self.maintain()
+
+    async def maintain(self) -> None:
+        """One keep-alive pass: ping, recycle stale connections and top up."""
+        loop = asyncio.get_running_loop()
+        for audio_format, idle in list(self._idle.items()):
+            for warm in list(idle):
+                stale = loop.time() - warm.opened_at > self.max_idle
+                if not stale and await self._keep_alive(warm.connection):
+                    continue
+                if warm in idle:
+                    idle.remove(warm)
+                    if stale:
+                        self.recycled += 1
+                    await self._discard(warm)
+            self._refill(*audio_format)
+
+        for parked in list(self._parked.values()):
+            await parked.transcription.keep_alive()
+
+    async def close(self) -> None:
+        """Close every idle and parked connection (worker shutdown)."""
+        self._closed = True
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for idle in self._idle.values():
+            while idle:
+                await self._discard(idle.popleft())
+        for token in list(self._parked):
+            parked = self._parked.pop(token)
+            parked.expiry.cancel()
+            await parked.transcription.close()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            # linear16 by sample rate, containers by encoding
+            "idle": {
+                rate if encoding == LINEAR16 else encoding: len(idle)
+                for (rate, encoding), idle in self._idle.items()
+            },
+            "hits": self.hits,
+            "misses": self.misses,
+            "opened": self.opened,
+            "open_failures": self.open_failures,
+            "recycled": self.recycled,
+            "keepalive_failures": self.keepalive_failures,
+            "handoffs_waiting": len(self._parked),
+            "handoffs_parked": self.handoffs_parked,
+            "handoffs_claimed": self.handoffs_claimed,
+            "handoffs_expired": self.handoffs_expired,
+        }
+
+    def _take(self, sample_rate: int, encoding: str = LINEAR16) -> Optional[_Warm]:
+        idle = self._idle.setdefault(_audio_format(sample_rate, encoding), deque())
+        return idle.popleft() if idle else None
+
+    def _refill(self, sample_rate: int, encoding: str = LINEAR16) -> None:
+        """Start opening connections until `size` are idle or on the way."""
+        if self._closed:
+            return
+        audio_format = _audio_format(sample_rate, encoding)
+        idle = self._idle.setdefault(audio_format, deque())
+        missing = self.size - len(idle) - self._opening.get(audio_format, 0)
+        for _ in range(max(missing, 0)):
+            self._opening[audio_format] = self._opening.get(audio_format, 0) + 1
+            task = asyncio.create_task(self._open(audio_format))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _open(self, audio_format: tuple[int, str]) -> None:
+        sample_rate, encoding = audio_format
+        context = self._connect(sample_rate, encoding)
+        try:
+            connection = await context.__aenter__()
+        except Exception as e:
+            # The next maintain() pass tries again
+            self.open_failures += 1
+            print(f"[DGPool] Warming a {encoding} {sample_rate} Hz connection failed: {e}")
+            return
+        finally:
+            self._opening[audio_format] -= 1
+
+        warm = _Warm(context, connection, asyncio.get_running_loop().time())
+        self.opened += 1
+        if self._closed:
+            await self._discard(warm)
+        else:
+            self._idle.setdefault(audio_format, deque()).append(warm)
+
+    async def _keep_alive(self, connection) -> bool:
+        try:
+            await connection.send_keep_alive()
+            return True
+        except Exception as e:
+            self.keepalive_failures += 1
+            print(f"[DGPool] KeepAlive failed, dropping connection: {e}")
+            return False
+
+    @staticmethod
+    async def _discard(warm: _Warm) -> None:
+        try:
+            await warm.context.__aexit__(None, None, None)
+        except Exception as e:
+            print(f"[DGPool] Error closing connection: {e}")
+
+    # ---------- handoff ----------
+
+    def park(self, transcription, sample_rate: int, encoding: str = LINEAR16) -> str:
+        """
+        Keep an open transcription for a later claim().
+
+        Args:
+            transcription: An open SupervisedTranscription nobody is reading from
+            sample_rate: Sample rate of its audio
+            encoding: Encoding of its audio
+
+        Returns:
+            One-time handoff token
+        """
+        token = secrets.token_urlsafe(16)
+        expiry = asyncio.get_running_loop().call_later(self.handoff_ttl, self._expire, token)
+        self._parked[token] = _Parked(transcription, _audio_format(sample_rate, encoding), expiry)
+        self.handoffs_parked += 1
+        return token
+
+    def claim(self, token: Optional[str], sample_rate: int, encoding: str = LINEAR16):
+        """
+        Take a parked transcription. Returns None if the token is unknown
+        (expired, already used, or issued by another worker) or the audio
+        format differs.
+        """
+        parked = self._parked.get(token) if token else None
+        if parked is None or parked.audio_format != _audio_format(sample_rate, encoding):
+            return None
+        del self._parked[token]
+        parked.expiry.cancel()
+        self.handoffs_claimed += 1
+        return parked.transcription
+
+    def _expire(self, token: str) -> None:
+        parked = self._parked.pop(token, None)
+        if parked is None:
+            return
+        self.handoffs_expired += 1
+        print("[DGPool] Handoff expired unclaimed")
+        task = asyncio.create_task(parked.transcription.close())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+# Singleton pool for this worker
+_pool: TranscriptionPool | None = None
+
+
+def get_transcription_pool() -> TranscriptionPool:
+    """Get or create this worker's transcription pool."""
+    global _pool
+    if _pool is None:
+        _pool = TranscriptionPool()
+    return _pool
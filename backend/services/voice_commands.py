@@ -0,0 +1,296 @@
+"""
+Voice commands ("kova activate", "kova stop", ...) spotted in live transcripts.
+
+"kova" isn't a real word, so Deepgram spells it many ways. Rather than
+scanning the transcript for syllables (which also fired on "cover the
+vase, stop"), every command phrase is compiled into a trie of phonetic keys
+(a simplified Metaphone: "kova", "cova" and "kovah" all key to "KF") with
+the known spellings of "kova" as alternatives. Words must follow each other,
+so unrelated words in between break the match; filler words ("um") don't.
+
+A CommandMatcher follows one transcript stream. Interim results repeat and
+revise the utterance so far; the matcher only steps the trie over tokens
+that changed since the last message, and keeps its partial matches across
+a final result so a command split over two results still fires. Each
+command fires once per occurrence.
+
+Per-command stats: a trigger that fired on an interim result but is not in
+the final transcript is counted as retracted (a false trigger).
+"""
+import itertools
+import re
+from functools import lru_cache
+from typing import Optional
+
+# Spellings of "kova" seen from Deepgram (multi-word entries are consecutive tokens)
+KOVA_SPELLINGS = ("kova", "cova", "kovah", "koba", "cover", "cobra", "covid", "co va", "ko va")
+
+# Words that may appear inside a command without breaking it
+FILLER_WORDS = frozenset({"um", "uh", "uhm", "er", "erm", "ah", "hmm", "mm"})
+
+# Built-in commands
+ACTIVATE_COMMAND = "activate"
+STOP_COMMAND = "stop"
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+_VOWELS = frozenset("aeiou")
+
+
+@lru_cache(maxsize=8192)
+def phonetic_key(word: str) -> str:
+    """
+    Simplified Metaphone key of one word: consonant sounds only, similar
+    sounding letters merged ("kova" -> "KF", "activate" -> "AKTFT").
+    """
+    w = re.sub(r"[^a-z0-9]", "", word.lower())
+    if not w or w.isdigit():
+        return w
+    if w[:2] in ("kn", "gn", "pn", "wr"):
+        w = w[1:]
+    elif w[0] == "x":
+        w = "s" + w[1:]
+
+    out = []
+    i, n = 0, len(w)
+    while i < n:
+        c = w[i]
+        prev = w[i - 1] if i else ""
+        nxt = w[i + 1] if i + 1 < n else ""
+        after = w[i + 2] if i + 2 < n else ""
+        code = ""
+        if c == prev and c != "c":
+            i += 1
+            continue
+        if c in _VOWELS:
+            code = "A" if i == 0 else ""
+        elif c == "b":
+            code = "" if prev == "m" and i == n - 1 else "B"
+        elif c == "c":
+            if nxt == "h":
+                code, i = "X", i + 1
+            elif nxt and nxt in "iey":
+                code = "S"
+            else:
+                code = "K"
+        elif c == "d":
+            code = "J" if nxt == "g" and after and after in "eiy" else "T"
+        elif c == "g":
+            if nxt == "h" and after not in _VOWELS:
+                code = ""
+            else:
+                code = "J" if nxt and nxt in "eiy" else "K"
+        elif c == "h":
+            code = "H" if nxt in _VOWELS and prev not in ("c", "g", "p", "s", "t") else ""
+        elif c == "k":
+            code = "" if prev == "c" else "K"
+        elif c == "p":
+            if nxt == "h":
+                code, i = "F", i + 1
+            else:
+                code = "P"
+        elif c == "q":
+            code = "K"
+        elif c in ("s", "t"):
+            if nxt == "h":
+                code, i = ("X" if c == "s" else "0"), i + 1
+            elif nxt == "i" and after in ("o", "a"):
+                code = "X"
+            else:
+                code = c.upper()
+        elif c == "v":
+            code = "F"
+        elif c in ("w", "y"):
+            code = c.upper() if nxt in _VOWELS else ""
+        elif c == "x":
+            code = "KS"
+        elif c == "z":
+            code = "S"
+        else:
+            code = c.upper()
+        if code and not (out and out[-1] == code):
+            out.append(code)
+        i += 1
+    return "".join(out)
+
+
+def transcript_keys(transcript: str) -> list[str]:
+    """Phonetic keys of a transcript's words, without filler words."""
+    keys = []
+    for token in _TOKEN.findall(transcript.lower()):
+        token = token.replace("'", "")
+        if token and token not in FILLER_WORDS:
+            key = phonetic_key(token)
+            if key:
+                keys.append(key)
+    return keys
+
+
+class _Node:
+    __slots__ = ("children", "commands")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.commands: list[str] = []
+
+
+class CommandStats:
+    """How often a command fired, and how often the final transcript disagreed."""
+
+    __slots__ = ("triggers", "confirmed", "retracted")
+
+    def __init__(self):
+        self.triggers = 0
+        self.confirmed = 0
+        self.retracted = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "triggers": self.triggers,
+            "confirmed": self.confirmed,
+            "retracted": self.retracted,
+            "false_trigger_rate": round(self.retracted / self.triggers, 4) if self.triggers else 0.0,
+        }
+
+
+class CommandEngine:
+    """Compiled set of voice commands, shared by every stream's CommandMatcher."""
+
+    def __init__(self, spellings: Optional[dict[str, tuple[str, ...]]] = None):
+        """
+        Args:
+            spellings: word -> alternative spellings to accept for it
+                (default: KOVA_SPELLINGS for "kova")
+        """
+        self.spellings = spellings if spellings is not None else {"kova": KOVA_SPELLINGS}
+        self._root = _Node()
+        self._stats: dict[str, CommandStats] = {}
+
+    def register(self, name: str, *phrases: str) -> None:
+        """
+        Add a command. Registering the same name again adds more phrases.
+
+        Args:
+            name: Reported when any of the phrases is spoken
+            phrases: e.g. "kova call my son"
+        """
+        for phrase in phrases:
+            alternatives = [self.spellings.get(word, (word,)) for word in phrase.lower().split()]
+            for spelling in itertools.product(*alternatives):
+                keys = transcript_keys(" ".join(spelling))
+                if not keys:
+                    continue
+                node = self._root
+                for key in keys:
+                    node = node.children.setdefault(key, _Node())
+                if name not in node.commands:
+                    node.commands.append(name)
+        self._stats.setdefault(name, CommandStats())
+
+    def lookup(self, phrase: str) -> Optional[str]:
+        """The command a phrase says exactly, if any."""
+        node = self._root
+        for key in transcript_keys(phrase):
+            node = node.children.get(key)
+            if node is None:
+                return None
+        return node.commands[0] if node.commands else None
+
+    def matcher(self) -> "CommandMatcher":
+        return CommandMatcher(self)
+
+    def stats(self) -> dict:
+        return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+
+class CommandMatcher:
+    """Incremental command matching over one stream of interim and final transcripts."""
+
+    def __init__(self, engine: CommandEngine):
+        self.engine = engine
+        self._keys: list[str] = []  # Keys of the current (unfinalized) result consumed so far
+        self._states: list[tuple] = [()]  # _states[i]: partial matches after i keys (0 = carried over)
+        self._found: list[list[str]] = [[]]  # _found[i]: commands completed by key i
+        self._fired: set[tuple[str, int]] = set()  # (command, position) already reported
+
+    def feed(self, transcript: str, is_final: bool = True) -> list[str]:
+        """
+        Process one Deepgram result.
+
+        Args:
+            transcript: The result's full text (interim results repeat earlier words)
+            is_final: Whether Deepgram will not revise this text any more
+
+        Returns:
+            Commands that newly fired
+        """
+        keys = transcript_keys(transcript)
+        common = len(self._keys)
+        if keys[:common] != self._keys:
+            # Deepgram revised earlier words: rewind to what still agrees
+            common = 0
+            for old, new in zip(self._keys, keys):
+                if old != new:
+                    break
+                common += 1
+            del self._keys[common:]
+            del self._states[common + 1:]
+            del self._found[common + 1:]
+
+        fired = []
+        root = self.engine._root
+        states = self._states[-1]
+        for key in keys[common:]:
+            advanced = []
+            for node in (*states, root):
+                child = node.children.get(key)
+                if child is not None:
+                    advanced.append(child)
+            states = tuple(advanced)
+            position = len(self._keys) + 1
+            completed = [name for node in states for name in node.commands]
+            self._keys.append(key)
+            self._states.append(states)
+            self._found.append(completed)
+            for name in completed:
+                if (name, position) not in self._fired:
+                    self._fired.add((name, position))
+                    self.engine._stats[name].triggers += 1
+                    fired.append(name)
+
+        if is_final:
+            self._finish()
+        return fired
+
+    def _finish(self) -> None:
+        """Settle the stats for this result and carry partial matches into the next."""
+        present = {(name, position) for position, names in enumerate(self._found) for name in names}
+        for name, position in self._fired:
+            stats = self.engine._stats[name]
+            if (name, position) in present:
+                stats.confirmed += 1
+            else:
+                stats.retracted += 1
+        self._states = [self._states[-1]]
+        self._keys = []
+        self._found = [[]]
+        self._fired = set()
+
+
+def create_command_engine() -> CommandEngine:
+    """An engine with the built-in commands registered."""
+    engine = CommandEngine()
+    engine.register(ACTIVATE_COMMAND, "kova activate")
+    engine.register(STOP_COMMAND, "kova stop")
+    return engine
+
+
+# Singleton engine shared by every stream in this worker
+_engine: CommandEngine | None = None
+
+
+def get_command_engine() -> CommandEngine:
+    """Get or create the worker's command engine."""
+    global _engine
+    if _engine is None:
+        _engine = create_command_engine()
+    return _engine
@@ -0,0 +1,414 @@
+"""
+On-server wake word spotting, so idle microphones don't stream to Deepgram.
+
+/ws/wakeword used to send every second of an idle app's microphone to
+Deepgram. WakeWordSpotter now listens locally and only opens the Deepgram
+path (which still has the final say, see routers/wakeword.py) when it
+thinks it heard the wake phrase:
+
+- Audio is decimated to 16 kHz and cut into 32 ms frames every 20 ms.
+- A frame energy check against a tracked noise floor finds speech. Silence
+  and steady room noise stop there, before any FFT, which is what lets one
+  core serve hundreds of idle streams.
+- Around speech, MFCCs (log-mel filterbank + DCT) are computed, and every
+  DTW_STRIDE frames the recent frames are matched against the user's
+  enrolled templates with subsequence DTW.
+
+Templates are enrolled per user from a few recordings of the phrase
+(enroll()); the match threshold is calibrated from how far the recordings
+are from each other. Until a user has MIN_ENROLLED_SAMPLES, the spotter
+falls back to gating on speech alone: Deepgram hears speech, not silence.
+"""
+import io
+import os
+from typing import Optional
+
+import numpy as np
+
+# Feature extraction (at FEATURE_SAMPLE_RATE)
+FEATURE_SAMPLE_RATE = 16000
+FRAME_LENGTH = 512  # 32 ms, also the FFT size
+HOP_LENGTH = 320  # 20 ms
+N_MELS = 26
+N_MFCC = 13  # c0 (overall level) is dropped when matching
+PRE_EMPHASIS = 0.97
+
+# A frame is speech if it is this far above the noise floor (and above MIN_SPEECH_DBFS)
+SPEECH_MARGIN_DB = float(os.getenv("WAKE_SPEECH_MARGIN_DB", "12"))
+MIN_SPEECH_DBFS = -55.0
+
+# The noise floor drops instantly and rises this fast (dB per second)
+NOISE_RISE_DB_PER_SECOND = 3.0
+
+# Frames between DTW matches while someone is talking (100 ms)
+DTW_STRIDE = 5
+
+# Matching window as a multiple of the longest template
+WINDOW_STRETCH = 1.5
+
+# Enrollment limits
+MIN_ENROLLED_SAMPLES = 3
+MAX_TEMPLATES = 5
+MIN_TEMPLATE_SECONDS = 0.3
+MAX_TEMPLATE_SECONDS = 2.5
+
+# Frames more than this far below the loudest one are trimmed from a recording
+TRIM_DB = 35.0
+
+# Threshold = largest distance between enrolled recordings * THRESHOLD_MARGIN.
+# Errs towards triggering: Deepgram confirms every hit anyway.
+THRESHOLD_MARGIN = float(os.getenv("WAKE_THRESHOLD_MARGIN", "2.0"))
+
+# After a hit, ignore the next this many seconds
+REFRACTORY_SECONDS = 1.5
+
+# Speech-only gate (no templates): seconds after the last speech the gate stays open
+SPEECH_HANGOVER_SECONDS = 1.0
+
+# Dynamic range kept per frame in the log-mel spectrum
+MEL_RANGE_DB = 30.0
+
+_FRAMES_PER_SECOND = FEATURE_SAMPLE_RATE / HOP_LENGTH
+_MEL_FLOOR = 10 ** (-MEL_RANGE_DB / 10)
+_EPS = 1e-10
+
+
+def _mel_filterbank() -> np.ndarray:
+    """Triangular mel filters as an (N_MELS, FRAME_LENGTH // 2 + 1) matrix."""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    edges = mel_to_hz(np.linspace(hz_to_mel(20.0), hz_to_mel(FEATURE_SAMPLE_RATE / 2), N_MELS + 2))
+    bins = np.fft.rfftfreq(FRAME_LENGTH, 1.0 / FEATURE_SAMPLE_RATE)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
+def _dct_matrix() -> np.ndarray:
+    """Orthonormal DCT-II basis as an (N_MELS, N_MFCC) matrix."""
+    n = np.arange(N_MELS)[:, None]
+    k = np.arange(N_MFCC)[None, :]
+    basis = np.cos(np.pi / N_MELS * (n + 0.5) * k) * np.sqrt(2.0 / N_MELS)
+    basis[:, 0] /= np.sqrt(2.0)
+    return basis.astype(np.float32)
+
+
+_WINDOW = np.hamming(FRAME_LENGTH).astype(np.float32)
+_MEL_FILTERS = _mel_filterbank()
+_DCT = _dct_matrix()
+
+
+def frame_signal(samples: np.ndarray) -> np.ndarray:
+    """Overlapping (frames, FRAME_LENGTH) view of 16 kHz float samples."""
+    if len(samples) < FRAME_LENGTH:
+        return np.zeros((0, FRAME_LENGTH), dtype=np.float32)
+    return np.lib.stride_tricks.sliding_window_view(samples, FRAME_LENGTH)[::HOP_LENGTH]
+
+
+def frame_energy_db(frames: np.ndarray) -> np.ndarray:
+    """Per-frame energy in dBFS."""
+    return 10.0 * np.log10(np.mean(frames * frames, axis=1) + _EPS)
+
+
+def mfcc(frames: np.ndarray) -> np.ndarray:
+    """MFCCs c1..c12 for each frame, as float32 (frames, N_MFCC - 1)."""
+    emphasized = frames - PRE_EMPHASIS * np.pad(frames, ((0, 0), (1, 0)))[:, :-1]
+    spectrum = np.abs(np.fft.rfft(emphasized * _WINDOW, axis=1)) ** 2
+    mel = spectrum.astype(np.float32) @ _MEL_FILTERS.T
+    # Bands more than MEL_RANGE_DB below the frame's loudest are floored, so
+    # bands holding only background noise don't depend on how loud it is
+    log_mel = np.log(mel + mel.max(axis=1, keepdims=True) * _MEL_FLOOR + _EPS)
+    return (log_mel @ _DCT)[:, 1:]
+
+
+def subsequence_dtw(templates: list[np.ndarray], window: np.ndarray, last: int = 1) -> np.ndarray:
+    """
+    For each template, the best alignment cost of the whole template against
+    any stretch of the window ending in its `last` frames, per template frame.
+
+    Steps advance the template one frame and the window by 0, 1 or 2
+    frames, so every path sums exactly len(template) local distances and
+    each row of the cost tables is one vectorized update for all templates.
+    """
+    if len(window) == 0 or not templates:
+        return np.full(len(templates), np.inf)
+    lengths = [len(t) for t in templates]
+    stacked = np.zeros((len(templates), max(lengths), window.shape[1]), dtype=np.float32)
+    for k, template in enumerate(templates):
+        stacked[k, :len(template)] = template
+    cost = np.sqrt(np.maximum(
+        np.sum(stacked ** 2, axis=2)[:, :, None]
+        + np.sum(window ** 2, axis=1)[None, None, :]
+        - 2.0 * stacked @ window.T,
+        0.0,
+    ))
+
+    ends = {}
+    for k, length in enumerate(lengths):
+        ends.setdefault(length - 1, []).append(k)
+    distances = np.empty(len(templates))
+    row = cost[:, 0].copy()  # Free start: any window frame can match a template's first
+    for i in range(max(lengths)):
+        if i:
+            best = row.copy()
+            np.minimum(best[:, 1:], row[:, :-1], out=best[:, 1:])
+            np.minimum(best[:, 2:], row[:, :-2], out=best[:, 2:])
+            row = cost[:, i] + best
+        for k in ends.get(i, ()):
+            distances[k] = row[k, -last:].min() / lengths[k]
+    return distances
+
+
+def pcm_to_float(pcm: bytes) -> np.ndarray:
+    """linear16 bytes to float32 samples in [-1, 1)."""
+    usable = len(pcm) - len(pcm) % 2
+    return np.frombuffer(pcm[:usable], dtype="<i2").astype(np.float32) / 32768.0
+
+
+class Resampler:
+    """Streaming conversion to FEATURE_SAMPLE_RATE (block average for integer ratios)."""
+
+    def __init__(self, sample_rate: int):
+        self.step = sample_rate / FEATURE_SAMPLE_RATE
+        self.factor = int(self.step) if sample_rate % FEATURE_SAMPLE_RATE == 0 else 0
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._position = 0.0
+
+    def __call__(self, samples: np.ndarray) -> np.ndarray:
+        if self._tail.size:
+            samples = np.concatenate([self._tail, samples])
+        if self.factor:
+            usable = len(samples) - len(samples) % self.factor
+            self._tail = samples[usable:]
+            if self.factor == 1:
+                return samples[:usable]
+            return samples[:usable].reshape(-1, self.factor).mean(axis=1)
+
+        # Linear interpolation, carrying the phase between chunks
+        positions = np.arange(self._position, len(samples) - 1, self.step)
+        out = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+        following = self._position + len(positions) * self.step
+        keep = min(int(following), len(samples))
+        self._tail = samples[keep:]
+        self._position = following - keep
+        return out
+
+
+def resample(pcm: bytes, sample_rate: int) -> np.ndarray:
+    """A whole linear16 recording as float samples at FEATURE_SAMPLE_RATE."""
+    return Resampler(sample_rate)(pcm_to_float(pcm))
+
+
+class WakeWordModel:
+    """One user's enrolled templates and calibrated match threshold."""
+
+    def __init__(self, templates: Optional[list[np.ndarray]] = None, threshold: float = float("inf")):
+        self.templates = templates or []
+        self.threshold = threshold
+
+    @property
+    def ready(self) -> bool:
+        return len(self.templates) >= MIN_ENROLLED_SAMPLES
+
+    @property
+    def max_length(self) -> int:
+        return max((len(t) for t in self.templates), default=0)
+
+    def distance(self, window: np.ndarray, last: int = 1) -> float:
+        """Smallest per-frame DTW distance of any template to the end of `window`."""
+        return float(subsequence_dtw(self.templates, window, last).min(initial=np.inf))
+
+    def calibrate(self) -> None:
+        """Set the threshold from the spread between the enrolled recordings."""
+        if len(self.templates) < 2:
+            self.threshold = float("inf")
+            return
+        spread = max(
+            subsequence_dtw(self.templates[:j] + self.templates[j + 1:], window, len(window)).max()
+            for j, window in enumerate(self.templates)
+        )
+        self.threshold = spread * THRESHOLD_MARGIN
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        arrays = {f"template_{i}": t.astype(np.float32) for i, t in enumerate(self.templates)}
+        np.savez_compressed(buffer, threshold=np.float64(self.threshold), **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes | str) -> "WakeWordModel":
+        """Load from raw bytes or a PostgREST bytea string ("\\x0a1b...")."""
+        if isinstance(data, str):
+            data = bytes.fromhex(data[2:] if data.startswith("\\x") else data)
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            count = sum(1 for name in archive.files if name.startswith("template_"))
+            templates = [archive[f"template_{i}"] for i in range(count)]
+            return cls(templates, float(archive["threshold"]))
+
+
+def extract_template(pcm: bytes, sample_rate: int) -> np.ndarray:
+    """
+    MFCCs of one enrollment recording, trimmed to the spoken part.
+
+    Raises:
+        ValueError: If the phrase is missing, too short or too long
+    """
+    frames = frame_signal(resample(pcm, sample_rate))
+    if len(frames) == 0:
+        raise ValueError("Recording is too short")
+    energy = frame_energy_db(frames)
+    spoken = np.flatnonzero((energy > energy.max() - TRIM_DB) & (energy > MIN_SPEECH_DBFS))
+    if len(spoken) == 0:
+        raise ValueError("No speech found in the recording")
+    frames = frames[spoken[0]:spoken[-1] + 1]
+    seconds = len(frames) / _FRAMES_PER_SECOND
+    if seconds < MIN_TEMPLATE_SECONDS:
+        raise ValueError(f"Phrase is too short ({seconds:.2f}s)")
+    if seconds > MAX_TEMPLATE_SECONDS:
+        raise ValueError(f"Phrase is too long ({seconds:.2f}s); record only the wake phrase")
+    return mfcc(frames)
+
+
+def enroll(model: Optional[WakeWordModel], pcm: bytes, sample_rate: int) -> WakeWordModel:
+    """
+    Add one recording of the wake phrase to a user's model (keeping the
+    newest MAX_TEMPLATES) and recalibrate its threshold.
+
+    Raises:
+        ValueError: If the recording is unusable
+    """
+    template = extract_template(pcm, sample_rate)
+    templates = ((model.templates if model else []) + [template])[-MAX_TEMPLATES:]
+    enrolled = WakeWordModel(templates)
+    enrolled.calibrate()
+    return enrolled
+
+
+class WakeWordSpotter:
+    """Streaming wake word detector for one microphone."""
+
+    def __init__(self, sample_rate: int, model: Optional[WakeWordModel] = None):
+        """
+        Args:
+            sample_rate: Sample rate of the linear16 audio pushed in
+            model: The user's enrolled templates; without a ready model the
+                spotter gates on speech only
+        """
+        self.model = model if model is not None and model.ready else None
+        self.hits = 0
+        self.last_distance = float("inf")
+        self._resample = Resampler(sample_rate)
+        self._pending = np.zeros(0, dtype=np.float32)  # 16 kHz samples not yet framed
+        self._noise_db: Optional[float] = None
+        self._features = np.zeros((0, N_MFCC - 1), dtype=np.float32)
+        self._frames_since_speech = 1 << 30
+        self._frames_since_match = 0
+        self._refractory = 0
+        if self.model is not None:
+            self._window = int(self.model.max_length * WINDOW_STRETCH) + DTW_STRIDE
+        else:
+            self._window = 0
+        self._hangover = int(SPEECH_HANGOVER_SECONDS * _FRAMES_PER_SECOND)
+
+    @property
+    def speaking(self) -> bool:
+        """Whether there was speech within the last SPEECH_HANGOVER_SECONDS."""
+        return self._frames_since_speech <= self._hangover
+
+    def push(self, pcm: bytes) -> bool:
+        """
+        Feed audio. Returns True when the Deepgram path should be opened:
+        on a template match, or (without templates) when speech starts.
+        """
+        samples = self._resample(pcm_to_float(pcm))
+        if self._pending.size:
+            samples = np.concatenate([self._pending, samples])
+        frames = frame_signal(samples)
+        consumed = len(frames) * HOP_LENGTH
+        self._pending = samples[consumed:] if consumed else samples
+        if len(frames) == 0:
+            return False
+
+        was_speaking = self.speaking
+        speech = self._detect_speech(frames)
+        if speech.any():
+            self._frames_since_speech = len(frames) - 1 - int(np.flatnonzero(speech)[-1])
+        else:
+            self._frames_since_speech += len(frames)
+
+        if self.model is None:
+            return self.speaking and not was_speaking
+
+        if self._refractory > 0:
+            self._refractory -= len(frames)
+            self._features = self._features[:0]
+            return False
+        if self._frames_since_speech > self._window:
+            # Silence or steady noise: nothing can match, skip the FFTs
+            self._features = self._features[:0]
+            return False
+
+        self._features = np.concatenate([self._features, mfcc(frames)])[-self._window:]
+        self._frames_since_match += len(frames)
+        if self._frames_since_match < DTW_STRIDE or len(self._features) < self.model.max_length // 2:
+            return False
+
+        # Every end frame since the last match is tried exactly once
+        distance = self.model.distance(self._features, last=min(self._frames_since_match, len(self._features)))
+        self._frames_since_match = 0
+        self.last_distance = distance
+        if distance > self.model.threshold:
+            return False
+        self.hits += 1
+        self._refractory = int(REFRACTORY_SECONDS * _FRAMES_PER_SECOND)
+        self._features = self._features[:0]
+        return True
+
+    def _detect_speech(self, frames: np.ndarray) -> np.ndarray:
+        energy = frame_energy_db(frames)
+        quietest = float(energy.min())
+        if self._noise_db is None:
+            self._noise_db = quietest
+        else:
+            rise = NOISE_RISE_DB_PER_SECOND * len(frames) / _FRAMES_PER_SECOND
+            self._noise_db = min(quietest, self._noise_db + rise)
+        return (energy > self._noise_db + SPEECH_MARGIN_DB) & (energy > MIN_SPEECH_DBFS)
+
+
+class WakeWordMetrics:
+    """Process-wide counters for how much idle audio the spotter kept local."""
+
+    def __init__(self):
+        self.streams = 0
+        self.audio_seconds = 0.0
+        self.streamed_seconds = 0.0
+        self.triggers = 0
+        self.confirmed = 0
+        self.false_alarms = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "streams": self.streams,
+            "audio_seconds": round(self.audio_seconds, 1),
+            "streamed_seconds": round(self.streamed_seconds, 1),
+            "triggers": self.triggers,
+            "confirmed": self.confirmed,
+            "false_alarms": self.false_alarms,
+        }
+
+
+# Singleton metrics shared by all wake word streams in this worker
+_metrics: WakeWordMetrics | None = None
+
+
+def get_wake_word_metrics() -> WakeWordMetrics:
+    """Get or create the process-wide wake word metrics."""
+    global _metrics
+    if _metrics is None:
+        _metrics = WakeWordMetrics()
+    return _metrics
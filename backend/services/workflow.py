@@ -10,128 +10,101 @@ This graph coordinates the flow:
 """
 
 import time
-from typing import TypedDict, List, Dict, Literal
+from typing import TypedDict, Dict, Literal, Optional
 from langgraph.graph import StateGraph, END
 
 from services.scam_detector import analyze_transcript
 from services.question_generator import generate_question
 from services.alert_sender import send_scam_alert
+from services.observer_hub import observer_link
 from services.session_state import SessionState
 
+# Routing thresholds (tune with /api/analytics/risk-timelines)
+ALERT_RISK_THRESHOLD = 80
+ALERT_CONFIDENCE_THRESHOLD = 70
+QUESTION_CONFIDENCE_THRESHOLD = 50
+
 
 # ============== STATE DEFINITION ==============
 
 class KovaState(TypedDict):
     """State that flows through the graph."""
-    # Core session data
-    transcript_history: List[Dict[str, str]]
-    risk_score: int
-    confidence_score: int
-    latest_reasoning: str
+    # Core session data - one SessionState the nodes mutate in place (never copied)
+    session: SessionState
     
     # Input for this invocation
     new_chunk: Dict[str, str]  # {"speaker": "caller", "text": "..."}
+    session_id: Optional[str]  # Live session, for watch links in alerts
     
     # Outputs
     suggested_question: str  # Single question or None
     necessity_score: int  # 0-10 score for debugging
     alert_sent: bool
-    last_alert_time: float  # Timestamp of last sent alert
-    last_question_time: float # Timestamp of last generated question
-    suspicious_number_reported: bool  # Whether this number has been reported to DB
-    
-    # Config (set once at start)
-    emergency_contacts: List[str]  # Phone numbers for alerts
-    caller_phone_number: str  # The caller's phone number (for suspicious number tracking)
 
 
 # ============== NODE FUNCTIONS ==============
 
-def analyze_node(state: KovaState) -> KovaState:
+def analyze_node(state: KovaState) -> dict:
     """Node 1: Run scam detection on the new chunk."""
     
-    # Create a SessionState object from the graph state
-    session = SessionState()
-    session.transcript_history = state["transcript_history"].copy()
-    session.risk_score = state["risk_score"]
-    session.confidence_score = state["confidence_score"]
-    
-    # Run analysis (this updates session in-place)
-    analyze_transcript(state["new_chunk"], session)
-    
-    # Return updated state
-    return {
-        **state,
-        "transcript_history": session.transcript_history,
-        "risk_score": session.risk_score,
-        "confidence_score": session.confidence_score,
-        "latest_reasoning": session.latest_reasoning,
-    }
+    # Run analysis (this updates the session in-place and appends the chunk)
+    analyze_transcript(state["new_chunk"], state["session"])
+    return {}
 
 
-def question_generator_node(state: KovaState) -> KovaState:
+def question_generator_node(state: KovaState) -> dict:
     """Node 2a: Generate a verification question when confidence is low."""
     
-    session = SessionState()
-    session.transcript_history = state["transcript_history"]
-    session.risk_score = state["risk_score"]
-    session.confidence_score = state["confidence_score"]
-    
-    session.confidence_score = state["confidence_score"]
+    session = state["session"]
     
     # Rate limit: Don't generate if less than 3 seconds since last question
-    last_time = state.get("last_question_time", 0)
     current_time = time.time()
     
-    if (current_time - last_time) < 3.0:
-        return {
-            **state,
-            "suggested_question": None,
-            "necessity_score": 0,
-            # last_question_time remains unchanged
-        }
+    if (current_time - session.last_question_time) < 3.0:
+        return {"suggested_question": None, "necessity_score": 0}
 
     question, score = generate_question(session)
     
     # Only update timestamp if we actually generated a question
-    new_last_time = current_time if question else last_time
+    if question:
+        session.last_question_time = current_time
     
     return {
-        **state,
         "suggested_question": question,  # May be None if no question needed
         "necessity_score": score,
-        "last_question_time": new_last_time,
     }
 
 
-def alert_node(state: KovaState) -> KovaState:
+def alert_node(state: KovaState) -> dict:
     """Node 2b: Send SMS alerts when scam is confirmed."""
     
-    contacts = state.get("emergency_contacts", [])
+    session = state["session"]
+    contacts = session.emergency_contacts
     if not contacts:
         print("WARNING: No emergency contacts configured")
-        return {**state, "alert_sent": False}
+        return {"alert_sent": False}
     
-    caller_number = state.get("caller_phone_number")
-    already_reported = state.get("suspicious_number_reported", False)
+    caller_number = session.caller_phone_number
     
     # Only report to database once per session
-    should_report = caller_number and not already_reported
+    should_report = bool(caller_number) and not session.suspicious_number_reported
+    
+    # Each contact gets their own link to follow the call live (/ws/observe)
+    session_id = state.get("session_id")
+    watch_links = {number: observer_link(session_id, number) for number in contacts} if session_id else None
     
     success = send_scam_alert(
-        risk_score=state["risk_score"],
-        confidence_score=state["confidence_score"],
-        reasoning=state["latest_reasoning"],
+        risk_score=session.risk_score,
+        confidence_score=session.confidence_score,
+        reasoning=session.latest_reasoning,
         contact_numbers=contacts,
-        caller_phone_number=caller_number if should_report else None
+        caller_phone_number=caller_number if should_report else None,
+        watch_links=watch_links,
     )
     
-    return {
-        **state,
-        "alert_sent": success,
-        "last_alert_time": time.time(),
-        "suspicious_number_reported": already_reported or should_report
-    }
+    session.last_alert_time = time.time()
+    session.suspicious_number_reported = session.suspicious_number_reported or should_report
+    return {"alert_sent": success}
 
 
 # ============== ROUTING LOGIC ==============
@@ -139,20 +112,20 @@ def alert_node(state: KovaState) -> KovaState:
 def route_after_analysis(state: KovaState) -> Literal["question_generator_node", "alert_node", "__end__"]:
     """Decide what to do after analyzing the transcript."""
     
-    risk = state["risk_score"]
-    conf = state["confidence_score"]
+    session = state["session"]
+    risk = session.risk_score
+    conf = session.confidence_score
     
     # High risk + High confidence = Confirmed scam, alert!
-    if risk >= 80 and conf >= 70:
+    if risk >= ALERT_RISK_THRESHOLD and conf >= ALERT_CONFIDENCE_THRESHOLD:
         # Check throttling (30 seconds)
-        last_time = state.get("last_alert_time", 0)
-        if (time.time() - last_time) < 30:
+        if (time.time() - session.last_alert_time) < 30:
             return END
             
         return "alert_node"
     
     # Low confidence = Need more info, generate questions
-    if conf < 50:
+    if conf < QUESTION_CONFIDENCE_THRESHOLD:
         return "question_generator_node"
     
     # Otherwise, just end (return current status to frontend)
@@ -205,51 +178,33 @@ def get_kova_graph():
     return _kova_graph
 
 
-def process_chunk(
-    new_chunk: Dict[str, str],
-    transcript_history: List[Dict[str, str]],
-    risk_score: int = 0,
-    confidence_score: int = 0,
-    emergency_contacts: List[str] = None,
-    last_alert_time: float = 0,
-    last_question_time: float = 0,
-    caller_phone_number: str = None,
-    suspicious_number_reported: bool = False
-) -> KovaState:
+def process_chunk(new_chunk: Dict[str, str], session: SessionState, session_id: Optional[str] = None) -> KovaState:
     """
     Main entry point: Process a new audio chunk through the Kova graph.
     
+    The session is updated in place: the chunk is appended to its transcript
+    and its scores, reasoning, alert/question timestamps and reported flag
+    are updated. Callers keep one SessionState for the whole call.
+    
     Args:
         new_chunk: {"speaker": "caller"|"user", "text": "..."}
-        transcript_history: List of previous turns
-        risk_score: Current risk score (0 for new session)
-        confidence_score: Current confidence (0 for new session)
-        emergency_contacts: Phone numbers to alert (optional)
-        last_alert_time: Timestamp of last alert sent (for throttling)
-        caller_phone_number: The caller's phone number for suspicious number tracking
-        suspicious_number_reported: Whether this number has already been reported to DB
+        session: The call's SessionState (history, scores, contacts, caller number)
+        session_id: The live session's ID, if it has one (alerts link to /ws/observe)
         
     Returns:
-        Updated KovaState with new scores, questions, alert status, and last_alert_time.
+        KovaState with the same session plus suggested_question,
+        necessity_score and alert_sent for this chunk.
     """
     
     graph = get_kova_graph()
     
     initial_state: KovaState = {
-        "transcript_history": transcript_history or [],
-        "risk_score": risk_score,
-        "confidence_score": confidence_score,
-        "latest_reasoning": "",
+        "session": session,
         "new_chunk": new_chunk,
+        "session_id": session_id,
         "suggested_question": None,
         "necessity_score": 0,
         "alert_sent": False,
-        "emergency_contacts": emergency_contacts or [],
-        "last_alert_time": last_alert_time,
-        "last_question_time": last_question_time,
-        "caller_phone_number": caller_phone_number,
-        "suspicious_number_reported": suspicious_number_reported,
     }
     
-    result = graph.invoke(initial_state)
-    return result
+    return graph.invoke(initial_state)
@@ -0,0 +1,99 @@
+"""
+Tests for the cached analytics endpoints and conditional GET.
+"""
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services import analytics_cache, supabase_client
+from services.analytics_cache import AnalyticsCache
+from services.storage import set_storage
+from services.storage.sqlite_store import SQLiteStorage
+
+
+class TestAnalyticsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = SQLiteStorage(":memory:")
+        set_storage(self.storage)
+        self._original_cache, analytics_cache._cache = analytics_cache._cache, AnalyticsCache()
+        self.client = TestClient(app)
+        self.client.__enter__()
+        self._record_call(risk=90)
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+        set_storage(None)
+        analytics_cache._cache = self._original_cache
+
+    def _record_call(self, risk: int):
+        self.client.portal.call(lambda: supabase_client.update_call_analytics(
+            user_id="user-1", call_duration_seconds=60, final_risk_score=risk,
+            caller_phone_number="555 123 4567", was_scam=risk >= 80,
+        ))
+
+    def test_not_modified_without_database_hit(self):
+        first = self.client.get("/api/analytics", params={"user_id": "user-1"})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()["total_calls"], 1)
+        etag = first.headers["etag"]
+
+        with patch.object(self.storage, "get_user_analytics", side_effect=AssertionError("database hit")):
+            second = self.client.get("/api/analytics", params={"user_id": "user-1"}, headers={"If-None-Match": etag})
+            self.assertEqual(second.status_code, 304)
+            self.assertEqual(second.content, b"")
+
+            by_date = self.client.get("/api/analytics", params={"user_id": "user-1"},
+                                      headers={"If-Modified-Since": first.headers["last-modified"]})
+            self.assertEqual(by_date.status_code, 304)
+
+    def test_write_invalidates(self):
+        etag = self.client.get("/api/analytics", params={"user_id": "user-1"}).headers["etag"]
+        self._record_call(risk=10)
+
+        response = self.client.get("/api/analytics", params={"user_id": "user-1"}, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total_calls"], 2)
+        self.assertNotEqual(response.headers["etag"], etag)
+
+    def test_export_is_gzipped_when_accepted(self):
+        response = self.client.get("/api/analytics/export", params={"user_id": "user-1"},
+                                   headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.json()["summary"]["scam_detection_rate_percent"], 100.0)
+
+        plain = self.client.get("/api/analytics/export", params={"user_id": "user-1"},
+                                headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", plain.headers)
+        self.assertNotEqual(plain.headers["etag"], response.headers["etag"])
+
+    def test_unknown_user(self):
+        response = self.client.get("/api/analytics", params={"user_id": "nobody"})
+        self.assertEqual(response.json(), {"error": "Not found"})
+
+
+class TestAnalyticsCacheLoading(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_misses_load_once(self):
+        calls = []
+
+        async def load(user_id):
+            calls.append(user_id)
+            await asyncio.sleep(0.01)
+            return analytics_cache.AnalyticsReadModel({"id": user_id}, {})
+
+        cache = AnalyticsCache(max_users=1)
+        models = await asyncio.gather(*(cache.get("user-1", load) for _ in range(10)))
+        self.assertEqual(calls, ["user-1"])
+        self.assertTrue(all(m is models[0] for m in models))
+
+        await cache.get("user-2", load)
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Tests for the streaming call-record export.
+"""
+import csv
+import io
+import json
+import unittest
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services import supabase_client
+from services.storage import set_storage
+from services.storage.sqlite_store import SQLiteStorage
+
+
+def _record(day: int, hour: int, risk: int) -> dict:
+    ended_at = f"2026-03-{day:02d}T{hour:02d}:00:00.000000+00:00"
+    return {
+        "user_id": "user-1",
+        "session_id": f"s-{day}-{hour}",
+        "started_at": ended_at,
+        "ended_at": ended_at,
+        "duration_seconds": 60,
+        "final_risk_score": risk,
+        "caller_phone_number": "+15551234567",
+        "was_scam": risk >= 80,
+        "questions_generated": 0,
+        "alerts_sent": 0,
+    }
+
+
+class TestAnalyticsExport(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = SQLiteStorage(":memory:")
+        set_storage(self.storage)
+        self.client = TestClient(app)
+        self.client.__enter__()
+        # Ten calls per day on March 1-3, two sharing each timestamp to exercise the id tiebreak
+        for day in (1, 2, 3):
+            for hour in range(5):
+                for risk in (10, 90):
+                    self.client.portal.call(self.storage.record_call, _record(day, hour, risk))
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+        set_storage(None)
+
+    def test_keyset_pages_cover_every_row_once(self):
+        async def collect():
+            pages = []
+            async for page in supabase_client.iter_call_records("user-1", page_size=4):
+                pages.append(page)
+            return pages
+
+        pages = self.client.portal.call(collect)
+        ids = [row["id"] for page in pages for row in page]
+        self.assertEqual(len(pages), 8)
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 30)
+
+    def test_ndjson_with_date_range(self):
+        response = self.client.get("/api/analytics/export", params={
+            "user_id": "user-1", "format": "ndjson", "since": "2026-03-02", "until": "2026-03-02",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(len(rows), 10)
+        self.assertTrue(all(r["ended_at"].startswith("2026-03-02") for r in rows))
+
+    def test_csv(self):
+        response = self.client.get("/api/analytics/export", params={"user_id": "user-1", "format": "csv"})
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(rows[0]["session_id"], "s-1-0")
+        self.assertIn("attachment", response.headers["content-disposition"])
+
+    def test_json_document(self):
+        response = self.client.get("/api/analytics/export", params={"user_id": "user-1", "format": "json", "since": "2026-03-03"})
+        body = response.json()
+        self.assertEqual(body["count"], 10)
+        self.assertEqual(len(body["calls"]), 10)
+
+        empty = self.client.get("/api/analytics/export", params={"user_id": "nobody", "format": "json"})
+        self.assertEqual(empty.json(), {"calls": [], "count": 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
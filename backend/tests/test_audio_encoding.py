@@ -0,0 +1,207 @@
+"""
+Tests for Opus container parsing, encoding negotiation and Opus replay.
+
+The WebM and Ogg streams are built here the way MediaRecorder writes them
+(live WebM: unknown-size Segment and Clusters); the Opus packets are just a
+20 ms TOC byte plus filler, since nothing here decodes them.
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+from services import audio_encoding, live_transcription
+from services.audio_encoding import (
+    LINEAR16,
+    OPUS,
+    OpusStream,
+    negotiate_encoding,
+    opus_packet_seconds,
+)
+from services.live_transcription import SupervisedTranscription, get_transcription_metrics
+from tests.test_live_transcription import FakeDeepgram, result
+
+OPUS_HEAD = b"OpusHead" + bytes([1, 1]) + (312).to_bytes(2, "little") + (48000).to_bytes(4, "little") + bytes(3)
+UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+
+
+def packet(n):
+    """A 20 ms CELT packet (TOC config 19, one frame)."""
+    return bytes([19 << 3]) + bytes([n % 256]) * 40
+
+
+def element(element_id: bytes, payload: bytes) -> bytes:
+    return element_id + (0x10000000 | len(payload)).to_bytes(4, "big") + payload
+
+
+def webm(clusters=3, blocks=25):
+    """(stream, header length, packets): `clusters` clusters of `blocks` 20 ms blocks each."""
+    header = (
+        element(b"\x1a\x45\xdf\xa3", element(b"\x42\x82", b"webm"))
+        + b"\x18\x53\x80\x67" + UNKNOWN_SIZE
+        + element(b"\x15\x49\xa9\x66", element(b"\x2a\xd7\xb1", (1_000_000).to_bytes(3, "big")))
+        + element(b"\x16\x54\xae\x6b", element(b"\xae", element(b"\x63\xa2", OPUS_HEAD)))
+    )
+    body = b""
+    packets = []
+    for c in range(clusters):
+        body += b"\x1f\x43\xb6\x75" + UNKNOWN_SIZE + element(b"\xe7", (c * blocks * 20).to_bytes(2, "big"))
+        for b in range(blocks):
+            data = packet(len(packets))
+            packets.append(data)
+            body += element(b"\xa3", b"\x81" + (b * 20).to_bytes(2, "big") + b"\x80" + data)
+    return header + body, len(header), packets
+
+
+def ogg_page(granule, sequence, packets, header_type=0):
+    lacing, body = b"", b""
+    for data in packets:
+        lacing += b"\xff" * (len(data) // 255) + bytes([len(data) % 255])
+        body += data
+    return (
+        b"OggS" + bytes([0, header_type]) + granule.to_bytes(8, "little", signed=True)
+        + (1).to_bytes(4, "little") + sequence.to_bytes(4, "little") + bytes(4)
+        + bytes([len(lacing)]) + lacing + body
+    )
+
+
+def ogg(pages=10, per_page=5):
+    """(stream, header length, packets): audio pages of `per_page` 20 ms packets."""
+    header = ogg_page(0, 0, [OPUS_HEAD], header_type=2) + ogg_page(0, 1, [b"OpusTags" + bytes(8)])
+    body = b""
+    packets = []
+    for p in range(pages):
+        page = [packet(len(packets) + i) for i in range(per_page)]
+        packets += page
+        body += ogg_page(312 + len(packets) * 960, p + 2, page)
+    return header + body, len(header), packets
+
+
+def feed_in_chunks(stream, data, size):
+    packets = []
+    for i in range(0, len(data), size):
+        packets += stream.feed(data[i:i + size])
+    return packets
+
+
+class TestOpusStream(unittest.TestCase):
+
+    def test_webm(self):
+        data, header_length, packets = webm()
+        for size in (1, 7, 4096):
+            stream = OpusStream()
+            self.assertEqual(feed_in_chunks(stream, data, size), packets)
+            self.assertEqual(stream.container, "webm")
+            self.assertEqual(stream.header, data[:header_length])
+            self.assertEqual(stream.opus_head, OPUS_HEAD)
+            self.assertAlmostEqual(stream.duration, 1.5)
+
+    def test_ogg(self):
+        # 300-byte packets span several lacing values
+        data, header_length, packets = ogg()
+        packets_long = [packet(0) * 8] * 2
+        data += ogg_page(312 + 52 * 960, 12, packets_long)
+        for size in (1, 13, 4096):
+            stream = OpusStream()
+            self.assertEqual(feed_in_chunks(stream, data, size), packets + packets_long)
+            self.assertEqual(stream.container, "ogg")
+            self.assertEqual(stream.header, data[:header_length])
+            self.assertEqual(stream.opus_head, OPUS_HEAD)
+            self.assertAlmostEqual(stream.duration, 52 * 0.02)
+
+    def test_resuming_from_a_sync_point(self):
+        """Header + prefix + the rest of the stream is a valid stream with the remaining audio."""
+        for build in (webm, ogg):
+            data, _, packets = build()
+            stream = OpusStream()
+            stream.feed(data)
+            point = stream.sync_point(0.73)
+            self.assertLessEqual(point.time, 0.73)
+            self.assertGreater(point.time, 0.6)
+
+            resumed = OpusStream()
+            remaining = resumed.feed(stream.header + point.prefix + data[point.position:])
+            self.assertEqual(remaining, packets[-len(remaining):])
+            self.assertAlmostEqual(len(remaining) * 0.02, stream.duration - point.time)
+
+    def test_sync_points_respect_the_buffer(self):
+        data, _, _ = webm()
+        stream = OpusStream(window=1000)
+        stream.feed(data)
+        point = stream.sync_point(0.0, not_before=len(data) - 500)
+        self.assertGreaterEqual(point.position, len(data) - 500)
+        self.assertIsNone(stream.sync_point(0.0, not_before=len(data)))
+
+    def test_rejects_other_audio(self):
+        with self.assertRaises(ValueError):
+            OpusStream().feed(b"RIFF\x00\x00\x00\x00WAVE")
+        with self.assertRaises(ValueError):
+            OpusStream().feed(ogg_page(0, 0, [b"Speex   "], header_type=2))
+
+    def test_packet_durations(self):
+        self.assertAlmostEqual(opus_packet_seconds(packet(0)), 0.02)
+        self.assertAlmostEqual(opus_packet_seconds(bytes([(19 << 3) | 3, 3])), 0.06)
+        self.assertAlmostEqual(opus_packet_seconds(bytes([1 << 3 | 1])), 0.04)
+
+
+class TestNegotiation(unittest.TestCase):
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding(OPUS), OPUS)
+        self.assertEqual(negotiate_encoding("flac"), LINEAR16)
+        self.assertEqual(negotiate_encoding(None), LINEAR16)
+        with mock.patch.object(audio_encoding, "decoder_available", return_value=False):
+            self.assertEqual(negotiate_encoding(OPUS, needs_pcm=True), LINEAR16)
+        with mock.patch.object(audio_encoding, "decoder_available", return_value=True):
+            self.assertEqual(negotiate_encoding(OPUS, needs_pcm=True), OPUS)
+
+
+class TestOpusReplay(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        live_transcription._metrics = None
+        patcher = mock.patch.object(live_transcription, "RECONNECT_BACKOFF_BASE", 0.001)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.deepgram = FakeDeepgram()
+
+    async def test_reconnect_resends_the_header_and_resumes_mid_cluster(self):
+        data, header_length, _ = webm()
+        connection = SupervisedTranscription(connect=self.deepgram.connect, encoding=OPUS)
+        async with connection:
+            for i in range(0, len(data), 1000):
+                await connection.send_media(data[i:i + 1000])
+            first = self.deepgram.connections[0]
+            self.assertEqual(bytes(first.sent), data)  # Passed through unchanged
+            first.messages.put_nowait(result("hello", 0.0, 0.7))
+            first.fail()
+
+            received = []
+
+            async def collect():
+                async for message in connection:
+                    received.append(message.channel.alternatives[0].transcript)
+                    if len(received) == 2:
+                        return
+
+            receiver = asyncio.create_task(collect())
+            await asyncio.sleep(0.05)
+            second = OpusStream()
+            packets = second.feed(bytes(self.deepgram.connections[1].sent))
+            # A valid stream: the header, then the blocks from 0.7s on
+            self.assertEqual(second.header, data[:header_length])
+            self.assertEqual(len(packets), 40)
+
+            # Times restart at 0 on the new connection (= 0.7s)
+            self.deepgram.connections[1].messages.put_nowait(result("hello", -0.1, 0.05))
+            self.deepgram.connections[1].messages.put_nowait(result("grandma", 0.0, 0.5))
+            await asyncio.wait_for(receiver, 1)
+
+        self.assertEqual(received, ["hello", "grandma"])
+        metrics = get_transcription_metrics()
+        self.assertEqual(metrics.duplicates_dropped, 1)
+        self.assertAlmostEqual(metrics.replayed_seconds_total, 0.8)
+        self.assertEqual(metrics.lost_audio_seconds_total, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
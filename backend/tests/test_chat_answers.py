@@ -0,0 +1,172 @@
+"""
+Tests for canned chat intents and precomputed /chat answers.
+"""
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services import chat_bot, session_actor, workflow
+from services.chat_bot import precompute_answers, precomputed_answer
+from services.chat_intents import IntentMatcher
+from services.session_actor import SessionActor
+from services.session_state import SessionState
+from services.session_store import set_session_store
+from services.session_store.memory_store import MemorySessionStore
+
+
+def fresh(answer, risk=40, age=0):
+    return {"answer": answer, "risk_score": risk, "computed_at": time.time() - age}
+
+
+class TestIntentMatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = IntentMatcher()
+
+    def intent(self, query):
+        intent = self.matcher.match(query)
+        return intent.name if intent else None
+
+    def test_common_phrasings(self):
+        self.assertEqual(self.intent("Is this a scam?"), "is_scam")
+        self.assertEqual(self.intent("is it a scam"), "is_scam")
+        self.assertEqual(self.intent("Should I hang up??"), "hang_up")
+        self.assertEqual(self.intent("can I give them my credit card"), "share_card")
+        self.assertEqual(self.intent("They want me to buy gift cards"), "send_money")
+        self.assertEqual(self.intent("Is this really my grandson?"), "verify_identity")
+
+    def test_specific_or_negated_questions_go_live(self):
+        self.assertIsNone(self.intent("Should I give them my name?"))
+        self.assertIsNone(self.intent("should I NOT hang up"))
+        self.assertIsNone(self.intent("What should I say to them?"))
+        self.assertIsNone(self.intent("Is this a scam or not"))
+        self.assertIsNone(self.intent("um"))
+
+    def test_configurable_intents(self):
+        matcher = IntentMatcher({"call_back": {"question": "Should I call them back?", "examples": ["can i call back later"]}})
+        self.assertEqual(matcher.match("should I call them back").name, "call_back")
+        self.assertIsNone(matcher.match("is this a scam"))
+
+
+class TestPrecomputedAnswers(unittest.TestCase):
+
+    def setUp(self):
+        self.session = SessionState()
+        self.session.risk_score = 45
+        self.session.precomputed_answers = {"hang_up": fresh("Yes, hang up now.")}
+
+    def test_answers_a_matching_question(self):
+        self.assertEqual(precomputed_answer("should i hang up", self.session), "Yes, hang up now.")
+        self.assertEqual(self.session.chatbot_history, [
+            {"role": "user", "content": "should i hang up"},
+            {"role": "assistant", "content": "Yes, hang up now."},
+        ])
+
+    def test_stale_or_missing_answers_go_live(self):
+        self.assertIsNone(precomputed_answer("is this a scam", self.session))
+        self.session.risk_score = 80
+        self.assertIsNone(precomputed_answer("should i hang up", self.session))
+        self.session.risk_score = 45
+        self.session.precomputed_answers["hang_up"] = fresh("Yes.", age=chat_bot.PRECOMPUTE_MAX_AGE + 1)
+        self.assertIsNone(precomputed_answer("should i hang up", self.session))
+        self.assertEqual(self.session.chatbot_history, [])
+
+    def test_precompute_skips_failed_intents(self):
+        def generate(question, session):
+            if "hang up" in question:
+                raise RuntimeError("rate limited")
+            return f"answer to {question}"
+
+        self.session.add_turn("caller", "buy gift cards")
+        with mock.patch.object(chat_bot, "_generate_answer", generate):
+            answers = asyncio.run(precompute_answers(self.session))
+        self.assertNotIn("hang_up", answers)
+        self.assertEqual(answers["is_scam"]["answer"], "answer to Is this a scam?")
+        self.assertEqual(answers["is_scam"]["risk_score"], 45)
+
+    def test_answers_survive_serialization(self):
+        restored = SessionState.from_bytes(self.session.to_bytes())
+        self.assertEqual(restored.precomputed_answers, self.session.precomputed_answers)
+
+
+class TestActorPrecomputes(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.store = MemorySessionStore()
+        set_session_store(self.store)
+        self.addCleanup(set_session_store, None)
+        self.addCleanup(self.store.close)
+        self.risks = iter([40, 42, 70])
+
+        def analyze(new_chunk, session):
+            session.risk_score = next(self.risks)
+            session.add_turn(new_chunk["speaker"], new_chunk["text"])
+
+        patcher = mock.patch.object(workflow, "analyze_transcript", analyze)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.precompute = mock.AsyncMock(side_effect=lambda session: {"is_scam": fresh(f"risk {session.risk_score}", session.risk_score)})
+        patcher = mock.patch.object(session_actor, "precompute_answers", self.precompute)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.actor = SessionActor("s1", SessionState())
+        await self.actor.start()
+        self.addAsyncCleanup(self.actor.stop)
+
+    async def wait_for_answer(self, expected):
+        for _ in range(100):
+            entry = self.store.get("s1").precomputed_answers.get("is_scam")
+            if entry and entry["answer"] == expected:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f"precomputed answer never became {expected!r}")
+
+    async def test_regenerates_when_risk_moves(self):
+        await self.actor.analyze({"speaker": "caller", "text": "hello"})
+        await self.wait_for_answer("risk 40")
+
+        await self.actor.analyze({"speaker": "caller", "text": "it's me"})  # +2: still fresh
+        await asyncio.sleep(0.02)
+        self.assertEqual(self.precompute.await_count, 1)
+
+        await self.actor.analyze({"speaker": "caller", "text": "send gift cards"})
+        await self.wait_for_answer("risk 70")
+        self.assertEqual(self.precompute.await_count, 2)
+
+
+class TestChatEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemorySessionStore()
+        set_session_store(self.store)
+        self.addCleanup(set_session_store, None)
+        self.addCleanup(self.store.close)
+        session = SessionState()
+        session.risk_score = 85
+        session.precomputed_answers = {"hang_up": fresh("Yes, hang up right now.", risk=85)}
+        self.store.save("s1", session)
+        self.client = TestClient(app)
+
+    def test_matching_question_skips_the_model(self):
+        with mock.patch("routers.chat.chat_with_protector") as live:
+            response = self.client.post("/chat", json={"session_id": "s1", "query": "Should I hang up?"})
+        self.assertEqual(response.json(), {"response": "Yes, hang up right now."})
+        live.assert_not_called()
+        stored = self.store.get("s1")
+        self.assertEqual(stored.chatbot_history[-1]["content"], "Yes, hang up right now.")
+        self.assertEqual(stored.pending_user_inputs, ["Should I hang up?"])
+
+    def test_other_questions_go_live(self):
+        with mock.patch("routers.chat.chat_with_protector", return_value="Ask them a question only family knows.") as live:
+            response = self.client.post("/chat", json={"session_id": "s1", "query": "What should I ask them?"})
+        self.assertEqual(response.json()["response"], "Ask them a question only family knows.")
+        live.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import asyncio
+import json
+import unittest
+
+from fastapi.testclient import TestClient
+
+from main import app
+from services import number_index
+from services.number_index import SuspiciousNumberIndex
+
+
+class TestCheckNumbers(unittest.TestCase):
+
+    def setUp(self):
+        rows = [{"phone_number": "+15551234567", "report_count": 3, "last_reported_at": "2026-01-01T00:00:00+00:00"}]
+        async def fetch(after_ts, after_number, limit):
+            return [] if after_ts else rows
+
+        index = SuspiciousNumberIndex(fetch_fn=fetch)
+        asyncio.run(index.sync())
+        self._original, number_index._index = number_index._index, index
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        number_index._index = self._original
+
+    def test_bulk_lookup_streams_normalized_deduplicated_ndjson(self):
+        response = self.client.post("/api/check-numbers", json={
+            "phone_numbers": ["(555) 123-4567", "+1 555 123 4567", "415-555-0000", "911"],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0]["phone_number"], "+15551234567")
+        self.assertEqual(lines[0]["inputs"], ["(555) 123-4567", "+1 555 123 4567"])
+        self.assertTrue(lines[0]["found"])
+        self.assertEqual(lines[0]["report_count"], 3)
+        self.assertEqual(lines[1], {"phone_number": "+14155550000", "inputs": ["415-555-0000"], "found": False, "risk_prior": 0})
+        self.assertEqual(lines[2], {"input": "911", "error": "invalid_number"})
+
+    def test_rejects_oversized_batches(self):
+        response = self.client.post("/api/check-numbers", json={"phone_numbers": ["5551234567"] * 10001})
+        self.assertEqual(response.status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,6 +10,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 load_dotenv()
 
+from services.session_state import SessionState
 from services.workflow import process_chunk
 
 
@@ -17,9 +18,8 @@ def test_full_scam_flow():
     """Test that a scam call triggers both questions AND eventually an alert."""
     print("=== Testing LangGraph: Full Scam Flow ===\n")
     
-    history = []
-    risk = 0
-    conf = 0
+    session = SessionState()
+    session.emergency_contacts = ["+16692940189"]
     
     chunks = [
         {"speaker": "caller", "text": "Hey grandma, it's me! I lost my phone so I'm calling from a friend's number."},
@@ -31,30 +31,17 @@ def test_full_scam_flow():
         {"speaker": "caller", "text": "Just ask for a MoneyGram. Send it to John Doe in Miami. Hurry, please!"},
     ]
     
-    last_alert_time = 0
-    
     for i, chunk in enumerate(chunks, 1):
         print(f"\n--- Turn {i} ---")
         print(f"{chunk['speaker'].upper()}: {chunk['text']}")
         
-        result = process_chunk(
-            new_chunk=chunk,
-            transcript_history=history,
-            risk_score=risk,
-            confidence_score=conf,
-            emergency_contacts=["+16692940189"],
-            last_alert_time=last_alert_time
-        )
-        
-        # Update state for next iteration
-        history = result["transcript_history"]
-        risk = result["risk_score"]
-        conf = result["confidence_score"]
-        last_alert_time = result.get("last_alert_time", last_alert_time)
+        result = process_chunk(chunk, session)
+        risk = session.risk_score
+        conf = session.confidence_score
         
         print(f"Risk: {risk}/100 | Confidence: {conf}/100")
         print(f"Necessity Score: {result.get('necessity_score', 0)}/10")
-        print(f"Reasoning: {result['latest_reasoning']}")
+        print(f"Reasoning: {session.latest_reasoning}")
         
         if result["suggested_question"]:
             print(f"📋 Suggested Question: {result['suggested_question']}")
@@ -79,9 +66,7 @@ def test_safe_call_flow():
     """Test that a normal call keeps risk low and generates questions initially."""
     print("\n\n=== Testing LangGraph: Safe Call Flow ===\n")
     
-    history = []
-    risk = 0
-    conf = 0
+    session = SessionState()
     
     chunks = [
         {"speaker": "caller", "text": "Hi, this is the pharmacy calling about your prescription refill."},
@@ -94,21 +79,13 @@ def test_safe_call_flow():
         print(f"\n--- Turn {i} ---")
         print(f"{chunk['speaker'].upper()}: {chunk['text']}")
         
-        result = process_chunk(
-            new_chunk=chunk,
-            transcript_history=history,
-            risk_score=risk,
-            confidence_score=conf,
-            emergency_contacts=[]
-        )
-        
-        history = result["transcript_history"]
-        risk = result["risk_score"]
-        conf = result["confidence_score"]
+        result = process_chunk(chunk, session)
+        risk = session.risk_score
+        conf = session.confidence_score
         
         print(f"Risk: {risk}/100 | Confidence: {conf}/100")
         print(f"Necessity Score: {result.get('necessity_score', 0)}/10")
-        print(f"Reasoning: {result['latest_reasoning']}")
+        print(f"Reasoning: {session.latest_reasoning}")
         
         if result["suggested_question"]:
             print(f"📋 Suggested Question: {result['suggested_question']}")
@@ -0,0 +1,53 @@
+"""
+Tests for the HyperLogLog sketch.
+"""
+import hashlib
+import unittest
+
+from services.hyperloglog import HyperLogLog
+
+
+class TestHyperLogLog(unittest.TestCase):
+
+    def test_estimate_within_error(self):
+        sketch = HyperLogLog()
+        for i in range(50000):
+            sketch.add(f"+1555{i:07d}")
+        self.assertLess(abs(sketch.count() - 50000) / 50000, 4 * sketch.standard_error)
+
+    def test_small_counts_are_near_exact(self):
+        sketch = HyperLogLog()
+        for _ in range(3):
+            for i in range(25):
+                sketch.add(f"+1415555{i:04d}")
+        self.assertEqual(sketch.count(), 25)
+
+    def test_merge_is_union(self):
+        a, b = HyperLogLog(), HyperLogLog()
+        for i in range(3000):
+            a.add(f"n{i}")
+        for i in range(2000, 5000):
+            b.add(f"n{i}")
+        merged = HyperLogLog.from_bytes(a.to_bytes()).merge(b)
+        self.assertLess(abs(merged.count() - 5000) / 5000, 4 * merged.standard_error)
+
+    def test_serialization_round_trip(self):
+        sketch = HyperLogLog()
+        sketch.add("+15551234567")
+        data = sketch.to_bytes()
+        self.assertEqual(len(data), 4096)
+        self.assertEqual(HyperLogLog.from_bytes(data).registers, sketch.registers)
+        # PostgREST returns bytea as a hex string
+        self.assertEqual(HyperLogLog.from_bytes("\\x" + data.hex()).registers, sketch.registers)
+
+    def test_register_matches_database_hash(self):
+        # hll_add() in SQL: md5 prefix, 12 index bits, first set bit of the other 52
+        sketch = HyperLogLog()
+        index, rank = sketch.register_for("+15551234567")
+        bits = bin(int(hashlib.md5(b"+15551234567").hexdigest()[:16], 16))[2:].zfill(64)
+        self.assertEqual(index, int(bits[:12], 2))
+        self.assertEqual(rank, bits[12:].index("1") + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+"""
+Tests for the supervised Deepgram connection (reconnect, replay, dedupe).
+"""
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+from services import live_transcription
+from services.audio_encoding import LINEAR16
+from services.live_transcription import AudioRingBuffer, SupervisedTranscription, get_transcription_metrics
+
+SAMPLE_RATE = 1000  # 2000 bytes per second keeps the arithmetic readable
+
+
+def result(text, start, duration, is_final=True):
+    alternative = SimpleNamespace(transcript=text)
+    return SimpleNamespace(channel=SimpleNamespace(alternatives=[alternative]), start=start, duration=duration, is_final=is_final)
+
+
+class FakeUpstream:
+    """A Deepgram socket whose results and failures the test controls."""
+
+    def __init__(self):
+        self.sent = bytearray()
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+
+    async def send_media(self, data):
+        if self.closed:
+            raise ConnectionError("socket closed")
+        self.sent += data
+
+    def fail(self):
+        self.messages.put_nowait(ConnectionError("upstream reset"))
+
+    async def __aiter__(self):
+        while True:
+            item = await self.messages.get()
+            if isinstance(item, Exception):
+                self.closed = True
+                raise item
+            if item is None:
+                return
+            yield item
+
+
+class FakeDeepgram:
+    """connect() factory recording every upstream connection."""
+
+    def __init__(self, failures=0):
+        self.connections: list[FakeUpstream] = []
+        self.failures = failures
+
+    @asynccontextmanager
+    async def connect(self, sample_rate, encoding=LINEAR16):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connect refused")
+        upstream = FakeUpstream()
+        self.connections.append(upstream)
+        try:
+            yield upstream
+        finally:
+            upstream.closed = True
+            upstream.messages.put_nowait(None)
+
+
+class TestAudioRingBuffer(unittest.TestCase):
+
+    def test_wraps_and_reads_by_stream_position(self):
+        ring = AudioRingBuffer(8)
+        ring.write(b"abcdef")
+        ring.write(b"ghij")
+        self.assertEqual(ring.total, 10)
+        self.assertEqual(ring.start, 2)
+        self.assertEqual(ring.read(0), b"cdefghij")
+        self.assertEqual(ring.read(5, 9), b"fghi")
+        ring.write(b"0123456789xy")
+        self.assertEqual(ring.read(ring.start), b"456789xy")
+
+
+class TestSupervisedTranscription(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        live_transcription._metrics = None
+        patcher = mock.patch.object(live_transcription, "RECONNECT_BACKOFF_BASE", 0.001)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.deepgram = FakeDeepgram()
+
+    async def collect(self, connection, count):
+        received = []
+        async for message in connection:
+            received.append(message.channel.alternatives[0].transcript)
+            if len(received) == count:
+                return received
+        return received
+
+    async def test_reconnects_and_replays_audio_since_last_final(self):
+        async with SupervisedTranscription(SAMPLE_RATE, connect=self.deepgram.connect, replay_seconds=5) as connection:
+            first = self.deepgram.connections[0]
+            await connection.send_media(b"A" * 2000)  # 0-1s
+            await connection.send_media(b"B" * 2000)  # 1-2s
+            first.messages.put_nowait(result("hello", 0.0, 1.0))
+            first.fail()
+
+            receiver = asyncio.create_task(self.collect(connection, 2))
+            await asyncio.sleep(0.05)
+            second = self.deepgram.connections[1]
+            # Only the audio after the final transcript is replayed
+            self.assertEqual(bytes(second.sent), b"B" * 2000)
+
+            # Overlapping result from the new connection (times restart at 0 = 1s)
+            second.messages.put_nowait(result("hello", -0.5, 0.4))
+            second.messages.put_nowait(result("is this grandma", 0.0, 1.0))
+            self.assertEqual(await asyncio.wait_for(receiver, 1), ["hello", "is this grandma"])
+
+        metrics = get_transcription_metrics().to_dict()
+        self.assertEqual(metrics["reconnects"], 1)
+        self.assertEqual(metrics["duplicates_dropped"], 1)
+        self.assertAlmostEqual(metrics["replayed_seconds_total"], 1.0)
+        self.assertGreater(metrics["gap_seconds_total"], 0)
+        self.assertEqual(connection.reconnects, 1)
+
+    async def test_audio_sent_while_reconnecting_is_replayed(self):
+        async with SupervisedTranscription(SAMPLE_RATE, connect=self.deepgram.connect) as connection:
+            self.deepgram.failures = 2
+            self.deepgram.connections[0].fail()
+            receiver = asyncio.create_task(self.collect(connection, 1))
+            await asyncio.sleep(0)
+            await connection.send_media(b"C" * 400)  # Buffered only
+
+            await asyncio.sleep(0.05)
+            self.assertEqual(len(self.deepgram.connections), 2)
+            self.assertEqual(bytes(self.deepgram.connections[1].sent), b"C" * 400)
+            self.deepgram.connections[1].messages.put_nowait(result("still here", 0.0, 0.2))
+            self.assertEqual(await asyncio.wait_for(receiver, 1), ["still here"])
+        self.assertEqual(get_transcription_metrics().failed_attempts, 2)
+
+    async def test_gap_beyond_buffer_counts_lost_audio(self):
+        async with SupervisedTranscription(SAMPLE_RATE, connect=self.deepgram.connect, replay_seconds=1) as connection:
+            await connection.send_media(b"D" * 6000)  # 3s, only the last 1s is kept
+            self.deepgram.connections[0].fail()
+            receiver = asyncio.create_task(self.collect(connection, 1))
+            await asyncio.sleep(0.05)
+            self.assertEqual(len(self.deepgram.connections[1].sent), 2000)
+            self.assertAlmostEqual(get_transcription_metrics().lost_audio_seconds_total, 2.0)
+            receiver.cancel()
+
+    async def test_gives_up_after_max_attempts(self):
+        async with SupervisedTranscription(SAMPLE_RATE, connect=self.deepgram.connect, max_attempts=2) as connection:
+            self.deepgram.failures = 5
+            self.deepgram.connections[0].fail()
+            with self.assertRaises(ConnectionError):
+                await asyncio.wait_for(self.collect(connection, 1), 1)
+        self.assertEqual(get_transcription_metrics().gave_up, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
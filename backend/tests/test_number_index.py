@@ -0,0 +1,116 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from services import number_index
+from services.number_index import BloomFilter, SuspiciousNumberIndex, caller_risk_prior
+
+
+def make_fetch(rows):
+    """Fake keyset-paged fetch over an in-memory table."""
+    async def fetch(after_ts, after_number, limit):
+        ordered = sorted(rows, key=lambda r: (r["last_reported_at"], r["phone_number"]))
+        if after_ts is not None:
+            ordered = [r for r in ordered if (r["last_reported_at"], r["phone_number"]) > (after_ts, after_number)]
+        return ordered[:limit]
+    return fetch
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        numbers = [f"+1555{i:07d}" for i in range(1000)]
+        for n in numbers:
+            bloom.add(n)
+        self.assertTrue(all(n in bloom for n in numbers))
+
+        false_positives = sum(f"+1666{i:07d}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class TestSuspiciousNumberIndex(unittest.TestCase):
+
+    def test_load_delta_sync_and_write_through(self):
+        table = [
+            {"phone_number": f"+1555{i:07d}", "report_count": 1, "last_reported_at": "2026-01-01T00:00:00+00:00"}
+            for i in range(2500)
+        ]
+        index = SuspiciousNumberIndex(fetch_fn=make_fetch(table))
+        self.assertFalse(index.is_fresh())
+
+        self.assertEqual(asyncio.run(index.sync()), 2500)
+        self.assertTrue(index.is_fresh())
+        self.assertEqual(index.lookup("+15550000042")["report_count"], 1)
+        self.assertIsNone(index.lookup("+15559999999"))
+
+        # Only rows past the watermark are pulled on the next sync
+        table.append({"phone_number": "+15559999999", "report_count": 4, "last_reported_at": "2026-01-02T00:00:00+00:00"})
+        self.assertEqual(asyncio.run(index.sync()), 1)
+        self.assertEqual(index.lookup("+15559999999")["report_count"], 4)
+
+        index.record_reports({"+15559999999": 2, "+14150000000": 1})
+        self.assertEqual(index.lookup("+15559999999")["report_count"], 6)
+        self.assertEqual(index.lookup("+14150000000")["report_count"], 1)
+
+    def test_neighborhood_counts(self):
+        table = [
+            {"phone_number": "+15551234501", "report_count": 3, "last_reported_at": "2026-01-01T00:00:00+00:00"},
+            {"phone_number": "(555) 123-4502", "report_count": 2, "last_reported_at": "2026-01-01T00:00:00+00:00"},
+            {"phone_number": "+15551239999", "report_count": 1, "last_reported_at": "2026-01-01T00:00:00+00:00"},
+            {"phone_number": "+15559990000", "report_count": 7, "last_reported_at": "2026-01-01T00:00:00+00:00"},
+        ]
+        index = SuspiciousNumberIndex(fetch_fn=make_fetch(table))
+        asyncio.run(index.sync())
+
+        nearby = index.neighborhood("+15551234599")
+        self.assertEqual(nearby["neighbors"]["prefix"], "+155512345")
+        self.assertEqual((nearby["neighbors"]["numbers"], nearby["neighbors"]["reports"]), (2, 5))
+        self.assertEqual(nearby["block"]["prefix"], "+1555123")
+        self.assertEqual((nearby["block"]["numbers"], nearby["block"]["reports"]), (3, 6))
+
+        # The number's own reports are excluded from its neighborhood
+        own = index.neighborhood("+15551234501")
+        self.assertEqual(own["neighbors"]["numbers"], 1)
+        self.assertEqual(own["neighbors"]["reports"], 2)
+
+        # Absolute counts from a later sync adjust the aggregates
+        index.apply([{"phone_number": "+15551234502", "report_count": 5, "last_reported_at": "2026-01-02T00:00:00+00:00"}])
+        self.assertEqual(index.neighborhood("+15551234599")["neighbors"]["reports"], 8)
+
+    def test_risk_prior_uses_decayed_reputation(self):
+        now = datetime.now(timezone.utc)
+        recent = (now - timedelta(days=1)).isoformat()
+        ancient = (now - timedelta(days=730)).isoformat()
+        table = [
+            {"phone_number": "+15551110000", "report_count": 10, "reputation_score": 10.0,
+             "reputation_updated_at": recent, "last_reported_at": recent},
+            {"phone_number": "+15552220000", "report_count": 10, "reputation_score": 10.0,
+             "reputation_updated_at": ancient, "last_reported_at": ancient},
+            {"phone_number": "+15553330001", "report_count": 2, "last_reported_at": recent},
+        ]
+        index = SuspiciousNumberIndex(fetch_fn=make_fetch(table))
+        asyncio.run(index.sync())
+        original, number_index._index = number_index._index, index
+        try:
+            self.assertGreaterEqual(caller_risk_prior("+15551110000"), 70)
+            self.assertEqual(caller_risk_prior("+15552220000"), 0)
+            # Neighbor of a recently reported number
+            self.assertGreater(caller_risk_prior("+15553330002"), 0)
+            self.assertEqual(caller_risk_prior("+14150000000"), 0)
+
+            before = index.reputation_score("+15552220000")
+            index.record_reports({"+15552220000": 1})
+            self.assertAlmostEqual(index.reputation_score("+15552220000"), before + 1, places=3)
+        finally:
+            number_index._index = original
+
+    def test_staleness_bound(self):
+        index = SuspiciousNumberIndex(fetch_fn=make_fetch([]), max_staleness=0)
+        asyncio.run(index.sync())
+        index.last_synced_at -= 1
+        self.assertFalse(index.is_fresh())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+"""
+Tests for the /ws/observe live call fan-out.
+"""
+import asyncio
+import json
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from main import app
+from routers import observe
+from services import observer_hub
+from services.observer_hub import (
+    ObserverHub,
+    get_observer_hub,
+    issue_observer_token,
+    observer_link,
+    open_observer_hub,
+    release_observer_hub,
+    verify_observer_token,
+)
+
+CONTACT = "+15551234567"
+
+
+def update(segments=(), risk=10, confidence=20, alert=False):
+    return {
+        "type": "transcript",
+        "segments": [{"speaker": speaker, "text": text} for speaker, text in segments],
+        "risk_score": risk,
+        "confidence_score": confidence,
+        "reasoning": "Asked for gift cards.",
+        "suggested_question": None,
+        "alert_sent": alert,
+    }
+
+
+def drain(subscription):
+    frames = []
+    while not subscription.queue.empty():
+        frame = subscription.queue.get_nowait()
+        frames.append(None if frame is None else json.loads(frame))
+    return frames
+
+
+class TestObserverHub(unittest.IsolatedAsyncioTestCase):
+
+    async def test_snapshot_then_updates(self):
+        hub = ObserverHub("s1")
+        hub.update(update([("caller", "hi grandma")], risk=40))
+        subscription = hub.subscribe(CONTACT)
+        hub.update(update([("caller", "send gift cards")], risk=85, alert=True))
+
+        state, event = drain(subscription)
+        self.assertEqual(state["type"], "state")
+        self.assertEqual(state["risk_score"], 40)
+        self.assertEqual(state["segments"], [{"speaker": "caller", "text": "hi grandma"}])
+        self.assertEqual(event["type"], "update")
+        self.assertEqual(event["segments"], [{"speaker": "caller", "text": "send gift cards"}])
+        self.assertEqual((event["risk_score"], event["alert_sent"]), (85, True))
+
+    async def test_serialized_once_for_all_observers(self):
+        hub = ObserverHub("s1")
+        subscriptions = [hub.subscribe(f"+1555000000{i}") for i in range(5)]
+        for subscription in subscriptions:
+            drain(subscription)
+        with mock.patch.object(observer_hub.json, "dumps", wraps=json.dumps) as dumps:
+            hub.update(update([("caller", "it's your grandson")]))
+        dumps.assert_called_once()
+        frames = [subscription.queue.get_nowait() for subscription in subscriptions]
+        self.assertTrue(all(frame is frames[0] for frame in frames))
+        self.assertEqual((hub.published, hub.delivered), (1, 5))
+
+    async def test_slow_observer_is_dropped_without_blocking(self):
+        hub = ObserverHub("s1", queue_size=4)
+        slow = hub.subscribe("+15550000001")
+        fast = hub.subscribe("+15550000002")
+
+        for i in range(10):
+            hub.update(update([("caller", f"sentence {i}")]))
+            drain(fast)
+
+        self.assertTrue(slow.dropped)
+        self.assertFalse(fast.dropped)
+        self.assertEqual(hub.subscribers, 1)
+        self.assertEqual(hub.dropped, 1)
+        # The slow observer's backlog is replaced by the disconnect marker
+        self.assertEqual(drain(slow), [None])
+
+    async def test_close_ends_every_observer(self):
+        hub = ObserverHub("s1")
+        subscription = hub.subscribe(CONTACT)
+        hub.close()
+        self.assertEqual(drain(subscription)[-2:], [{"type": "ended"}, None])
+        self.assertIsNone(hub.subscribe(CONTACT))
+
+    async def test_subscriber_limit(self):
+        hub = ObserverHub("s1", max_subscribers=2)
+        self.assertIsNotNone(hub.subscribe("+15550000001"))
+        self.assertIsNotNone(hub.subscribe("+15550000002"))
+        self.assertIsNone(hub.subscribe("+15550000003"))
+
+    async def test_hub_survives_a_reconnect(self):
+        first = open_observer_hub("s-reconnect")
+        subscription = first.subscribe(CONTACT)
+        second = open_observer_hub("s-reconnect")  # Reconnect during the grace period
+        release_observer_hub(first)
+        self.assertIs(second, first)
+        self.assertIs(get_observer_hub("s-reconnect"), first)
+        self.assertFalse(subscription.dropped)
+
+        release_observer_hub(second)
+        self.assertIsNone(get_observer_hub("s-reconnect"))
+        self.assertEqual(drain(subscription)[-2:], [{"type": "ended"}, None])
+
+
+class TestObserverTokens(unittest.TestCase):
+
+    def test_round_trip(self):
+        token = issue_observer_token("s1", CONTACT)
+        self.assertEqual(verify_observer_token("s1", token), CONTACT)
+
+    def test_rejects_other_sessions_and_tampering(self):
+        token = issue_observer_token("s1", CONTACT)
+        self.assertIsNone(verify_observer_token("s2", token))
+        payload, signature = token.split(".")
+        forged = issue_observer_token("s1", "+15550000000").split(".")[0]
+        self.assertIsNone(verify_observer_token("s1", f"{forged}.{signature}"))
+        self.assertIsNone(verify_observer_token("s1", payload))
+        self.assertIsNone(verify_observer_token("s1", None))
+
+    def test_expires(self):
+        token = issue_observer_token("s1", CONTACT, ttl=60)
+        with mock.patch.object(observer_hub.time, "time", return_value=time.time() + 120):
+            self.assertIsNone(verify_observer_token("s1", token))
+
+    def test_link_carries_a_token(self):
+        link = observer_link("s1", CONTACT)
+        self.assertIn("/s1?token=", link)
+        self.assertEqual(verify_observer_token("s1", link.split("token=")[1]), CONTACT)
+
+
+class FakeWebSocket:
+    """Just enough of a WebSocket for observe_websocket."""
+
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+        self.disconnect = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data))
+
+    async def receive(self):
+        await self.disconnect.wait()
+        return {"type": "websocket.disconnect"}
+
+    async def close(self, code=1000, reason=None):
+        if self.close_code is None:
+            self.close_code = code
+
+
+class TestObserveEndpoint(unittest.IsolatedAsyncioTestCase):
+
+    async def test_streams_until_the_call_ends(self):
+        hub = open_observer_hub("s-live")
+        hub.update(update([("caller", "hi grandma")]))
+        websocket = FakeWebSocket()
+        task = asyncio.create_task(observe.observe_websocket(websocket, "s-live", issue_observer_token("s-live", CONTACT)))
+        await asyncio.sleep(0.01)
+        hub.update(update([("caller", "wire the money")], risk=90, alert=True))
+        release_observer_hub(hub)
+        await asyncio.wait_for(task, 1)
+
+        self.assertEqual([m["type"] for m in websocket.sent], ["state", "update", "ended"])
+        self.assertTrue(websocket.sent[1]["alert_sent"])
+        self.assertEqual(websocket.close_code, 1000)
+
+    async def test_observer_leaving_unsubscribes(self):
+        hub = open_observer_hub("s-leave")
+        websocket = FakeWebSocket()
+        task = asyncio.create_task(observe.observe_websocket(websocket, "s-leave", issue_observer_token("s-leave", CONTACT)))
+        await asyncio.sleep(0.01)
+        self.assertEqual(hub.subscribers, 1)
+        websocket.disconnect.set()
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(hub.subscribers, 0)
+        release_observer_hub(hub)
+
+
+class TestObserveRejections(unittest.TestCase):
+
+    def close_code(self, url):
+        client = TestClient(app)
+        with client.websocket_connect(url) as websocket:
+            with self.assertRaises(WebSocketDisconnect) as closed:
+                websocket.receive_text()
+        return closed.exception.code
+
+    def test_bad_token(self):
+        self.assertEqual(self.close_code("/ws/observe/s1?token=nope"), observe.CLOSE_UNAUTHORIZED)
+
+    def test_call_not_live(self):
+        token = issue_observer_token("s-gone", CONTACT)
+        self.assertEqual(self.close_code(f"/ws/observe/s-gone?token={token}"), observe.CLOSE_NOT_LIVE)
+
+
+if __name__ == "__main__":
+    unittest.main()
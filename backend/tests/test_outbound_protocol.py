@@ -0,0 +1,122 @@
+"""
+Tests for the compact /ws/audio outbound protocol.
+"""
+import asyncio
+import json
+import unittest
+from contextlib import asynccontextmanager
+from unittest import mock
+
+import ormsgpack
+from fastapi.testclient import TestClient
+
+from main import app
+from routers import websocket as websocket_router
+from services.outbound_protocol import FIELDS, JSON, MSGPACK, SPEAKERS, TYPES, OutboundEncoder, negotiate_protocol
+
+
+def transcript(segments=(), risk=10, confidence=20, reasoning="Caller asked how the user is.", question=None, alert=False):
+    return {
+        "type": "transcript",
+        "segments": [{"speaker": speaker, "text": text} for speaker, text in segments],
+        "risk_score": risk,
+        "confidence_score": confidence,
+        "reasoning": reasoning,
+        "suggested_question": question,
+        "alert_sent": alert,
+    }
+
+
+def unpack(data):
+    return ormsgpack.unpackb(data, option=ormsgpack.OPT_NON_STR_KEYS)
+
+
+class TestOutboundEncoder(unittest.TestCase):
+
+    def test_json_is_unchanged(self):
+        message = transcript([("caller", "hi grandma")])
+        encoder = OutboundEncoder()
+        self.assertEqual(json.loads(encoder.encode(message)), message)
+        # Every message is complete, even when nothing changed
+        self.assertEqual(json.loads(encoder.encode(message)), message)
+
+    def test_deltas_carry_only_changes(self):
+        encoder = OutboundEncoder(MSGPACK)
+        first = unpack(encoder.encode(transcript([("caller", "hi grandma"), ("user", "who is this?")])))
+        self.assertEqual(first, {
+            FIELDS["type"]: TYPES["transcript"],
+            FIELDS["seq"]: 0,
+            FIELDS["segments"]: [[SPEAKERS["caller"], "hi grandma"], [SPEAKERS["user"], "who is this?"]],
+            FIELDS["risk_score"]: 10,
+            FIELDS["confidence_score"]: 20,
+            FIELDS["reasoning"]: "Caller asked how the user is.",
+        })
+
+        second = unpack(encoder.encode(transcript([("caller", "it's your grandson")], risk=35)))
+        self.assertEqual(second, {
+            FIELDS["type"]: TYPES["transcript"],
+            FIELDS["seq"]: 2,
+            FIELDS["segments"]: [[SPEAKERS["caller"], "it's your grandson"]],
+            FIELDS["risk_score"]: 35,
+        })
+
+        # Nothing new: nothing to send
+        self.assertIsNone(encoder.encode(transcript(risk=35)))
+
+        events = unpack(encoder.encode(transcript(risk=35, question="What's your mom's name?", alert=True)))
+        self.assertEqual(events[FIELDS["suggested_question"]], "What's your mom's name?")
+        self.assertIs(events[FIELDS["alert_sent"]], True)
+        self.assertNotIn(FIELDS["seq"], events)
+
+    def test_other_messages_use_codes(self):
+        encoder = OutboundEncoder(MSGPACK)
+        frame = unpack(encoder.encode({"type": "stop_call", "transcript": "kova stop"}))
+        self.assertEqual(frame, {FIELDS["type"]: TYPES["stop_call"], FIELDS["transcript"]: "kova stop"})
+
+    def test_smaller_over_a_call(self):
+        sizes = {}
+        for protocol in (JSON, MSGPACK):
+            encoder = OutboundEncoder(protocol)
+            total = 0
+            for i in range(50):
+                message = transcript([("caller", f"sentence number {i}")], risk=min(i * 2, 90), reasoning="Urgency and secrecy." * 3)
+                data = encoder.encode(message)
+                total += len(data.encode() if isinstance(data, str) else data)
+            sizes[protocol] = total
+        self.assertLess(sizes[MSGPACK] * 2.5, sizes[JSON])
+
+    def test_negotiation(self):
+        self.assertEqual(negotiate_protocol(MSGPACK), MSGPACK)
+        self.assertEqual(negotiate_protocol("cbor"), JSON)
+        self.assertEqual(negotiate_protocol(None), JSON)
+
+
+class IdleTranscription:
+    """A Deepgram connection that never produces results."""
+
+    async def send_media(self, data):
+        pass
+
+    async def __aiter__(self):
+        await asyncio.Event().wait()
+        yield  # pragma: no cover
+
+
+class TestAudioWebsocketHandshake(unittest.TestCase):
+
+    def test_handshake_reports_the_protocol(self):
+        @asynccontextmanager
+        async def connect(*args, **kwargs):
+            yield IdleTranscription()
+
+        client = TestClient(app)
+        with mock.patch.object(websocket_router, "create_supervised_connection", connect):
+            for requested, expected in ((MSGPACK, MSGPACK), (None, JSON)):
+                url = "/ws/audio" + (f"?protocol={requested}" if requested else "")
+                with client.websocket_connect(url) as websocket:
+                    handshake = websocket.receive_json()
+                self.assertEqual(handshake, {"type": "audio_format", "encoding": "linear16", "protocol": expected})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+from services.phone_numbers import normalize_phone_number, exchange_block_prefix, neighborhood_prefix
+
+
+class TestPhoneNumbers(unittest.TestCase):
+
+    def test_formatting_variants_normalize_to_one_key(self):
+        variants = ["(555) 123-4567", "555.123.4567", "+1 555 123 4567", "1-555-123-4567", "001 555 123 4567"]
+        self.assertEqual({normalize_phone_number(v) for v in variants}, {"+15551234567"})
+
+    def test_international_numbers_keep_country_code(self):
+        self.assertEqual(normalize_phone_number("+44 20 7946 0958"), "+442079460958")
+
+    def test_invalid_numbers(self):
+        for raw in [None, "", "911", "+1 555 123", "12345678901234567"]:
+            self.assertIsNone(normalize_phone_number(raw))
+
+    def test_prefixes(self):
+        self.assertEqual(exchange_block_prefix("+15551234567"), "+1555123")
+        self.assertEqual(neighborhood_prefix("+15551234567", 2), "+155512345")
+
+
+if __name__ == '__main__':
+    unittest.main()
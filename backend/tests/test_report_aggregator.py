@@ -0,0 +1,52 @@
+import threading
+import unittest
+
+from services.report_aggregator import ReportAggregator
+
+
+class TestReportAggregator(unittest.TestCase):
+
+    def test_burst_is_flushed_as_one_exact_batch(self):
+        flushed = []
+        aggregator = ReportAggregator(flush_interval=60, flush_fn=lambda batch: flushed.append(batch) or True)
+
+        threads = [
+            threading.Thread(target=lambda: [aggregator.add("+15551234567") for _ in range(100)])
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        aggregator.add("+15557654321")
+
+        self.assertTrue(aggregator.flush())
+        self.assertEqual(flushed, [{"+15551234567": 800, "+15557654321": 1}])
+        self.assertEqual(aggregator.pending_count(), 0)
+
+    def test_failed_flush_keeps_counts(self):
+        results = [False, True]
+        flushed = []
+
+        def flush_fn(batch):
+            flushed.append(batch)
+            return results.pop(0)
+
+        aggregator = ReportAggregator(flush_interval=60, flush_fn=flush_fn)
+        aggregator.add("+15551234567", 2)
+        self.assertFalse(aggregator.flush())
+        aggregator.add("+15551234567")
+        self.assertTrue(aggregator.flush())
+
+        self.assertEqual(flushed[-1], {"+15551234567": 3})
+
+    def test_max_pending_triggers_flush(self):
+        flushed = []
+        aggregator = ReportAggregator(flush_interval=60, max_pending=2, flush_fn=lambda batch: flushed.append(batch) or True)
+        aggregator.add("+15550000001")
+        aggregator.add("+15550000002")
+        self.assertEqual(flushed, [{"+15550000001": 1, "+15550000002": 1}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+
+from services.reputation import (
+    HALF_LIFE_SECONDS, decayed_score, to_anchored, from_anchored, row_anchored_score,
+)
+
+
+class TestReputation(unittest.TestCase):
+
+    def test_score_halves_every_half_life(self):
+        self.assertAlmostEqual(decayed_score(8.0, 0.0, now=HALF_LIFE_SECONDS), 4.0)
+        self.assertAlmostEqual(decayed_score(8.0, 0.0, now=3 * HALF_LIFE_SECONDS), 1.0)
+
+    def test_anchored_scores_sum_across_update_times(self):
+        now = 1800000000.0
+        recent = to_anchored(10, now - 86400)
+        old = to_anchored(1, now - 2 * 365 * 86400)
+        expected = decayed_score(10, now - 86400, now) + decayed_score(1, now - 2 * 365 * 86400, now)
+        self.assertAlmostEqual(from_anchored(recent + old, now), expected)
+        self.assertLess(from_anchored(old, now), 0.001)
+
+    def test_row_without_score_falls_back_to_report_count(self):
+        row = {"report_count": 3, "last_reported_at": "2026-03-01T00:00:00+00:00"}
+        stored = {**row, "reputation_score": 3.0, "reputation_updated_at": "2026-03-01T00:00:00Z"}
+        self.assertAlmostEqual(row_anchored_score(row), row_anchored_score(stored))
+
+
+if __name__ == '__main__':
+    unittest.main()
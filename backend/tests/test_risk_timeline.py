@@ -0,0 +1,51 @@
+"""
+Tests for per-call risk timelines and the fleet statistics built from them.
+"""
+import unittest
+
+from services.risk_timeline import RiskTimeline, TimelineStats, SAMPLE_FORMAT, FLAG_ALERT, FLAG_QUESTION
+
+
+def _timeline(samples) -> bytes:
+    timeline = RiskTimeline(start_time=1000.0)
+    for seconds, risk, confidence, flags in samples:
+        timeline.record(risk, confidence, flags, at=1000.0 + seconds)
+    return timeline.to_bytes()
+
+
+class TestRiskTimeline(unittest.TestCase):
+
+    def test_packed_fixed_width(self):
+        data = _timeline([(0, 0, 0, 0), (1.5, 45, 30, FLAG_QUESTION), (90, 85, 75, FLAG_ALERT)])
+        self.assertEqual(SAMPLE_FORMAT.size, 7)
+        self.assertEqual(len(data), 21)
+
+        samples = RiskTimeline.from_bytes("\\x" + data.hex()).to_array()
+        self.assertEqual(samples["t_ms"].tolist(), [0, 1500, 90000])
+        self.assertEqual(samples["risk"].tolist(), [0, 45, 85])
+        self.assertEqual(samples["flags"].tolist(), [0, FLAG_QUESTION, FLAG_ALERT])
+
+    def test_values_are_clamped(self):
+        samples = RiskTimeline.from_bytes(_timeline([(-5, 300, -1, 0)])).to_array()
+        self.assertEqual((int(samples["t_ms"][0]), int(samples["risk"][0]), int(samples["confidence"][0])), (0, 255, 0))
+
+    def test_fleet_stats(self):
+        stats = TimelineStats(risk_threshold=80, confidence_threshold=70, minutes=(1, 2), percentiles=(50,))
+        # High risk at 30s, confident at 90s, alert at 90s
+        stats.add(_timeline([(0, 0, 0, 0), (30, 85, 40, 0), (90, 90, 75, FLAG_ALERT), (150, 90, 80, 0)]))
+        # Confident before risk is high; never alerts; ends before minute 2
+        stats.add(_timeline([(0, 0, 0, 0), (20, 20, 80, 0), (70, 60, 90, 0)]))
+        stats.add(b"")
+        result = stats.result()
+
+        self.assertEqual(result["calls"], 2)
+        self.assertEqual(result["time_to_first_alert_seconds"], {"alerted_calls": 1, "percentiles": {"p50": 90.0}})
+        self.assertEqual(result["risk_at_minute"]["1"], {"calls": 2, "percentiles": {"p50": 52.5}})
+        self.assertEqual(result["risk_at_minute"]["2"]["calls"], 1)
+        self.assertEqual(result["high_risk_before_confident"]["calls"], 1)
+        self.assertEqual(result["high_risk_before_confident"]["rate"], 0.5)
+        self.assertEqual(result["high_risk_before_confident"]["lead_seconds_percentiles"], {"p50": 60.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+"""
+Tests for the per-session actor that owns a live call's state.
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from services import workflow
+from services.risk_timeline import RiskTimeline
+from services import session_actor
+from services.session_actor import SessionActor, USER_INPUT_SPEAKER
+from services.session_state import SessionState
+from services.session_store import set_session_store
+from services.session_store.memory_store import MemorySessionStore
+from services.session_store.sqlite_store import SQLiteSessionStore
+from services.transcript_processor import TranscriptProcessor
+
+
+def fake_analyze(new_chunk, session):
+    """Raises risk by 10 per caller chunk; USER_INPUT questions push it to 90."""
+    if new_chunk["speaker"] == USER_INPUT_SPEAKER:
+        session.risk_score = 90
+    else:
+        session.risk_score += 10
+    session.confidence_score = 60
+    session.latest_reasoning = new_chunk["text"]
+    session.add_turn(new_chunk["speaker"], new_chunk["text"])
+
+
+class SessionActorTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def make_store(self):
+        return MemorySessionStore()
+
+    async def asyncSetUp(self):
+        self.store = self.make_store()
+        set_session_store(self.store)
+        self.addCleanup(set_session_store, None)
+        self.addCleanup(self.store.close)
+        patcher = mock.patch.object(workflow, "analyze_transcript", fake_analyze)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # No model calls for the canned chat answers (see test_chat_answers)
+        patcher = mock.patch.object(session_actor, "precompute_answers", mock.AsyncMock(return_value={}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.updates = []
+
+        async def on_update(result):
+            self.updates.append(result)
+
+        self.timeline = RiskTimeline()
+        self.processor = TranscriptProcessor()
+        self.actor = SessionActor(
+            "s1", SessionState(), timeline=self.timeline, processor=self.processor, on_update=on_update
+        )
+        await self.actor.start()
+
+    async def asyncTearDown(self):
+        await self.actor.stop()
+
+    async def wait_for(self, condition, timeout=2.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not condition():
+            if asyncio.get_running_loop().time() > deadline:
+                self.fail("condition not met")
+            await asyncio.sleep(0.01)
+
+    def ask(self, question):
+        """What /chat does: append to the stored session and queue a fact check."""
+        self.store.update("s1", lambda s: s.queue_user_input(question))
+
+
+class TestSessionActor(SessionActorTestCase):
+
+    async def test_segments_are_applied_in_order_and_published(self):
+        results = await asyncio.gather(*(
+            self.actor.analyze({"speaker": "caller", "text": str(i)}) for i in range(5)
+        ))
+        self.assertEqual(len(results), 5)
+        self.assertEqual(self.actor.state.risk_score, 50)
+        self.assertEqual(len(self.timeline), 5)
+
+        stored = self.store.get("s1")
+        self.assertEqual([t["text"] for t in stored.transcript_history], ["0", "1", "2", "3", "4"])
+        self.assertEqual(stored.risk_score, 50)
+        self.assertEqual(stored.version, self.actor.version)
+
+    async def test_chat_fact_check_updates_risk(self):
+        await self.actor.analyze({"speaker": "caller", "text": "hello"})
+        self.store.update("s1", lambda s: s.add_chat_messages([{"role": "user", "content": "is this my bank?"}]))
+        self.ask("is this my bank?")
+
+        await self.wait_for(lambda: self.updates)
+        self.assertEqual(self.actor.state.risk_score, 90)
+        stored = self.store.get("s1")
+        self.assertEqual(stored.risk_score, 90)
+        self.assertEqual(stored.pending_user_inputs, [])
+        self.assertEqual(stored.transcript_history[-1]["speaker"], USER_INPUT_SPEAKER)
+        # The actor's publish left the chat exchange alone
+        self.assertEqual(stored.chatbot_history[0]["content"], "is this my bank?")
+
+    async def test_pending_questions_are_coalesced(self):
+        for question in ("who is this?", "why gift cards?", "should I hang up?"):
+            self.ask(question)
+
+        await self.wait_for(lambda: self.updates)
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(self.updates), 1)
+        fact_checks = [t for t in self.actor.state.transcript_history if t["speaker"] == USER_INPUT_SPEAKER]
+        self.assertEqual(len(fact_checks), 1)
+        self.assertEqual(fact_checks[0]["text"], "who is this?\nwhy gift cards?\nshould I hang up?")
+
+    async def test_republishes_after_eviction(self):
+        self.store.delete("s1")
+        await self.actor.analyze({"speaker": "caller", "text": "still here"})
+        self.assertEqual(self.store.get("s1").risk_score, 10)
+
+    async def test_failed_analysis_reaches_caller(self):
+        with mock.patch.object(workflow, "analyze_transcript", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                await self.actor.analyze({"speaker": "caller", "text": "x"})
+        # The actor keeps running
+        await self.actor.analyze({"speaker": "caller", "text": "y"})
+        self.assertEqual(self.actor.state.risk_score, 10)
+
+
+class TestSessionResume(SessionActorTestCase):
+
+    async def reconnect(self):
+        """A new connection for the same session_id, as /ws/audio builds it."""
+        actor = SessionActor("s1", SessionState(), timeline=RiskTimeline(), processor=TranscriptProcessor())
+        await actor.start()
+        self.addAsyncCleanup(actor.stop)
+        return actor
+
+    async def drop_call(self):
+        self.actor.state.last_alert_time = 123.0
+        for i in range(3):
+            await self.actor.analyze({"speaker": "caller", "text": str(i)})
+        self.processor.add_transcript("send the gift")
+        self.processor.conversation_history.append({"speaker": "caller", "text": "2"})
+        await self.actor.stop()
+
+    async def test_reconnect_restores_call(self):
+        await self.drop_call()
+        resumed = await self.reconnect()
+
+        self.assertTrue(resumed.resumed)
+        state = resumed.state
+        self.assertEqual((state.risk_score, state.confidence_score), (30, 60))
+        self.assertEqual([t["text"] for t in state.transcript_history], ["0", "1", "2"])
+        self.assertEqual(state.last_alert_time, 123.0)
+        self.assertEqual(state.detached_at, 0)
+        self.assertEqual(resumed.processor.buffer.strip(), "send the gift")
+        self.assertEqual(resumed.processor.conversation_history, [{"speaker": "caller", "text": "2"}])
+        self.assertEqual(len(resumed.timeline), 3)
+        self.assertEqual(resumed.timeline.to_bytes(), self.timeline.to_bytes())
+
+        # The dropped connection must not record the call; the resumed one will
+        self.assertFalse(await self.actor.release(grace=0))
+        await resumed.analyze({"speaker": "caller", "text": "3"})
+        await resumed.stop()
+        self.assertTrue(await resumed.release(grace=0))
+        self.assertIsNone(self.store.get("s1"))
+
+    async def test_unresumed_call_is_finalized_once(self):
+        await self.drop_call()
+        self.assertTrue(await self.actor.release(grace=0))
+        self.assertIsNone(self.store.get("s1"))
+
+        fresh = await self.reconnect()
+        self.assertFalse(fresh.resumed)
+        self.assertEqual(fresh.state.risk_score, 0)
+
+    async def test_reconnect_after_grace_starts_fresh(self):
+        await self.drop_call()
+        with mock.patch.object(session_actor, "RESUME_GRACE_SECONDS", 0):
+            await asyncio.sleep(0.01)
+            fresh = await self.reconnect()
+        self.assertFalse(fresh.resumed)
+        self.assertEqual(len(fresh.state.transcript_history), 0)
+        # The new connection owns the id now, so the old one stands down
+        self.assertFalse(await self.actor.release(grace=0))
+
+    async def test_periodic_snapshot_saves_timeline(self):
+        with mock.patch.object(session_actor, "SNAPSHOT_INTERVAL", 0.01):
+            self.actor._schedule_snapshot()
+            await self.actor.analyze({"speaker": "caller", "text": "hi"})
+            self.processor.add_transcript("half a sentence")
+            await self.wait_for(lambda: "half a sentence" in self.store.get("s1").processor_buffer)
+        self.assertEqual(self.store.get("s1").risk_timeline, self.timeline.to_bytes())
+
+
+class TestSessionActorAcrossWorkers(SessionActorTestCase):
+
+    def make_store(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "sessions.db")
+        return SQLiteSessionStore(self.path, poll_interval=0.01)
+
+    async def test_fact_check_queued_by_other_worker(self):
+        other = SQLiteSessionStore(self.path, poll_interval=0.01)
+        self.addCleanup(other.close)
+        other.update("s1", lambda s: s.queue_user_input("is this the IRS?"))
+
+        await self.wait_for(lambda: self.updates)
+        self.assertEqual(other.get("s1").risk_score, 90)
+
+    async def test_resume_on_other_worker(self):
+        await self.actor.analyze({"speaker": "caller", "text": "hello"})
+        await self.actor.stop()
+
+        other = SQLiteSessionStore(self.path, poll_interval=0.01)
+        self.addCleanup(other.close)
+        set_session_store(other)
+        resumed = SessionActor("s1", SessionState(), timeline=RiskTimeline())
+        await resumed.start()
+        self.addAsyncCleanup(resumed.stop)
+        self.assertTrue(resumed.resumed)
+        self.assertEqual(resumed.timeline.to_bytes(), self.timeline.to_bytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
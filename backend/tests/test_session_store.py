@@ -0,0 +1,193 @@
+"""
+Tests for the session stores behind session_manager.
+"""
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from services.session_state import SessionState, MAX_CHAT_MESSAGES
+from services.session_store import SessionConflict
+from services.session_store.memory_store import MemorySessionStore
+from services.session_store.sqlite_store import SQLiteSessionStore
+
+
+class SessionStoreContract:
+    """Behaviour every backend must have; mixed into a TestCase per backend."""
+
+    def make_store(self, **kwargs):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_get_returns_copy(self):
+        state = SessionState()
+        state.add_turn("caller", "hello")
+        self.assertEqual(self.store.save("s1", state), 1)
+
+        copy = self.store.get("s1")
+        copy.transcript_history.append({"speaker": "user", "text": "not saved"})
+        self.assertEqual(len(self.store.get("s1").transcript_history), 1)
+        self.assertIsNone(self.store.get("missing"))
+
+    def test_compare_and_set(self):
+        self.store.save("s1", SessionState())
+        stale = self.store.get("s1")
+        fresh = self.store.get("s1")
+        fresh.risk_score = 40
+        self.store.save("s1", fresh, expected_version=fresh.version)
+        with self.assertRaises(SessionConflict):
+            self.store.save("s1", stale, expected_version=stale.version)
+        with self.assertRaises(SessionConflict):
+            self.store.save("s2", SessionState(), expected_version=3)
+
+    def test_concurrent_updates_are_not_lost(self):
+        self.store.save("s1", SessionState())
+
+        def chat(n):
+            for i in range(25):
+                self.store.update("s1", lambda s: s.chatbot_history.append({"role": "user", "content": f"{n}-{i}"}))
+
+        threads = [threading.Thread(target=chat, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        state = self.store.get("s1")
+        self.assertEqual(len(state.chatbot_history), 100)
+        self.assertEqual(state.version, 101)
+        self.assertIsNone(self.store.update("missing", lambda s: None))
+
+    def test_change_notification(self):
+        events = []
+        unsubscribe = self.store.subscribe(lambda session_id, version: events.append((session_id, version)))
+        self.store.save("s1", SessionState())
+        self.store.update("s1", lambda s: setattr(s, "risk_score", 10))
+        self.store.delete("s1")
+        self._wait_for(lambda: len(events) == 3)
+        self.assertEqual(events, [("s1", 1), ("s1", 2), ("s1", 0)])
+
+        unsubscribe()
+        self.store.save("s2", SessionState())
+        time.sleep(0.2)
+        self.assertEqual(len(events), 3)
+
+    def test_idle_sessions_expire(self):
+        store = self.make_store(idle_ttl=0.05)
+        self.addCleanup(store.close)
+        store.save("idle", SessionState())
+        time.sleep(0.1)
+        store.save("busy", SessionState())
+
+        self.assertIsNone(store.get("idle"))
+        self.assertIsNone(store.update("idle", lambda s: None))
+        self.assertEqual(store.evict_expired(), 1)
+        self.assertEqual(store.session_ids(), ["busy"])
+        self.assertEqual(store.evictions, 1)
+        # An expired session starts again from version 1
+        self.assertEqual(store.save("idle", SessionState(), expected_version=0), 1)
+
+    def test_least_recently_written_evicted_beyond_cap(self):
+        store = self.make_store(max_sessions=2)
+        self.addCleanup(store.close)
+        store.save("a", SessionState())
+        store.save("b", SessionState())
+        store.update("a", lambda s: setattr(s, "risk_score", 5))
+        store.save("c", SessionState())
+
+        self.assertEqual(sorted(store.session_ids()), ["a", "c"])
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.evictions, 1)
+
+    def test_stats_account_memory(self):
+        state = SessionState()
+        state.add_turn("caller", "héllo")
+        state.add_chat_messages([{"role": "user", "content": "is this real?"}])
+        self.store.save("s1", state)
+
+        [stats] = self.store.stats()
+        self.assertEqual(stats["session_id"], "s1")
+        self.assertEqual(stats["version"], 1)
+        self.assertEqual(stats["transcript_bytes"], len("caller") + len("héllo".encode()))
+        self.assertEqual(stats["chat_bytes"], len("is this real?"))
+        self.assertEqual(stats["total_bytes"], stats["transcript_bytes"] + stats["chat_bytes"])
+        self.assertGreaterEqual(stats["idle_seconds"], 0)
+
+    def _wait_for(self, condition, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+class TestMemorySessionStore(SessionStoreContract, unittest.TestCase):
+
+    def make_store(self, **kwargs):
+        return MemorySessionStore(**kwargs)
+
+
+class TestSQLiteSessionStore(SessionStoreContract, unittest.TestCase):
+
+    def make_store(self, **kwargs):
+        if not hasattr(self, "_dir"):
+            self._dir = tempfile.TemporaryDirectory()
+            self.path = os.path.join(self._dir.name, "sessions.db")
+        return SQLiteSessionStore(self.path, poll_interval=0.01, **kwargs)
+
+    def tearDown(self):
+        super().tearDown()
+        self._dir.cleanup()
+
+    def test_other_process_sees_and_notifies(self):
+        # A second store on the same file stands in for another worker
+        other = SQLiteSessionStore(self.path, poll_interval=0.01)
+        self.addCleanup(other.close)
+        events = []
+        other.subscribe(lambda session_id, version: events.append((session_id, version)))
+
+        state = SessionState()
+        state.risk_score = 65
+        self.store.save("s1", state)
+        self.assertEqual(other.get("s1").risk_score, 65)
+        other.update("s1", lambda s: s.chatbot_history.append({"role": "user", "content": "is this real?"}))
+        self.assertEqual(self.store.get("s1").chatbot_history[0]["content"], "is this real?")
+
+        self._wait_for(lambda: len(events) == 2)
+        self.assertEqual(events, [("s1", 1), ("s1", 2)])
+
+
+class TestSessionStateSerialization(unittest.TestCase):
+
+    def test_round_trip(self):
+        state = SessionState()
+        state.add_turn("caller", "This is the IRS")
+        state.risk_score, state.confidence_score = 85, 72
+        state.emergency_contacts = ["+15551234567"]
+        state.suspicious_number_reported = True
+        state.risk_timeline = b"\x00\xff\x10"
+
+        data = state.to_bytes()
+        restored = SessionState.from_bytes(data, version=7)
+        self.assertEqual(restored.transcript_history, state.transcript_history)
+        self.assertEqual((restored.risk_score, restored.confidence_score), (85, 72))
+        self.assertTrue(restored.suspicious_number_reported)
+        self.assertEqual(restored.risk_timeline, b"\x00\xff\x10")
+        self.assertEqual(restored.version, 7)
+        with self.assertRaises(ValueError):
+            SessionState.from_bytes(b"\x00" + data[1:])
+
+    def test_chat_history_is_capped(self):
+        state = SessionState()
+        for i in range(MAX_CHAT_MESSAGES + 10):
+            state.add_chat_messages([{"role": "user", "content": str(i)}])
+        self.assertEqual(len(state.chatbot_history), MAX_CHAT_MESSAGES)
+        self.assertEqual(state.chatbot_history[-1]["content"], str(MAX_CHAT_MESSAGES + 9))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+"""
+Offline integration tests for the data-access layer on the SQLite backend.
+"""
+import asyncio
+import unittest
+from datetime import date, timedelta
+
+import numpy as np
+
+from services import number_index, supabase_client
+from services.number_index import SuspiciousNumberIndex
+from services.risk_timeline import RiskTimeline, FLAG_ALERT
+from services.storage import set_storage
+from services.storage.sqlite_store import SQLiteStorage
+from services.wake_spotter import WakeWordModel
+
+
+class TestSQLiteStorage(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.storage = SQLiteStorage(":memory:")
+        set_storage(self.storage)
+        self._original_index = number_index._index
+        number_index._index = SuspiciousNumberIndex(fetch_fn=self.storage.fetch_suspicious_numbers_since)
+
+    async def asyncTearDown(self):
+        await self.storage.close()
+        set_storage(None)
+        number_index._index = self._original_index
+
+    async def test_concurrent_reports_are_exact(self):
+        await asyncio.gather(*(
+            supabase_client.report_suspicious_number("(555) 123-4567") for _ in range(50)
+        ))
+        await supabase_client.report_suspicious_numbers({"+15551234567": 5, "4155550000": 1})
+
+        rows = await self.storage.get_suspicious_numbers(["+15551234567", "+14155550000"])
+        counts = {r["phone_number"]: r["report_count"] for r in rows}
+        self.assertEqual(counts, {"+15551234567": 55, "+14155550000": 1})
+
+        result = await supabase_client.check_suspicious_number("555-123-4567")
+        self.assertTrue(result["found"])
+        self.assertEqual(result["report_count"], 55)
+        self.assertAlmostEqual(result["reputation_score"], 55, places=1)
+
+    async def test_delta_sync_from_sqlite(self):
+        await supabase_client.report_suspicious_numbers({"+15551234567": 2})
+        index = number_index.get_number_index()
+        self.assertEqual(await index.sync(), 1)
+        await supabase_client.report_suspicious_numbers({"+15557654321": 1})
+        self.assertEqual(await index.sync(), 1)
+        self.assertEqual(len(index), 2)
+
+    async def test_call_analytics_and_records(self):
+        for risk in (90, 20):
+            ok = await supabase_client.update_call_analytics(
+                user_id="user-1",
+                call_duration_seconds=60,
+                final_risk_score=risk,
+                caller_phone_number="555 123 4567",
+                was_scam=risk >= 80,
+                session_id=f"session-{risk}",
+            )
+            self.assertTrue(ok)
+
+        analytics = await supabase_client.get_user_analytics("user-1")
+        self.assertEqual(analytics["total_calls"], 2)
+        self.assertEqual(analytics["total_scam_calls"], 1)
+        self.assertEqual(analytics["recent_callers"][0]["phone"], "+15551234567")
+
+        records = await self.storage.get_call_records("user-1")
+        self.assertEqual([r["session_id"] for r in records], ["session-20", "session-90"])
+        self.assertTrue(records[1]["was_scam"])
+
+        export = await supabase_client.export_analytics_data("user-1")
+        self.assertEqual(export["summary"]["scam_detection_rate_percent"], 50.0)
+
+    async def test_calls_roll_up_incrementally(self):
+        await asyncio.gather(*(
+            supabase_client.update_call_analytics(
+                user_id="user-1",
+                call_duration_seconds=30,
+                final_risk_score=85 if i % 4 == 0 else 10,
+                caller_phone_number=f"555 123 {4500 + i % 12}",
+                was_scam=i % 4 == 0,
+            )
+            for i in range(20)
+        ))
+
+        analytics = await supabase_client.get_user_analytics("user-1")
+        self.assertEqual(analytics["total_calls"], 20)
+        self.assertEqual(analytics["unique_callers_count"], 12)
+        self.assertEqual(analytics["total_call_duration_seconds"], 600)
+        self.assertEqual(len(analytics["recent_callers"]), 10)
+        (today,) = analytics["daily_stats"].values()
+        self.assertEqual(today, {"calls": 20, "scams": 5})
+        (week,) = analytics["weekly_stats"].values()
+        self.assertEqual(week, {"calls": 20, "scams": 5, "duration": 600})
+
+    async def test_fleet_unique_scam_numbers(self):
+        for user, numbers in (("user-1", range(0, 30)), ("user-2", range(20, 50))):
+            for n in numbers:
+                await supabase_client.update_call_analytics(
+                    user_id=user,
+                    final_risk_score=90,
+                    caller_phone_number=f"+1555000{n:04d}",
+                    was_scam=True,
+                )
+        await supabase_client.update_call_analytics(user_id="user-2", caller_phone_number="+15559999999")
+
+        fleet = await supabase_client.get_fleet_analytics()
+        self.assertEqual(fleet["unique_scam_numbers"], 50)
+
+    async def test_risk_timelines_persist_and_aggregate(self):
+        for alert_at in (10, 20, 30):
+            timeline = RiskTimeline(start_time=0.0)
+            timeline.record(0, 0, at=0.0)
+            timeline.record(90, 80, FLAG_ALERT, at=float(alert_at))
+            await supabase_client.update_call_analytics(user_id="user-1", risk_timeline=timeline.to_bytes())
+        await supabase_client.update_call_analytics(user_id="user-1")
+
+        stats = await supabase_client.get_risk_timeline_stats(80, 70, max_calls=2)
+        self.assertEqual(stats["calls"], 2)
+        stats = await supabase_client.get_risk_timeline_stats(80, 70)
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["time_to_first_alert_seconds"]["percentiles"]["p50"], 20.0)
+
+    async def test_compaction_downsamples_old_buckets(self):
+        today = date.today()
+        old_day = today - timedelta(days=200)
+        old_week = today - timedelta(days=1000)
+        rows = [
+            ("day", old_day, 3, 1, 90),
+            ("day", today, 1, 0, 10),
+            ("week", old_week, 4, 2, 120),
+            ("week", old_week + timedelta(days=7), 1, 0, 30),
+        ]
+
+        def seed(conn):
+            conn.executemany(
+                "insert into call_rollups (user_id, period, bucket, calls, scams, duration_seconds) "
+                "values ('user-1', ?, ?, ?, ?, ?)",
+                [(period, bucket.isoformat(), *counts) for period, bucket, *counts in rows],
+            )
+
+        await self.storage._run(seed)
+        self.assertEqual(await self.storage.compact_call_rollups(90, 730), 3)
+
+        remaining = await self.storage.get_call_rollups("user-1")
+        periods = sorted((r["period"], r["bucket"]) for r in remaining)
+        self.assertIn(("day", today.isoformat()), periods)
+        self.assertNotIn(("day", old_day.isoformat()), periods)
+        self.assertFalse(any(p == "week" for p, _ in periods))
+        months = [r for r in remaining if r["period"] == "month"]
+        self.assertEqual(sum(r["calls"] for r in months), 5)
+        self.assertEqual(sum(r["duration_seconds"] for r in months), 150)
+
+    async def test_wake_word_model_round_trip(self):
+        self.assertIsNone(await supabase_client.get_wake_word_model("user-1"))
+        templates = [np.arange(24, dtype=np.float32).reshape(2, 12), np.ones((3, 12), dtype=np.float32)]
+        await supabase_client.save_wake_word_model("user-1", WakeWordModel(templates, 1.5))
+
+        model = await supabase_client.get_wake_word_model("user-1")
+        self.assertEqual(model.threshold, 1.5)
+        self.assertEqual(len(model.templates), 2)
+        np.testing.assert_array_equal(model.templates[0], templates[0])
+
+        await supabase_client.save_wake_word_model("user-1", None)
+        self.assertIsNone(await supabase_client.get_wake_word_model("user-1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
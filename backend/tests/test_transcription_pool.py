@@ -0,0 +1,218 @@
+"""
+Tests for pre-warmed Deepgram connections and the wakeword-to-call handoff.
+"""
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from services import transcription_pool
+from services.audio_encoding import LINEAR16, OPUS
+from services.live_transcription import SupervisedTranscription, create_supervised_connection
+from services.transcription_pool import TranscriptionPool
+
+SAMPLE_RATE = 1000  # 2000 bytes per second
+
+
+def result(text, start, duration, is_final=True):
+    alternative = SimpleNamespace(transcript=text)
+    return SimpleNamespace(channel=SimpleNamespace(alternatives=[alternative]), start=start, duration=duration, is_final=is_final)
+
+
+class FakeSocket:
+    """A Deepgram socket that records audio and KeepAlives."""
+
+    def __init__(self):
+        self.sent = bytearray()
+        self.keepalives = 0
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+        self.broken = False
+
+    async def send_media(self, data):
+        if self.closed:
+            raise ConnectionError("socket closed")
+        self.sent += data
+
+    async def send_keep_alive(self):
+        if self.broken:
+            raise ConnectionError("socket timed out")
+        self.keepalives += 1
+
+    async def __aiter__(self):
+        while True:
+            item = await self.messages.get()
+            if item is None:
+                return
+            yield item
+
+
+class FakeDeepgram:
+    """connect() factory recording every socket it opens."""
+
+    def __init__(self):
+        self.sockets: list[FakeSocket] = []
+        self.formats: list[tuple] = []
+
+    @asynccontextmanager
+    async def connect(self, sample_rate, encoding=LINEAR16):
+        socket = FakeSocket()
+        self.sockets.append(socket)
+        self.formats.append((sample_rate, encoding))
+        try:
+            yield socket
+        finally:
+            socket.closed = True
+            socket.messages.put_nowait(None)
+
+
+class TestTranscriptionPool(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.deepgram = FakeDeepgram()
+
+    def make_pool(self, **kwargs):
+        pool = TranscriptionPool(connect=self.deepgram.connect, **kwargs)
+        self.addAsyncCleanup(pool.close)
+        return pool
+
+    async def settle(self):
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+    async def test_hands_out_warm_connection_and_refills(self):
+        pool = self.make_pool(size=1)
+        pool._refill(SAMPLE_RATE)
+        await self.settle()
+        warm = self.deepgram.sockets[0]
+
+        async with pool.connect(SAMPLE_RATE) as connection:
+            self.assertIs(connection, warm)
+            await self.settle()
+            # A replacement is already open for the next call
+            self.assertEqual(len(self.deepgram.sockets), 2)
+            self.assertEqual(pool.stats()["idle"][SAMPLE_RATE], 1)
+
+        self.assertTrue(warm.closed)
+        self.assertFalse(self.deepgram.sockets[1].closed)
+        self.assertEqual((pool.hits, pool.misses), (1, 0))
+
+    async def test_dials_when_nothing_is_idle(self):
+        pool = self.make_pool(size=0)
+        async with pool.connect(SAMPLE_RATE) as connection:
+            self.assertIs(connection, self.deepgram.sockets[0])
+        self.assertTrue(connection.closed)
+        self.assertEqual((pool.hits, pool.misses), (0, 1))
+
+    async def test_keeps_idle_connections_alive_and_replaces_dead_or_stale_ones(self):
+        pool = self.make_pool(size=1)
+        pool._refill(SAMPLE_RATE)
+        await self.settle()
+        first = self.deepgram.sockets[0]
+
+        await pool.maintain()
+        self.assertEqual(first.keepalives, 1)
+
+        first.broken = True
+        await pool.maintain()
+        await self.settle()
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.keepalive_failures, 1)
+        self.assertEqual(len(self.deepgram.sockets), 2)
+
+        pool.max_idle = 0
+        await asyncio.sleep(0.01)
+        await pool.maintain()
+        await self.settle()
+        self.assertTrue(self.deepgram.sockets[1].closed)
+        self.assertEqual(pool.recycled, 1)
+        self.assertEqual(pool.stats()["idle"][SAMPLE_RATE], 1)
+
+    async def test_formats_are_pooled_separately(self):
+        pool = self.make_pool(size=1)
+        pool._refill(SAMPLE_RATE)
+        await self.settle()
+        async with pool.connect(16000, OPUS) as connection:
+            # Containers carry their own rate, so Deepgram isn't told one
+            self.assertIsNot(connection, self.deepgram.sockets[0])
+            self.assertEqual(self.deepgram.formats[1], (48000, OPUS))
+        await self.settle()
+        self.assertEqual(pool.stats()["idle"], {SAMPLE_RATE: 1, OPUS: 1})
+        self.assertEqual((pool.hits, pool.misses), (0, 1))
+
+    async def test_close_shuts_everything(self):
+        pool = self.make_pool(size=2)
+        pool._refill(SAMPLE_RATE)
+        await self.settle()
+        await pool.close()
+        self.assertTrue(all(socket.closed for socket in self.deepgram.sockets))
+        pool._refill(SAMPLE_RATE)
+        self.assertEqual(len(self.deepgram.sockets), 2)
+
+
+class TestWakewordHandoff(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.deepgram = FakeDeepgram()
+        self.pool = TranscriptionPool(size=0, connect=self.deepgram.connect)
+        transcription_pool._pool = self.pool
+        self.addAsyncCleanup(self.pool.close)
+        self.addCleanup(setattr, transcription_pool, "_pool", None)
+
+    async def open_wakeword(self):
+        wakeword = SupervisedTranscription(SAMPLE_RATE, connect=self.pool.connect)
+        await wakeword.open()
+        await wakeword.send_media(b"W" * 2000)  # "kova activate", 0-1s
+        return wakeword
+
+    async def test_call_adopts_the_open_wakeword_connection(self):
+        wakeword = await self.open_wakeword()
+        token = self.pool.park(wakeword, SAMPLE_RATE)
+        socket = self.deepgram.sockets[0]
+
+        await self.pool.maintain()
+        self.assertEqual(socket.keepalives, 1)
+
+        async with create_supervised_connection(SAMPLE_RATE, handoff=token) as call:
+            self.assertIs(call, wakeword)
+            self.assertEqual(len(self.deepgram.sockets), 1)  # No new handshake
+            await call.send_media(b"C" * 2000)  # 1-2s
+            self.assertEqual(bytes(socket.sent), b"W" * 2000 + b"C" * 2000)
+
+            # The wake phrase's late final is not part of the call
+            socket.messages.put_nowait(result("kova activate", 0.0, 1.0))
+            socket.messages.put_nowait(result("hi grandma", 1.0, 1.0))
+            messages = aiter(call)
+            message = await asyncio.wait_for(anext(messages), 1)
+            self.assertEqual(message.channel.alternatives[0].transcript, "hi grandma")
+            await messages.aclose()
+
+        self.assertTrue(socket.closed)
+        self.assertEqual(self.pool.handoffs_claimed, 1)
+
+    async def test_token_is_single_use_and_checks_sample_rate(self):
+        wakeword = await self.open_wakeword()
+        token = self.pool.park(wakeword, SAMPLE_RATE)
+        self.assertIsNone(self.pool.claim(token, 16000))
+        self.assertIsNone(self.pool.claim(token, SAMPLE_RATE, OPUS))
+        self.assertIs(self.pool.claim(token, SAMPLE_RATE), wakeword)
+        self.assertIsNone(self.pool.claim(token, SAMPLE_RATE))
+
+        # An unknown token falls back to a fresh connection
+        async with create_supervised_connection(SAMPLE_RATE, handoff=token) as call:
+            self.assertIsNot(call, wakeword)
+            self.assertEqual(len(self.deepgram.sockets), 2)
+        await wakeword.close()
+
+    async def test_unclaimed_handoff_expires(self):
+        self.pool.handoff_ttl = 0.01
+        wakeword = await self.open_wakeword()
+        token = self.pool.park(wakeword, SAMPLE_RATE)
+        await asyncio.sleep(0.05)
+        self.assertTrue(self.deepgram.sockets[0].closed)
+        self.assertIsNone(self.pool.claim(token, SAMPLE_RATE))
+        self.assertEqual(self.pool.handoffs_expired, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
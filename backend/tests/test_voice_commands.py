@@ -0,0 +1,84 @@
+"""
+Tests for the phonetic voice command engine.
+"""
+import unittest
+
+from services.voice_commands import (
+    ACTIVATE_COMMAND,
+    STOP_COMMAND,
+    CommandEngine,
+    create_command_engine,
+    phonetic_key,
+)
+
+
+class TestPhoneticKey(unittest.TestCase):
+
+    def test_spellings_of_kova_share_a_key(self):
+        self.assertEqual({phonetic_key(w) for w in ("kova", "Cova", "kovah", "KOVA")}, {"KF"})
+
+    def test_homophones(self):
+        self.assertEqual(phonetic_key("pause"), phonetic_key("paws"))
+        self.assertEqual(phonetic_key("son"), phonetic_key("sun"))
+        self.assertEqual(phonetic_key("knight"), phonetic_key("night"))
+        self.assertNotEqual(phonetic_key("stop"), phonetic_key("shop"))
+
+
+class TestCommandMatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_command_engine()
+        self.matcher = self.engine.matcher()
+
+    def test_matches_consecutive_words_only(self):
+        self.assertEqual(self.matcher.feed("Kova, stop."), [STOP_COMMAND])
+        self.assertEqual(self.matcher.feed("cover the vase, stop"), [])
+        self.assertEqual(self.matcher.feed("Cobra stop"), [STOP_COMMAND])
+        self.assertEqual(self.matcher.feed("co va activate please"), [ACTIVATE_COMMAND])
+
+    def test_fillers_do_not_break_a_command(self):
+        self.assertEqual(self.matcher.feed("kova, um, stop"), [STOP_COMMAND])
+
+    def test_command_split_across_final_results(self):
+        self.assertEqual(self.matcher.feed("Okay. Kova.", is_final=True), [])
+        self.assertEqual(self.matcher.feed("Stop.", is_final=True), [STOP_COMMAND])
+        self.assertEqual(self.matcher.feed("stop", is_final=True), [])
+
+    def test_interim_results_fire_once(self):
+        self.assertEqual(self.matcher.feed("hello kova", is_final=False), [])
+        self.assertEqual(self.matcher.feed("hello kova stop", is_final=False), [STOP_COMMAND])
+        self.assertEqual(self.matcher.feed("hello kova stop it", is_final=False), [])
+        self.assertEqual(self.matcher.feed("Hello, kova stop it.", is_final=True), [])
+        self.assertEqual(self.engine.stats()[STOP_COMMAND]["confirmed"], 1)
+
+    def test_revised_interim_counts_as_retracted(self):
+        self.assertEqual(self.matcher.feed("kova stop", is_final=False), [STOP_COMMAND])
+        self.assertEqual(self.matcher.feed("coffee shop", is_final=True), [])
+        stats = self.engine.stats()[STOP_COMMAND]
+        self.assertEqual((stats["triggers"], stats["confirmed"], stats["retracted"]), (1, 0, 1))
+        self.assertEqual(stats["false_trigger_rate"], 1.0)
+
+    def test_only_new_tokens_are_stepped(self):
+        self.matcher.feed("one two three four", is_final=False)
+        states = self.matcher._states[:]
+        self.matcher.feed("one two three four five", is_final=False)
+        # Earlier states are reused, not recomputed
+        self.assertTrue(all(a is b for a, b in zip(states, self.matcher._states)))
+        self.assertEqual(len(self.matcher._states), 6)
+
+    def test_register_more_commands(self):
+        self.engine.register("call_son", "kova call my son", "kova call my boy")
+        self.engine.register("pause", "kova pause")
+        self.assertEqual(self.matcher.feed("Kova, call my sun."), ["call_son"])
+        self.assertEqual(self.matcher.feed("cova paws"), ["pause"])
+        self.assertEqual(self.engine.lookup("kova pause"), "pause")
+        self.assertIsNone(self.engine.lookup("kova"))
+
+    def test_custom_wake_word(self):
+        engine = CommandEngine()
+        engine.register("wake", "hey there")
+        self.assertEqual(engine.matcher().feed("Hey, there!"), ["wake"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,251 @@
+"""
+Tests for the on-server wake word spotter.
+
+Phrases are synthesized as a sequence of harmonic tones, which is enough
+spectral structure for MFCC + DTW to tell two orderings apart.
+"""
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from main import app
+from routers import wakeword
+from services import transcription_pool, wake_spotter
+from services.audio_encoding import LINEAR16
+from services.storage import set_storage
+from services.storage.sqlite_store import SQLiteStorage
+from services.transcription_pool import TranscriptionPool
+from services.wake_spotter import (
+    Resampler,
+    WakeWordModel,
+    WakeWordSpotter,
+    enroll,
+    pcm_to_float,
+)
+
+RATE = 48000
+CHUNK_BYTES = 8192  # What the browser's ScriptProcessor sends (4096 samples)
+
+WAKE = [180, 320, 240, 400]
+OTHER = [400, 240, 320, 180]
+
+
+def tone(f0, seconds, amplitude):
+    t = np.arange(int(seconds * RATE)) / RATE
+    signal = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 6))
+    envelope = np.minimum(1, np.minimum(t, t[-1] - t) * 40)
+    return amplitude * signal * envelope
+
+
+def phrase(order, stretch=1.0, amplitude=0.3):
+    return np.concatenate([tone(f, 0.25 * stretch, amplitude) for f in order])
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE))
+
+
+def pcm(signal, noise=0.003, seed=0):
+    signal = signal + np.random.default_rng(seed).normal(0, noise, len(signal))
+    return (np.clip(signal, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def stream(spotter, data):
+    return sum(spotter.push(data[i:i + CHUNK_BYTES]) for i in range(0, len(data), CHUNK_BYTES))
+
+
+def enrolled_model():
+    model = None
+    for seed, stretch in enumerate((0.9, 1.0, 1.1)):
+        recording = np.concatenate([silence(0.1), phrase(WAKE, stretch), silence(0.1)])
+        model = enroll(model, pcm(recording, seed=seed), RATE)
+    return model
+
+
+class TestEnrollment(unittest.TestCase):
+
+    def test_templates_are_trimmed_and_calibrated(self):
+        model = enrolled_model()
+        self.assertTrue(model.ready)
+        self.assertEqual(len(model.templates), 3)
+        # 1s of phrase at 20ms hops, without the surrounding silence
+        self.assertLess(abs(len(model.templates[1]) - 50), 5)
+        self.assertTrue(np.isfinite(model.threshold))
+
+    def test_not_ready_until_enough_samples(self):
+        model = enroll(None, pcm(phrase(WAKE)), RATE)
+        self.assertFalse(model.ready)
+        self.assertIsNone(WakeWordSpotter(RATE, model).model)
+
+    def test_rejects_unusable_recordings(self):
+        with self.assertRaises(ValueError):
+            enroll(None, pcm(silence(1), noise=0), RATE)
+        with self.assertRaises(ValueError):
+            enroll(None, pcm(tone(200, 0.1, 0.3)), RATE)
+        with self.assertRaises(ValueError):
+            enroll(None, pcm(phrase(WAKE, stretch=3.0)), RATE)
+
+    def test_keeps_newest_templates(self):
+        model = enrolled_model()
+        for seed in range(4):
+            model = enroll(model, pcm(phrase(WAKE), seed=10 + seed), RATE)
+        self.assertEqual(len(model.templates), wake_spotter.MAX_TEMPLATES)
+
+    def test_serialization_round_trip(self):
+        model = enrolled_model()
+        for data in (model.to_bytes(), "\\x" + model.to_bytes().hex()):
+            loaded = WakeWordModel.from_bytes(data)
+            self.assertEqual(loaded.threshold, model.threshold)
+            for a, b in zip(loaded.templates, model.templates):
+                np.testing.assert_array_equal(a, b)
+
+
+class TestWakeWordSpotter(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.model = enrolled_model()
+
+    def test_spots_the_enrolled_phrase(self):
+        for stretch, amplitude in ((1.05, 0.2), (1.2, 0.5)):
+            spotter = WakeWordSpotter(RATE, self.model)
+            audio = np.concatenate([silence(2), phrase(WAKE, stretch, amplitude), silence(1)])
+            self.assertEqual(stream(spotter, pcm(audio, seed=7)), 1)
+
+    def test_ignores_other_sounds(self):
+        spotter = WakeWordSpotter(RATE, self.model)
+        audio = np.concatenate([
+            silence(1),
+            phrase(OTHER),
+            silence(1),
+            np.random.default_rng(3).normal(0, 0.05, RATE * 2),
+            silence(1),
+        ])
+        self.assertEqual(stream(spotter, pcm(audio)), 0)
+
+    def test_silence_never_reaches_the_fft(self):
+        spotter = WakeWordSpotter(RATE, self.model)
+        with mock.patch.object(wake_spotter, "mfcc", wraps=wake_spotter.mfcc) as mfcc:
+            stream(spotter, pcm(silence(5)))
+            self.assertEqual(mfcc.call_count, 0)
+            stream(spotter, pcm(phrase(WAKE)))
+            self.assertGreater(mfcc.call_count, 0)
+
+    def test_speech_gate_without_templates(self):
+        spotter = WakeWordSpotter(RATE)
+        self.assertEqual(stream(spotter, pcm(silence(2))), 0)
+        self.assertFalse(spotter.speaking)
+        # Opens once when speech starts, stays open while it continues
+        self.assertEqual(stream(spotter, pcm(phrase(OTHER))), 1)
+        self.assertTrue(spotter.speaking)
+        stream(spotter, pcm(silence(2)))
+        self.assertFalse(spotter.speaking)
+
+
+class TestResampler(unittest.TestCase):
+
+    def test_streaming_matches_whole_recording(self):
+        samples = pcm_to_float(pcm(phrase(WAKE)))
+        for rate in (48000, 44100, 16000):
+            whole = Resampler(rate)(samples)
+            resampler = Resampler(rate)
+            chunked = np.concatenate([resampler(samples[i:i + 4097]) for i in range(0, len(samples), 4097)])
+            self.assertEqual(len(chunked), len(whole))
+            np.testing.assert_allclose(chunked, whole, atol=1e-6)
+            self.assertLess(abs(len(whole) - len(samples) * 16000 / rate), 2)
+
+
+class ConfirmingSocket:
+    """A Deepgram socket that transcribes its first second of audio as the wake phrase."""
+
+    def __init__(self, sample_rate):
+        self.bytes_per_second = sample_rate * 2
+        self.sent = bytearray()
+        self.messages: asyncio.Queue = asyncio.Queue()
+
+    async def send_media(self, data):
+        before = len(self.sent)
+        self.sent += data
+        if before < self.bytes_per_second <= len(self.sent):
+            alternative = SimpleNamespace(transcript="Kova, activate.")
+            self.messages.put_nowait(SimpleNamespace(
+                channel=SimpleNamespace(alternatives=[alternative]), start=0.0, duration=1.0, is_final=True,
+            ))
+
+    async def send_keep_alive(self):
+        pass
+
+    async def __aiter__(self):
+        while (message := await self.messages.get()) is not None:
+            yield message
+
+
+class ConfirmingDeepgram:
+    """connect() factory recording every socket it opens."""
+
+    def __init__(self):
+        self.sockets: list[ConfirmingSocket] = []
+
+    @asynccontextmanager
+    async def connect(self, sample_rate, encoding=LINEAR16):
+        socket = ConfirmingSocket(sample_rate)
+        self.sockets.append(socket)
+        try:
+            yield socket
+        finally:
+            socket.messages.put_nowait(None)
+
+
+class TestWakewordEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.deepgram = ConfirmingDeepgram()
+        self.pool = TranscriptionPool(size=0, connect=self.deepgram.connect)
+        transcription_pool._pool = self.pool
+        self.addCleanup(setattr, transcription_pool, "_pool", None)
+        set_storage(SQLiteStorage(":memory:"))
+        self.addCleanup(set_storage, None)
+        self.client = TestClient(app)
+
+    def test_deepgram_only_hears_speech_and_confirms(self):
+        url = f"/ws/wakeword?sample_rate={RATE}&wake_word=kova%20activate"
+        with self.client.websocket_connect(url) as websocket:
+            quiet = pcm(silence(10))
+            for i in range(0, len(quiet), CHUNK_BYTES):
+                websocket.send_bytes(quiet[i:i + CHUNK_BYTES])
+            speech = pcm(np.concatenate([phrase(WAKE), silence(1)]))
+            for i in range(0, len(speech), CHUNK_BYTES):
+                websocket.send_bytes(speech[i:i + CHUNK_BYTES])
+            self.assertEqual(websocket.receive_json(), {"type": "audio_format", "encoding": "linear16"})
+            message = websocket.receive_json()
+
+        self.assertTrue(message["detected"])
+        self.assertTrue(message["handoff"])
+        # One confirmation session, opened at speech onset with the pre-roll
+        self.assertEqual(len(self.deepgram.sockets), 1)
+        preroll = int(wakeword.PREROLL_SECONDS * RATE) * 2
+        self.assertLessEqual(len(self.deepgram.sockets[0].sent), preroll + len(speech))
+        self.assertEqual(self.pool.stats()["handoffs_waiting"], 1)
+
+    def test_enrollment(self):
+        for seed, stretch in enumerate((0.9, 1.0, 1.1)):
+            response = self.client.post(
+                f"/wakeword/enroll?user_id=user-1&sample_rate={RATE}",
+                content=pcm(phrase(WAKE, stretch), seed=seed),
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"samples": 3, "samples_needed": 0, "ready": True})
+
+        response = self.client.post(f"/wakeword/enroll?user_id=user-1&sample_rate={RATE}", content=pcm(silence(1), noise=0))
+        self.assertEqual(response.status_code, 400)
+
+        self.assertFalse(self.client.delete("/wakeword/enroll?user_id=user-1").json()["ready"])
+
+
+if __name__ == "__main__":
+    unittest.main()
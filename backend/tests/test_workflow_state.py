@@ -0,0 +1,104 @@
+"""
+Tests for the in-place SessionState the LangGraph workflow mutates.
+"""
+import time
+import tracemalloc
+import unittest
+from collections import deque
+from unittest import mock
+
+from services.session_state import SessionState, MAX_TRANSCRIPT_TURNS
+from services import workflow
+
+
+def fake_analyze(risk, confidence):
+    def analyze(new_chunk, session):
+        session.risk_score = risk
+        session.confidence_score = confidence
+        session.latest_reasoning = "stubbed"
+        session.add_turn(new_chunk["speaker"], new_chunk["text"])
+    return analyze
+
+
+class TestSessionStateHistory(unittest.TestCase):
+
+    def test_history_is_bounded_ring_buffer(self):
+        state = SessionState()
+        for i in range(MAX_TRANSCRIPT_TURNS + 5):
+            state.add_turn("caller", str(i))
+        self.assertIsInstance(state.transcript_history, deque)
+        self.assertEqual(len(state.transcript_history), MAX_TRANSCRIPT_TURNS)
+        self.assertEqual(state.transcript_history[0]["text"], "5")
+        self.assertEqual([t["text"] for t in state.recent_turns(2)], [str(MAX_TRANSCRIPT_TURNS + 3), str(MAX_TRANSCRIPT_TURNS + 4)])
+
+    def test_speaker_labels_are_interned(self):
+        state = SessionState()
+        state.add_turn("".join(["cal", "ler"]), "a")
+        state.add_turn("".join(["ca", "ller"]), "b")
+        first, second = state.transcript_history
+        self.assertIs(first["speaker"], second["speaker"])
+
+    def test_slots_reject_unknown_attributes(self):
+        with self.assertRaises(AttributeError):
+            SessionState().risk = 5
+
+    def test_serialized_history_stays_bounded(self):
+        state = SessionState()
+        state.add_turn("user", "hi")
+        restored = SessionState.from_bytes(state.to_bytes())
+        self.assertEqual(restored.transcript_history.maxlen, MAX_TRANSCRIPT_TURNS)
+        self.assertEqual(list(restored.transcript_history), [{"speaker": "user", "text": "hi"}])
+
+    def test_add_turn_allocation_does_not_grow_with_history(self):
+        def peak_for(history_length):
+            state = SessionState()
+            for i in range(history_length):
+                state.add_turn("caller", f"turn {i}")
+            tracemalloc.start()
+            state.add_turn("caller", "new turn")
+            state.recent_turns(20)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return peak
+
+        self.assertLess(peak_for(MAX_TRANSCRIPT_TURNS), peak_for(25) + 512)
+
+
+class TestProcessChunkInPlace(unittest.TestCase):
+
+    def test_graph_mutates_the_same_session(self):
+        session = SessionState()
+        with mock.patch.object(workflow, "analyze_transcript", fake_analyze(20, 60)):
+            result = workflow.process_chunk({"speaker": "caller", "text": "hello"}, session)
+        self.assertIs(result["session"], session)
+        self.assertEqual((session.risk_score, session.confidence_score), (20, 60))
+        self.assertEqual(len(session.transcript_history), 1)
+        self.assertFalse(result["alert_sent"])
+
+    def test_alert_updates_session(self):
+        session = SessionState()
+        session.emergency_contacts = ["+15551234567"]
+        session.caller_phone_number = "+15557654321"
+        with mock.patch.object(workflow, "analyze_transcript", fake_analyze(90, 90)), \
+                mock.patch.object(workflow, "send_scam_alert", return_value=True) as send:
+            result = workflow.process_chunk({"speaker": "caller", "text": "gift cards"}, session)
+            workflow.process_chunk({"speaker": "caller", "text": "hurry"}, session)
+
+        self.assertTrue(result["alert_sent"])
+        self.assertTrue(session.suspicious_number_reported)
+        self.assertAlmostEqual(session.last_alert_time, time.time(), delta=5)
+        # Second chunk is inside the 30s throttle window
+        send.assert_called_once()
+
+    def test_question_timestamp_only_set_when_asked(self):
+        session = SessionState()
+        with mock.patch.object(workflow, "analyze_transcript", fake_analyze(30, 10)), \
+                mock.patch.object(workflow, "generate_question", return_value=(None, 2)):
+            result = workflow.process_chunk({"speaker": "caller", "text": "hi"}, session)
+        self.assertIsNone(result["suggested_question"])
+        self.assertEqual(result["necessity_score"], 2)
+        self.assertEqual(session.last_question_time, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,7 @@ import { Dashboard } from './pages/Dashboard';
 import { ActiveCall } from './pages/ActiveCall';
 import { Account } from './pages/Account';
 import { Analytics } from './pages/Analytics';
+import { Observe } from './pages/Observe';
 import { type ReactNode } from 'react';
 
 // Protected route component
@@ -37,6 +38,9 @@ function AppRoutes() {
         <Route path="/signup" element={<Signup />} />
       </Route>
 
+      {/* Watch links from scam alerts (the link's token is the authorization) */}
+      <Route path="/observe/:sessionId" element={<Observe />} />
+
       {/* Protected Routes */}
       <Route path="/dashboard" element={<ProtectedRoute><Dashboard /></ProtectedRoute>} />
       <Route path="/active" element={<ProtectedRoute><ActiveCall /></ProtectedRoute>} />
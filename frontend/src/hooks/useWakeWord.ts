@@ -1,9 +1,12 @@
 import { useState, useEffect, useRef, useCallback } from 'react';
+import { preferredEncoding, startAudioSender } from '../lib/audioCapture';
 
 interface UseWakeWordOptions {
     wakeWord?: string;
-    onWakeWord: () => void;
+    // handoff: token for /ws/audio to adopt the wake word's open transcription connection
+    onWakeWord: (handoff?: string) => void;
     enabled?: boolean;
+    userId?: string;  // Selects the user's enrolled wake word templates on the server
 }
 
 interface UseWakeWordReturn {
@@ -19,13 +22,14 @@ export const useWakeWord = ({
     wakeWord = 'hello',
     onWakeWord,
     enabled = true,
+    userId,
 }: UseWakeWordOptions): UseWakeWordReturn => {
     const [isListening, setIsListening] = useState(false);
     const [error, setError] = useState<string | null>(null);
 
     const socketRef = useRef<WebSocket | null>(null);
     const audioContextRef = useRef<AudioContext | null>(null);
-    const processorRef = useRef<ScriptProcessorNode | null>(null);
+    const stopSenderRef = useRef<(() => void) | null>(null);
     const streamRef = useRef<MediaStream | null>(null);
     const shouldBeListeningRef = useRef(false);
     const onWakeWordRef = useRef(onWakeWord);
@@ -42,9 +46,9 @@ export const useWakeWord = ({
             reconnectTimeoutRef.current = null;
         }
 
-        if (processorRef.current) {
-            processorRef.current.disconnect();
-            processorRef.current = null;
+        if (stopSenderRef.current) {
+            stopSenderRef.current();
+            stopSenderRef.current = null;
         }
 
         if (audioContextRef.current) {
@@ -90,7 +94,7 @@ export const useWakeWord = ({
             await audioContext.resume();
 
             // Connect to backend WebSocket
-            const wsUrl = `ws://localhost:8000/ws/wakeword?sample_rate=${audioContext.sampleRate}&wake_word=${encodeURIComponent(wakeWord)}`;
+            const wsUrl = `ws://localhost:8000/ws/wakeword?sample_rate=${audioContext.sampleRate}&wake_word=${encodeURIComponent(wakeWord)}&user_id=${userId || ''}&encoding=${preferredEncoding()}`;
             const socket = new WebSocket(wsUrl);
             socketRef.current = socket;
 
@@ -98,26 +102,6 @@ export const useWakeWord = ({
                 console.log('[WakeWord] Connected to backend');
                 setIsListening(true);
                 setError(null);
-
-                // Set up audio processing
-                const source = audioContext.createMediaStreamSource(stream);
-                const processor = audioContext.createScriptProcessor(4096, 1, 1);
-                processorRef.current = processor;
-
-                processor.onaudioprocess = (e) => {
-                    if (socket.readyState === WebSocket.OPEN) {
-                        const inputData = e.inputBuffer.getChannelData(0);
-                        const int16Data = new Int16Array(inputData.length);
-                        for (let i = 0; i < inputData.length; i++) {
-                            const s = Math.max(-1, Math.min(1, inputData[i]));
-                            int16Data[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
-                        }
-                        socket.send(int16Data.buffer);
-                    }
-                };
-
-                source.connect(processor);
-                processor.connect(audioContext.destination);
             };
 
             socket.onmessage = (event) => {
@@ -125,12 +109,18 @@ export const useWakeWord = ({
                     const data = JSON.parse(event.data);
                     console.log('[WakeWord] Message:', data);
 
+                    // Audio starts once the server has picked the encoding
+                    if (data.type === 'audio_format') {
+                        stopSenderRef.current = startAudioSender(data.encoding, stream, audioContext, socket);
+                        return;
+                    }
+
                     if (data.detected) {
                         console.log('[WakeWord] Wake word detected!');
                         shouldBeListeningRef.current = false;
                         cleanup();
                         setIsListening(false);
-                        onWakeWordRef.current();
+                        onWakeWordRef.current(data.handoff);
                     }
                 } catch (e) {
                     console.error('[WakeWord] Parse error:', e);
@@ -167,7 +157,7 @@ export const useWakeWord = ({
             }
             setIsListening(false);
         }
-    }, [wakeWord, cleanup]);
+    }, [wakeWord, userId, cleanup]);
 
     const stopListening = useCallback(() => {
         shouldBeListeningRef.current = false;
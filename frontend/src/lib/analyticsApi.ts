@@ -92,6 +92,30 @@ export async function fetchUserAnalytics(userId: string): Promise<UserAnalyticsR
     }
 }
 
+export interface FleetAnalytics {
+    unique_scam_numbers: number;
+    relative_error: number;
+}
+
+/**
+ * Fetch fleet-wide estimates (distinct scam numbers seen across all users).
+ */
+export async function fetchFleetAnalytics(): Promise<FleetAnalytics | null> {
+    try {
+        const response = await fetch(`${API_BASE}/analytics/fleet`);
+        const data = await response.json();
+
+        if (data.error) {
+            return null;
+        }
+
+        return data as FleetAnalytics;
+    } catch (error) {
+        console.error('Error fetching fleet analytics:', error);
+        return null;
+    }
+}
+
 /**
  * Export analytics data in shareable format.
  */
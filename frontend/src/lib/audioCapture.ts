@@ -0,0 +1,70 @@
+/**
+ * Microphone capture for the audio WebSockets.
+ *
+ * Browsers that can record Opus send it in a WebM/Ogg container from
+ * MediaRecorder (~32 kbps, encoded off the main thread); everything else
+ * sends 16-bit PCM from a ScriptProcessorNode (768 kbps at 48 kHz). The
+ * client asks for an encoding with ?encoding= and the server answers with
+ * {"type": "audio_format", "encoding": ...} before it reads any audio.
+ */
+
+export type AudioEncoding = 'opus' | 'linear16';
+
+const OPUS_MIME_TYPES = ['audio/webm;codecs=opus', 'audio/ogg;codecs=opus'];
+const OPUS_BITS_PER_SECOND = 32000;
+const OPUS_TIMESLICE_MS = 250;
+
+function opusMimeType(): string | undefined {
+    if (typeof MediaRecorder === 'undefined') return undefined;
+    return OPUS_MIME_TYPES.find(type => MediaRecorder.isTypeSupported(type));
+}
+
+/** The encoding to ask the server for. */
+export function preferredEncoding(): AudioEncoding {
+    return opusMimeType() ? 'opus' : 'linear16';
+}
+
+/**
+ * Start sending microphone audio in the encoding the server accepted.
+ * Returns a function that stops sending.
+ */
+export function startAudioSender(
+    encoding: AudioEncoding,
+    stream: MediaStream,
+    audioContext: AudioContext,
+    socket: WebSocket,
+): () => void {
+    const mimeType = opusMimeType();
+    if (encoding === 'opus' && mimeType) {
+        const recorder = new MediaRecorder(stream, { mimeType, audioBitsPerSecond: OPUS_BITS_PER_SECOND });
+        recorder.ondataavailable = (e) => {
+            if (e.data.size > 0 && socket.readyState === WebSocket.OPEN) {
+                socket.send(e.data);
+            }
+        };
+        recorder.start(OPUS_TIMESLICE_MS);
+        return () => {
+            if (recorder.state !== 'inactive') recorder.stop();
+        };
+    }
+
+    const source = audioContext.createMediaStreamSource(stream);
+    const processor = audioContext.createScriptProcessor(4096, 1, 1);
+    processor.onaudioprocess = (e) => {
+        if (socket.readyState === WebSocket.OPEN) {
+            const inputData = e.inputBuffer.getChannelData(0);
+            const int16Data = new Int16Array(inputData.length);
+            for (let i = 0; i < inputData.length; i++) {
+                const s = Math.max(-1, Math.min(1, inputData[i]));
+                int16Data[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
+            }
+            socket.send(int16Data.buffer);
+        }
+    };
+    source.connect(processor);
+    processor.connect(audioContext.destination); // Essential for script processor to run
+    return () => {
+        processor.disconnect();
+        source.disconnect();
+    };
+}
@@ -0,0 +1,127 @@
+/**
+ * Decoding for /ws/audio messages.
+ *
+ * With ?protocol=msgpack the server sends binary MessagePack frames with
+ * integer keys (the codes below mirror backend/services/outbound_protocol.py),
+ * and transcript messages are deltas: fields that didn't change are left
+ * out, and `seq` numbers the first new segment. Text frames are JSON.
+ */
+
+export type CallProtocol = 'json' | 'msgpack';
+
+export const PREFERRED_PROTOCOL: CallProtocol = 'msgpack';
+
+const TYPES = ['transcript', 'stop_call', 'voice_command'];
+const FIELDS = [
+    'type', 'seq', 'segments', 'risk_score', 'confidence_score',
+    'reasoning', 'suggested_question', 'alert_sent', 'transcript', 'command',
+];
+const SPEAKERS = ['user', 'caller'];
+
+class Reader {
+    private view: DataView;
+    private bytes: Uint8Array;
+    private offset = 0;
+    private text = new TextDecoder();
+
+    constructor(buffer: ArrayBuffer) {
+        this.view = new DataView(buffer);
+        this.bytes = new Uint8Array(buffer);
+    }
+
+    read(): unknown {
+        const byte = this.view.getUint8(this.offset++);
+        if (byte <= 0x7f) return byte;
+        if (byte >= 0xe0) return byte - 0x100;
+        if (byte >= 0x80 && byte <= 0x8f) return this.map(byte & 0x0f);
+        if (byte >= 0x90 && byte <= 0x9f) return this.array(byte & 0x0f);
+        if (byte >= 0xa0 && byte <= 0xbf) return this.str(byte & 0x1f);
+        switch (byte) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xc4: return this.bin(this.uint(1));
+            case 0xc5: return this.bin(this.uint(2));
+            case 0xc6: return this.bin(this.uint(4));
+            case 0xca: return this.number(4, (o) => this.view.getFloat32(o));
+            case 0xcb: return this.number(8, (o) => this.view.getFloat64(o));
+            case 0xcc: return this.uint(1);
+            case 0xcd: return this.uint(2);
+            case 0xce: return this.uint(4);
+            case 0xcf: return this.number(8, (o) => Number(this.view.getBigUint64(o)));
+            case 0xd0: return this.number(1, (o) => this.view.getInt8(o));
+            case 0xd1: return this.number(2, (o) => this.view.getInt16(o));
+            case 0xd2: return this.number(4, (o) => this.view.getInt32(o));
+            case 0xd3: return this.number(8, (o) => Number(this.view.getBigInt64(o)));
+            case 0xd9: return this.str(this.uint(1));
+            case 0xda: return this.str(this.uint(2));
+            case 0xdb: return this.str(this.uint(4));
+            case 0xdc: return this.array(this.uint(2));
+            case 0xdd: return this.array(this.uint(4));
+            case 0xde: return this.map(this.uint(2));
+            case 0xdf: return this.map(this.uint(4));
+            default: throw new Error(`Unsupported MessagePack type 0x${byte.toString(16)}`);
+        }
+    }
+
+    private number(size: number, get: (offset: number) => number): number {
+        const value = get(this.offset);
+        this.offset += size;
+        return value;
+    }
+
+    private uint(size: number): number {
+        if (size === 1) return this.number(1, (o) => this.view.getUint8(o));
+        if (size === 2) return this.number(2, (o) => this.view.getUint16(o));
+        return this.number(4, (o) => this.view.getUint32(o));
+    }
+
+    private str(length: number): string {
+        const value = this.text.decode(this.bytes.subarray(this.offset, this.offset + length));
+        this.offset += length;
+        return value;
+    }
+
+    private bin(length: number): Uint8Array {
+        const value = this.bytes.slice(this.offset, this.offset + length);
+        this.offset += length;
+        return value;
+    }
+
+    private array(length: number): unknown[] {
+        const items = [];
+        for (let i = 0; i < length; i++) items.push(this.read());
+        return items;
+    }
+
+    private map(length: number): Map<unknown, unknown> {
+        const entries = new Map();
+        for (let i = 0; i < length; i++) {
+            const key = this.read();
+            entries.set(key, this.read());
+        }
+        return entries;
+    }
+}
+
+/**
+ * A /ws/audio message as a plain object with the JSON field names.
+ * Fields missing from a delta are missing here too.
+ */
+export function decodeCallMessage(data: string | ArrayBuffer): Record<string, unknown> {
+    if (typeof data === 'string') return JSON.parse(data);
+
+    const frame = new Reader(data).read() as Map<unknown, unknown>;
+    const message: Record<string, unknown> = {};
+    frame.forEach((value, key) => {
+        message[typeof key === 'number' ? FIELDS[key] : String(key)] = value;
+    });
+    if (typeof message.type === 'number') message.type = TYPES[message.type];
+    if (Array.isArray(message.segments)) {
+        message.segments = (message.segments as [number | string, string][]).map(([speaker, text]) => ({
+            speaker: typeof speaker === 'number' ? SPEAKERS[speaker] : speaker,
+            text,
+        }));
+    }
+    return message;
+}
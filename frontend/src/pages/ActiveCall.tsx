@@ -7,6 +7,8 @@ import { cn } from '../utils/cn';
 import { ShieldAlert, ShieldCheck, ShieldQuestion, PhoneOff, X, MessageCircleQuestion, AlertTriangle } from 'lucide-react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { useAuth } from '../contexts/AuthContext';
+import { preferredEncoding, startAudioSender, type AudioEncoding } from '../lib/audioCapture';
+import { PREFERRED_PROTOCOL, decodeCallMessage } from '../lib/callProtocol';
 
 interface AudioDevice {
     deviceId: string;
@@ -18,23 +20,26 @@ interface TranscriptSegment {
     text: string;
 }
 
+// With the msgpack protocol, fields that didn't change are left out
 interface TranscriptMessage {
     type: string;
-    segments: TranscriptSegment[];
-    risk_score: number;
-    confidence_score: number;
-    reasoning: string;
-    suggested_question: string | null;
-    alert_sent: boolean;
+    seq?: number; // Index of the first segment among those sent on this connection
+    segments?: TranscriptSegment[];
+    risk_score?: number;
+    confidence_score?: number;
+    reasoning?: string;
+    suggested_question?: string | null;
+    alert_sent?: boolean;
 }
 
 export const ActiveCall = () => {
     const navigate = useNavigate();
     const location = useLocation();
     const { user } = useAuth();
-    const locationState = location.state as { callerPhoneNumber?: string; autoStart?: boolean } | null;
+    const locationState = location.state as { callerPhoneNumber?: string; autoStart?: boolean; handoff?: string } | null;
     const callerPhoneNumber = locationState?.callerPhoneNumber || '';
     const autoStart = locationState?.autoStart || false;
+    const handoff = locationState?.handoff || '';
     const [riskScore, setRiskScore] = useState(0);
     const [confidenceScore, setConfidenceScore] = useState(0);
     const [transcriptSegments, setTranscriptSegments] = useState<TranscriptSegment[]>([]);
@@ -48,7 +53,8 @@ export const ActiveCall = () => {
     // WebSocket and audio refs
     const socketRef = useRef<WebSocket | null>(null);
     const audioContextRef = useRef<AudioContext | null>(null);
-    const processorRef = useRef<ScriptProcessorNode | null>(null);
+    const stopSenderRef = useRef<(() => void) | null>(null);
+    const nextSeqRef = useRef(0);
     const streamRef = useRef<MediaStream | null>(null);
 
     // Session ID for chatbot context - stable across component lifecycle
@@ -147,33 +153,16 @@ export const ActiveCall = () => {
             // Create two branches: one for Analysis (Visualizer), one for Processing (WebSocket)
             // Branch 1 is handled by passing 'stream' to AudioVisualizer component
 
-            // Branch 2: Sending data to backend
-            const source = audioContext.createMediaStreamSource(stream);
-            const processor = audioContext.createScriptProcessor(4096, 1, 1);
-            processorRef.current = processor;
+            // Branch 2: Sending data to backend (Opus via MediaRecorder where supported)
+            const wsUrl = `ws://localhost:8000/ws/audio?sample_rate=${audioContext.sampleRate}&caller_phone_number=${encodeURIComponent(callerPhoneNumber)}&session_id=${sessionId}&user_id=${user?.id || ''}&handoff=${encodeURIComponent(handoff)}&encoding=${preferredEncoding()}&protocol=${PREFERRED_PROTOCOL}`;
+            const socket = new WebSocket(wsUrl);
+            socket.binaryType = 'arraybuffer';
+            socketRef.current = socket;
+            nextSeqRef.current = 0;
 
-            const wsUrl = `ws://localhost:8000/ws/audio?sample_rate=${audioContext.sampleRate}&caller_phone_number=${encodeURIComponent(callerPhoneNumber)}&session_id=${sessionId}&user_id=${user?.id || ''}`;
-            socketRef.current = new WebSocket(wsUrl);
-
-            socketRef.current.onopen = () => {
+            socket.onopen = () => {
                 console.log('WebSocket Connected');
                 setIsListening(true);
-
-                processor.onaudioprocess = (e) => {
-                    if (socketRef.current?.readyState === WebSocket.OPEN) {
-                        const inputData = e.inputBuffer.getChannelData(0);
-                        // Downsample or process if needed, but here we send raw PCM
-                        const int16Data = new Int16Array(inputData.length);
-                        for (let i = 0; i < inputData.length; i++) {
-                            const s = Math.max(-1, Math.min(1, inputData[i]));
-                            int16Data[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
-                        }
-                        socketRef.current.send(int16Data.buffer);
-                    }
-                };
-
-                source.connect(processor);
-                processor.connect(audioContext.destination); // Essential for script processor to run
             };
 
             // ... (rest of websocket handlers) ...
@@ -181,9 +170,15 @@ export const ActiveCall = () => {
             // Handle incoming transcripts with speaker info
             socketRef.current.onmessage = (event) => {
                 try {
-                    const message = JSON.parse(event.data);
+                    const message = decodeCallMessage(event.data);
                     console.log('Received:', message);
 
+                    // Audio starts once the server has picked the encoding
+                    if (message.type === 'audio_format') {
+                        stopSenderRef.current = startAudioSender(message.encoding as AudioEncoding, stream, audioContext, socket);
+                        return;
+                    }
+
                     // Handle "kova stop" voice command
                     if (message.type === 'stop_call') {
                         console.log('[ActiveCall] "kova stop" detected, ending call...');
@@ -192,12 +187,22 @@ export const ActiveCall = () => {
                     }
 
                     if (message.type === 'transcript') {
-                        const transcriptMessage = message as TranscriptMessage;
-                        if (transcriptMessage.segments.length > 0) {
-                            setTranscriptSegments(prev => [...prev, ...transcriptMessage.segments]);
+                        const transcriptMessage = message as unknown as TranscriptMessage;
+                        let segments = transcriptMessage.segments ?? [];
+                        if (transcriptMessage.seq !== undefined) {
+                            // Skip segments this connection already delivered
+                            segments = segments.slice(Math.max(nextSeqRef.current - transcriptMessage.seq, 0));
+                            nextSeqRef.current = Math.max(nextSeqRef.current, transcriptMessage.seq + (transcriptMessage.segments?.length ?? 0));
+                        }
+                        if (segments.length > 0) {
+                            setTranscriptSegments(prev => [...prev, ...segments]);
+                        }
+                        if (transcriptMessage.risk_score !== undefined) {
+                            setRiskScore(transcriptMessage.risk_score);
+                        }
+                        if (transcriptMessage.confidence_score !== undefined) {
+                            setConfidenceScore(transcriptMessage.confidence_score);
                         }
-                        setRiskScore(transcriptMessage.risk_score);
-                        setConfidenceScore(transcriptMessage.confidence_score);
 
                         // Add new question if not duplicate
                         if (transcriptMessage.suggested_question) {
@@ -227,9 +232,9 @@ export const ActiveCall = () => {
     }, [selectedDeviceId, callerPhoneNumber, sessionId]);
 
     const stopListening = useCallback(() => {
-        if (processorRef.current) {
-            processorRef.current.disconnect();
-            processorRef.current = null;
+        if (stopSenderRef.current) {
+            stopSenderRef.current();
+            stopSenderRef.current = null;
         }
 
         if (audioContextRef.current) {
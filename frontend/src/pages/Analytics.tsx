@@ -3,7 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { Button } from '../components/ui/Button';
 import { ArrowLeft, ShieldCheck, Timer, XCircle, AlertTriangle, Phone, Users, Bell, HelpCircle, Loader2 } from 'lucide-react';
 import { AreaChart, Area, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, BarChart, Bar, PieChart, Pie, Cell } from 'recharts';
-import { supabase } from '../lib/supabaseClient';
+import { fetchUserAnalytics, fetchFleetAnalytics, type FleetAnalytics } from '../lib/analyticsApi';
 import { useAuth } from '../contexts/AuthContext';
 import type { UserAnalytics } from '../types/database.types';
 
@@ -11,6 +11,7 @@ export const Analytics = () => {
     const navigate = useNavigate();
     const { user } = useAuth();
     const [analytics, setAnalytics] = useState<UserAnalytics | null>(null);
+    const [fleet, setFleet] = useState<FleetAnalytics | null>(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState<string | null>(null);
 
@@ -22,23 +23,13 @@ export const Analytics = () => {
             }
 
             try {
-                const { data, error: supabaseError } = await supabase
-                    .from('user_analytics')
-                    .select('*')
-                    .eq('id', user.id)
-                    .single();
-
-                if (supabaseError) {
-                    if (supabaseError.code === 'PGRST116') {
-                        // No row found - user has no analytics yet
-                        setAnalytics(null);
-                    } else {
-                        throw supabaseError;
-                    }
-                } else {
-                    setAnalytics(data as UserAnalytics);
-                    console.log(data);
-                }
+                // Served by the backend, which assembles daily/weekly stats from the call rollups
+                const [data, fleetData] = await Promise.all([
+                    fetchUserAnalytics(user.id),
+                    fetchFleetAnalytics(),
+                ]);
+                setAnalytics(data as UserAnalytics | null);
+                setFleet(fleetData);
             } catch (err) {
                 console.error('Error fetching analytics:', err);
                 setError('Failed to load analytics data');
@@ -202,6 +193,11 @@ export const Analytics = () => {
                                     <span className="text-xs font-medium uppercase">Unique Callers</span>
                                 </div>
                                 <p className="text-2xl font-bold text-white">{analytics.unique_callers_count}</p>
+                                {fleet && (
+                                    <p className="text-xs text-neutral-500 mt-1">
+                                        ~{fleet.unique_scam_numbers.toLocaleString()} scam numbers seen across Kova
+                                    </p>
+                                )}
                             </div>
 
                             <div className="bg-neutral-900 border border-neutral-800 p-4 rounded-2xl">
@@ -12,12 +12,12 @@ export const Dashboard = () => {
     const [isMenuOpen, setIsMenuOpen] = useState(false);
     const [showPhoneModal, setShowPhoneModal] = useState(false);
     const [wakeWordEnabled, setWakeWordEnabled] = useState(true);
-    const { profile, signOut } = useAuth();
+    const { user, profile, signOut } = useAuth();
 
     // Handle wake word detection - navigate directly to active call with autoStart
-    const handleWakeWordDetected = useCallback(() => {
+    const handleWakeWordDetected = useCallback((handoff?: string) => {
         console.log('[Dashboard] Wake word detected! Navigating to active call with auto-start...');
-        navigate('/active', { state: { callerPhoneNumber: '', autoStart: true } });
+        navigate('/active', { state: { callerPhoneNumber: '', autoStart: true, handoff } });
     }, [navigate]);
 
     // Wake word listener
@@ -25,6 +25,7 @@ export const Dashboard = () => {
         wakeWord: 'kova activate',
         onWakeWord: handleWakeWordDetected,
         enabled: wakeWordEnabled,
+        userId: user?.id,
     });
 
     const handleStartProtection = () => {
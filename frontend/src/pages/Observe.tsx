@@ -0,0 +1,171 @@
+import { useState, useEffect, useRef } from 'react';
+import { useParams, useSearchParams } from 'react-router-dom';
+import { cn } from '../utils/cn';
+import { ShieldAlert, ShieldCheck, ShieldQuestion, AlertTriangle } from 'lucide-react';
+
+interface TranscriptSegment {
+    speaker: 'user' | 'caller';
+    text: string;
+}
+
+// Messages from /ws/observe (see backend/services/observer_hub.py)
+interface ObserverMessage {
+    type: 'state' | 'update' | 'ended';
+    segments?: TranscriptSegment[];
+    risk_score?: number;
+    confidence_score?: number;
+    reasoning?: string;
+    alert_sent?: boolean;
+}
+
+// Close codes from backend/routers/observe.py
+const CLOSE_UNAUTHORIZED = 4401;
+const CLOSE_NOT_LIVE = 4404;
+const CLOSE_TRY_AGAIN = 1013;
+const RECONNECT_DELAY_MS = 2000;
+
+type Connection = 'connecting' | 'live' | 'ended' | 'unauthorized' | 'not_live';
+
+export const Observe = () => {
+    const { sessionId } = useParams<{ sessionId: string }>();
+    const [searchParams] = useSearchParams();
+    const token = searchParams.get('token') || '';
+    const [connection, setConnection] = useState<Connection>('connecting');
+    const [riskScore, setRiskScore] = useState(0);
+    const [confidenceScore, setConfidenceScore] = useState(0);
+    const [reasoning, setReasoning] = useState('');
+    const [segments, setSegments] = useState<TranscriptSegment[]>([]);
+    const [alertSent, setAlertSent] = useState(false);
+    const transcriptEndRef = useRef<HTMLDivElement>(null);
+
+    useEffect(() => {
+        let socket: WebSocket | null = null;
+        let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+        let stopped = false;
+
+        const connect = () => {
+            setConnection('connecting');
+            socket = new WebSocket(`ws://localhost:8000/ws/observe/${encodeURIComponent(sessionId || '')}?token=${encodeURIComponent(token)}`);
+            socket.onmessage = (event) => {
+                const message = JSON.parse(event.data) as ObserverMessage;
+                if (message.type === 'ended') {
+                    setConnection('ended');
+                    return;
+                }
+                setConnection('live');
+                if (message.type === 'state') {
+                    // A (re)connect starts from a fresh snapshot
+                    setSegments(message.segments || []);
+                } else if (message.segments && message.segments.length > 0) {
+                    const added = message.segments;
+                    setSegments(prev => [...prev, ...added]);
+                }
+                if (message.risk_score !== undefined) setRiskScore(message.risk_score);
+                if (message.confidence_score !== undefined) setConfidenceScore(message.confidence_score);
+                if (message.reasoning) setReasoning(message.reasoning);
+                if (message.alert_sent) setAlertSent(true);
+            };
+            socket.onclose = (event) => {
+                if (stopped) return;
+                if (event.code === CLOSE_UNAUTHORIZED) setConnection('unauthorized');
+                else if (event.code === CLOSE_NOT_LIVE) setConnection(prev => prev === 'ended' ? prev : 'not_live');
+                else if (event.code === CLOSE_TRY_AGAIN) reconnectTimer = setTimeout(connect, RECONNECT_DELAY_MS);
+                else setConnection(prev => prev === 'live' || prev === 'connecting' ? 'ended' : prev);
+            };
+        };
+
+        connect();
+        return () => {
+            stopped = true;
+            clearTimeout(reconnectTimer);
+            socket?.close();
+        };
+    }, [sessionId, token]);
+
+    useEffect(() => {
+        transcriptEndRef.current?.scrollIntoView({ behavior: 'smooth' });
+    }, [segments]);
+
+    const status = riskScore < 30 ? 'safe' : riskScore < 70 ? 'warning' : 'danger';
+
+    const getStatusColor = () => {
+        switch (status) {
+            case 'safe': return 'text-brand-400 bg-brand-500/10 border-brand-500/20';
+            case 'warning': return 'text-amber-400 bg-amber-500/10 border-amber-500/20';
+            case 'danger': return 'text-red-400 bg-red-500/10 border-red-500/20';
+        }
+    };
+
+    const connectionText: Record<Connection, string> = {
+        connecting: 'Connecting to the call...',
+        live: 'Live',
+        ended: 'The call has ended.',
+        unauthorized: 'This link is invalid or has expired.',
+        not_live: 'This call is not live right now.',
+    };
+
+    return (
+        <div className="min-h-screen bg-neutral-950 text-neutral-100 flex flex-col items-center p-6">
+            <div className="w-full max-w-2xl space-y-6">
+                <div className="flex items-center justify-between">
+                    <h1 className="text-xl font-semibold">Kova Live Call</h1>
+                    <span className={cn(
+                        "text-sm",
+                        connection === 'live' ? "text-brand-400" : "text-neutral-500"
+                    )}>
+                        {connectionText[connection]}
+                    </span>
+                </div>
+
+                {alertSent && (
+                    <div className="bg-red-500/20 border-2 border-red-500 rounded-2xl p-4 flex items-center gap-3">
+                        <AlertTriangle className="w-6 h-6 text-red-400 animate-pulse" />
+                        <div>
+                            <p className="text-red-400 font-bold text-lg">Scam Likely</p>
+                            <p className="text-red-300/80 text-sm">Consider calling them right away</p>
+                        </div>
+                    </div>
+                )}
+
+                <div className="flex items-center gap-4">
+                    <div className={cn("inline-flex items-center gap-2 px-4 py-2 rounded-full border", getStatusColor())}>
+                        {status === 'safe' && <ShieldCheck className="w-4 h-4" />}
+                        {status === 'warning' && <ShieldQuestion className="w-4 h-4" />}
+                        {status === 'danger' && <ShieldAlert className="w-4 h-4 animate-pulse" />}
+                        <span className="font-semibold uppercase tracking-wider text-sm">
+                            {status === 'safe' ? 'Looks Safe' : status === 'warning' ? 'Suspicious' : 'Scam Detected'}
+                        </span>
+                    </div>
+                    <span className="text-sm text-neutral-400">
+                        Risk {riskScore}/100 · Confidence {confidenceScore}/100
+                    </span>
+                </div>
+
+                {reasoning && (
+                    <p className="text-sm text-neutral-300 bg-neutral-900/60 border border-neutral-800 rounded-lg px-4 py-3">
+                        {reasoning}
+                    </p>
+                )}
+
+                <div className="bg-neutral-900/60 border border-neutral-800 rounded-lg p-4 h-[50vh] overflow-y-auto space-y-2">
+                    {segments.length === 0 ? (
+                        <p className="text-neutral-500 italic text-sm">Waiting for conversation...</p>
+                    ) : (
+                        segments.map((segment, idx) => (
+                            <p key={idx} className="text-sm">
+                                <span className={cn(
+                                    "font-medium mr-2",
+                                    segment.speaker === 'caller' ? "text-amber-400" : "text-brand-400"
+                                )}>
+                                    {segment.speaker === 'caller' ? 'Caller' : 'Them'}:
+                                </span>
+                                {segment.text}
+                            </p>
+                        ))
+                    )}
+                    <div ref={transcriptEndRef} />
+                </div>
+            </div>
+        </div>
+    );
+};
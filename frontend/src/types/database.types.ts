@@ -33,7 +33,7 @@ export interface UserAnalytics {
     medium_risk_calls: number;
     low_risk_calls: number;
     unique_callers_count: number;
-    recent_callers: string[] | null;
+    recent_callers: { phone: string; last_call: string; risk: number }[] | null;
     first_call_at: string | null;
     last_call_at: string | null;
     last_scam_detected_at: string | null;
@@ -102,7 +102,7 @@ export interface Database {
                     medium_risk_calls?: number;
                     low_risk_calls?: number;
                     unique_callers_count?: number;
-                    recent_callers?: string[] | null;
+                    recent_callers?: { phone: string; last_call: string; risk: number }[] | null;
                     first_call_at?: string | null;
                     last_call_at?: string | null;
                     last_scam_detected_at?: string | null;
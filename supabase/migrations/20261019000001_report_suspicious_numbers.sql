@@ -0,0 +1,22 @@
+-- Atomic, batched suspicious-number reporting.
+--
+-- Replaces the SELECT-then-UPDATE/INSERT round-trips in
+-- report_suspicious_number() with a single upsert-increment. Concurrent
+-- reports for the same number are serialized by the primary key conflict,
+-- so no increments are lost.
+
+alter table suspicious_numbers
+  add column if not exists created_at timestamptz default now();
+
+create or replace function report_suspicious_numbers(numbers text[], counts int[])
+returns void
+language sql
+as $$
+  insert into suspicious_numbers (phone_number, report_count, last_reported_at, created_at)
+  select phone_number, sum(report_count), now(), now()
+  from unnest(numbers, counts) as batch(phone_number, report_count)
+  group by phone_number
+  on conflict (phone_number) do update
+    set report_count = suspicious_numbers.report_count + excluded.report_count,
+        last_reported_at = excluded.last_reported_at;
+$$;
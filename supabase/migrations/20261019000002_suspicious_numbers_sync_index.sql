@@ -0,0 +1,5 @@
+-- Keyset index for delta-syncing the in-process suspicious number replica
+-- (rows are paged by (last_reported_at, phone_number) past a watermark).
+
+create index if not exists suspicious_numbers_last_reported_at_idx
+  on suspicious_numbers (last_reported_at, phone_number);
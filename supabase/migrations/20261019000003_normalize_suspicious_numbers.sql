@@ -0,0 +1,33 @@
+-- Normalize existing suspicious_numbers keys to E.164.
+--
+-- The backend now normalizes every number before reporting or looking it up,
+-- so legacy rows stored as "(555) 123-4567" etc. are merged into their E.164
+-- row (summing report counts). National-format numbers are assumed to be NANP,
+-- matching DEFAULT_COUNTRY_CODE in services/phone_numbers.py.
+
+create temporary table normalized_suspicious_numbers on commit drop as
+select
+  case
+    when phone_number like '+%' then '+' || digits
+    when length(digits) = 10 then '+1' || digits
+    when length(digits) = 11 and digits like '1%' then '+' || digits
+  end as e164,
+  report_count,
+  last_reported_at,
+  created_at
+from (
+  select *, regexp_replace(phone_number, '\D', '', 'g') as digits
+  from suspicious_numbers
+  where phone_number !~ '^\+[0-9]+$'
+) legacy;
+
+delete from suspicious_numbers where phone_number !~ '^\+[0-9]+$';
+
+insert into suspicious_numbers (phone_number, report_count, last_reported_at, created_at)
+select e164, sum(report_count), max(last_reported_at), min(created_at)
+from normalized_suspicious_numbers
+where e164 is not null
+group by e164
+on conflict (phone_number) do update
+  set report_count = suspicious_numbers.report_count + excluded.report_count,
+      last_reported_at = greatest(suspicious_numbers.last_reported_at, excluded.last_reported_at);
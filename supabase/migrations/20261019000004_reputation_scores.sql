@@ -0,0 +1,75 @@
+-- Time-decayed caller reputation.
+--
+-- reputation_score is an exponentially decayed report count: each report adds
+-- 1, and the score halves every half_life_seconds. It is updated in O(1) on
+-- every report (decay the stored value to now, then add), so no report history
+-- is ever rescanned. Rows that predate this migration are treated as if all
+-- of their reports arrived at last_reported_at until they are recomputed.
+
+alter table suspicious_numbers
+  add column if not exists reputation_score double precision,
+  add column if not exists reputation_updated_at timestamptz;
+
+create or replace function reputation_decay(age_seconds double precision, half_life_seconds double precision)
+returns double precision
+language sql
+immutable
+as $$
+  -- Clamp the exponent so very old scores decay to ~0 instead of underflowing
+  select exp(greatest(-700.0, -ln(2.0) * greatest(age_seconds, 0) / half_life_seconds));
+$$;
+
+drop function if exists report_suspicious_numbers(text[], int[]);
+
+create or replace function report_suspicious_numbers(
+  numbers text[],
+  counts int[],
+  half_life_seconds double precision default 2592000
+)
+returns void
+language sql
+as $$
+  insert into suspicious_numbers (
+    phone_number, report_count, reputation_score, reputation_updated_at, last_reported_at, created_at
+  )
+  select phone_number, sum(report_count), sum(report_count), now(), now(), now()
+  from unnest(numbers, counts) as batch(phone_number, report_count)
+  group by phone_number
+  on conflict (phone_number) do update
+    set report_count = suspicious_numbers.report_count + excluded.report_count,
+        reputation_score = coalesce(suspicious_numbers.reputation_score, suspicious_numbers.report_count)
+          * reputation_decay(
+              extract(epoch from excluded.reputation_updated_at - coalesce(
+                suspicious_numbers.reputation_updated_at,
+                suspicious_numbers.last_reported_at,
+                excluded.reputation_updated_at
+              )),
+              half_life_seconds
+            )
+          + excluded.reputation_score,
+        reputation_updated_at = excluded.reputation_updated_at,
+        last_reported_at = excluded.last_reported_at;
+$$;
+
+-- Batch backfill: (re)derive scores from report_count and last_reported_at.
+-- Without per-report history this assumes every report arrived at
+-- last_reported_at, which is an upper bound on the true decayed score.
+create or replace function recompute_reputation_scores(
+  half_life_seconds double precision default 2592000,
+  only_missing boolean default true
+)
+returns integer
+language sql
+as $$
+  with updated as (
+    update suspicious_numbers
+    set reputation_score = report_count * reputation_decay(
+          extract(epoch from now() - coalesce(last_reported_at, now())),
+          half_life_seconds
+        ),
+        reputation_updated_at = now()
+    where not only_missing or reputation_score is null
+    returning 1
+  )
+  select count(*)::integer from updated;
+$$;
@@ -0,0 +1,17 @@
+-- One row per finished call, written by update_call_analytics().
+
+create table if not exists call_records (
+  id bigint generated always as identity primary key,
+  user_id uuid not null,
+  session_id text,
+  started_at timestamptz,
+  ended_at timestamptz not null default now(),
+  duration_seconds integer not null default 0,
+  final_risk_score integer not null default 0,
+  caller_phone_number text,
+  was_scam boolean not null default false,
+  questions_generated integer not null default 0,
+  alerts_sent integer not null default 0
+);
+
+create index if not exists call_records_user_idx on call_records (user_id, ended_at desc);
@@ -0,0 +1,156 @@
+-- Append-only call log with incrementally maintained rollups.
+--
+-- update_call_analytics() used to read the whole user_analytics row, mutate
+-- the weekly_stats / daily_stats / recent_callers blobs in Python and write it
+-- back: two round-trips, a lost-update race when two calls end together, and
+-- a row that grows every day forever. Now each call end is a single insert
+-- into call_records; a trigger applies it to the user_analytics counters and
+-- the call_rollups buckets in the same transaction, touching a bounded amount
+-- of data no matter how long the user has had the product.
+
+create table if not exists call_rollups (
+  user_id uuid not null,
+  period text not null check (period in ('day', 'week', 'month')),
+  bucket date not null,
+  calls integer not null default 0,
+  scams integer not null default 0,
+  duration_seconds bigint not null default 0,
+  primary key (user_id, period, bucket)
+);
+
+create or replace function apply_call_record()
+returns trigger
+language plpgsql
+as $$
+declare
+  is_scam int := case when new.was_scam then 1 else 0 end;
+  is_high int := case when new.final_risk_score >= 80 then 1 else 0 end;
+  is_medium int := case when new.final_risk_score >= 50 and new.final_risk_score < 80 then 1 else 0 end;
+  is_low int := case when new.final_risk_score < 50 then 1 else 0 end;
+  call_day date := (new.ended_at at time zone 'utc')::date;
+  caller jsonb := case when new.caller_phone_number is null then null else jsonb_build_object(
+    'phone', new.caller_phone_number, 'last_call', new.ended_at, 'risk', new.final_risk_score
+  ) end;
+begin
+  insert into user_analytics as ua (
+    id, total_calls, total_call_duration_seconds, total_scam_calls, total_suspicious_calls,
+    total_safe_calls, total_alerts_sent, total_questions_generated, high_risk_calls,
+    medium_risk_calls, low_risk_calls, unique_callers_count, recent_callers,
+    first_call_at, last_call_at, last_scam_detected_at
+  ) values (
+    new.user_id, 1, new.duration_seconds, is_scam, is_medium,
+    is_low, new.alerts_sent, new.questions_generated, is_high,
+    is_medium, is_low, case when caller is null then 0 else 1 end,
+    case when caller is null then '[]'::jsonb else jsonb_build_array(caller) end,
+    new.ended_at, new.ended_at, case when new.was_scam then new.ended_at end
+  )
+  on conflict (id) do update set
+    total_calls = coalesce(ua.total_calls, 0) + 1,
+    total_call_duration_seconds = coalesce(ua.total_call_duration_seconds, 0) + new.duration_seconds,
+    total_scam_calls = coalesce(ua.total_scam_calls, 0) + is_scam,
+    total_suspicious_calls = coalesce(ua.total_suspicious_calls, 0) + is_medium,
+    total_safe_calls = coalesce(ua.total_safe_calls, 0) + is_low,
+    total_alerts_sent = coalesce(ua.total_alerts_sent, 0) + new.alerts_sent,
+    total_questions_generated = coalesce(ua.total_questions_generated, 0) + new.questions_generated,
+    high_risk_calls = coalesce(ua.high_risk_calls, 0) + is_high,
+    medium_risk_calls = coalesce(ua.medium_risk_calls, 0) + is_medium,
+    low_risk_calls = coalesce(ua.low_risk_calls, 0) + is_low,
+    -- Move this caller to the front of the (at most 10) most recent callers
+    recent_callers = case when caller is null then ua.recent_callers else (
+      select jsonb_agg(recent.c order by recent.ord)
+      from (
+        select caller as c, 0::bigint as ord
+        union all
+        select e.c, e.ord
+        from jsonb_array_elements(coalesce(ua.recent_callers, '[]'::jsonb)) with ordinality as e(c, ord)
+        where e.c->>'phone' is distinct from new.caller_phone_number
+        order by ord
+        limit 10
+      ) recent
+    ) end,
+    first_call_at = least(ua.first_call_at, excluded.first_call_at),
+    last_call_at = greatest(ua.last_call_at, excluded.last_call_at),
+    last_scam_detected_at = greatest(ua.last_scam_detected_at, excluded.last_scam_detected_at);
+
+  update user_analytics
+  set unique_callers_count = jsonb_array_length(coalesce(recent_callers, '[]'::jsonb))
+  where id = new.user_id;
+
+  insert into call_rollups (user_id, period, bucket, calls, scams, duration_seconds)
+  values
+    (new.user_id, 'day', call_day, 1, is_scam, new.duration_seconds),
+    (new.user_id, 'week', date_trunc('week', call_day)::date, 1, is_scam, new.duration_seconds)
+  on conflict (user_id, period, bucket) do update set
+    calls = call_rollups.calls + excluded.calls,
+    scams = call_rollups.scams + excluded.scams,
+    duration_seconds = call_rollups.duration_seconds + excluded.duration_seconds;
+
+  return new;
+end;
+$$;
+
+drop trigger if exists call_records_apply on call_records;
+create trigger call_records_apply
+  after insert on call_records
+  for each row execute function apply_call_record();
+
+-- Retention and downsampling. Daily buckets past their retention are dropped
+-- (the weekly buckets already carry their totals); weekly buckets past theirs
+-- are folded into monthly buckets.
+create or replace function compact_call_rollups(
+  daily_retention_days integer default 90,
+  weekly_retention_days integer default 730
+)
+returns integer
+language plpgsql
+as $$
+declare
+  dropped_days integer;
+  folded_weeks integer;
+begin
+  delete from call_rollups
+  where period = 'day' and bucket < current_date - daily_retention_days;
+  get diagnostics dropped_days = row_count;
+
+  with old_weeks as (
+    delete from call_rollups
+    where period = 'week' and bucket < current_date - weekly_retention_days
+    returning *
+  ), months as (
+    insert into call_rollups (user_id, period, bucket, calls, scams, duration_seconds)
+    select user_id, 'month', date_trunc('month', bucket)::date, sum(calls), sum(scams), sum(duration_seconds)
+    from old_weeks
+    group by user_id, date_trunc('month', bucket)::date
+    on conflict (user_id, period, bucket) do update set
+      calls = call_rollups.calls + excluded.calls,
+      scams = call_rollups.scams + excluded.scams,
+      duration_seconds = call_rollups.duration_seconds + excluded.duration_seconds
+  )
+  select count(*) into folded_weeks from old_weeks;
+
+  return dropped_days + folded_weeks;
+end;
+$$;
+
+-- Backfill rollups from the legacy JSON blobs, then stop storing them.
+-- Weekly keys were strftime("%Y-W%W"): week N starts N-1 weeks after the
+-- year's first Monday.
+insert into call_rollups (user_id, period, bucket, calls, scams, duration_seconds)
+select ua.id, 'day', day.key::date, coalesce((day.value->>'calls')::int, 0), coalesce((day.value->>'scams')::int, 0), 0
+from user_analytics ua, jsonb_each(coalesce(ua.daily_stats, '{}'::jsonb)) as day
+on conflict (user_id, period, bucket) do nothing;
+
+insert into call_rollups (user_id, period, bucket, calls, scams, duration_seconds)
+select
+  ua.id,
+  'week',
+  jan1 + ((8 - extract(isodow from jan1)::int) % 7) + (split_part(week.key, '-W', 2)::int - 1) * 7,
+  coalesce((week.value->>'calls')::int, 0),
+  coalesce((week.value->>'scams')::int, 0),
+  coalesce((week.value->>'duration')::bigint, 0)
+from user_analytics ua,
+  jsonb_each(coalesce(ua.weekly_stats, '{}'::jsonb)) as week,
+  lateral (select make_date(split_part(week.key, '-W', 1)::int, 1, 1) as jan1) as y
+on conflict (user_id, period, bucket) do nothing;
+
+update user_analytics set daily_stats = '{}'::jsonb, weekly_stats = '{}'::jsonb;
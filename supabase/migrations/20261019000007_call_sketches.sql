@@ -0,0 +1,117 @@
+-- Unique-caller counting with HyperLogLog sketches.
+--
+-- unique_callers_count used to be the length of recent_callers, so it could
+-- never exceed 10. Each user now carries a 4 KB HyperLogLog sketch of every
+-- caller seen (plus one of scam callers only, which merge across users into
+-- a fleet-wide unique scam number estimate). hll_add() hashes exactly like
+-- services/hyperloglog.py: the first 64 bits of md5, 12 index bits, rank of
+-- the first set bit in the remaining 52.
+
+alter table user_analytics
+  add column if not exists callers_hll bytea,
+  add column if not exists scam_callers_hll bytea;
+
+create or replace function hll_add(sketch bytea, value text)
+returns bytea
+language plpgsql
+immutable
+as $$
+declare
+  bits bit(64) := ('x' || substr(md5(value), 1, 16))::bit(64);
+  idx integer := substring(bits from 1 for 12)::bit(12)::integer;
+  rank integer := position('1' in substring(bits from 13)::text);
+begin
+  if rank = 0 then
+    rank := 53;
+  end if;
+  if sketch is null then
+    sketch := decode(repeat('00', 4096), 'hex');
+  end if;
+  if get_byte(sketch, idx) < rank then
+    sketch := set_byte(sketch, idx, rank);
+  end if;
+  return sketch;
+end;
+$$;
+
+-- Same estimator as HyperLogLog.count()
+create or replace function hll_count(sketch bytea)
+returns bigint
+language sql
+immutable
+as $$
+  select case when sketch is null then 0 else (
+    select case
+      when raw <= 2.5 * 4096 and zeros > 0 then round(4096 * ln(4096.0 / zeros))
+      else round(raw)
+    end
+    from (
+      select
+        (0.7213 / (1 + 1.079 / 4096)) * 4096 * 4096 / sum(power(2::float8, -get_byte(sketch, i))) as raw,
+        count(*) filter (where get_byte(sketch, i) = 0) as zeros
+      from generate_series(0, 4095) as i
+    ) estimate
+  )::bigint end
+$$;
+
+-- Register-wise max of every user's scam-caller sketch
+create or replace function merge_scam_caller_sketches()
+returns bytea
+language sql
+stable
+as $$
+  select decode(string_agg(lpad(to_hex(register), 2, '0'), '' order by i), 'hex')
+  from (
+    select i, max(get_byte(scam_callers_hll, i)) as register
+    from user_analytics, generate_series(0, 4095) as i
+    where scam_callers_hll is not null
+    group by i
+  ) registers
+$$;
+
+-- Runs after call_records_apply (triggers fire in name order), so the
+-- analytics row exists; it replaces the recent_callers-based count.
+create or replace function apply_call_sketches()
+returns trigger
+language plpgsql
+as $$
+begin
+  if new.caller_phone_number is null then
+    return new;
+  end if;
+  update user_analytics set
+    callers_hll = hll_add(callers_hll, new.caller_phone_number),
+    scam_callers_hll = case when new.was_scam
+      then hll_add(scam_callers_hll, new.caller_phone_number)
+      else scam_callers_hll end,
+    unique_callers_count = hll_count(hll_add(callers_hll, new.caller_phone_number))
+  where id = new.user_id;
+  return new;
+end;
+$$;
+
+drop trigger if exists call_records_sketch on call_records;
+create trigger call_records_sketch
+  after insert on call_records
+  for each row execute function apply_call_sketches();
+
+-- Backfill from the call log
+do $$
+declare
+  rec record;
+begin
+  for rec in
+    select distinct user_id, caller_phone_number, was_scam
+    from call_records
+    where caller_phone_number is not null
+  loop
+    update user_analytics set
+      callers_hll = hll_add(callers_hll, rec.caller_phone_number),
+      scam_callers_hll = case when rec.was_scam
+        then hll_add(scam_callers_hll, rec.caller_phone_number)
+        else scam_callers_hll end
+    where id = rec.user_id;
+  end loop;
+  update user_analytics set unique_callers_count = hll_count(callers_hll) where callers_hll is not null;
+end;
+$$;
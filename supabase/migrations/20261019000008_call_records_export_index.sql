@@ -0,0 +1,4 @@
+-- Keyset pagination for streaming exports: pages are ordered by
+-- (ended_at, id) within one user, so the index must match that order.
+
+create index if not exists call_records_user_export_idx on call_records (user_id, ended_at, id);
@@ -0,0 +1,7 @@
+-- Packed per-call risk timeline (7-byte samples, see services/risk_timeline.py),
+-- written with the call record at call end.
+
+alter table call_records add column if not exists risk_timeline bytea;
+
+-- Fleet statistics page through calls with a timeline by id
+create index if not exists call_records_risk_timeline_idx on call_records (id) where risk_timeline is not null;
@@ -0,0 +1,9 @@
+-- Per-user wake word templates for the on-server spotter (an npz archive of
+-- MFCC templates plus the calibrated threshold, see services/wake_spotter.py),
+-- written by POST /wakeword/enroll.
+
+create table if not exists wake_word_models (
+  user_id uuid primary key,
+  model bytea not null,
+  updated_at timestamptz not null default now()
+);